@@ -0,0 +1,196 @@
+"""
+Local CoinGecko stand-in for benchmarks.
+Serves /coins/markets from synthetic data with configurable latency and 429 throttling.
+"""
+
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+def synthetic_coin_ids(num_coins: int) -> List[str]:
+    """Ids of the synthetic coins served by FakeCoinGeckoServer."""
+    return [f"coin-{i:06d}" for i in range(num_coins)]
+
+
+def synthetic_market_record(index: int, rng: random.Random, now: datetime) -> Dict:
+    """
+    Build one /coins/markets record with realistic field types and magnitudes.
+    
+    Args:
+        index: Coin position (0 is the largest market cap)
+        rng: Seeded random source
+        now: Reference time for last_updated
+    
+    Returns:
+        Record with the fields CoinGecko returns
+    """
+    price = round(10 ** rng.uniform(-4, 5), 8)
+    supply = round(10 ** rng.uniform(6, 11))
+    change_pct = rng.uniform(-15, 15)
+    timestamp = lambda moment: moment.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    
+    return {
+        'id': f"coin-{index:06d}",
+        'symbol': f"c{index:06d}",
+        'name': f"Coin {index}",
+        'image': f"https://example.invalid/coins/{index}.png",
+        'current_price': price,
+        'market_cap': round(price * supply),
+        'market_cap_rank': index + 1,
+        'fully_diluted_valuation': None,
+        'total_volume': round(price * supply * rng.uniform(0.001, 0.2)),
+        'high_24h': round(price * 1.05, 8),
+        'low_24h': round(price * 0.95, 8),
+        'price_change_24h': round(price * change_pct / 100, 8),
+        'price_change_percentage_24h': round(change_pct, 5),
+        'market_cap_change_24h': 0.0,
+        'market_cap_change_percentage_24h': round(change_pct, 5),
+        'circulating_supply': float(supply),
+        'total_supply': float(supply),
+        'max_supply': None if index % 3 else float(supply * 2),
+        'ath': round(price * 3, 8),
+        'ath_change_percentage': -66.7,
+        'ath_date': timestamp(now - timedelta(days=400 + index % 365)),
+        'atl': round(price / 10, 10),
+        'atl_change_percentage': 900.0,
+        'atl_date': timestamp(now - timedelta(days=1500 + index % 365)),
+        'roi': None,
+        'last_updated': timestamp(now - timedelta(seconds=index % 300)),
+        'price_change_percentage_24h_in_currency': round(change_pct, 5),
+        'price_change_percentage_7d_in_currency': round(rng.uniform(-40, 40), 5),
+    }
+
+
+class FakeCoinGeckoServer:
+    """Threaded HTTP server emulating the CoinGecko /coins/markets endpoint."""
+    
+    def __init__(
+        self,
+        num_coins: int,
+        latency_ms: float = 0.0,
+        throttle_every: int = 0,
+        retry_after: float = 0.0,
+        seed: int = 42
+    ):
+        """
+        Args:
+            num_coins: Number of synthetic coins
+            latency_ms: Delay added to every response
+            throttle_every: Answer every Nth request with 429 (0 disables)
+            retry_after: Retry-After seconds sent with 429 responses
+            seed: Random seed for reproducible data
+        """
+        self.num_coins = num_coins
+        self.latency_ms = latency_ms
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.requests = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+        
+        # Records are encoded once so serving cost stays out of the measurements
+        rng = random.Random(seed)
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        self._encoded = [
+            json.dumps(synthetic_market_record(i, rng, now), separators=(",", ":")).encode("utf-8")
+            for i in range(num_coins)
+        ]
+        self._index = {f"coin-{i:06d}": i for i in range(num_coins)}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def base_url(self) -> str:
+        """Base URL to use as COINGECKO_API_URL."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self) -> "FakeCoinGeckoServer":
+        """Start serving on a free localhost port in a background thread."""
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def do_GET(self):
+                server._handle(self)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """Stop the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+    
+    def __enter__(self) -> "FakeCoinGeckoServer":
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+    
+    def markets_body(self, query: Dict[str, List[str]]) -> bytes:
+        """
+        Build a /coins/markets response body.
+        
+        With ids the matching coins are returned in market cap order, like the
+        real API; either way per_page/page select one page of results.
+        
+        Args:
+            query: Parsed query string
+        
+        Returns:
+            JSON array body
+        """
+        per_page = int(query.get('per_page', ['100'])[0])
+        page = int(query.get('page', ['1'])[0])
+        
+        if 'ids' in query:
+            ids = query['ids'][0].split(",")
+            positions = sorted(self._index[coin_id] for coin_id in ids if coin_id in self._index)
+        else:
+            positions = range(self.num_coins)
+        
+        selected = positions[(page - 1) * per_page:page * per_page]
+        return b"[" + b",".join(self._encoded[i] for i in selected) + b"]"
+    
+    def _handle(self, handler: BaseHTTPRequestHandler):
+        """Answer one request."""
+        with self._lock:
+            self.requests += 1
+            throttle = self.throttle_every > 0 and self.requests % self.throttle_every == 0
+            if throttle:
+                self.throttled += 1
+        
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        
+        url = urlparse(handler.path)
+        if throttle:
+            status, body, headers = 429, b'{"status":{"error_code":429}}', {'Retry-After': str(self.retry_after)}
+        elif url.path.endswith("/coins/markets"):
+            status, body, headers = 200, self.markets_body(parse_qs(url.query)), {}
+        else:
+            status, body, headers = 404, b'{"error":"not found"}', {}
+        
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
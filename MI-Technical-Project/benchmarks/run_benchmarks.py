@@ -0,0 +1,282 @@
+"""
+Benchmark runner for the ETL pipeline.
+Runs fetch -> transform -> validate -> load against a local CoinGecko stand-in and DuckDB.
+
+Usage (from MI-Technical-Project):
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --scenarios 1000,10000 --compare <commit>
+"""
+
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = BENCHMARK_DIR.parent
+SRC_DIR = PROJECT_DIR / "src"
+RESULTS_DIR = BENCHMARK_DIR / "results"
+
+DEFAULT_SCENARIOS = [1000, 10000, 100000]
+
+# Stages shown in the summary table
+REPORTED_STAGES = ['pipeline.fetch', 'pipeline.quality', 'pipeline.load']
+
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from config import Config  # noqa: E402
+from benchmarks.fake_coingecko import FakeCoinGeckoServer, synthetic_coin_ids  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def override_config(**values):
+    """Temporarily replace Config attributes."""
+    previous = {name: getattr(Config, name) for name in values}
+    for name, value in values.items():
+        setattr(Config, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(Config, name, value)
+
+
+def run_scenario(num_coins: int, latency_ms: float = 0.0, throttle_every: int = 0, workers: int = 8) -> Dict:
+    """
+    Run the batch pipeline once over synthetic coins.
+    
+    Args:
+        num_coins: Rows to push through the pipeline
+        latency_ms: Latency added by the fake API to every response
+        throttle_every: Fake API answers every Nth request with 429 (0 disables)
+        workers: Concurrent page requests
+    
+    Returns:
+        Scenario result with throughput, peak memory and per-stage timings
+    """
+    from bigquery_loader import BigQueryLoader
+    from data_fetcher import CryptoDataFetcher
+    from data_quality import DataQualityChecker
+    from local_bigquery import LocalBigQueryClient
+    from main import run_batch_pipeline
+    from metrics import RunMetrics, peak_rss_bytes, set_run_metrics
+    
+    with FakeCoinGeckoServer(num_coins, latency_ms=latency_ms, throttle_every=throttle_every) as server, \
+            tempfile.TemporaryDirectory() as state_dir:
+        with override_config(
+            COINGECKO_API_URL=server.base_url,
+            COINGECKO_API_KEY=None,
+            COINGECKO_REQUESTS_PER_MINUTE=60_000_000,
+            COINGECKO_BURST=workers,
+            FETCH_MAX_WORKERS=workers,
+            CACHE_MODE="off",
+            STATE_DIR=Path(state_dir),
+            CRYPTO_IDS=synthetic_coin_ids(num_coins),
+            GCP_PROJECT_ID="benchmark-project",
+            BQ_LOAD_MODE="merge"
+        ):
+            fetcher = CryptoDataFetcher()
+            quality_checker = DataQualityChecker()
+            bq_loader = BigQueryLoader(client=LocalBigQueryClient(project="benchmark-project"))
+            
+            metrics = RunMetrics(command=f"benchmark-{num_coins}")
+            set_run_metrics(metrics)
+            success = False
+            try:
+                success = run_batch_pipeline(fetcher, quality_checker, [bq_loader])
+            finally:
+                set_run_metrics(None)
+                metrics.finish(success)
+            
+            rows_loaded = bq_loader.client.get_table(bq_loader.table_ref).num_rows if success else 0
+            transport = fetcher.transport_stats()
+    
+    summary = metrics.summary()
+    return {
+        'rows': num_coins,
+        'success': success,
+        'rows_loaded': rows_loaded,
+        'wall_seconds': summary['wall_seconds'],
+        'cpu_seconds': summary['cpu_seconds'],
+        'records_per_second': round(rows_loaded / summary['wall_seconds'], 1) if summary['wall_seconds'] else 0.0,
+        'peak_rss_bytes': peak_rss_bytes(),
+        'requests': server.requests,
+        'throttled': server.throttled,
+        'retries': transport['retries'],
+        'bytes_received': transport['bytes_received'],
+        'stages': {
+            name: {field: totals[field] for field in ('calls', 'wall_seconds', 'cpu_seconds', 'rows', 'peak_rss_delta_bytes')}
+            for name, totals in summary['stages'].items()
+        },
+    }
+
+
+def run_scenario_subprocess(num_coins: int, args: argparse.Namespace) -> Dict:
+    """Run one scenario in a fresh interpreter so peak memory is per scenario."""
+    command = [
+        sys.executable, "-m", "benchmarks.run_benchmarks",
+        "--scenario", str(num_coins),
+        "--latency-ms", str(args.latency_ms),
+        "--throttle-every", str(args.throttle_every),
+        "--workers", str(args.workers),
+    ]
+    result = subprocess.run(command, cwd=PROJECT_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Scenario {num_coins} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def git_revision() -> Dict:
+    """Current commit and whether the working tree has uncommitted changes."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--", "src", "benchmarks"], cwd=PROJECT_DIR, capture_output=True, text=True
+        ).stdout.strip()
+        return {'commit': commit, 'dirty': bool(status)}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': "unknown", 'dirty': True}
+
+
+def compare_results(baseline: Dict, current: Dict, max_regression_pct: float) -> List[str]:
+    """
+    Compare two result files scenario by scenario.
+    
+    Args:
+        baseline: Earlier results
+        current: New results
+        max_regression_pct: Allowed drop in records/sec before a scenario counts as a regression
+    
+    Returns:
+        Descriptions of scenarios that regressed beyond the threshold
+    """
+    baseline_rows = {scenario['rows']: scenario for scenario in baseline['scenarios']}
+    regressions = []
+    
+    for scenario in current['scenarios']:
+        before = baseline_rows.get(scenario['rows'])
+        if not before or not before['records_per_second']:
+            continue
+        
+        change_pct = (scenario['records_per_second'] / before['records_per_second'] - 1) * 100
+        memory_pct = (scenario['peak_rss_bytes'] / max(before['peak_rss_bytes'], 1) - 1) * 100
+        print(
+            f"{scenario['rows']:>8} rows: {before['records_per_second']:>10.0f} -> {scenario['records_per_second']:>10.0f} rec/s "
+            f"({change_pct:+.1f}%), peak RSS {memory_pct:+.1f}%"
+        )
+        if change_pct < -max_regression_pct:
+            regressions.append(f"{scenario['rows']} rows: throughput {change_pct:+.1f}%")
+    
+    return regressions
+
+
+def print_results(results: Dict):
+    """Print a summary table of a results file."""
+    header = f"{'rows':>8} {'rec/s':>10} {'wall s':>8} {'peak MiB':>9} {'req':>5} {'429':>4} " + " ".join(
+        f"{name.split('.')[-1] + ' s':>10}" for name in REPORTED_STAGES
+    )
+    print(header)
+    for scenario in results['scenarios']:
+        stages = " ".join(
+            f"{scenario['stages'].get(name, {}).get('wall_seconds', 0):>10.3f}" for name in REPORTED_STAGES
+        )
+        print(
+            f"{scenario['rows']:>8} {scenario['records_per_second']:>10.0f} {scenario['wall_seconds']:>8.2f} "
+            f"{scenario['peak_rss_bytes'] / 2 ** 20:>9.1f} {scenario['requests']:>5} {scenario['throttled']:>4} {stages}"
+        )
+
+
+def resolve_results_path(value: str) -> Path:
+    """Accept either a results file path or a commit label saved in benchmarks/results."""
+    path = Path(value)
+    return path if path.exists() else RESULTS_DIR / f"{value}.json"
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark the ETL pipeline against local stand-ins")
+    parser.add_argument(
+        "--scenarios", default=",".join(str(n) for n in DEFAULT_SCENARIOS),
+        help="Comma-separated row counts (default: 1000,10000,100000)"
+    )
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Fake API latency per response")
+    parser.add_argument("--throttle-every", type=int, default=25, help="Fake API returns 429 every Nth request (0 disables)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent page requests")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="Baseline results file or commit to compare against")
+    parser.add_argument(
+        "--max-regression-pct", type=float, default=20.0,
+        help="Exit non-zero if throughput drops more than this versus --compare"
+    )
+    parser.add_argument("--in-process", action="store_true", help="Run scenarios in this interpreter")
+    parser.add_argument("--scenario", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Run the benchmark scenarios and save the results."""
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    
+    if args.scenario is not None:
+        # Child process: print one scenario as JSON
+        print(json.dumps(run_scenario(args.scenario, args.latency_ms, args.throttle_every, args.workers)))
+        return
+    
+    scenarios = []
+    for num_coins in (int(n) for n in args.scenarios.split(",")):
+        print(f"Running {num_coins} rows...", file=sys.stderr)
+        if args.in_process:
+            scenarios.append(run_scenario(num_coins, args.latency_ms, args.throttle_every, args.workers))
+        else:
+            scenarios.append(run_scenario_subprocess(num_coins, args))
+    
+    revision = git_revision()
+    label = revision['commit'] + ("-dirty" if revision['dirty'] else "")
+    results = {
+        'label': label,
+        **revision,
+        'created_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {
+            'latency_ms': args.latency_ms,
+            'throttle_every': args.throttle_every,
+            'workers': args.workers,
+        },
+        'scenarios': scenarios,
+    }
+    
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{label}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    
+    print_results(results)
+    print(f"\nResults saved to {output}")
+    
+    if any(not scenario['success'] for scenario in scenarios):
+        sys.exit(1)
+    
+    if args.compare:
+        baseline = json.loads(resolve_results_path(args.compare).read_text())
+        print(f"\nCompared with {baseline['label']}:")
+        regressions = compare_results(baseline, results, args.max_regression_pct)
+        if regressions:
+            print("Regressions: " + "; ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
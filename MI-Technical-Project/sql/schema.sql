@@ -12,21 +12,22 @@ CREATE TABLE IF NOT EXISTS `crypto_analytics.crypto_prices` (
   crypto_id STRING NOT NULL OPTIONS(description="Unique cryptocurrency identifier (e.g., 'bitcoin')"),
   symbol STRING NOT NULL OPTIONS(description="Trading symbol in uppercase (e.g., 'BTC')"),
   name STRING NOT NULL OPTIONS(description="Full name of the cryptocurrency"),
+  vs_currency STRING OPTIONS(description="Quote currency of the price, market cap and volume columns (e.g. 'usd'); NULL rows predate the column and are USD"),
   
   -- Price Metrics
-  current_price FLOAT64 OPTIONS(description="Current price in USD"),
-  high_24h FLOAT64 OPTIONS(description="Highest price in last 24 hours (USD)"),
-  low_24h FLOAT64 OPTIONS(description="Lowest price in last 24 hours (USD)"),
+  current_price FLOAT64 OPTIONS(description="Current price in vs_currency"),
+  high_24h FLOAT64 OPTIONS(description="Highest price in last 24 hours (vs_currency)"),
+  low_24h FLOAT64 OPTIONS(description="Lowest price in last 24 hours (vs_currency)"),
   
   -- Price Changes
-  price_change_24h FLOAT64 OPTIONS(description="Absolute price change in last 24 hours (USD)"),
+  price_change_24h FLOAT64 OPTIONS(description="Absolute price change in last 24 hours (vs_currency)"),
   price_change_percentage_24h FLOAT64 OPTIONS(description="Percentage price change in last 24 hours"),
   price_change_percentage_7d FLOAT64 OPTIONS(description="Percentage price change in last 7 days"),
   
   -- Market Metrics
-  market_cap FLOAT64 OPTIONS(description="Total market capitalization (USD)"),
+  market_cap FLOAT64 OPTIONS(description="Total market capitalization (vs_currency)"),
   market_cap_rank INT64 OPTIONS(description="Market cap ranking (1 = highest)"),
-  total_volume FLOAT64 OPTIONS(description="24-hour trading volume (USD)"),
+  total_volume FLOAT64 OPTIONS(description="24-hour trading volume (vs_currency)"),
   
   -- Supply Metrics
   circulating_supply FLOAT64 OPTIONS(description="Circulating supply of coins/tokens"),
@@ -34,9 +35,9 @@ CREATE TABLE IF NOT EXISTS `crypto_analytics.crypto_prices` (
   max_supply FLOAT64 OPTIONS(description="Maximum supply cap (NULL if unlimited)"),
   
   -- Historical Extremes
-  ath FLOAT64 OPTIONS(description="All-time high price (USD)"),
+  ath FLOAT64 OPTIONS(description="All-time high price (vs_currency)"),
   ath_date TIMESTAMP OPTIONS(description="Date when all-time high was reached"),
-  atl FLOAT64 OPTIONS(description="All-time low price (USD)"),
+  atl FLOAT64 OPTIONS(description="All-time low price (vs_currency)"),
   atl_date TIMESTAMP OPTIONS(description="Date when all-time low was reached"),
   
   -- Metadata
@@ -50,6 +51,110 @@ OPTIONS(
   labels=[("department", "analytics"), ("data_source", "coingecko"), ("update_frequency", "daily")]
 );
 
+-- =====================================================
+-- Rollup Table: Daily Price Summary
+-- =====================================================
+-- One row per coin, quote currency and extraction date. The loader deletes and
+-- re-aggregates only the dates touched by each load, so reads never
+-- scan crypto_prices history.
+-- Rebuild from full history with: python main.py rebuild-rollups
+
+CREATE TABLE IF NOT EXISTS `crypto_analytics.crypto_daily_summary` (
+  date DATE NOT NULL OPTIONS(description="Extraction date (UTC)"),
+  crypto_id STRING NOT NULL OPTIONS(description="Unique cryptocurrency identifier"),
+  vs_currency STRING NOT NULL OPTIONS(description="Quote currency of the price, market cap and volume columns"),
+  symbol STRING OPTIONS(description="Trading symbol in uppercase"),
+  name STRING OPTIONS(description="Full name of the cryptocurrency"),
+  avg_price FLOAT64 OPTIONS(description="Average current_price over the day's extractions"),
+  daily_low FLOAT64 OPTIONS(description="Lowest low_24h over the day's extractions"),
+  daily_high FLOAT64 OPTIONS(description="Highest high_24h over the day's extractions"),
+  avg_market_cap FLOAT64 OPTIONS(description="Average market capitalization"),
+  avg_volume FLOAT64 OPTIONS(description="Average 24-hour trading volume"),
+  avg_24h_change_pct FLOAT64 OPTIONS(description="Average 24-hour percentage price change"),
+  data_points INT64 OPTIONS(description="Extractions aggregated into the row"),
+  refreshed_at TIMESTAMP OPTIONS(description="When the loader last recomputed the row")
+)
+PARTITION BY date
+CLUSTER BY crypto_id, vs_currency
+OPTIONS(
+  description="Daily per-coin aggregates of crypto_prices, maintained incrementally by the ETL loader.",
+  labels=[("department", "analytics"), ("data_source", "coingecko"), ("update_frequency", "per_load")]
+);
+
+-- =====================================================
+-- Rollup Table: Latest Cryptocurrency Prices
+-- =====================================================
+-- One row per coin and quote currency. The loader upserts the newest row per
+-- coin and currency from the dates touched by each load; older extractions
+-- never replace newer ones.
+
+CREATE TABLE IF NOT EXISTS `crypto_analytics.crypto_latest_prices` (
+  crypto_id STRING NOT NULL OPTIONS(description="Unique cryptocurrency identifier"),
+  vs_currency STRING NOT NULL OPTIONS(description="Quote currency of the price, market cap and volume columns"),
+  symbol STRING OPTIONS(description="Trading symbol in uppercase"),
+  name STRING OPTIONS(description="Full name of the cryptocurrency"),
+  current_price FLOAT64 OPTIONS(description="Current price in vs_currency"),
+  market_cap FLOAT64 OPTIONS(description="Total market capitalization (vs_currency)"),
+  market_cap_rank INT64 OPTIONS(description="Market cap ranking (1 = highest)"),
+  total_volume FLOAT64 OPTIONS(description="24-hour trading volume (vs_currency)"),
+  price_change_percentage_24h FLOAT64 OPTIONS(description="Percentage price change in last 24 hours"),
+  price_change_percentage_7d FLOAT64 OPTIONS(description="Percentage price change in last 7 days"),
+  circulating_supply FLOAT64 OPTIONS(description="Circulating supply of coins/tokens"),
+  last_updated TIMESTAMP OPTIONS(description="Last update timestamp from API"),
+  extraction_timestamp TIMESTAMP NOT NULL OPTIONS(description="ETL extraction timestamp (UTC) of the row")
+)
+CLUSTER BY crypto_id, vs_currency
+OPTIONS(
+  description="Most recent crypto_prices row per coin and quote currency, maintained incrementally by the ETL loader.",
+  labels=[("department", "analytics"), ("data_source", "coingecko"), ("update_frequency", "per_load")]
+);
+
+-- =====================================================
+-- Reference Table: Global Market Metrics
+-- =====================================================
+-- One row per quote currency and extraction from /global, loaded in the
+-- same run as crypto_prices when FETCH_ENDPOINTS includes global.
+
+CREATE TABLE IF NOT EXISTS `crypto_analytics.crypto_global_metrics` (
+  vs_currency STRING NOT NULL OPTIONS(description="Quote currency of the market cap and volume columns"),
+  total_market_cap FLOAT64 OPTIONS(description="Total crypto market capitalization (vs_currency)"),
+  total_volume FLOAT64 OPTIONS(description="Total 24-hour trading volume (vs_currency)"),
+  market_cap_percentage_btc FLOAT64 OPTIONS(description="Bitcoin share of total market cap (%)"),
+  market_cap_percentage_eth FLOAT64 OPTIONS(description="Ethereum share of total market cap (%)"),
+  active_cryptocurrencies INT64 OPTIONS(description="Number of active cryptocurrencies"),
+  markets INT64 OPTIONS(description="Number of exchanges tracked"),
+  market_cap_change_percentage_24h_usd FLOAT64 OPTIONS(description="Total market cap change in last 24 hours (USD, %)"),
+  updated_at TIMESTAMP OPTIONS(description="Last update timestamp from API"),
+  extraction_timestamp TIMESTAMP NOT NULL OPTIONS(description="ETL extraction timestamp (UTC)")
+)
+PARTITION BY DATE(extraction_timestamp)
+CLUSTER BY vs_currency
+OPTIONS(
+  description="Global cryptocurrency market metrics per quote currency.",
+  labels=[("department", "analytics"), ("data_source", "coingecko"), ("update_frequency", "per_load")]
+);
+
+-- =====================================================
+-- Reference Table: Exchange Rates
+-- =====================================================
+-- BTC-denominated rates from /exchange_rates, loaded in the same run as
+-- crypto_prices when FETCH_ENDPOINTS includes exchange_rates.
+
+CREATE TABLE IF NOT EXISTS `crypto_analytics.crypto_exchange_rates` (
+  currency STRING NOT NULL OPTIONS(description="Currency code (e.g. 'usd', 'eth')"),
+  name STRING OPTIONS(description="Currency name"),
+  unit STRING OPTIONS(description="Currency unit symbol"),
+  rate_type STRING OPTIONS(description="fiat, crypto or commodity"),
+  btc_rate FLOAT64 OPTIONS(description="Units of the currency per 1 BTC"),
+  extraction_timestamp TIMESTAMP NOT NULL OPTIONS(description="ETL extraction timestamp (UTC)")
+)
+PARTITION BY DATE(extraction_timestamp)
+CLUSTER BY currency
+OPTIONS(
+  description="BTC exchange rates for fiat and crypto currencies.",
+  labels=[("department", "analytics"), ("data_source", "coingecko"), ("update_frequency", "per_load")]
+);
+
 -- =====================================================
 -- Create View: Latest Cryptocurrency Prices
 -- =====================================================
@@ -59,6 +164,7 @@ OPTIONS(
 CREATE OR REPLACE VIEW `crypto_analytics.v_latest_crypto_prices` AS
 SELECT 
   crypto_id,
+  vs_currency,
   symbol,
   name,
   current_price,
@@ -70,12 +176,7 @@ SELECT
   circulating_supply,
   last_updated,
   extraction_timestamp
-FROM (
-  SELECT *,
-    ROW_NUMBER() OVER (PARTITION BY crypto_id ORDER BY extraction_timestamp DESC) as rn
-  FROM `crypto_analytics.crypto_prices`
-)
-WHERE rn = 1
+FROM `crypto_analytics.crypto_latest_prices`
 ORDER BY market_cap_rank;
 
 -- =====================================================
@@ -85,19 +186,19 @@ ORDER BY market_cap_rank;
 
 CREATE OR REPLACE VIEW `crypto_analytics.v_daily_price_summary` AS
 SELECT 
-  DATE(extraction_timestamp) as date,
+  date,
   crypto_id,
+  vs_currency,
   symbol,
   name,
-  AVG(current_price) as avg_price,
-  MIN(low_24h) as daily_low,
-  MAX(high_24h) as daily_high,
-  AVG(market_cap) as avg_market_cap,
-  AVG(total_volume) as avg_volume,
-  AVG(price_change_percentage_24h) as avg_24h_change_pct,
-  COUNT(*) as data_points
-FROM `crypto_analytics.crypto_prices`
-GROUP BY date, crypto_id, symbol, name
+  avg_price,
+  daily_low,
+  daily_high,
+  avg_market_cap,
+  avg_volume,
+  avg_24h_change_pct,
+  data_points
+FROM `crypto_analytics.crypto_daily_summary`
 ORDER BY date DESC, avg_market_cap DESC;
 
 -- =====================================================
@@ -119,12 +220,14 @@ ORDER BY date DESC, avg_market_cap DESC;
 -- WHERE DATE(extraction_timestamp) = CURRENT_DATE();
 
 -- Check for duplicate records
+-- (should return no rows when batches are loaded with BQ_LOAD_MODE=merge)
 -- SELECT 
 --   crypto_id, 
+--   vs_currency, 
 --   extraction_timestamp, 
 --   COUNT(*) as duplicate_count
 -- FROM `crypto_analytics.crypto_prices`
--- GROUP BY crypto_id, extraction_timestamp
+-- GROUP BY crypto_id, vs_currency, extraction_timestamp
 -- HAVING COUNT(*) > 1;
 
 -- Check daily data completeness
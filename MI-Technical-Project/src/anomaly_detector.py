@@ -0,0 +1,314 @@
+"""
+Anomaly detection module for per-coin price, volume and market cap outliers.
+Keeps EWMA baselines per coin and quote currency in a compact local state file and scores batches in one vectorized pass.
+"""
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from columnar_decoder import series_ids
+
+logger = logging.getLogger(__name__)
+
+ANOMALY_METRICS = ['current_price', 'total_volume', 'market_cap']
+ANOMALY_COLUMNS = ['crypto_id', 'vs_currency', *ANOMALY_METRICS]
+
+ANOMALY_ACTIONS = ('off', 'warn', 'fail')
+ANOMALY_METHODS = ('zscore', 'mad')
+
+# Anomalies listed individually in a quality report
+MAX_REPORTED_ANOMALIES = 20
+
+# Ratio of the standard deviation to the mean absolute deviation of a normal distribution
+MAD_TO_STD = np.sqrt(np.pi / 2)
+
+
+class AnomalyDetector:
+    """
+    Scores rows against per-coin EWMA baselines of log price, volume and market cap.
+    
+    Baselines are kept per series (columnar_decoder.series_ids), so each quote
+    currency of a coin has its own.
+    """
+    
+    def __init__(
+        self,
+        path: Path,
+        action: str = "warn",
+        method: str = "zscore",
+        threshold: float = 6.0,
+        alpha: float = 0.1,
+        min_observations: int = 5,
+        min_scale: float = 0.01,
+        max_reported: int = MAX_REPORTED_ANOMALIES
+    ):
+        """
+        Args:
+            path: State file (.npz)
+            action: 'warn' reports anomalies, 'fail' also fails the quality gate
+            method: 'zscore' scales deviations by the EWMA standard deviation,
+                'mad' by the EWMA mean absolute deviation (less sensitive to
+                earlier spikes)
+            threshold: Score above which a value is anomalous
+            alpha: EWMA weight of each new observation
+            min_observations: Observations a coin needs before it is scored
+            min_scale: Lower bound on the deviation scale in log units, so
+                coins with flat history (e.g. stablecoins) are not flagged for
+                tiny moves (0.01 is roughly 1%)
+            max_reported: Anomalies listed individually in the report
+        
+        Raises:
+            ValueError: If action or method is not recognized
+        """
+        if action not in ANOMALY_ACTIONS:
+            raise ValueError(f"Invalid anomaly action '{action}', expected one of {', '.join(ANOMALY_ACTIONS)}")
+        if method not in ANOMALY_METHODS:
+            raise ValueError(f"Invalid anomaly method '{method}', expected one of {', '.join(ANOMALY_METHODS)}")
+        
+        self.path = Path(path)
+        self.action = action
+        self.method = method
+        self.threshold = threshold
+        self.alpha = alpha
+        self.min_observations = min_observations
+        self.min_scale = min_scale
+        self.max_reported = max_reported
+        self._lock = threading.Lock()
+        
+        num_metrics = len(ANOMALY_METRICS)
+        self.index = pd.Index([], dtype=object)
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.empty((0, num_metrics))
+        self.var = np.empty((0, num_metrics))
+        self.mad = np.empty((0, num_metrics))
+        self._load()
+    
+    def score(self, df: pd.DataFrame) -> Tuple[bool, Dict, np.ndarray]:
+        """
+        Score every row of a batch against its coin's baseline.
+        
+        Log values are compared with the EWMA mean of log values, so a 100x
+        price error scores the same for any price level. Coins with fewer than
+        min_observations loads are not scored.
+        
+        Args:
+            df: Transformed DataFrame
+        
+        Returns:
+            Tuple of (passed, report, per-row anomaly mask). passed is False
+            only when anomalies were found and the action is 'fail'.
+        """
+        num_rows = len(df)
+        logs = self._log_values(df)
+        
+        with self._lock:
+            positions = self.index.get_indexer(series_ids(df))
+            known = positions >= 0
+            rows = np.where(known, positions, 0)
+            ready = known & (self.count[rows] >= self.min_observations) if len(self.count) else known
+            mean = self.mean[rows] if len(self.count) else np.full_like(logs, np.nan)
+            scale = self._scale()[rows] if len(self.count) else np.full_like(logs, np.nan)
+        
+        with np.errstate(invalid='ignore'):
+            scores = np.abs(logs - mean) / scale
+            scores[~ready] = np.nan
+            flagged = scores > self.threshold
+        anomalous_rows = flagged.any(axis=1) if num_rows else np.zeros(0, dtype=bool)
+        anomaly_count = int(np.count_nonzero(anomalous_rows))
+        
+        anomalies = []
+        crypto_ids = series_ids(df)
+        for row, metric in np.argwhere(flagged)[:self.max_reported]:
+            anomalies.append({
+                'crypto_id': crypto_ids[row],
+                'metric': ANOMALY_METRICS[metric],
+                'value': float(np.exp(logs[row, metric])),
+                'expected': float(np.exp(mean[row, metric])),
+                'score': round(float(scores[row, metric]), 2),
+            })
+        
+        if anomaly_count == 0:
+            status = 'PASSED'
+            logger.info("Data Quality PASSED: Anomaly check")
+        else:
+            status = 'FAILED' if self.action == 'fail' else 'WARN'
+            log = logger.error if self.action == 'fail' else logger.warning
+            log(f"Data Quality {status}: {anomaly_count} rows deviate from their coin baseline (first: {anomalies[0]})")
+        
+        report = {
+            'status': status,
+            'method': self.method,
+            'threshold': self.threshold,
+            'scored_rows': int(np.count_nonzero(ready)),
+            'anomaly_count': anomaly_count,
+            'anomalies': anomalies,
+        }
+        return status != 'FAILED', report, anomalous_rows
+    
+    def update(self, df: pd.DataFrame):
+        """
+        Fold loaded rows into the per-coin baselines.
+        
+        Rows are averaged per coin (in log space) and each coin's EWMA mean,
+        variance and mean absolute deviation take one step, so the cost is
+        O(coins) regardless of history length.
+        
+        Args:
+            df: Rows that were loaded
+        """
+        if df is None or df.empty:
+            return
+        
+        per_coin = pd.DataFrame(self._log_values(df), columns=ANOMALY_METRICS)
+        per_coin['crypto_id'] = series_ids(df)
+        per_coin = per_coin.dropna(subset=['crypto_id']).groupby('crypto_id', sort=False).mean()
+        
+        with self._lock:
+            new_ids = per_coin.index.difference(self.index)
+            if len(new_ids):
+                self._append(new_ids)
+            
+            rows = self.index.get_indexer(per_coin.index)
+            x = per_coin.to_numpy(dtype=np.float64)
+            mean, var, mad = self.mean[rows], self.var[rows], self.mad[rows]
+            
+            diff = x - mean
+            increment = self.alpha * diff
+            updated_mean = mean + increment
+            updated_var = (1 - self.alpha) * (var + diff * increment)
+            updated_mad = (1 - self.alpha) * mad + self.alpha * np.abs(diff)
+            
+            # First observation of a metric starts its baseline; missing values leave it as is
+            first = np.isnan(mean) & ~np.isnan(x)
+            missing = np.isnan(x)
+            updated_mean = np.where(first, x, np.where(missing, mean, updated_mean))
+            updated_var = np.where(first, 0.0, np.where(missing, var, updated_var))
+            updated_mad = np.where(first, 0.0, np.where(missing, mad, updated_mad))
+            
+            self.mean[rows], self.var[rows], self.mad[rows] = updated_mean, updated_var, updated_mad
+            self.count[rows] += 1
+        
+        logger.info(f"Updated anomaly baselines for {len(rows)} coins")
+    
+    def save(self):
+        """Write the baselines to the state file atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        
+        with self._lock:
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    ids=np.asarray(self.index, dtype=str),
+                    count=self.count,
+                    mean=self.mean,
+                    var=self.var,
+                    mad=self.mad
+                )
+            os.replace(tmp_path, self.path)
+    
+    def _load(self):
+        """Read the baselines from the state file, if it exists."""
+        if not self.path.exists():
+            return
+        
+        try:
+            with np.load(self.path, allow_pickle=False) as state:
+                self.index = pd.Index(state['ids'].astype(object))
+                self.count = state['count'].astype(np.int64)
+                self.mean = state['mean'].astype(np.float64)
+                self.var = state['var'].astype(np.float64)
+                self.mad = state['mad'].astype(np.float64)
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Could not read anomaly state {self.path} ({str(e)}) - starting with empty baselines")
+            return
+        
+        logger.info(f"Loaded anomaly baselines for {len(self.index)} coins")
+    
+    def _append(self, new_ids: pd.Index):
+        """Add empty baselines for coins seen for the first time."""
+        num_new = len(new_ids)
+        empty = np.full((num_new, len(ANOMALY_METRICS)), np.nan)
+        
+        self.index = self.index.append(pd.Index(new_ids, dtype=object))
+        self.count = np.concatenate([self.count, np.zeros(num_new, dtype=np.int64)])
+        self.mean = np.concatenate([self.mean, empty])
+        self.var = np.concatenate([self.var, empty])
+        self.mad = np.concatenate([self.mad, empty])
+    
+    def _scale(self) -> np.ndarray:
+        """Deviation scale per coin and metric in log units."""
+        if self.method == 'mad':
+            scale = self.mad * MAD_TO_STD
+        else:
+            scale = np.sqrt(self.var)
+        return np.maximum(scale, self.min_scale)
+    
+    @staticmethod
+    def _log_values(df: pd.DataFrame) -> np.ndarray:
+        """Natural log of each metric column, NaN for missing or non-positive values."""
+        values = np.column_stack([
+            df[col].to_numpy(dtype=np.float64, na_value=np.nan) if col in df.columns else np.full(len(df), np.nan)
+            for col in ANOMALY_METRICS
+        ]) if len(df) else np.empty((0, len(ANOMALY_METRICS)))
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(values > 0, np.log(values), np.nan)
+
+
+class SeriesMeans:
+    """
+    Running per-series means of the log anomaly metrics, folded batch by batch.
+    
+    AnomalyDetector.update averages each series' rows in log space, so a
+    streamed run only needs per-series sums and counts rather than its rows.
+    rows() returns one row per series at the geometric mean of its values,
+    which update() folds exactly as it would all of the run's rows.
+    """
+    
+    def __init__(self):
+        self._sums = pd.DataFrame(columns=ANOMALY_METRICS, dtype=np.float64)
+        self._counts = pd.DataFrame(columns=ANOMALY_METRICS, dtype=np.float64)
+        self._labels = pd.DataFrame()
+    
+    def add(self, df: pd.DataFrame):
+        """
+        Fold a batch into the running sums.
+        
+        Args:
+            df: Validated rows
+        """
+        if df is None or df.empty:
+            return
+        
+        ids = pd.Index(series_ids(df))
+        logs = AnomalyDetector._log_values(df)
+        sums = pd.DataFrame(np.nan_to_num(logs), index=ids, columns=ANOMALY_METRICS).groupby(level=0, sort=False).sum()
+        counts = pd.DataFrame((~np.isnan(logs)).astype(np.float64), index=ids, columns=ANOMALY_METRICS).groupby(level=0, sort=False).sum()
+        
+        labels = df[[col for col in ('crypto_id', 'vs_currency') if col in df.columns]].set_axis(ids)
+        labels = labels[~labels.index.duplicated() & ~labels.index.isin(self._labels.index)]
+        
+        self._sums = self._sums.add(sums, fill_value=0) if len(self._sums) else sums
+        self._counts = self._counts.add(counts, fill_value=0) if len(self._counts) else counts
+        self._labels = pd.concat([self._labels, labels]) if len(self._labels) else labels
+    
+    def rows(self) -> pd.DataFrame:
+        """
+        One row per series with the geometric mean of each metric (NaN where it had no values).
+        
+        Returns:
+            DataFrame with the series' crypto_id/vs_currency and ANOMALY_METRICS columns
+        """
+        if self._labels.empty:
+            return pd.DataFrame(columns=ANOMALY_COLUMNS)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = np.exp(self._sums / self._counts.where(self._counts > 0))
+        return self._labels.join(means.reindex(self._labels.index)).reset_index(drop=True)
@@ -0,0 +1,319 @@
+"""
+Historical backfill module for cryptocurrency price data.
+Rebuilds crypto_prices history from CoinGecko market_chart ranges.
+"""
+
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from columnar_decoder import COLUMN_ORDER, DEFAULT_VS_CURRENCY, FLOAT_FIELDS, to_category
+from data_fetcher import CryptoDataFetcher
+from data_quality import DataQualityChecker
+from dedupe_index import DedupeIndex
+
+logger = logging.getLogger(__name__)
+
+SERIES_COLUMNS = {
+    'prices': 'current_price',
+    'market_caps': 'market_cap',
+    'total_volumes': 'total_volume',
+}
+
+
+def market_chart_to_frame(crypto_id: str, symbol: str, name: str, payload: Dict, end: datetime) -> pd.DataFrame:
+    """
+    Turn a market_chart/range response into crypto_prices rows.
+    
+    Each data point becomes one row whose extraction_timestamp is the point's
+    own timestamp, so rows land in the partition of the day they describe.
+    
+    Args:
+        crypto_id: Cryptocurrency ID
+        symbol: Trading symbol
+        name: Cryptocurrency name
+        payload: Response with 'prices', 'market_caps' and 'total_volumes' series
+        end: Exclusive upper bound; points at or after it are dropped
+    
+    Returns:
+        DataFrame with the crypto_prices columns
+    """
+    series = {}
+    for key, column in SERIES_COLUMNS.items():
+        points = np.asarray(payload.get(key) or [], dtype=np.float64).reshape(-1, 2)
+        series[column] = pd.Series(points[:, 1], index=points[:, 0].astype(np.int64))
+    
+    # Align the three series on their millisecond timestamps
+    merged = pd.DataFrame(series).sort_index()
+    merged = merged[~merged.index.duplicated(keep='last')]
+    timestamps = pd.to_datetime(merged.index.to_numpy(), unit='ms')
+    keep = timestamps < pd.Timestamp(end)
+    merged = merged[keep]
+    timestamps = timestamps[keep]
+    
+    num_rows = len(merged)
+    df = pd.DataFrame({
+        'crypto_id': to_category([crypto_id] * num_rows),
+        'symbol': to_category([symbol.upper()] * num_rows),
+        'name': to_category([name] * num_rows),
+        'vs_currency': to_category([DEFAULT_VS_CURRENCY] * num_rows),
+    })
+    
+    for column in FLOAT_FIELDS:
+        df[column] = merged[column].to_numpy() if column in merged else np.full(num_rows, np.nan)
+    
+    df['market_cap_rank'] = pd.array([None] * num_rows, dtype='Int64')
+    df['ath_date'] = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns, UTC]')
+    df['atl_date'] = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns, UTC]')
+    df['last_updated'] = timestamps.tz_localize('UTC')
+    df['extraction_timestamp'] = df['last_updated']
+    
+    return df[COLUMN_ORDER]
+
+
+class BackfillCheckpoint:
+    """Thread-safe JSON checkpoint of per-coin backfill progress for a date window."""
+    
+    def __init__(self, path: Path, start: date, end: date):
+        self.path = Path(path)
+        self.window = f"{start.isoformat()}/{end.isoformat()}"
+        self._lock = threading.Lock()
+        self._state = {'windows': {}}
+        
+        if self.path.exists():
+            with open(self.path) as f:
+                self._state = json.load(f)
+        
+        self.progress: Dict[str, str] = self._state['windows'].setdefault(self.window, {})
+    
+    def loaded_through(self, crypto_id: str) -> Optional[date]:
+        """
+        Get the exclusive end date already loaded for a coin.
+        
+        Args:
+            crypto_id: Cryptocurrency ID
+        
+        Returns:
+            First day not yet loaded, or None if the coin has not started
+        """
+        with self._lock:
+            value = self.progress.get(crypto_id)
+        return date.fromisoformat(value) if value else None
+    
+    def mark(self, crypto_id: str, loaded_through: date):
+        """
+        Record that a coin is loaded up to (excluding) the given day and persist.
+        
+        Args:
+            crypto_id: Cryptocurrency ID
+            loaded_through: First day not yet loaded
+        """
+        with self._lock:
+            self.progress[crypto_id] = loaded_through.isoformat()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(self._state, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+class BackfillEngine:
+    """
+    Backfills crypto_prices history for many coins on a bounded worker pool.
+    
+    Workers fetch and validate slices concurrently, but loads are shared:
+    slices of every coin are buffered and written together once flush_rows
+    rows are waiting (and at the end), and the rollups are refreshed once for
+    all touched dates. A coin's checkpoint advances only when the load
+    carrying its slice succeeded.
+    """
+    
+    def __init__(
+        self,
+        fetcher: CryptoDataFetcher,
+        bq_loader,
+        checkpoint_path: Optional[Path] = None,
+        max_workers: Optional[int] = None,
+        slice_days: Optional[int] = None,
+        dedupe_index: Optional[DedupeIndex] = None,
+        flush_rows: Optional[int] = None
+    ):
+        self.fetcher = fetcher
+        self.bq_loader = bq_loader
+        self.checkpoint_path = Path(checkpoint_path or Config.STATE_DIR / "backfill_checkpoint.json")
+        self.max_workers = max_workers or Config.BACKFILL_MAX_WORKERS
+        self.slice_days = slice_days or Config.BACKFILL_SLICE_DAYS
+        self.dedupe_index = dedupe_index
+        self.flush_rows = flush_rows or Config.BACKFILL_FLUSH_ROWS
+        self.loads = 0
+        self._buffer: List[Tuple[str, date, pd.DataFrame]] = []
+        self._buffered_rows = 0
+        self._failed: Set[str] = set()
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+    
+    def run(self, crypto_ids: List[str], start: date, end: date) -> bool:
+        """
+        Backfill every coin for the inclusive date window, resuming from the checkpoint.
+        
+        Args:
+            crypto_ids: Cryptocurrency IDs to backfill
+            start: First day to backfill
+            end: Last day to backfill (inclusive)
+        
+        Returns:
+            True if every coin was backfilled, False otherwise
+        """
+        end_exclusive = end + timedelta(days=1)
+        checkpoint = BackfillCheckpoint(self.checkpoint_path, start, end)
+        
+        pending = [
+            crypto_id for crypto_id in crypto_ids
+            if (checkpoint.loaded_through(crypto_id) or start) < end_exclusive
+        ]
+        skipped = len(crypto_ids) - len(pending)
+        logger.info(f"Backfilling {len(pending)} coins from {start} to {end} ({skipped} already complete)")
+        
+        if not pending:
+            return True
+        
+        metadata = self._coin_metadata(pending)
+        if metadata is None:
+            return False
+        
+        self._failed = set()
+        workers = max(1, min(self.max_workers, len(pending)))
+        self.bq_loader.defer_rollups = True
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(
+                    lambda crypto_id: self._backfill_coin(
+                        crypto_id, metadata.get(crypto_id, (crypto_id, crypto_id)), checkpoint, start, end_exclusive
+                    ),
+                    pending
+                ))
+            self._flush(checkpoint)
+        finally:
+            self.bq_loader.defer_rollups = False
+        self.bq_loader.refresh_rollups()
+        
+        failed = [crypto_id for crypto_id, ok in zip(pending, results) if not ok or crypto_id in self._failed]
+        if failed:
+            logger.error(f"Backfill failed for {len(failed)} coins: {', '.join(failed)} - rerun to resume")
+            return False
+        
+        logger.info(f"Backfill complete for {len(pending)} coins")
+        return True
+    
+    def _backfill_coin(
+        self,
+        crypto_id: str,
+        names: Tuple[str, str],
+        checkpoint: BackfillCheckpoint,
+        start: date,
+        end_exclusive: date
+    ) -> bool:
+        """Fetch and validate one coin slice by slice, buffering each slice for a shared load."""
+        symbol, name = names
+        quality_checker = DataQualityChecker()
+        resume_from = checkpoint.loaded_through(crypto_id) or start
+        
+        for slice_start, slice_end in self._slices(resume_from, end_exclusive):
+            if crypto_id in self._failed:
+                return False
+            
+            start_ts = datetime.combine(slice_start, datetime.min.time())
+            end_ts = datetime.combine(slice_end, datetime.min.time())
+            
+            try:
+                payload = self.fetcher.fetch_market_chart_range(crypto_id, start_ts, end_ts)
+            except Exception as e:
+                logger.error(f"Error fetching history for {crypto_id} {slice_start}..{slice_end}: {str(e)}")
+                return False
+            
+            df = market_chart_to_frame(crypto_id, symbol, name, payload, end_ts)
+            
+            if not df.empty:
+                if not quality_checker.run_batch_checks(df):
+                    logger.error(f"Data quality checks failed for {crypto_id} {slice_start}..{slice_end}")
+                    return False
+                
+                if self.dedupe_index is not None:
+                    df, _ = self.dedupe_index.filter_new(df)
+            
+            logger.info(f"✓ {crypto_id}: buffered {len(df)} rows for {slice_start}..{slice_end - timedelta(days=1)}")
+            self._buffer_slice(crypto_id, slice_end, df, checkpoint)
+        
+        return True
+    
+    def _buffer_slice(self, crypto_id: str, slice_end: date, df: pd.DataFrame, checkpoint: BackfillCheckpoint):
+        """Add a validated slice to the shared buffer, loading the buffer once it holds flush_rows rows."""
+        with self._buffer_lock:
+            self._buffer.append((crypto_id, slice_end, df))
+            self._buffered_rows += len(df)
+            due = self._buffered_rows >= self.flush_rows
+        
+        if due:
+            self._flush(checkpoint)
+    
+    def _flush(self, checkpoint: BackfillCheckpoint) -> bool:
+        """
+        Load every buffered slice in one write, then checkpoint them.
+        
+        Slices of coins whose earlier load failed are dropped, so a coin's
+        checkpoint never skips past a slice that was not loaded.
+        
+        Returns:
+            True if the buffer was loaded (or empty), False otherwise
+        """
+        with self._flush_lock:
+            with self._buffer_lock:
+                slices = [entry for entry in self._buffer if entry[0] not in self._failed]
+                self._buffer, self._buffered_rows = [], 0
+            
+            frames = [df for _, _, df in slices if not df.empty]
+            if frames:
+                batch = pd.concat(frames, ignore_index=True)
+                if not self.bq_loader.write_batch(batch):
+                    coins = sorted({crypto_id for crypto_id, _, _ in slices})
+                    logger.error(f"Failed to load {len(batch)} backfilled rows of {', '.join(coins)}")
+                    with self._buffer_lock:
+                        self._failed.update(coins)
+                    return False
+                if self.dedupe_index is not None:
+                    self.dedupe_index.commit(batch)
+                self.loads += 1
+                logger.info(f"✓ Loaded {len(batch)} backfilled rows from {len(slices)} coin slices (load {self.loads})")
+            
+            for crypto_id, slice_end, _ in slices:
+                checkpoint.mark(crypto_id, slice_end)
+        return True
+    
+    def _slices(self, start: date, end_exclusive: date) -> Iterator[Tuple[date, date]]:
+        """Split [start, end_exclusive) into whole-day slices of at most slice_days."""
+        slice_start = start
+        while slice_start < end_exclusive:
+            slice_end = min(slice_start + timedelta(days=self.slice_days), end_exclusive)
+            yield slice_start, slice_end
+            slice_start = slice_end
+    
+    def _coin_metadata(self, crypto_ids: List[str]) -> Optional[Dict[str, Tuple[str, str]]]:
+        """Look up symbol and name for each coin from /coins/markets."""
+        markets = self.fetcher.fetch_transformed_market_data(crypto_ids)
+        if markets is None:
+            logger.error("Could not look up coin symbols and names for backfill")
+            return None
+        
+        return {
+            row.crypto_id: (row.symbol, row.name)
+            for row in markets[['crypto_id', 'symbol', 'name']].itertuples(index=False)
+        }
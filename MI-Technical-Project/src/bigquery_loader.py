@@ -3,34 +3,135 @@ BigQuery loader module for data persistence.
 Handles connection and data loading to Google BigQuery.
 """
 
+import contextlib
 import pandas as pd
 import logging
+import datetime as dt
+import re
+import threading
+import time
+import uuid
+import weakref
 from google.cloud import bigquery
 from google.oauth2 import service_account
-from typing import Optional
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from columnar_decoder import DEFAULT_VS_CURRENCY
 from config import Config
+from metrics import instrumented
+from parquet_staging import ParquetStager
+from query_cache import QueryCache
+from sinks import Sink
+from storage_writer import BigQueryWriteClient, StorageWriter
+from table_schema import REFERENCE_TABLES, load_create_table, load_table_schema, load_view_dependencies
 
 logger = logging.getLogger(__name__)
 
+# Datasets and tables known to exist, per client, for the life of the process
+_known_refs: "weakref.WeakKeyDictionary[object, Set[str]]" = weakref.WeakKeyDictionary()
+_known_refs_lock = threading.Lock()
+
+# Rollup tables maintained after each load (see sql/schema.sql)
+DAILY_SUMMARY_TABLE = "crypto_daily_summary"
+LATEST_PRICES_TABLE = "crypto_latest_prices"
+
+# Python type -> BigQuery query parameter type (bool before int, datetime before date)
+PARAM_TYPES = [
+    (bool, "BOOL"),
+    (int, "INT64"),
+    (float, "FLOAT64"),
+    (dt.datetime, "TIMESTAMP"),
+    (dt.date, "DATE"),
+    (str, "STRING"),
+]
 
-class BigQueryLoader:
+
+class BigQueryLoader(Sink):
     """Handles loading data to Google BigQuery."""
     
-    def __init__(self):
+    name = "bigquery"
+    
+    def __init__(
+        self,
+        client=None,
+        stager: Optional[ParquetStager] = None,
+        query_cache: Optional[QueryCache] = None,
+        write_client=None
+    ):
         self.project_id = Config.GCP_PROJECT_ID
         self.dataset_id = Config.BQ_DATASET
         self.table_id = Config.BQ_TABLE
         self.credentials_path = Config.GCP_CREDENTIALS_PATH
-        self.client = None
+        self.load_mode = Config.BQ_LOAD_MODE
+        self.merge_keys = Config.BQ_MERGE_KEYS
+        self.client = client
+        self.stager = stager or ParquetStager(table_name=self.table_id)
+        self.schema = self._bq_schema(self.stager.columns)
+        self._reference_stagers: Dict[str, ParquetStager] = {}
+        self._job_files: Dict[str, Path] = {}
+        self._job_files_lock = threading.Lock()
+        self.bytes_uploaded = 0
         
+        # Storage Write API appends instead of load jobs (BQ_WRITE_MODE=storage_write)
+        self.write_mode = Config.BQ_WRITE_MODE
+        self.write_client = write_client
+        self._storage_writers: Dict[str, StorageWriter] = {}
+        
+        # Extraction dates written since the rollups were last refreshed (None = unknown, rebuild all)
+        self.rollups_enabled = Config.BQ_ROLLUPS == "on"
+        self._touched_dates: Optional[Set[str]] = set()
+        # Set while a caller batches many writes and refreshes the rollups itself
+        self.defer_rollups = False
+        # Called with the crypto_prices rows of earlier batches once replay_spool loads
+        # them, so watermarks and the dedupe index catch up with rows loaded late
+        self.on_spool_loaded: Optional[Callable[[pd.DataFrame], None]] = None
+        
+        # Opt-in cache of query results, invalidated by this loader's writes
+        self.query_cache = query_cache
+        if self.query_cache is None and Config.QUERY_CACHE_MODE == "on":
+            self.query_cache = QueryCache(
+                Config.STATE_DIR / "query_cache",
+                max_bytes=Config.QUERY_CACHE_MAX_MB * 1024 * 1024,
+                ttl_seconds=Config.QUERY_CACHE_TTL_SECONDS,
+                dependencies=self._view_dependencies()
+            )
+    
+    @property
+    def table_ref(self) -> str:
+        """Fully qualified reference of the target table."""
+        return f"{self.project_id}.{self.dataset_id}.{self.table_id}"
+    
+    @property
+    def daily_summary_ref(self) -> str:
+        """Fully qualified reference of the daily summary rollup table."""
+        return f"{self.project_id}.{self.dataset_id}.{DAILY_SUMMARY_TABLE}"
+    
+    @property
+    def latest_prices_ref(self) -> str:
+        """Fully qualified reference of the latest prices rollup table."""
+        return f"{self.project_id}.{self.dataset_id}.{LATEST_PRICES_TABLE}"
+        
+    def transfer_counters(self) -> Dict[str, int]:
+        """Cumulative staged-file bytes submitted to load jobs, for run metrics."""
+        return {'bytes': self.bytes_uploaded, 'retries': 0}
+    
+    @instrumented()
     def initialize_client(self) -> bool:
         """
         Initialize BigQuery client with credentials.
         
+        A client passed to the constructor (e.g. LocalBigQueryClient) is kept as is.
+        
         Returns:
             True if initialization successful, False otherwise
         """
+        if self.client is not None:
+            return True
+        
         try:
             if self.credentials_path:
                 credentials = service_account.Credentials.from_service_account_file(
@@ -51,6 +152,7 @@ class BigQueryLoader:
             logger.error(f"Failed to initialize BigQuery client: {str(e)}")
             return False
     
+    @instrumented()
     def ensure_dataset_exists(self) -> bool:
         """
         Ensure BigQuery dataset exists, create if not.
@@ -58,9 +160,11 @@ class BigQueryLoader:
         Returns:
             True if dataset exists or was created, False otherwise
         """
+        dataset_ref = f"{self.project_id}.{self.dataset_id}"
+        if self._is_known(dataset_ref):
+            return True
+        
         try:
-            dataset_ref = f"{self.project_id}.{self.dataset_id}"
-            
             try:
                 self.client.get_dataset(dataset_ref)
                 logger.info(f"Dataset {dataset_ref} already exists")
@@ -73,12 +177,14 @@ class BigQueryLoader:
                 self.client.create_dataset(dataset, timeout=30)
                 logger.info(f"Created dataset {dataset_ref}")
             
+            self._remember(dataset_ref)
             return True
             
         except Exception as e:
             logger.error(f"Error ensuring dataset exists: {str(e)}")
             return False
     
+    @instrumented()
     def load_data(self, df: pd.DataFrame, write_disposition: str = "WRITE_APPEND") -> bool:
         """
         Load DataFrame to BigQuery table.
@@ -90,62 +196,979 @@ class BigQueryLoader:
         Returns:
             True if load successful, False otherwise
         """
+        job = self.submit_load(df, write_disposition=write_disposition)
+        if job is None:
+            return False
+        
+        success, _ = self.wait_for_jobs([job])
+        return success
+    
+    @instrumented()
+    def submit_load(
+        self,
+        df: pd.DataFrame,
+        table_ref: Optional[str] = None,
+        write_disposition: str = "WRITE_APPEND"
+    ):
+        """
+        Stage a DataFrame as Parquet and start a load job without waiting for it.
+        
+        Args:
+            df: DataFrame to load
+            table_ref: Destination table (defaults to the configured table)
+            write_disposition: Write mode (WRITE_APPEND, WRITE_TRUNCATE, WRITE_EMPTY)
+        
+        Returns:
+            Load job handle, or None if the job could not be submitted
+        """
         if df is None or df.empty:
             logger.warning("Cannot load empty DataFrame to BigQuery")
-            return False
+            return None
         
         try:
-            table_ref = f"{self.project_id}.{self.dataset_id}.{self.table_id}"
+            path = self.stager.stage(df)
+        except Exception as e:
+            logger.error(f"Error staging data for BigQuery: {str(e)}")
+            return None
+        
+        return self.submit_file_load(path, table_ref, write_disposition)
+    
+    def write(self, df: pd.DataFrame, reference_frames: Optional[Dict[str, pd.DataFrame]] = None) -> bool:
+        """
+        Write a validated batch as a sink: stage it, then drain the load spool.
+        
+        The batch is staged before the client is initialized, so it is kept
+        for replay even when BigQuery cannot be reached. Batches left by
+        earlier failed runs load in the same jobs and are reported to
+        on_spool_loaded; this batch is left to the caller.
+        
+        Args:
+            df: Validated market data
+            reference_frames: Validated reference frames keyed by fetch
+                endpoint ('global', 'exchange_rates')
+        
+        Returns:
+            True if the batch (and the rest of the spool) was loaded, False otherwise
+        """
+        staged = self.stage_batch(df, reference_frames)
+        if staged is None:
+            logger.error("✗ Failed to stage data for BigQuery")
+            return False
+        
+        if not self.initialize_client() or not self.ensure_dataset_exists():
+            logger.error("✗ BigQuery is unavailable - the batch is kept in the load spool for 'python main.py replay'")
+            return False
+        
+        if not self.replay_spool(staged):
+            logger.error("✗ Failed to load data to BigQuery - the batch is kept in the load spool for 'python main.py replay'")
+            return False
+        
+        return True
+    
+    @instrumented()
+    def stage_batch(
+        self,
+        df: pd.DataFrame,
+        reference_frames: Optional[Dict[str, pd.DataFrame]] = None
+    ) -> Optional[List[Path]]:
+        """
+        Write a validated batch to the load spool ahead of loading it.
+        
+        Staging needs no BigQuery connection, so a batch that fails to load
+        (or never reaches the load because the client could not be set up)
+        stays on disk with its original extraction_timestamp, and replay_spool
+        loads it on the next run without calling the API again.
+        
+        Args:
+            df: Validated market data
+            reference_frames: Validated reference frames keyed by fetch
+                endpoint ('global', 'exchange_rates')
+        
+        Returns:
+            Staged file paths, or None if any frame could not be staged
+        """
+        if df is None or df.empty:
+            logger.warning("Cannot stage empty DataFrame")
+            return None
+            
+        if self.load_mode == "merge":
+            missing = [col for col in self.merge_keys if col not in df.columns]
+            if missing:
+                logger.error(f"Cannot stage for upsert: key columns missing from DataFrame: {', '.join(missing)}")
+                return None
+            df = self._drop_duplicate_keys(df, self.merge_keys)
             
+        paths = []
+        try:
+            paths.append(self.stager.stage(df))
+            for endpoint, frame in (reference_frames or {}).items():
+                paths.append(self._reference_stager(REFERENCE_TABLES[endpoint]).stage(frame))
+        except Exception as e:
+            logger.error(f"Error staging data for BigQuery: {str(e)}")
+            return None
+        
+        return paths
+    
+    @instrumented()
+    def submit_file_load(
+        self,
+        path: Path,
+        table_ref: Optional[str] = None,
+        write_disposition: str = "WRITE_APPEND",
+        schema: Optional[List] = None
+    ):
+        """
+        Start a load job for a staged Parquet file with the explicit table schema.
+        
+        The staged file is removed once wait_for_jobs sees the job succeed and
+        kept in the spool for replay_spool otherwise.
+        
+        Args:
+            path: Staged Parquet file
+            table_ref: Destination table (defaults to the configured table)
+            write_disposition: Write mode (WRITE_APPEND, WRITE_TRUNCATE, WRITE_EMPTY)
+            schema: BigQuery schema of the file (defaults to the target table's)
+        
+        Returns:
+            Load job handle, or None if the job could not be submitted
+        """
+        table_ref = table_ref or self.table_ref
+        
+        if self.write_mode == "storage_write" and write_disposition == "WRITE_APPEND":
+            return self._submit_append(path, table_ref)
+        
+        try:
             # Configure job settings
             job_config = bigquery.LoadJobConfig(
-                write_disposition=write_disposition,
-                schema_update_options=[
-                    bigquery.SchemaUpdateOption.ALLOW_FIELD_ADDITION
-                ]
+                source_format=bigquery.SourceFormat.PARQUET,
+                schema=schema or self.schema,
+                write_disposition=write_disposition
             )
             
-            logger.info(f"Loading {len(df)} records to {table_ref}")
+            logger.info(f"Submitting load of {Path(path).name} to {table_ref}")
             
-            # Load data
-            job = self.client.load_table_from_dataframe(
-                df, table_ref, job_config=job_config
-            )
+            with open(path, "rb") as source:
+                job = self.client.load_table_from_file(
+                    source, table_ref, job_config=job_config
+                )
             
-            # Wait for the job to complete
-            job.result()
+            with self._job_files_lock:
+                self._job_files[self._job_key(job)] = Path(path)
+                self.bytes_uploaded += Path(path).stat().st_size
+            return job
+            
+        except Exception as e:
+            logger.error(f"Error submitting load to BigQuery: {str(e)} - {Path(path).name} kept for replay")
+            self._mark_failed(Path(path), str(e))
+            return None
+            
+    def _submit_append(self, path: Path, table_ref: str):
+        """
+        Append a staged Parquet file through the Storage Write API.
+        
+        Rows join the table's StorageWriter buffer, which flushes on size or
+        age and at the start of wait_for_jobs, so rows are queryable seconds
+        after they are staged. The returned handle is waited on like a load job
+        and the staged file is released the same way.
+        
+        Args:
+            path: Staged Parquet file
+            table_ref: Destination table
+        
+        Returns:
+            Append handle, or None if the rows could not be submitted
+        """
+        try:
+            writer = self._storage_writer(table_ref)
+            handle = writer.submit(pq.read_table(path, schema=writer.arrow_schema))
+        except Exception as e:
+            logger.error(f"Error submitting append to BigQuery: {str(e)} - {Path(path).name} kept for replay")
+            self._mark_failed(Path(path), str(e))
+            return None
+        
+        with self._job_files_lock:
+            self._job_files[self._job_key(handle)] = Path(path)
+            self.bytes_uploaded += Path(path).stat().st_size
+        return handle
+    
+    def _storage_writer(self, table_ref: str) -> StorageWriter:
+        """
+        StorageWriter of a table, creating the table (and, unless one was
+        passed to the constructor, the write client) on first use.
+        """
+        if table_ref in self._storage_writers:
+            return self._storage_writers[table_ref]
+        
+        schema_table = "crypto_prices" if table_ref == self.table_ref else table_ref.split(".")[-1]
+        self._ensure_table(schema_table, table_ref)
+        
+        if self.write_client is None:
+            credentials = None
+            if self.credentials_path:
+                credentials = service_account.Credentials.from_service_account_file(self.credentials_path)
+            self.write_client = BigQueryWriteClient(credentials=credentials)
+        
+        stager = self.stager if table_ref == self.table_ref else self._reference_stager(schema_table)
+        writer = StorageWriter(
+            self.write_client,
+            table_ref,
+            stager.arrow_schema,
+            stream_type=Config.BQ_WRITE_STREAM_TYPE,
+            flush_bytes=int(Config.BQ_WRITE_FLUSH_MB * 1024 * 1024),
+            flush_seconds=Config.BQ_WRITE_FLUSH_SECONDS
+        )
+        self._storage_writers[table_ref] = writer
+        return writer
+    
+    def flush_appends(self) -> bool:
+        """
+        Flush rows buffered for the Storage Write API.
+        
+        Returns:
+            True if every buffer was written, False otherwise
+        """
+        return all([writer.flush() for writer in list(self._storage_writers.values())])
+    
+    def close(self):
+        """Flush buffered appends and close the Storage Write API streams."""
+        for writer in list(self._storage_writers.values()):
+            writer.close()
+        self._storage_writers = {}
+        if self.write_client is not None:
+            self.write_client.close()
+    
+    @instrumented()
+    def wait_for_jobs(
+        self,
+        jobs: Iterable,
+        poll_interval: float = 0.5,
+        timeout: Optional[float] = None
+    ) -> Tuple[bool, int]:
+        """
+        Poll several load or query jobs together until all of them finish.
+            
+        Jobs run concurrently on the BigQuery side, so the wait is bounded by
+        the slowest job rather than the sum of all jobs. Row counts come from
+        each job's own statistics (output_rows for loads, DML affected rows for
+        MERGEs) instead of an extra table metadata request.
+            
+        Args:
+            jobs: Job handles returned by submit_load or submit_batch
+            poll_interval: Seconds between polling rounds
+            timeout: Maximum seconds to wait (None waits indefinitely)
             
-            # Get the table to verify load
-            table = self.client.get_table(table_ref)
+        Returns:
+            Tuple of (all_jobs_succeeded, rows_written)
+        """
+        pending = [job for job in jobs if job is not None]
+        # Appends finish when their buffer is flushed; a failed flush fails its handles
+        self.flush_appends()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        success = True
+        rows_written = 0
+        
+        while pending:
+            still_running = []
+            
+            for job in pending:
+                try:
+                    if not job.done():
+                        still_running.append(job)
+                        continue
+                    
+                    job.result()
+                    rows_written += self._job_rows(job)
+                    
+                    destination = getattr(job, "destination", None)
+                    if destination is not None:
+                        self._remember(self._ref_string(destination))
+                        self._record_load(job, self._ref_string(destination))
+                    
+                    self._release_file(job, loaded=True)
+                
+                except Exception as e:
+                    logger.error(f"BigQuery job {getattr(job, 'job_id', '')} failed: {str(e)}")
+                    self._release_file(job, loaded=False, error=str(e))
+                    success = False
             
-            logger.info(f"Successfully loaded {len(df)} records to BigQuery")
-            logger.info(f"Table now contains {table.num_rows} total rows")
+            pending = still_running
+            if not pending:
+                break
             
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.error(f"Timed out waiting for {len(pending)} BigQuery jobs")
+                return False, rows_written
+            
+            time.sleep(poll_interval)
+        
+        if success:
+            logger.info(f"Successfully wrote {rows_written} records to BigQuery")
+        
+        if not self.defer_rollups and self._has_touched_dates():
+            self.refresh_rollups()
+        
+        return success, rows_written
+    
+    @instrumented()
+    def write_batch(self, df: pd.DataFrame) -> bool:
+        """
+        Write a DataFrame using the configured load mode.
+        
+        Args:
+            df: DataFrame to write
+        
+        Returns:
+            True if the write succeeded, False otherwise
+        """
+        job = self.submit_batch(df)
+        if job is None:
+            return False
+        
+        success, _ = self.wait_for_jobs([job])
+        return success
+    
+    @instrumented()
+    def submit_batch(self, df: pd.DataFrame):
+        """
+        Start writing a DataFrame using the configured load mode.
+        
+        In append mode the load job is only submitted, so several batches can
+        load concurrently. In merge mode the staging load and MERGE run to
+        completion here, since MERGEs into one table are serialized anyway.
+        
+        Args:
+            df: DataFrame to write
+        
+        Returns:
+            Job handle to pass to wait_for_jobs, or None on failure
+        """
+        if self.load_mode == "merge":
+            return self._merge_batch(df, self.merge_keys)
+        return self.submit_load(df, write_disposition="WRITE_APPEND")
+    
+    @instrumented()
+    def upsert_data(self, df: pd.DataFrame, key_columns: Optional[List[str]] = None) -> bool:
+        """
+        Idempotently upsert a DataFrame into the target table.
+        
+        The batch is loaded into a staging table and MERGEd into the target on
+        the key columns. The MERGE condition lists the extraction dates present
+        in the batch as constants, so BigQuery only scans those partitions.
+        Rerunning the same batch updates rows in place instead of duplicating them.
+        
+        Args:
+            df: DataFrame to upsert
+            key_columns: Columns identifying a row (defaults to BQ_MERGE_KEYS)
+        
+        Returns:
+            True if the upsert succeeded, False otherwise
+        """
+        job = self._merge_batch(df, key_columns or self.merge_keys)
+        if job is None:
+            return False
+        
+        success, _ = self.wait_for_jobs([job])
+        return success
+    
+    def _merge_batch(self, df: pd.DataFrame, key_columns: List[str]):
+        """Stage a batch and MERGE it into the target table, returning the finished job."""
+        if df is None or df.empty:
+            logger.warning("Cannot upsert empty DataFrame to BigQuery")
+            return None
+        
+        missing = [col for col in key_columns if col not in df.columns]
+        if missing:
+            logger.error(f"Cannot upsert: key columns missing from DataFrame: {', '.join(missing)}")
+            return None
+        
+        batch = self._drop_duplicate_keys(df, key_columns)
+        
+        try:
+            path = self.stager.stage(batch)
+        except Exception as e:
+            logger.error(f"Error staging data for BigQuery: {str(e)}")
+            return None
+        
+        return self._merge_file(path, key_columns)
+    
+    def _merge_file(self, path: Path, key_columns: List[str]):
+        """Load a staged file into a staging table and MERGE it into the target table."""
+        if not self._table_exists(self.table_ref):
+            logger.info(f"Table {self.table_ref} does not exist yet - creating it with a plain load")
+            job = self.submit_file_load(path, write_disposition="WRITE_APPEND")
+            if job is not None:
+                # Finish the load so the next batch MERGEs into the new table; the
+                # caller's wait_for_jobs counts its rows, releases the file and reports a failure
+                with contextlib.suppress(Exception):
+                    job.result()
+            return job
+        
+        staging_ref = f"{self.project_id}.{self.dataset_id}._staging_{self.table_id}_{uuid.uuid4().hex[:12]}"
+        job = None
+        
+        try:
+            job = self.submit_file_load(path, staging_ref, write_disposition="WRITE_TRUNCATE")
+            if job is None:
+                return None
+            job.result()
+            
+            partition_dates = self._partition_dates(pq.read_table(path, columns=['extraction_timestamp']).to_pandas())
+            query = self.build_merge_query(staging_ref, self.stager.arrow_schema.names, key_columns, partition_dates)
+            merge_job = self.client.query(query)
+            merge_job.result()
+            self._record_write(self.table_ref, partition_dates)
+            
+            self._release_file(job, loaded=True)
+            logger.info(f"Merged {Path(path).name} into {self.table_ref}")
+            return merge_job
+        
+        except Exception as e:
+            logger.error(f"Error upserting data to BigQuery: {str(e)}")
+            if job is not None:
+                self._release_file(job, loaded=False, error=str(e))
+            return None
+        
+        finally:
+            try:
+                self.client.delete_table(staging_ref, not_found_ok=True)
+            except Exception as e:
+                logger.warning(f"Could not drop staging table {staging_ref}: {str(e)}")
+    
+    @instrumented()
+    def replay_spool(self, staged: Sequence[Path] = ()) -> bool:
+        """
+        Drain the load spool: load every staged batch, one job per table.
+        
+        The pending and failed files of each table (the target table and the
+        reference tables) are compacted into a single file first, so
+        recovering from several failed runs costs one load per table and no
+        API calls. Rows keep the extraction_timestamp they were fetched with.
+        Once the target table's file loads, its rows from earlier batches are
+        passed to on_spool_loaded.
+        
+        Args:
+            staged: Files the caller has just staged and records itself once loaded
+        
+        Returns:
+            True if every staged file was loaded, False otherwise
+        """
+        spooled = [(stager, stager.pending()) for stager in self._spool_stagers()]
+        spooled = [(stager, paths) for stager, paths in spooled if paths]
+        if not spooled:
+            logger.info("Load spool is empty - nothing to replay")
             return True
+        
+        jobs = []
+        replayed = None
+        target_path = None
+        for stager, paths in spooled:
+            logger.info(f"Replaying {len(paths)} staged {stager.table_name} files from {stager.spool_dir}")
+            is_target = stager is self.stager
+            key_columns = self.merge_keys if is_target and self.load_mode == "merge" else None
+            if is_target and self.on_spool_loaded is not None:
+                replayed = self.pending_rows([path for path in paths if path not in staged])
+        
+            try:
+                path = stager.compact(paths, key_columns)
+            except Exception as e:
+                logger.error(f"Could not compact staged {stager.table_name} files: {str(e)}")
+                jobs.append(None)
+                continue
             
+            if not is_target:
+                jobs.append(self._submit_reference_file(stager, path))
+            elif self.load_mode == "merge":
+                jobs.append(self._merge_file(path, self.merge_keys))
+            else:
+                jobs.append(self.submit_file_load(path))
+            if is_target:
+                target_path = path
+        
+        success, _ = self.wait_for_jobs(jobs)
+        logger.info(f"Load spool manifest: {self.stager.manifest.counts()}")
+        # A loaded file is removed from the spool, whatever happened to the other tables
+        target_loaded = target_path is not None and not target_path.exists()
+        if target_loaded and replayed is not None and not replayed.empty:
+            self.on_spool_loaded(replayed)
+        return success and all(job is not None for job in jobs)
+    
+    def pending_rows(self, paths: Optional[List[Path]] = None) -> pd.DataFrame:
+        """
+        Read crypto_prices rows waiting in the load spool.
+        
+        Args:
+            paths: Staged target table files (defaults to every pending one)
+        
+        Returns:
+            DataFrame of the staged rows (empty if there are none)
+        """
+        paths = self.stager.pending() if paths is None else paths
+        if not paths:
+            return self.stager.arrow_schema.empty_table().to_pandas()
+        return pa.concat_tables([pq.read_table(path, schema=self.stager.arrow_schema) for path in paths]).to_pandas()
+    
+    def _submit_reference_file(self, stager: ParquetStager, path: Path):
+        """Start an append load of a staged reference table file, creating the table if needed."""
+        ref = f"{self.project_id}.{self.dataset_id}.{stager.table_name}"
+        try:
+            self._ensure_table(stager.table_name, ref)
         except Exception as e:
-            logger.error(f"Error loading data to BigQuery: {str(e)}")
+            logger.error(f"Could not create {ref}: {str(e)} - {path.name} kept for replay")
+            self._mark_failed(path, str(e))
+            return None
+        return self.submit_file_load(path, ref, schema=self._bq_schema(stager.columns))
+    
+    def _spool_stagers(self) -> List[ParquetStager]:
+        """Stagers of every table whose files can be waiting in the load spool."""
+        return [self.stager, *(self._reference_stager(table_name) for table_name in REFERENCE_TABLES.values())]
+    
+    @instrumented()
+    def refresh_rollups(self, partition_dates: Optional[List[str]] = None, rebuild: bool = False) -> bool:
+        """
+        Bring the daily summary and latest price rollups up to date.
+        
+        Only the extraction dates written since the last refresh are
+        recomputed, so the cost follows the size of the load rather than the
+        table's history. Dates that fail to refresh stay pending for the next
+        call.
+        
+        Args:
+            partition_dates: ISO dates to recompute (defaults to the dates
+                written by this loader since the last refresh)
+            rebuild: Recompute both rollups from the full history
+        
+        Returns:
+            True if the rollups were refreshed (or there was nothing to do), False otherwise
+        """
+        if not self.rollups_enabled and not rebuild:
+            return True
+        
+        with self._job_files_lock:
+            if rebuild:
+                dates = None
+            elif partition_dates is not None:
+                dates = set(partition_dates)
+            else:
+                dates = self._touched_dates
+            self._touched_dates = set()
+        
+        if dates is not None and not dates:
+            return True
+        
+        try:
+            self._ensure_rollup_tables()
+            self.client.query(self.build_rollup_query(None if dates is None else sorted(dates))).result()
+        except Exception as e:
+            logger.error(f"Error refreshing rollup tables: {str(e)} - will retry after the next load")
+            self._touch(dates)
+            return False
+        
+        self._record_write(self.daily_summary_ref, None if dates is None else sorted(dates))
+        self._record_write(self.latest_prices_ref, None)
+        scope = "full history" if dates is None else f"{len(dates)} extraction dates"
+        logger.info(f"Refreshed {DAILY_SUMMARY_TABLE} and {LATEST_PRICES_TABLE} for {scope}")
+        return True
+    
+    def build_rollup_query(self, partition_dates: Optional[List[str]]) -> str:
+        """
+        Build the script refreshing both rollup tables for some extraction dates.
+        
+        Daily summary rows of those dates are deleted and re-aggregated from
+        the target table in one transaction. Latest prices are MERGEd from the
+        newest row per coin and quote currency in those dates and only replace
+        rows with an older extraction_timestamp, so backfilling old dates never
+        moves them back. Rows without a vs_currency are rolled up as USD.
+        
+        Args:
+            partition_dates: ISO dates to recompute (None covers all dates)
+        
+        Returns:
+            Multi-statement BigQuery script
+        """
+        if partition_dates is None:
+            date_filter = "TRUE"
+            summary_filter = "TRUE"
+        else:
+            dates = ", ".join(f"DATE '{day}'" for day in partition_dates)
+            date_filter = f"DATE(extraction_timestamp) IN ({dates})"
+            summary_filter = f"date IN ({dates})"
+        
+        currency = f"COALESCE(vs_currency, '{DEFAULT_VS_CURRENCY}')"
+        latest_columns = [col['name'] for col in load_table_schema(LATEST_PRICES_TABLE)]
+        select_columns = ", ".join(latest_columns)
+        source_columns = ", ".join(f"{currency} AS vs_currency" if col == 'vs_currency' else col for col in latest_columns)
+        updates = ",\n    ".join(
+            f"{col} = S.{col}" for col in latest_columns if col not in ('crypto_id', 'vs_currency')
+        )
+        insert_values = ", ".join(f"S.{col}" for col in latest_columns)
+        
+        return f"""BEGIN TRANSACTION;
+
+DELETE FROM `{self.daily_summary_ref}`
+WHERE {summary_filter};
+
+INSERT INTO `{self.daily_summary_ref}`
+  (date, crypto_id, vs_currency, symbol, name, avg_price, daily_low, daily_high,
+   avg_market_cap, avg_volume, avg_24h_change_pct, data_points, refreshed_at)
+SELECT
+  DATE(extraction_timestamp) AS date,
+  crypto_id,
+  {currency},
+  symbol,
+  name,
+  AVG(current_price),
+  MIN(low_24h),
+  MAX(high_24h),
+  AVG(market_cap),
+  AVG(total_volume),
+  AVG(price_change_percentage_24h),
+  COUNT(*),
+  CURRENT_TIMESTAMP
+FROM `{self.table_ref}`
+WHERE {date_filter}
+GROUP BY date, crypto_id, {currency}, symbol, name;
+
+MERGE INTO `{self.latest_prices_ref}` T
+USING (
+  SELECT {source_columns}
+  FROM `{self.table_ref}`
+  WHERE {date_filter}
+  QUALIFY ROW_NUMBER() OVER (PARTITION BY crypto_id, {currency} ORDER BY extraction_timestamp DESC) = 1
+) S
+ON T.crypto_id = S.crypto_id AND T.vs_currency = S.vs_currency
+WHEN MATCHED AND S.extraction_timestamp >= T.extraction_timestamp THEN UPDATE SET
+    {updates}
+WHEN NOT MATCHED THEN INSERT ({select_columns})
+VALUES ({insert_values});
+
+COMMIT TRANSACTION;"""
+    
+    def _ensure_rollup_tables(self):
+        """Create the rollup tables from sql/schema.sql if they do not exist yet."""
+        for table_name, ref in ((DAILY_SUMMARY_TABLE, self.daily_summary_ref), (LATEST_PRICES_TABLE, self.latest_prices_ref)):
+            self._ensure_table(table_name, ref)
+    
+    def _ensure_table(self, table_name: str, ref: str):
+        """Create a table from its sql/schema.sql definition if it does not exist yet."""
+        if self._table_exists(ref):
+            return
+        ddl = re.sub(r"`[^`]+`", f"`{ref}`", load_create_table(table_name), count=1)
+        self.client.query(ddl).result()
+        self._remember(ref)
+        logger.info(f"Created table {ref}")
+    
+    def _reference_stager(self, table_name: str) -> ParquetStager:
+        """Stager writing a reference table's files to the load spool."""
+        if table_name not in self._reference_stagers:
+            self._reference_stagers[table_name] = ParquetStager(
+                table_name=table_name, spool_dir=self.stager.spool_dir, schema_table=table_name
+            )
+        return self._reference_stagers[table_name]
+    
+    @staticmethod
+    def _bq_schema(columns: List[Dict[str, str]]) -> List:
+        """BigQuery schema fields for column definitions from sql/schema.sql."""
+        return [bigquery.SchemaField(col['name'], col['type'], mode=col['mode']) for col in columns]
+    
+    def _touch(self, partition_dates: Optional[Iterable[str]]):
+        """Mark extraction dates of the target table as needing a rollup refresh."""
+        with self._job_files_lock:
+            if partition_dates is None or self._touched_dates is None:
+                self._touched_dates = None
+            else:
+                self._touched_dates.update(partition_dates)
+    
+    def _has_touched_dates(self) -> bool:
+        """Whether writes since the last rollup refresh are waiting to be rolled up."""
+        with self._job_files_lock:
+            return self.rollups_enabled and (self._touched_dates is None or bool(self._touched_dates))
+    
+    def build_merge_query(
+        self,
+        staging_ref: str,
+        columns: List[str],
+        key_columns: List[str],
+        partition_dates: List[str]
+    ) -> str:
+        """
+        Build the MERGE statement for an upsert.
+        
+        Args:
+            staging_ref: Staging table holding the batch
+            columns: Columns to insert or update
+            key_columns: Columns identifying a row
+            partition_dates: ISO dates of the extraction_timestamp partitions touched
+        
+        Returns:
+            MERGE statement pruned to the given partitions; target rows without a
+            vs_currency predate the column and match USD rows
+        """
+        conditions = [f"{self._key_sql(col, 'T')} = S.{col}" for col in key_columns]
+        if partition_dates:
+            dates = ", ".join(f"DATE '{day}'" for day in partition_dates)
+            conditions.append(f"DATE(T.extraction_timestamp) IN ({dates})")
+        
+        updates = ",\n    ".join(f"{col} = S.{col}" for col in columns if col not in key_columns)
+        insert_columns = ", ".join(columns)
+        insert_values = ", ".join(f"S.{col}" for col in columns)
+        
+        query = f"""MERGE INTO `{self.table_ref}` T
+USING `{staging_ref}` S
+ON {' AND '.join(conditions)}
+"""
+        if updates:
+            query += f"""WHEN MATCHED THEN UPDATE SET
+    {updates}
+"""
+        query += f"""WHEN NOT MATCHED THEN INSERT ({insert_columns})
+VALUES ({insert_values})"""
+        return query
+    
+    def existing_keys(self, candidates: pd.DataFrame, key_columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """
+        Look up which candidate rows are already in the target table.
+        
+        The query reads only the extraction_timestamp partitions of the
+        candidates and the time range they span, so confirming a handful of
+        possible duplicates costs a few partitions rather than a table scan.
+        
+        Args:
+            candidates: Rows that may already be loaded
+            key_columns: Columns identifying a row (defaults to BQ_MERGE_KEYS)
+        
+        Returns:
+            DataFrame with the key columns of matching rows in the table
+            (possibly a superset of the candidates, NULL vs_currency read as USD),
+            or None if the lookup failed
+        """
+        key_columns = key_columns or self.merge_keys
+        if candidates is None or candidates.empty:
+            return pd.DataFrame(columns=key_columns)
+        
+        if not self.initialize_client():
+            return None
+        if not self._table_exists(self.table_ref):
+            return pd.DataFrame(columns=key_columns)
+        
+        timestamps = pd.to_datetime(candidates['extraction_timestamp'], utc=True)
+        partition_dates = self._partition_dates(candidates)
+        dates = ", ".join(f"DATE '{day}'" for day in partition_dates)
+        select_keys = ", ".join(
+            f"{self._key_sql(col)} AS {col}" if col == 'vs_currency' else col for col in key_columns
+        )
+        query = f"""SELECT DISTINCT {select_keys}
+FROM `{self.table_ref}`
+WHERE DATE(extraction_timestamp) IN ({dates})
+  AND extraction_timestamp BETWEEN @first_timestamp AND @last_timestamp"""
+        params = {
+            'first_timestamp': timestamps.min().to_pydatetime(),
+            'last_timestamp': timestamps.max().to_pydatetime(),
+        }
+        return self.execute_query(query, params, partitions=partition_dates, use_cache=False)
+    
+    def _table_exists(self, table_ref: str) -> bool:
+        """Check whether a table exists, remembering positive answers."""
+        if self._is_known(table_ref):
+            return True
+        
+        try:
+            self.client.get_table(table_ref)
+        except Exception:
             return False
+        
+        self._remember(table_ref)
+        return True
+    
+    def _is_known(self, ref: str) -> bool:
+        """Whether a dataset or table is already known to exist for this client."""
+        with _known_refs_lock:
+            return ref in _known_refs.get(self.client, ())
+    
+    def _remember(self, ref: str):
+        """Cache that a dataset or table exists for this client."""
+        if "._staging_" in ref:
+            return
+        with _known_refs_lock:
+            _known_refs.setdefault(self.client, set()).add(ref)
+    
+    def _view_dependencies(self) -> Dict[str, List[str]]:
+        """Tables read by each view in sql/schema.sql, mapped onto the configured dataset."""
+        try:
+            views = load_view_dependencies()
+        except OSError as e:
+            logger.warning(f"Could not read view definitions for the query cache: {str(e)}")
+            return {}
+        
+        rename = lambda ref: f"{self.dataset_id}.{ref.split('.')[-1]}"
+        return {rename(view): [rename(table) for table in tables] for view, tables in views.items()}
+    
+    def _record_write(self, table_ref: str, partition_dates: Optional[List[str]]):
+        """Tell the query cache and the rollups which partitions of a table were written."""
+        if "._staging_" in table_ref:
+            return
+        if self.rollups_enabled and table_ref == self.table_ref:
+            self._touch(partition_dates)
+        if self.query_cache is None:
+            return
+        try:
+            self.query_cache.record_write(table_ref, partition_dates)
+        except Exception as e:
+            logger.warning(f"Could not invalidate query cache for {table_ref}: {str(e)}")
+    
+    def _record_load(self, job, table_ref: str):
+        """Record the partitions written by a finished load job, read from its staged file."""
+        with self._job_files_lock:
+            path = self._job_files.get(self._job_key(job))
+        if path is None or (self.query_cache is None and not self.rollups_enabled):
+            return
+        
+        try:
+            partition_dates = self._partition_dates(pq.read_table(path, columns=['extraction_timestamp']).to_pandas())
+        except Exception:
+            partition_dates = None
+        self._record_write(table_ref, partition_dates)
+    
+    @staticmethod
+    def _ref_string(table) -> str:
+        """Format a TableReference-like object as project.dataset.table."""
+        if isinstance(table, str):
+            return table
+        return f"{table.project}.{table.dataset_id}.{table.table_id}"
+    
+    @staticmethod
+    def _job_key(job) -> str:
+        """Key identifying a job handle."""
+        return str(getattr(job, "job_id", None) or id(job))
+    
+    def _release_file(self, job, loaded: bool, error: str = ""):
+        """Forget the staged file behind a finished job, deleting it if the load succeeded."""
+        with self._job_files_lock:
+            path = self._job_files.pop(self._job_key(job), None)
+        if path is None:
+            return
+        if loaded:
+            self.stager.discard(path)
+        else:
+            logger.warning(f"Load of {path.name} failed - file kept in {self.stager.spool_dir} for replay")
+            self._mark_failed(path, error)
+    
+    def _mark_failed(self, path: Path, error: str):
+        """Record a failed load attempt in the spool manifest."""
+        try:
+            self.stager.mark_failed(path, error)
+        except Exception as e:
+            logger.warning(f"Could not update the load spool manifest for {path.name}: {str(e)}")
     
-    def execute_query(self, query: str) -> Optional[pd.DataFrame]:
+    @staticmethod
+    def _key_sql(col: str, alias: Optional[str] = None) -> str:
+        """SQL reading a key column of the target table, with rows from before vs_currency existed as USD."""
+        ref = f"{alias}.{col}" if alias else col
+        if col == 'vs_currency':
+            return f"COALESCE({ref}, '{DEFAULT_VS_CURRENCY}')"
+        return ref
+    
+    @staticmethod
+    def _drop_duplicate_keys(df: pd.DataFrame, key_columns: List[str]) -> pd.DataFrame:
+        """Keep the last row per key, since MERGE rejects several source rows matching one target row."""
+        duplicated = df.duplicated(subset=key_columns, keep='last')
+        if not duplicated.any():
+            return df
+        batch = df[~duplicated.to_numpy()]
+        logger.warning(f"Dropped {len(df) - len(batch)} duplicate keys from batch before MERGE")
+        return batch
+    
+    @staticmethod
+    def _job_rows(job) -> int:
+        """Rows written by a finished load or DML job, from the job's statistics."""
+        rows = getattr(job, "output_rows", None)
+        if rows is None:
+            rows = getattr(job, "num_dml_affected_rows", None)
+        return int(rows or 0)
+    
+    @staticmethod
+    def _partition_dates(df: pd.DataFrame) -> List[str]:
+        """ISO dates of the extraction_timestamp partitions present in a batch."""
+        if 'extraction_timestamp' not in df.columns:
+            return []
+        dates = pd.to_datetime(df['extraction_timestamp']).dt.strftime('%Y-%m-%d').dropna().unique()
+        return sorted(dates)
+    
+    @instrumented()
+    def execute_query(
+        self,
+        query: str,
+        params: Optional[Dict] = None,
+        partitions: Optional[List[str]] = None,
+        use_cache: bool = True
+    ) -> Optional[pd.DataFrame]:
         """
         Execute a SQL query and return results as DataFrame.
         
+        With the query cache enabled, repeated queries are answered from local
+        Parquet files until this loader writes to a partition they read.
+        Results of at least QUERY_STORAGE_API_MIN_ROWS rows are downloaded as
+        Arrow through the BigQuery Storage Read API (when
+        google-cloud-bigquery-storage is installed) instead of paging rows
+        over REST.
+        
         Args:
             query: SQL query string
+            params: Named query parameters, referenced as @name in the query
+            partitions: ISO dates of the extraction_timestamp partitions the
+                query reads, so writes to other dates keep the cached result
+                (None means any write to its tables invalidates it)
+            use_cache: Set to False to bypass the query cache
             
         Returns:
             DataFrame with query results or None if error
         """
+        cache = self.query_cache if use_cache else None
+        
+        if cache is not None:
+            table = cache.get(query, params)
+            if table is not None:
+                logger.info(f"Query answered from local cache ({table.num_rows} rows)")
+                return table.to_pandas()
+        
         try:
             logger.info("Executing query on BigQuery")
-            query_job = self.client.query(query)
+            started_at = time.time()
+            job_config = bigquery.QueryJobConfig(query_parameters=self._query_parameters(params)) if params else None
+            query_job = self.client.query(query, job_config=job_config)
             results = query_job.result()
-            df = results.to_dataframe()
             
+            total_rows = getattr(results, "total_rows", None) or 0
+            table = results.to_arrow(create_bqstorage_client=total_rows >= Config.QUERY_STORAGE_API_MIN_ROWS)
+            
+            if cache is not None:
+                cache.put(query, params, table, partitions=partitions, started_at=started_at)
+            
+            df = table.to_pandas()
             logger.info(f"Query returned {len(df)} rows")
             return df
             
         except Exception as e:
             logger.error(f"Error executing query: {str(e)}")
             return None
+
+    @staticmethod
+    def _query_parameters(params: Dict) -> List:
+        """
+        Build named scalar query parameters from Python values.
+        
+        Args:
+            params: Parameter name -> value
+        
+        Returns:
+            List of ScalarQueryParameter
+        
+        Raises:
+            TypeError: If a value has no matching BigQuery type
+        """
+        parameters = []
+        for name, value in params.items():
+            param_type = next((bq_type for py_type, bq_type in PARAM_TYPES if isinstance(value, py_type)), None)
+            if param_type is None:
+                raise TypeError(f"Unsupported type for query parameter '{name}': {type(value).__name__}")
+            parameters.append(bigquery.ScalarQueryParameter(name, param_type, value))
+        return parameters
@@ -0,0 +1,426 @@
+"""
+Column sketch module for per-run data profiles.
+Summarizes numeric and identifier columns as small mergeable sketches (quantiles,
+distinct counts, min/max/mean) kept per run in a local SQLite store.
+"""
+
+import io
+import logging
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PROFILE_NUMERIC_COLUMNS = [
+    'current_price', 'price_change_percentage_24h', 'market_cap', 'total_volume', 'circulating_supply', 'market_cap_rank'
+]
+PROFILE_ID_COLUMNS = ['crypto_id', 'symbol', 'vs_currency']
+
+# Quantiles reported in summaries and compared for drift
+PROFILE_QUANTILES = (0.1, 0.5, 0.9, 0.99)
+
+_UINT64_ONE = np.uint64(1)
+
+
+class HyperLogLog:
+    """
+    Distinct count sketch with 2^precision one-byte registers.
+    
+    The standard error is about 1.04 / sqrt(2^precision) (1.6% at the
+    default precision of 12, in 4 KB). Sketches of the same precision merge
+    by taking the register-wise maximum.
+    """
+    
+    def __init__(self, precision: int = 12, registers: Optional[np.ndarray] = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+    
+    def add(self, values: pd.Series):
+        """Add the non-null values of a column."""
+        values = values.dropna()
+        if values.empty:
+            return
+        
+        hashes = pd.util.hash_pandas_object(values.astype(str), index=False).to_numpy(dtype=np.uint64)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        # Leading zeros of the remaining bits, with a sentinel bit so an all-zero remainder stops the count
+        rest = (hashes << np.uint64(self.precision)) | (_UINT64_ONE << np.uint64(self.precision - 1))
+        zeros = np.zeros(len(rest), dtype=np.uint8)
+        for shift in (32, 16, 8, 4, 2, 1):
+            top_clear = rest < (_UINT64_ONE << np.uint64(64 - shift))
+            zeros[top_clear] += shift
+            rest[top_clear] <<= np.uint64(shift)
+        np.maximum.at(self.registers, index, zeros + 1)
+    
+    def merge(self, other: 'HyperLogLog'):
+        """Fold another sketch of the same precision into this one."""
+        np.maximum(self.registers, other.registers, out=self.registers)
+    
+    def estimate(self) -> int:
+        """Estimated number of distinct values."""
+        m = len(self.registers)
+        raw = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and empty:
+            # Linear counting is more accurate for small cardinalities
+            raw = m * np.log(m / empty)
+        return int(round(raw))
+
+
+class DDSketch:
+    """
+    Quantile sketch with relative accuracy guarantees.
+    
+    Values are counted in logarithmic buckets, so any quantile is returned
+    within relative_accuracy of a true value of that rank, whatever the
+    distribution (prices and volumes span many orders of magnitude). Merging
+    adds bucket counts, so sketches of any number of runs combine exactly.
+    """
+    
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+    
+    @property
+    def count(self) -> int:
+        """Values added to the sketch."""
+        return sum(self.positive.values()) + sum(self.negative.values()) + self.zero_count
+    
+    def add(self, values: np.ndarray):
+        """Add finite float values."""
+        values = values[np.isfinite(values)]
+        self.zero_count += int(np.count_nonzero(values == 0))
+        self._add_buckets(self.positive, values[values > 0])
+        self._add_buckets(self.negative, -values[values < 0])
+    
+    def _add_buckets(self, buckets: Dict[int, int], magnitudes: np.ndarray):
+        """Count positive magnitudes into their logarithmic buckets."""
+        if not len(magnitudes):
+            return
+        keys, counts = np.unique(np.ceil(np.log(magnitudes) / np.log(self.gamma)).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            buckets[key] = buckets.get(key, 0) + count
+    
+    def merge(self, other: 'DDSketch'):
+        """Fold another sketch with the same relative accuracy into this one."""
+        for buckets, other_buckets in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_buckets.items():
+                buckets[key] = buckets.get(key, 0) + count
+        self.zero_count += other.zero_count
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile.
+        
+        Args:
+            q: Quantile in [0, 1]
+        
+        Returns:
+            Estimated value, or None if the sketch is empty
+        """
+        total = self.count
+        if total == 0:
+            return None
+        
+        rank = q * (total - 1)
+        seen = 0
+        # Most negative values first: negative buckets by descending magnitude
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._bucket_value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._bucket_value(key)
+        return self._bucket_value(max(self.positive)) if self.positive else 0.0
+    
+    def _bucket_value(self, key: int) -> float:
+        """Representative value of a bucket, within relative_accuracy of every value in it."""
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+
+class ColumnSketch:
+    """Count, nulls, min/max/sum and a quantile or distinct count sketch of one column."""
+    
+    def __init__(self, kind: str):
+        """
+        Args:
+            kind: 'numeric' (DDSketch quantiles and moments) or 'id' (HyperLogLog distinct count)
+        """
+        self.kind = kind
+        self.count = 0
+        self.nulls = 0
+        self.minimum = np.nan
+        self.maximum = np.nan
+        self.total = 0.0
+        self.quantiles = DDSketch() if kind == 'numeric' else None
+        self.distinct = HyperLogLog() if kind == 'id' else None
+    
+    def add(self, values: pd.Series):
+        """Add a column of a batch."""
+        self.count += len(values)
+        if self.kind == 'id':
+            self.nulls += int(values.isna().sum())
+            self.distinct.add(values)
+            return
+        
+        array = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        finite = array[np.isfinite(array)]
+        self.nulls += len(array) - len(finite)
+        if len(finite):
+            self.minimum = np.fmin(self.minimum, finite.min())
+            self.maximum = np.fmax(self.maximum, finite.max())
+            self.total += float(finite.sum())
+            self.quantiles.add(finite)
+    
+    def merge(self, other: 'ColumnSketch'):
+        """Fold the sketch of the same column from another batch or run into this one."""
+        self.count += other.count
+        self.nulls += other.nulls
+        self.minimum = np.fmin(self.minimum, other.minimum)
+        self.maximum = np.fmax(self.maximum, other.maximum)
+        self.total += other.total
+        if self.kind == 'numeric':
+            self.quantiles.merge(other.quantiles)
+        else:
+            self.distinct.merge(other.distinct)
+    
+    def summary(self) -> Dict:
+        """Plain-value summary for reports."""
+        summary = {'count': self.count, 'nulls': self.nulls}
+        if self.kind == 'id':
+            summary['distinct'] = self.distinct.estimate()
+            return summary
+        
+        values = self.count - self.nulls
+        summary.update({
+            'min': None if np.isnan(self.minimum) else float(self.minimum),
+            'max': None if np.isnan(self.maximum) else float(self.maximum),
+            'mean': self.total / values if values else None,
+        })
+        for q in PROFILE_QUANTILES:
+            estimate = self.quantiles.quantile(q)
+            summary[f"p{int(q * 100)}"] = None if estimate is None else float(estimate)
+        return summary
+    
+    def to_bytes(self) -> bytes:
+        """Serialize the sketch (no pickling)."""
+        arrays = {
+            'kind': np.array(self.kind),
+            'stats': np.array([self.count, self.nulls], dtype=np.int64),
+            'moments': np.array([self.minimum, self.maximum, self.total], dtype=np.float64),
+        }
+        if self.kind == 'numeric':
+            sketch = self.quantiles
+            arrays['relative_accuracy'] = np.array(sketch.relative_accuracy)
+            arrays['zero_count'] = np.array(sketch.zero_count, dtype=np.int64)
+            for name, buckets in (('positive', sketch.positive), ('negative', sketch.negative)):
+                arrays[name] = np.array(sorted(buckets.items()), dtype=np.int64).reshape(-1, 2)
+        else:
+            arrays['registers'] = self.distinct.registers
+        
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        return buffer.getvalue()
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'ColumnSketch':
+        """Deserialize a sketch written by to_bytes."""
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            sketch = cls(str(arrays['kind']))
+            sketch.count, sketch.nulls = (int(value) for value in arrays['stats'])
+            sketch.minimum, sketch.maximum, sketch.total = (float(value) for value in arrays['moments'])
+            if sketch.kind == 'numeric':
+                sketch.quantiles = DDSketch(float(arrays['relative_accuracy']))
+                sketch.quantiles.zero_count = int(arrays['zero_count'])
+                sketch.quantiles.positive = {int(key): int(count) for key, count in arrays['positive']}
+                sketch.quantiles.negative = {int(key): int(count) for key, count in arrays['negative']}
+            else:
+                registers = arrays['registers'].astype(np.uint8)
+                sketch.distinct = HyperLogLog(int(np.log2(len(registers))), registers)
+        return sketch
+
+
+def profile_frame(df: pd.DataFrame) -> Dict[str, ColumnSketch]:
+    """
+    Sketch the profiled columns of a batch in one pass per column.
+    
+    Args:
+        df: Transformed DataFrame
+    
+    Returns:
+        Sketches keyed by column name (columns missing from the frame are skipped)
+    """
+    profile = {}
+    for kind, columns in (('numeric', PROFILE_NUMERIC_COLUMNS), ('id', PROFILE_ID_COLUMNS)):
+        for col in columns:
+            if col in df.columns:
+                profile[col] = ColumnSketch(kind)
+                profile[col].add(df[col])
+    return profile
+
+
+def merge_profiles(profiles: Iterable[Dict[str, ColumnSketch]]) -> Dict[str, ColumnSketch]:
+    """
+    Merge column profiles of several batches or runs.
+    
+    Args:
+        profiles: Profiles from profile_frame or SketchStore
+    
+    Returns:
+        One profile covering all of them
+    """
+    merged: Dict[str, ColumnSketch] = {}
+    for profile in profiles:
+        for col, sketch in profile.items():
+            if col not in merged:
+                merged[col] = ColumnSketch(sketch.kind)
+            merged[col].merge(sketch)
+    return merged
+
+
+def summarize_profile(profile: Dict[str, ColumnSketch]) -> Dict[str, Dict]:
+    """Summaries of every column of a profile, for reports."""
+    return {col: sketch.summary() for col, sketch in profile.items()}
+
+
+def compare_profiles(baseline: Dict[str, ColumnSketch], current: Dict[str, ColumnSketch]) -> Dict[str, Dict]:
+    """
+    Measure how each column's distribution moved between two profiles.
+    
+    Numeric columns report the relative change of each PROFILE_QUANTILES
+    quantile and of the null rate; identifier columns the change in distinct
+    count. The largest absolute quantile change is given as 'max_shift_pct',
+    so columns can be ranked by drift.
+    
+    Args:
+        baseline: Earlier profile (e.g. last month)
+        current: Later profile (e.g. this month)
+    
+    Returns:
+        Drift figures keyed by column, for columns present in both profiles
+    """
+    def pct_change(before, after):
+        if before is None or after is None or before == 0:
+            return None
+        return round((after - before) / abs(before) * 100, 2)
+    
+    drift = {}
+    for col in sorted(set(baseline) & set(current)):
+        before, after = baseline[col].summary(), current[col].summary()
+        null_rate = [summary['nulls'] / summary['count'] * 100 if summary['count'] else 0.0 for summary in (before, after)]
+        column = {'null_rate_change_pct_points': round(null_rate[1] - null_rate[0], 2)}
+        
+        if baseline[col].kind == 'id':
+            column['distinct'] = [before['distinct'], after['distinct']]
+            column['distinct_change_pct'] = pct_change(before['distinct'], after['distinct'])
+        else:
+            shifts = {}
+            for q in PROFILE_QUANTILES:
+                name = f"p{int(q * 100)}"
+                shifts[name] = pct_change(before[name], after[name])
+            column['quantile_change_pct'] = shifts
+            known = [abs(shift) for shift in shifts.values() if shift is not None]
+            column['max_shift_pct'] = max(known) if known else None
+        drift[col] = column
+    return drift
+
+
+class SketchStore:
+    """Per-run column sketches in a local SQLite file."""
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sketches ("
+            " run_id TEXT NOT NULL,"
+            " recorded_at TEXT NOT NULL,"
+            " column_name TEXT NOT NULL,"
+            " sketch BLOB NOT NULL,"
+            " PRIMARY KEY (run_id, column_name))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sketches_recorded ON sketches (recorded_at)")
+        self._db.commit()
+    
+    def record(self, profile: Dict[str, ColumnSketch], recorded_at: Optional[datetime] = None) -> str:
+        """
+        Store the profile of one run.
+        
+        Args:
+            profile: Column sketches of the run
+            recorded_at: Run time (defaults to now, UTC)
+        
+        Returns:
+            Run id the sketches were stored under
+        """
+        run_id = uuid.uuid4().hex[:12]
+        stamp = self._stamp(recorded_at or datetime.now(timezone.utc))
+        rows = [(run_id, stamp, col, sketch.to_bytes()) for col, sketch in profile.items()]
+        
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO sketches (run_id, recorded_at, column_name, sketch) VALUES (?, ?, ?, ?)", rows
+            )
+            self._db.commit()
+        
+        logger.info(f"Recorded column profile of {len(rows)} columns (run {run_id})")
+        return run_id
+    
+    def load(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict[str, ColumnSketch]:
+        """
+        Merge the profiles of every run recorded in [start, end).
+        
+        Only the stored sketches are read, so the cost is proportional to
+        the number of runs, not the rows they profiled.
+        
+        Args:
+            start: First run time to include (None = from the first run)
+            end: Run time to stop before (None = up to the latest run)
+        
+        Returns:
+            Merged profile (empty if no run falls in the window)
+        """
+        query = "SELECT column_name, sketch FROM sketches WHERE recorded_at >= ? AND recorded_at < ?"
+        bounds = (self._stamp(start) if start else "", self._stamp(end) if end else "~")
+        with self._lock:
+            rows = self._db.execute(query, bounds).fetchall()
+        
+        return merge_profiles({col: ColumnSketch.from_bytes(blob)} for col, blob in rows)
+    
+    def run_count(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+        """Number of runs recorded in [start, end)."""
+        bounds = (self._stamp(start) if start else "", self._stamp(end) if end else "~")
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(DISTINCT run_id) FROM sketches WHERE recorded_at >= ? AND recorded_at < ?", bounds
+            ).fetchone()[0]
+    
+    @staticmethod
+    def _stamp(moment: datetime) -> str:
+        """Sortable UTC text form of a time (naive times are taken as UTC)."""
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
+    
+    def close(self):
+        """Close the SQLite connection."""
+        with self._lock:
+            self._db.close()
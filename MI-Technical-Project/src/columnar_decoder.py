@@ -0,0 +1,434 @@
+"""
+Columnar decoder module for CoinGecko market responses.
+Streams JSON arrays record by record into typed NumPy column buffers, and
+builds typed frames from the global and exchange rate responses.
+"""
+
+import codecs
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Target column -> source field, mirroring CryptoDataFetcher.transform_data
+STRING_FIELDS = {
+    'crypto_id': 'id',
+    'symbol': 'symbol',
+    'name': 'name',
+}
+
+FLOAT_FIELDS = {
+    'current_price': 'current_price',
+    'market_cap': 'market_cap',
+    'total_volume': 'total_volume',
+    'high_24h': 'high_24h',
+    'low_24h': 'low_24h',
+    'price_change_24h': 'price_change_24h',
+    'price_change_percentage_24h': 'price_change_percentage_24h',
+    'price_change_percentage_7d': 'price_change_percentage_7d_in_currency',
+    'circulating_supply': 'circulating_supply',
+    'total_supply': 'total_supply',
+    'max_supply': 'max_supply',
+    'ath': 'ath',
+    'atl': 'atl',
+}
+
+INT_FIELDS = {
+    'market_cap_rank': 'market_cap_rank',
+}
+
+TIMESTAMP_FIELDS = {
+    'ath_date': 'ath_date',
+    'atl_date': 'atl_date',
+    'last_updated': 'last_updated',
+}
+
+# Quote currency of rows without a vs_currency (and of every row before it existed)
+DEFAULT_VS_CURRENCY = "usd"
+
+# Output column order, matching the crypto_prices schema used by transform_data
+COLUMN_ORDER = [
+    'crypto_id', 'symbol', 'name', 'vs_currency', 'current_price', 'market_cap', 'market_cap_rank',
+    'total_volume', 'high_24h', 'low_24h', 'price_change_24h', 'price_change_percentage_24h',
+    'price_change_percentage_7d', 'circulating_supply', 'total_supply', 'max_supply',
+    'ath', 'ath_date', 'atl', 'atl_date', 'last_updated', 'extraction_timestamp',
+]
+
+NAT = np.datetime64('NaT', 'ns').astype(np.int64)
+
+# Compact dtypes of the transformed frame: identifiers are dictionary-encoded
+# with Arrow-backed categories, counts are nullable Int64, timestamps are UTC
+CATEGORY_COLUMNS = [*STRING_FIELDS, 'vs_currency']
+UTC_TIMESTAMP_COLUMNS = [*TIMESTAMP_FIELDS, 'extraction_timestamp']
+
+# /global fields reported per quote currency, and scalar fields
+GLOBAL_CURRENCY_FIELDS = {
+    'total_market_cap': 'total_market_cap',
+    'total_volume': 'total_volume',
+}
+GLOBAL_SCALAR_FIELDS = {
+    'active_cryptocurrencies': 'active_cryptocurrencies',
+    'markets': 'markets',
+    'market_cap_change_percentage_24h_usd': 'market_cap_change_percentage_24h_usd',
+}
+
+
+def to_category(values: Iterable[Optional[str]]) -> pd.Categorical:
+    """
+    Dictionary-encode string values, keeping the categories in an Arrow string array.
+    
+    Args:
+        values: Strings, with None for missing values
+    
+    Returns:
+        Categorical with int codes and one Arrow-backed entry per distinct value
+    """
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    categories = pd.Index(uniques, dtype='string[pyarrow]')
+    return pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories))
+
+
+def series_ids(df: pd.DataFrame) -> np.ndarray:
+    """
+    Identify each row's price series: the coin, qualified by its quote currency.
+    
+    Rows in the default currency keep the bare crypto_id, so per-coin state
+    written before quote currencies existed stays valid; other currencies
+    become 'crypto_id:currency'.
+    
+    Args:
+        df: Transformed DataFrame
+    
+    Returns:
+        Object array of series ids, one per row
+    """
+    ids = np.asarray(df['crypto_id'], dtype=object)
+    if 'vs_currency' not in df.columns:
+        return ids
+    
+    currencies = np.asarray(df['vs_currency'], dtype=object)
+    other = pd.notna(currencies) & (currencies != DEFAULT_VS_CURRENCY)
+    if not other.any():
+        return ids
+    
+    ids = ids.copy()
+    ids[other] = [f"{crypto_id}:{currency}" for crypto_id, currency in zip(ids[other], currencies[other])]
+    return ids
+
+
+def global_metrics_frame(payload: Dict, vs_currencies: List[str], extraction_timestamp: datetime) -> pd.DataFrame:
+    """
+    Turn a /global response into one crypto_global_metrics row per quote currency.
+    
+    Args:
+        payload: Decoded /global response
+        vs_currencies: Quote currencies to keep
+        extraction_timestamp: ETL extraction timestamp for every row
+    
+    Returns:
+        DataFrame with the crypto_global_metrics columns
+    """
+    data = payload.get('data') or {}
+    shares = data.get('market_cap_percentage') or {}
+    updated_at = data.get('updated_at')
+    num_rows = len(vs_currencies)
+    
+    df = pd.DataFrame({'vs_currency': to_category(vs_currencies)})
+    for col, field in GLOBAL_CURRENCY_FIELDS.items():
+        values = data.get(field) or {}
+        df[col] = np.array([values.get(currency) for currency in vs_currencies], dtype=np.float64)
+    df['market_cap_percentage_btc'] = np.full(num_rows, shares.get('btc', np.nan), dtype=np.float64)
+    df['market_cap_percentage_eth'] = np.full(num_rows, shares.get('eth', np.nan), dtype=np.float64)
+    for col, field in GLOBAL_SCALAR_FIELDS.items():
+        value = data.get(field)
+        dtype = 'Int64' if col != 'market_cap_change_percentage_24h_usd' else 'float64'
+        df[col] = pd.array([value] * num_rows, dtype=dtype)
+    df['updated_at'] = pd.to_datetime([updated_at] * num_rows, unit='s', utc=True)
+    df['extraction_timestamp'] = pd.DatetimeIndex([extraction_timestamp] * num_rows).tz_localize('UTC')
+    return df
+
+
+def exchange_rates_frame(payload: Dict, extraction_timestamp: datetime) -> pd.DataFrame:
+    """
+    Turn an /exchange_rates response into crypto_exchange_rates rows.
+    
+    Args:
+        payload: Decoded /exchange_rates response (BTC-denominated rates)
+        extraction_timestamp: ETL extraction timestamp for every row
+    
+    Returns:
+        DataFrame with one row per currency
+    """
+    rates = payload.get('rates') or {}
+    currencies = list(rates)
+    num_rows = len(currencies)
+    
+    return pd.DataFrame({
+        'currency': to_category(currencies),
+        'name': to_category([rates[currency].get('name') for currency in currencies]),
+        'unit': to_category([rates[currency].get('unit') for currency in currencies]),
+        'rate_type': to_category([rates[currency].get('type') for currency in currencies]),
+        'btc_rate': np.array([rates[currency].get('value') for currency in currencies], dtype=np.float64),
+        'extraction_timestamp': pd.DatetimeIndex([extraction_timestamp] * num_rows).tz_localize('UTC'),
+    })
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast a transformed frame's columns to the compact dtypes.
+    
+    Columns already in their compact dtype are left as they are, so calling
+    this on a compact frame copies nothing.
+    
+    Args:
+        df: Transformed DataFrame, modified in place
+    
+    Returns:
+        The same DataFrame
+    """
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = to_category(df[col])
+    
+    for col in INT_FIELDS:
+        if col in df.columns and df[col].dtype.name != 'Int64':
+            df[col] = pd.array(df[col], dtype='Int64')
+    
+    for col in UTC_TIMESTAMP_COLUMNS:
+        if col in df.columns and str(df[col].dtype) != 'datetime64[ns, UTC]':
+            df[col] = pd.to_datetime(df[col], utc=True).astype('datetime64[ns, UTC]')
+    
+    return df
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Dict]:
+    """
+    Incrementally decode a top-level JSON array, yielding one element at a time.
+    
+    Only the current element and the undecoded tail of the byte stream are held
+    in memory, so the full response body is never materialized as Python objects.
+    
+    Args:
+        chunks: Iterable of raw response body chunks
+    
+    Yields:
+        Decoded array elements
+    
+    Raises:
+        ValueError: If the body is not a JSON array or is truncated
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    started = False
+    finished = False
+    
+    for chunk in chunks:
+        if finished:
+            break
+        buffer += text_decoder.decode(chunk)
+        pos = 0
+        
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char in " \t\r\n,":
+                pos += 1
+                continue
+            
+            if not started:
+                if char != "[":
+                    raise ValueError("Expected a JSON array response")
+                started = True
+                pos += 1
+                continue
+            
+            if char == "]":
+                finished = True
+                break
+            
+            try:
+                element, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Element is split across chunks - wait for more data
+                break
+            yield element
+        
+        buffer = buffer[pos:]
+    
+    if not finished:
+        raise ValueError("Truncated JSON array response")
+
+
+class MarketColumnBuilder:
+    """Accumulates market records directly into typed column buffers."""
+    
+    def __init__(self, capacity: int = 250, block_size: int = 1024, vs_currency: str = DEFAULT_VS_CURRENCY):
+        self.vs_currency = vs_currency
+        self.capacity = max(1, capacity)
+        self.block_size = block_size
+        self.size = 0
+        self.strings: Dict[str, List[Optional[str]]] = {col: [] for col in STRING_FIELDS}
+        self.floats = {col: np.empty(self.capacity, dtype=np.float64) for col in FLOAT_FIELDS}
+        self.ints = {col: np.empty(self.capacity, dtype=np.int64) for col in INT_FIELDS}
+        self.int_masks = {col: np.empty(self.capacity, dtype=bool) for col in INT_FIELDS}
+        self.timestamps = {col: np.empty(self.capacity, dtype=np.int64) for col in TIMESTAMP_FIELDS}
+        
+        # Small row block converted to the typed buffers in one vectorized step
+        self._block: Dict[str, List] = {col: [] for col in (*FLOAT_FIELDS, *INT_FIELDS, *TIMESTAMP_FIELDS)}
+        self._block_rows = 0
+    
+    def append(self, record: Dict):
+        """
+        Copy the mapped fields of one API record into the column buffers.
+        
+        Args:
+            record: Decoded market record
+        """
+        for col, field in STRING_FIELDS.items():
+            self.strings[col].append(record.get(field))
+        
+        for col, field in FLOAT_FIELDS.items():
+            self._block[col].append(record.get(field))
+        
+        for col, field in INT_FIELDS.items():
+            self._block[col].append(record.get(field))
+        
+        for col, field in TIMESTAMP_FIELDS.items():
+            value = record.get(field)
+            self._block[col].append(value.rstrip('Z') if value else 'NaT')
+        
+        self._block_rows += 1
+        if self._block_rows >= self.block_size:
+            self._flush_block()
+    
+    def extend(self, records: Iterable[Dict]) -> int:
+        """
+        Append every record from an iterable and flush the pending block.
+        
+        Args:
+            records: Iterable of decoded market records
+        
+        Returns:
+            Number of records appended
+        """
+        start = self.size + self._block_rows
+        for record in records:
+            self.append(record)
+        self._flush_block()
+        return self.size - start
+    
+    def to_frame(self, extraction_timestamp: datetime) -> pd.DataFrame:
+        """
+        Build the transformed DataFrame from the filled buffers.
+        
+        Args:
+            extraction_timestamp: ETL extraction timestamp for every row
+        
+        Returns:
+            DataFrame with the same columns as CryptoDataFetcher.transform_data
+        """
+        return self.concat([self], extraction_timestamp)
+    
+    @staticmethod
+    def concat(builders: List['MarketColumnBuilder'], extraction_timestamp: datetime) -> pd.DataFrame:
+        """
+        Build one transformed DataFrame from several builders (e.g. one per page).
+        
+        Args:
+            builders: Builders in output order
+            extraction_timestamp: ETL extraction timestamp for every row
+        
+        Returns:
+            DataFrame with the same columns as CryptoDataFetcher.transform_data
+        """
+        for builder in builders:
+            builder._flush_block()
+        
+        columns = {}
+        
+        for col in STRING_FIELDS:
+            values = [value for builder in builders for value in builder.strings[col]]
+            if col == 'symbol':
+                values = [value.upper() if isinstance(value, str) else value for value in values]
+            columns[col] = to_category(values)
+        
+        columns['vs_currency'] = to_category(np.repeat(
+            np.array([b.vs_currency for b in builders], dtype=object),
+            [b.size for b in builders]
+        ))
+        
+        for col in FLOAT_FIELDS:
+            columns[col] = np.concatenate([b.floats[col][:b.size] for b in builders])
+        
+        for col in INT_FIELDS:
+            columns[col] = pd.arrays.IntegerArray(
+                np.concatenate([b.ints[col][:b.size] for b in builders]),
+                np.concatenate([b.int_masks[col][:b.size] for b in builders])
+            )
+        
+        for col in TIMESTAMP_FIELDS:
+            values = np.concatenate([b.timestamps[col][:b.size] for b in builders])
+            columns[col] = pd.DatetimeIndex(values.view('datetime64[ns]'), tz='UTC')
+        
+        num_rows = sum(b.size for b in builders)
+        columns['extraction_timestamp'] = pd.DatetimeIndex(
+            np.full(num_rows, np.datetime64(extraction_timestamp, 'ns')), tz='UTC'
+        )
+        
+        df = pd.DataFrame({col: columns[col] for col in COLUMN_ORDER}, copy=False)
+        return df
+    
+    def _flush_block(self):
+        """Convert the pending row block into the typed buffers."""
+        rows = self._block_rows
+        if not rows:
+            return
+        
+        while self.size + rows > self.capacity:
+            self._grow()
+        window = slice(self.size, self.size + rows)
+        
+        for col in FLOAT_FIELDS:
+            self.floats[col][window] = np.array(self._block[col], dtype=np.float64)
+        
+        for col in INT_FIELDS:
+            values = self._block[col]
+            mask = np.fromiter((value is None for value in values), dtype=bool, count=rows)
+            self.int_masks[col][window] = mask
+            self.ints[col][window] = np.array([0 if value is None else value for value in values], dtype=np.int64)
+        
+        for col in TIMESTAMP_FIELDS:
+            self.timestamps[col][window] = self._parse_timestamps(self._block[col])
+        
+        for values in self._block.values():
+            values.clear()
+        self.size += rows
+        self._block_rows = 0
+    
+    def _grow(self):
+        """Double the capacity of every numeric buffer."""
+        self.capacity *= 2
+        for buffers in (self.floats, self.ints, self.int_masks, self.timestamps):
+            for col, values in buffers.items():
+                grown = np.empty(self.capacity, dtype=values.dtype)
+                grown[:self.size] = values[:self.size]
+                buffers[col] = grown
+    
+    @staticmethod
+    def _parse_timestamps(values: List[str]) -> np.ndarray:
+        """Parse ISO-8601 UTC timestamp strings to int64 nanoseconds (NaT if invalid)."""
+        try:
+            return np.array(values, dtype='datetime64[ns]').view(np.int64)
+        except ValueError:
+            parsed = np.empty(len(values), dtype=np.int64)
+            for i, value in enumerate(values):
+                try:
+                    parsed[i] = np.datetime64(value, 'ns').astype(np.int64)
+                except ValueError:
+                    parsed[i] = NAT
+            return parsed
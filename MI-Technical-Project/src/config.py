@@ -14,19 +14,96 @@ class Config:
     """Configuration class for application settings."""
     
     # API Configuration
-    COINGECKO_API_URL = "https://api.coingecko.com/api/v3"
+    COINGECKO_API_URL = os.getenv("COINGECKO_API_URL", "https://api.coingecko.com/api/v3")
     COINGECKO_API_KEY = os.getenv("COINGECKO_API_KEY", "")  # Optional for free tier
+    COINGECKO_API_TIER = os.getenv("COINGECKO_API_TIER", "demo")  # public, demo, analyst or pro
+    COINGECKO_PAGE_SIZE = int(os.getenv("COINGECKO_PAGE_SIZE", "250"))  # API maximum per_page
+    COINGECKO_REQUESTS_PER_MINUTE = int(os.getenv("COINGECKO_REQUESTS_PER_MINUTE", "0"))  # 0 = tier default
+    COINGECKO_BURST = int(os.getenv("COINGECKO_BURST", "5"))
+    COINGECKO_MAX_RETRIES = int(os.getenv("COINGECKO_MAX_RETRIES", "5"))
+    FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "4"))
+    
+    # Quote currencies fetched per run (long format, one row per coin and currency)
+    VS_CURRENCIES = [c.strip().lower() for c in os.getenv("VS_CURRENCIES", "usd").split(",") if c.strip()]
+    # Endpoints fetched per run: markets plus optionally global and exchange_rates
+    FETCH_ENDPOINTS = [e.strip() for e in os.getenv("FETCH_ENDPOINTS", "markets").split(",") if e.strip()]
+    
+    # Local response cache for CoinGecko calls: off, on or offline (replay only)
+    CACHE_MODE = os.getenv("CACHE_MODE", "off")
+    CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "300"))
+    CACHE_ENDPOINT_TTLS = os.getenv("CACHE_ENDPOINT_TTLS", "/coins/markets=300,/market_chart/range=86400")
+    CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", "256"))
     
     # BigQuery Configuration
     GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID")
     BQ_DATASET = os.getenv("BQ_DATASET", "crypto_analytics")
     BQ_TABLE = os.getenv("BQ_TABLE", "crypto_prices")
     GCP_CREDENTIALS_PATH = os.getenv("GCP_CREDENTIALS_PATH")
+    BQ_LOAD_MODE = os.getenv("BQ_LOAD_MODE", "merge")  # merge (idempotent upsert) or append
+    BQ_MERGE_KEYS = os.getenv("BQ_MERGE_KEYS", "crypto_id,vs_currency,extraction_timestamp").split(",")
+    STAGING_COMPRESSION = os.getenv("STAGING_COMPRESSION", "zstd")  # Parquet codec for staged loads
+    BQ_ROLLUPS = os.getenv("BQ_ROLLUPS", "on")  # on: refresh crypto_daily_summary/crypto_latest_prices after each load
+    
+    # How staged batches reach BigQuery: load (load jobs) or storage_write (Storage Write API appends, append mode only)
+    BQ_WRITE_MODE = os.getenv("BQ_WRITE_MODE", "load")
+    BQ_WRITE_STREAM_TYPE = os.getenv("BQ_WRITE_STREAM_TYPE", "committed")  # committed (visible on append) or pending (atomic per flush)
+    BQ_WRITE_FLUSH_MB = float(os.getenv("BQ_WRITE_FLUSH_MB", "4"))
+    BQ_WRITE_FLUSH_SECONDS = float(os.getenv("BQ_WRITE_FLUSH_SECONDS", "2"))
+    
+    # Local cache of query results (STATE_DIR/query_cache): off or on
+    QUERY_CACHE_MODE = os.getenv("QUERY_CACHE_MODE", "off")
+    QUERY_CACHE_TTL_SECONDS = int(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600"))  # 0 = until invalidated
+    QUERY_CACHE_MAX_MB = int(os.getenv("QUERY_CACHE_MAX_MB", "512"))
+    QUERY_STORAGE_API_MIN_ROWS = int(os.getenv("QUERY_STORAGE_API_MIN_ROWS", "100000"))
     
     # Data Quality Thresholds
     MIN_RECORDS_THRESHOLD = int(os.getenv("MIN_RECORDS_THRESHOLD", "1"))
     MAX_NULL_PERCENTAGE = float(os.getenv("MAX_NULL_PERCENTAGE", "10.0"))
     
+    # Anomaly detection against per-coin EWMA baselines (STATE_DIR/anomaly_state.npz)
+    ANOMALY_ACTION = os.getenv("ANOMALY_ACTION", "warn")  # off, warn or fail
+    ANOMALY_METHOD = os.getenv("ANOMALY_METHOD", "zscore")  # zscore or mad
+    ANOMALY_THRESHOLD = float(os.getenv("ANOMALY_THRESHOLD", "6.0"))
+    ANOMALY_ALPHA = float(os.getenv("ANOMALY_ALPHA", "0.1"))
+    ANOMALY_MIN_OBSERVATIONS = int(os.getenv("ANOMALY_MIN_OBSERVATIONS", "5"))
+    ANOMALY_MIN_SCALE = float(os.getenv("ANOMALY_MIN_SCALE", "0.01"))  # log units, ~1%
+    
+    # Per-run column sketches (quantiles, distinct counts) for profile trends (STATE_DIR/column_sketches.sqlite)
+    COLUMN_PROFILES = os.getenv("COLUMN_PROFILES", "on")  # on or off
+    
+    # Pre-load duplicate suppression with per-date Bloom filters of loaded keys (STATE_DIR/dedupe_index, append mode only)
+    DEDUPE_INDEX = os.getenv("DEDUPE_INDEX", "off")  # off or on
+    DEDUPE_KEYS_PER_PARTITION = int(os.getenv("DEDUPE_KEYS_PER_PARTITION", "200000"))
+    DEDUPE_ERROR_RATE = float(os.getenv("DEDUPE_ERROR_RATE", "0.001"))
+    DEDUPE_MAX_OPEN_PARTITIONS = int(os.getenv("DEDUPE_MAX_OPEN_PARTITIONS", "8"))
+    
+    # Streaming pipeline: rows per fetch -> quality -> load batch
+    PIPELINE_BATCH_SIZE = int(os.getenv("PIPELINE_BATCH_SIZE", "1000"))
+    
+    # Incremental mode: skip rows whose price moved less than this since the last load (0 = any change)
+    INCREMENTAL_PRICE_TOLERANCE_PCT = float(os.getenv("INCREMENTAL_PRICE_TOLERANCE_PCT", "0"))
+    
+    # Polling daemon: poll interval aligned to the API refresh cadence, polls batched per load job
+    DAEMON_INTERVAL_SECONDS = float(os.getenv("DAEMON_INTERVAL_SECONDS", "300"))
+    DAEMON_ALIGN_OFFSET_SECONDS = float(os.getenv("DAEMON_ALIGN_OFFSET_SECONDS", "15"))
+    DAEMON_POLLS_PER_LOAD = int(os.getenv("DAEMON_POLLS_PER_LOAD", "6"))
+    
+    # Historical backfill
+    BACKFILL_MAX_WORKERS = int(os.getenv("BACKFILL_MAX_WORKERS", "4"))
+    BACKFILL_SLICE_DAYS = int(os.getenv("BACKFILL_SLICE_DAYS", "30"))  # <= 90 days keeps hourly granularity
+    BACKFILL_FLUSH_ROWS = int(os.getenv("BACKFILL_FLUSH_ROWS", "100000"))  # rows buffered across coins per load
+    
+    # Local state (checkpoints, caches, spools)
+    STATE_DIR = Path(os.getenv("STATE_DIR", ".state"))
+    
+    # Destinations of the run command: bigquery and/or local (Hive-partitioned Parquet queried with DuckDB)
+    SINKS = [s.strip() for s in os.getenv("SINKS", "bigquery").split(",") if s.strip()]
+    LOCAL_WAREHOUSE_DIR = Path(os.getenv("LOCAL_WAREHOUSE_DIR", str(STATE_DIR / "warehouse")))
+    
+    # Run metrics (metrics.jsonl history, metrics.prom for the Prometheus textfile collector)
+    METRICS_DIR = Path(os.getenv("METRICS_DIR", str(STATE_DIR / "metrics")))
+    PROFILE_SLOW_RUN_SECONDS = float(os.getenv("PROFILE_SLOW_RUN_SECONDS", "0"))  # 0 disables cProfile dumps
+    
     # Cryptocurrencies to track
     CRYPTO_IDS = os.getenv("CRYPTO_IDS", "bitcoin,ethereum,cardano,solana,polkadot").split(",")
     
@@ -34,13 +111,81 @@ class Config:
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     
     @classmethod
-    def validate(cls):
-        """Validate required configuration parameters."""
+    def validate(cls, bigquery_only: bool = False):
+        """
+        Validate required configuration parameters.
+        
+        Args:
+            bigquery_only: The command talks to BigQuery directly instead of
+                writing through SINKS (streaming runs, the daemon, backfills)
+        """
         missing_vars = []
         
-        if not cls.GCP_PROJECT_ID:
+        if not cls.GCP_PROJECT_ID and "bigquery" in cls.SINKS:
             missing_vars.append("GCP_PROJECT_ID")
         
+        invalid_sinks = [s for s in cls.SINKS if s not in ("bigquery", "local")]
+        if invalid_sinks or not cls.SINKS:
+            raise ValueError(f"SINKS must list 'bigquery' and/or 'local', got '{','.join(cls.SINKS)}'")
+        
+        if bigquery_only and "bigquery" not in cls.SINKS:
+            raise ValueError(
+                "SINKS must include 'bigquery' for this command - only 'python main.py run' "
+                "without --stream writes to the local warehouse"
+            )
+        
+        if cls.CACHE_MODE not in ("off", "on", "offline"):
+            raise ValueError(f"CACHE_MODE must be 'off', 'on' or 'offline', got '{cls.CACHE_MODE}'")
+        
+        if cls.BQ_LOAD_MODE not in ("merge", "append"):
+            raise ValueError(f"BQ_LOAD_MODE must be 'merge' or 'append', got '{cls.BQ_LOAD_MODE}'")
+        
+        if cls.BQ_WRITE_MODE not in ("load", "storage_write"):
+            raise ValueError(f"BQ_WRITE_MODE must be 'load' or 'storage_write', got '{cls.BQ_WRITE_MODE}'")
+        
+        if cls.BQ_WRITE_MODE == "storage_write" and cls.BQ_LOAD_MODE != "append":
+            raise ValueError("BQ_WRITE_MODE=storage_write requires BQ_LOAD_MODE=append")
+        
+        if cls.BQ_WRITE_STREAM_TYPE not in ("committed", "pending"):
+            raise ValueError(f"BQ_WRITE_STREAM_TYPE must be 'committed' or 'pending', got '{cls.BQ_WRITE_STREAM_TYPE}'")
+        
+        if not cls.VS_CURRENCIES:
+            raise ValueError("VS_CURRENCIES must list at least one quote currency")
+        
+        invalid_endpoints = [e for e in cls.FETCH_ENDPOINTS if e not in ("markets", "global", "exchange_rates")]
+        if invalid_endpoints or "markets" not in cls.FETCH_ENDPOINTS:
+            raise ValueError(
+                f"FETCH_ENDPOINTS must include 'markets' and may add 'global' and 'exchange_rates', "
+                f"got '{','.join(cls.FETCH_ENDPOINTS)}'"
+            )
+        
+        if cls.BQ_LOAD_MODE == "merge" and len(cls.VS_CURRENCIES) > 1 and "vs_currency" not in cls.BQ_MERGE_KEYS:
+            raise ValueError("BQ_MERGE_KEYS must include vs_currency when several VS_CURRENCIES are fetched")
+        
+        if cls.BQ_ROLLUPS not in ("off", "on"):
+            raise ValueError(f"BQ_ROLLUPS must be 'off' or 'on', got '{cls.BQ_ROLLUPS}'")
+        
+        if cls.QUERY_CACHE_MODE not in ("off", "on"):
+            raise ValueError(f"QUERY_CACHE_MODE must be 'off' or 'on', got '{cls.QUERY_CACHE_MODE}'")
+        
+        if cls.ANOMALY_ACTION not in ("off", "warn", "fail"):
+            raise ValueError(f"ANOMALY_ACTION must be 'off', 'warn' or 'fail', got '{cls.ANOMALY_ACTION}'")
+        
+        if cls.ANOMALY_METHOD not in ("zscore", "mad"):
+            raise ValueError(f"ANOMALY_METHOD must be 'zscore' or 'mad', got '{cls.ANOMALY_METHOD}'")
+        
+        if cls.COLUMN_PROFILES not in ("off", "on"):
+            raise ValueError(f"COLUMN_PROFILES must be 'off' or 'on', got '{cls.COLUMN_PROFILES}'")
+        
+        if cls.DEDUPE_INDEX not in ("off", "on"):
+            raise ValueError(f"DEDUPE_INDEX must be 'off' or 'on', got '{cls.DEDUPE_INDEX}'")
+        
+        if cls.DEDUPE_INDEX == "on" and cls.BQ_LOAD_MODE != "append":
+            raise ValueError("DEDUPE_INDEX=on requires BQ_LOAD_MODE=append (merge mode already upserts on the keys)")
+        
+        if not 0 < cls.DEDUPE_ERROR_RATE < 1:
+            raise ValueError(f"DEDUPE_ERROR_RATE must be between 0 and 1, got {cls.DEDUPE_ERROR_RATE}")
+        
         if missing_vars:
             raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
         
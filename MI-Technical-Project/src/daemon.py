@@ -0,0 +1,244 @@
+"""
+Polling daemon module for intraday cryptocurrency snapshots.
+Keeps one fetcher session and BigQuery client alive and loads several polls at a time.
+"""
+
+import logging
+import signal
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from columnar_decoder import series_ids
+from data_fetcher import CryptoDataFetcher
+from anomaly_detector import AnomalyDetector
+from column_sketches import SketchStore
+from data_quality import DataQualityChecker
+from dedupe_index import DedupeIndex
+from watermark_store import WatermarkStore
+
+logger = logging.getLogger(__name__)
+
+
+class PollingDaemon:
+    """Polls CoinGecko on an aligned interval and batches several polls into one load."""
+    
+    def __init__(
+        self,
+        fetcher: CryptoDataFetcher,
+        bq_loader,
+        interval: Optional[float] = None,
+        polls_per_load: Optional[int] = None,
+        align_offset: Optional[float] = None,
+        watermarks: Optional[WatermarkStore] = None,
+        anomaly_detector: Optional[AnomalyDetector] = None,
+        sketch_store: Optional[SketchStore] = None,
+        dedupe_index: Optional[DedupeIndex] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        self.fetcher = fetcher
+        self.bq_loader = bq_loader
+        self.interval = interval or Config.DAEMON_INTERVAL_SECONDS
+        self.polls_per_load = max(1, polls_per_load or Config.DAEMON_POLLS_PER_LOAD)
+        self.align_offset = Config.DAEMON_ALIGN_OFFSET_SECONDS if align_offset is None else align_offset
+        self.watermarks = watermarks
+        self.dedupe_index = dedupe_index
+        self.quality_checker = DataQualityChecker(anomaly_detector=anomaly_detector, sketch_store=sketch_store)
+        self.clock = clock
+        self.buffer: List[pd.DataFrame] = []
+        # (series id, last_updated) of buffered rows; watermarks only advance on flush
+        self._buffered_versions: Set[Tuple[str, int]] = set()
+        if watermarks is not None or dedupe_index is not None:
+            # Rows of a failed flush are recorded once a later flush replays them
+            self.bq_loader.on_spool_loaded = self._commit_loaded
+        self.polls = 0
+        self.loads = 0
+        self.rows_loaded = 0
+        self._stop = threading.Event()
+    
+    def run(self, max_polls: Optional[int] = None) -> bool:
+        """
+        Poll until stopped (SIGTERM/SIGINT or stop()), then flush buffered rows.
+        
+        Args:
+            max_polls: Stop after this many polls (None runs until signalled)
+        
+        Returns:
+            True if the final flush succeeded, False otherwise
+        """
+        previous_handlers = self._install_signal_handlers()
+        logger.info(
+            f"Daemon started: polling every {self.interval}s (offset {self.align_offset}s), "
+            f"loading every {self.polls_per_load} polls"
+        )
+        
+        while not self._stop.is_set():
+            delay = self.seconds_until_next_poll()
+            if self._stop.wait(delay):
+                break
+            
+            self.poll()
+            
+            if len(self.buffer) >= self.polls_per_load:
+                self.flush()
+            
+            if max_polls is not None and self.polls >= max_polls:
+                break
+        
+        logger.info("Daemon stopping - flushing buffered rows")
+        flushed = self.flush()
+        self.bq_loader.close()
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+        logger.info(
+            f"Daemon stopped after {self.polls} polls and {self.loads} loads ({self.rows_loaded} rows); "
+            f"API transport stats: {self.fetcher.transport_stats()}"
+        )
+        return flushed
+    
+    def stop(self):
+        """Ask the polling loop to stop after the current poll."""
+        self._stop.set()
+    
+    def seconds_until_next_poll(self) -> float:
+        """
+        Seconds until the next interval boundary plus the alignment offset.
+        
+        Polls land at fixed wall-clock times (e.g. :00:15, :05:15 for a 300s
+        interval and 15s offset), just after the API refreshes its data.
+        
+        Returns:
+            Seconds to wait before the next poll
+        """
+        now = self.clock()
+        next_tick = (int((now - self.align_offset) // self.interval) + 1) * self.interval + self.align_offset
+        return max(0.0, next_tick - now)
+    
+    def poll(self) -> bool:
+        """
+        Fetch and validate one snapshot and add it to the buffer.
+        
+        Returns:
+            True if the snapshot was buffered, False if it was skipped
+        """
+        self.polls += 1
+        snapshot = self.fetcher.fetch_transformed_market_data(Config.CRYPTO_IDS)
+        
+        if snapshot is None or snapshot.empty:
+            logger.error(f"Poll {self.polls}: fetch failed or returned no rows - skipping")
+            return False
+        
+        if self.watermarks is not None:
+            pending = self.bq_loader.pending_rows() if self.bq_loader.stager.pending() else None
+            snapshot, skipped = self.watermarks.filter_changed(snapshot, pending)
+            snapshot, buffered = self._drop_buffered_versions(snapshot)
+            skipped += buffered
+            if snapshot.empty:
+                logger.info(f"Poll {self.polls}: no coins changed ({skipped} rows skipped)")
+                return False
+        
+        if not self.quality_checker.run_batch_checks(snapshot):
+            logger.error(f"Poll {self.polls}: data quality checks failed - skipping snapshot")
+            return False
+        
+        self.buffer.append(snapshot)
+        if self.watermarks is not None:
+            self._buffered_versions.update(self._versions(snapshot))
+        logger.info(f"Poll {self.polls}: buffered {len(snapshot)} rows ({len(self.buffer)}/{self.polls_per_load} polls)")
+        return True
+    
+    def flush(self) -> bool:
+        """
+        Load every buffered snapshot in one write.
+        
+        Files left in the load spool by an earlier failed flush are replayed
+        first, advancing the watermarks and dedupe index once they load. A
+        failed write keeps its staged file in the spool, so the buffer is
+        cleared either way and the rows are retried on the next flush; polls
+        skip the versions waiting there. With
+        a dedupe index, rows already in the warehouse are dropped first.
+        
+        Returns:
+            True if the buffer (and any pending spool files) were loaded, False otherwise
+        """
+        replayed = True
+        if self.bq_loader.stager.pending():
+            replayed = self.bq_loader.replay_spool()
+        
+        if not self.buffer:
+            return replayed
+        
+        batch = pd.concat(self.buffer, ignore_index=True)
+        self.buffer = []
+        self._buffered_versions = set()
+        
+        if self.dedupe_index is not None:
+            batch, _ = self.dedupe_index.filter_new(batch)
+            if batch.empty:
+                logger.info("Every buffered row is already in the warehouse - nothing to load")
+                return replayed
+        
+        if not self.bq_loader.write_batch(batch):
+            logger.error(f"Failed to load {len(batch)} buffered rows - kept in the load spool for the next flush")
+            return False
+        
+        self._commit_loaded(batch)
+        self.quality_checker.update_anomaly_baselines(batch)
+        self.quality_checker.record_column_profile()
+        
+        self.loads += 1
+        self.rows_loaded += len(batch)
+        logger.info(f"✓ Loaded {len(batch)} rows at {datetime.utcnow().isoformat()} (load {self.loads})")
+        return replayed
+    
+    def _commit_loaded(self, batch: pd.DataFrame):
+        """Advance the watermarks and dedupe index to loaded rows."""
+        if self.watermarks is not None:
+            self.watermarks.commit(batch)
+        if self.dedupe_index is not None:
+            self.dedupe_index.commit(batch)
+    
+    @staticmethod
+    def _versions(df: pd.DataFrame) -> List[Tuple[str, int]]:
+        """(series id, last_updated in ns) of each row; rows without last_updated get None."""
+        nanos = pd.to_datetime(df['last_updated'], utc=True).astype('datetime64[ns, UTC]').array.asi8
+        nat = np.iinfo(np.int64).min
+        return [(series, None if ns == nat else int(ns)) for series, ns in zip(series_ids(df), nanos)]
+    
+    def _drop_buffered_versions(self, snapshot: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+        """
+        Drop rows whose series and last_updated are already buffered.
+        
+        The watermarks still hold the last flushed versions, so without this an
+        unchanged coin would be buffered once per poll until the next flush.
+        Rows without last_updated cannot be compared and are kept.
+        """
+        if snapshot.empty or not self._buffered_versions:
+            return snapshot, 0
+        
+        keep = np.array([
+            version[1] is None or version not in self._buffered_versions
+            for version in self._versions(snapshot)
+        ])
+        if keep.all():
+            return snapshot, 0
+        return snapshot[keep], int((~keep).sum())
+    
+    def _install_signal_handlers(self) -> Dict[int, object]:
+        """Stop cleanly on SIGTERM and SIGINT when running in the main thread, returning the old handlers."""
+        if threading.current_thread() is not threading.main_thread():
+            return {}
+        return {
+            signum: signal.signal(signum, self._handle_signal)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+    
+    def _handle_signal(self, signum, frame):
+        """Signal handler requesting a clean shutdown."""
+        logger.info(f"Received signal {signum} - shutting down after flushing buffered rows")
+        self.stop()
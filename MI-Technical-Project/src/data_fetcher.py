@@ -3,13 +3,24 @@ Data fetcher module for cryptocurrency price data.
 Handles API requests to CoinGecko and data transformation.
 """
 
+import json
 import requests
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
 import logging
-from typing import Dict, List, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from config import Config
+from columnar_decoder import (
+    DEFAULT_VS_CURRENCY, MarketColumnBuilder, compact_frame, exchange_rates_frame, global_metrics_frame,
+    iter_json_array
+)
+from http_client import HttpClient, TIER_REQUESTS_PER_MINUTE
+from metrics import instrumented
+from response_cache import OfflineCacheMiss, ResponseCache, parse_endpoint_ttls
 
 logger = logging.getLogger(__name__)
 
@@ -17,43 +28,64 @@ logger = logging.getLogger(__name__)
 class CryptoDataFetcher:
     """Fetches cryptocurrency data from CoinGecko API."""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[ResponseCache] = None):
         self.base_url = Config.COINGECKO_API_URL
         self.api_key = Config.COINGECKO_API_KEY
+        self.page_size = Config.COINGECKO_PAGE_SIZE
+        self.max_workers = Config.FETCH_MAX_WORKERS
+        self.tier = Config.COINGECKO_API_TIER.lower()
         
+        # Add API key header if available
+        headers = {}
+        if self.api_key:
+            key_header = "x-cg-pro-api-key" if self.tier in ("analyst", "pro") else "x-cg-demo-api-key"
+            headers[key_header] = self.api_key
+        
+        requests_per_minute = (
+            Config.COINGECKO_REQUESTS_PER_MINUTE
+            or TIER_REQUESTS_PER_MINUTE.get(self.tier, TIER_REQUESTS_PER_MINUTE["public"])
+        )
+        
+        # One pooled session and rate budget shared by every request this fetcher makes
+        self.http = HttpClient(
+            requests_per_minute=requests_per_minute,
+            burst=Config.COINGECKO_BURST,
+            max_retries=Config.COINGECKO_MAX_RETRIES,
+            pool_size=max(self.max_workers, 1),
+            headers=headers
+        )
+        
+        # Opt-in response cache sitting under every API call
+        self.cache = cache
+        if self.cache is None and Config.CACHE_MODE in ("on", "offline"):
+            self.cache = ResponseCache(
+                Config.STATE_DIR / "response_cache.sqlite",
+                default_ttl=Config.CACHE_TTL_SECONDS,
+                endpoint_ttls=parse_endpoint_ttls(Config.CACHE_ENDPOINT_TTLS),
+                max_bytes=Config.CACHE_MAX_MB * 1024 * 1024,
+                offline=Config.CACHE_MODE == "offline"
+            )
+        
+    @instrumented()
     def fetch_market_data(self, crypto_ids: List[str]) -> Optional[pd.DataFrame]:
         """
         Fetch market data for specified cryptocurrencies.
         
+        Lists longer than one API page are delegated to
+        fetch_market_data_paginated so no coins are dropped.
+        
         Args:
             crypto_ids: List of cryptocurrency IDs (e.g., ['bitcoin', 'ethereum'])
             
         Returns:
             DataFrame with cryptocurrency market data or None if request fails
         """
-        endpoint = f"{self.base_url}/coins/markets"
-        
-        params = {
-            "vs_currency": "usd",
-            "ids": ",".join(crypto_ids),
-            "order": "market_cap_desc",
-            "per_page": 250,
-            "page": 1,
-            "sparkline": False,
-            "price_change_percentage": "24h,7d"
-        }
-        
-        # Add API key header if available
-        headers = {}
-        if self.api_key:
-            headers["x-cg-demo-api-key"] = self.api_key
+        if len(crypto_ids) > self.page_size:
+            return self.fetch_market_data_paginated(crypto_ids)
         
         try:
             logger.info(f"Fetching data for cryptocurrencies: {', '.join(crypto_ids)}")
-            response = requests.get(endpoint, params=params, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = self._fetch_page(crypto_ids)
             
             if not data:
                 logger.warning("API returned empty response")
@@ -75,10 +107,420 @@ class CryptoDataFetcher:
             logger.error(f"Unexpected error during data fetch: {str(e)}")
             return None
     
+    @instrumented()
+    def fetch_market_data_paginated(
+        self,
+        crypto_ids: List[str],
+        chunk_size: Optional[int] = None,
+        max_workers: Optional[int] = None
+    ) -> Optional[pd.DataFrame]:
+        """
+        Fetch market data for a large id list using concurrent page requests.
+        
+        The id list is split into chunks of at most one API page, the chunks are
+        fetched from a bounded thread pool that shares the requests-per-minute
+        budget, and the pages are merged in their original order.
+        
+        Args:
+            crypto_ids: List of cryptocurrency IDs
+            chunk_size: Ids per request (defaults to and capped at COINGECKO_PAGE_SIZE,
+                the per_page of every request)
+            max_workers: Concurrent requests (defaults to FETCH_MAX_WORKERS)
+        
+        Returns:
+            DataFrame with market data for all chunks, or None if any page fails
+        """
+        chunks = self._chunk_ids(crypto_ids, min(chunk_size or self.page_size, self.page_size))
+        if not chunks:
+            logger.warning("No cryptocurrency IDs supplied")
+            return None
+        
+        extraction_timestamp = datetime.utcnow()
+        logger.info(f"Fetching {len(crypto_ids)} cryptocurrencies in {len(chunks)} pages")
+        
+        pages = self._fetch_pages(self._fetch_page, chunks, max_workers)
+        if pages is None:
+            return None
+        
+        frames = [pd.DataFrame(page) for page in pages if page]
+        if not frames:
+            logger.warning("API returned empty response")
+            return None
+        
+        df = pd.concat(frames, ignore_index=True)
+        df['extraction_timestamp'] = extraction_timestamp
+        
+        logger.info(f"Successfully fetched {len(df)} records from {len(chunks)} pages")
+        return df
+    
+    @instrumented()
+    def fetch_transformed_market_data(
+        self,
+        crypto_ids: List[str],
+        chunk_size: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        vs_currencies: Optional[List[str]] = None
+    ) -> Optional[pd.DataFrame]:
+        """
+        Fetch market data straight into the transformed schema.
+        
+        Each page body is decoded incrementally and only the fields mapped by
+        transform_data are written into typed column buffers, so no list of
+        record dicts or intermediate raw DataFrame is built. Every quote
+        currency is requested for every id chunk from the same thread pool,
+        and the result is in long format with one row per coin and currency.
+        
+        Args:
+            crypto_ids: List of cryptocurrency IDs
+            chunk_size: Ids per request (defaults to and capped at COINGECKO_PAGE_SIZE,
+                the per_page of every request)
+            max_workers: Concurrent requests (defaults to FETCH_MAX_WORKERS)
+            vs_currencies: Quote currencies (defaults to VS_CURRENCIES)
+        
+        Returns:
+            Transformed DataFrame, or None if any page fails or no data is returned
+        """
+        frames = self.fetch_market_matrix(
+            crypto_ids, vs_currencies=vs_currencies, endpoints=['markets'],
+            chunk_size=chunk_size, max_workers=max_workers
+        )
+        return frames['markets'] if frames is not None else None
+    
+    @instrumented()
+    def fetch_market_matrix(
+        self,
+        crypto_ids: List[str],
+        vs_currencies: Optional[List[str]] = None,
+        endpoints: Optional[List[str]] = None,
+        chunk_size: Optional[int] = None,
+        max_workers: Optional[int] = None
+    ) -> Optional[Dict[str, pd.DataFrame]]:
+        """
+        Fetch every quote currency and endpoint of a run in one pass.
+        
+        Market pages for each (id chunk, currency) pair and the single
+        /global and /exchange_rates requests are all submitted to one thread
+        pool, sharing this fetcher's session and rate budget, so a run costs
+        the slowest request rather than the sum of one pass per currency.
+        
+        Args:
+            crypto_ids: List of cryptocurrency IDs
+            vs_currencies: Quote currencies (defaults to VS_CURRENCIES)
+            endpoints: Any of 'markets', 'global' and 'exchange_rates'
+                (defaults to FETCH_ENDPOINTS)
+            chunk_size: Ids per request (defaults to and capped at COINGECKO_PAGE_SIZE,
+                the per_page of every request)
+            max_workers: Concurrent requests (defaults to FETCH_MAX_WORKERS)
+        
+        Returns:
+            Dictionary of transformed DataFrames keyed by endpoint: 'markets'
+            in long format with a vs_currency column, 'global' with one row
+            per currency, 'exchange_rates' with one row per rate. None if any
+            request fails or no market data is returned.
+        """
+        currencies = vs_currencies or Config.VS_CURRENCIES
+        endpoints = endpoints or Config.FETCH_ENDPOINTS
+        chunks = self._chunk_ids(crypto_ids, min(chunk_size or self.page_size, self.page_size))
+        if 'markets' in endpoints and not chunks:
+            logger.warning("No cryptocurrency IDs supplied")
+            return None
+        
+        tasks = self._market_tasks(chunks, currencies) if 'markets' in endpoints else []
+        num_pages = len(tasks)
+        if 'global' in endpoints:
+            tasks.append((self._get_json, ("/global", {})))
+        if 'exchange_rates' in endpoints:
+            tasks.append((self._get_json, ("/exchange_rates", {})))
+        
+        extraction_timestamp = datetime.utcnow()
+        logger.info(
+            f"Fetching {len(crypto_ids)} cryptocurrencies in {', '.join(currencies)} "
+            f"({num_pages} pages, endpoints: {', '.join(endpoints)}) (columnar decode)"
+        )
+        
+        results = self._fetch_pages(lambda task: task[0](*task[1]), tasks, max_workers)
+        if results is None:
+            return None
+        
+        frames = {}
+        rest = iter(results[num_pages:])
+        if 'markets' in endpoints:
+            builders = [builder for builder in results[:num_pages] if builder.size]
+            if not builders:
+                logger.warning("API returned empty response")
+                return None
+            frames['markets'] = MarketColumnBuilder.concat(builders, extraction_timestamp)
+            logger.info(f"Successfully fetched and decoded {len(frames['markets'])} records from {num_pages} pages")
+        if 'global' in endpoints:
+            frames['global'] = global_metrics_frame(next(rest), currencies, extraction_timestamp)
+        if 'exchange_rates' in endpoints:
+            frames['exchange_rates'] = exchange_rates_frame(next(rest), extraction_timestamp)
+        
+        return frames
+    
+    @instrumented()
+    def iter_transformed_batches(
+        self,
+        crypto_ids: List[str],
+        batch_size: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        vs_currencies: Optional[List[str]] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Stream transformed market data as bounded record batches.
+        
+        Pages are only requested as the consumer pulls batches, with at most
+        max_in_flight pages outstanding, so a slow downstream stage holds back
+        fetching instead of letting decoded pages pile up in memory.
+        
+        Args:
+            crypto_ids: List of cryptocurrency IDs
+            batch_size: Maximum rows per batch (defaults to PIPELINE_BATCH_SIZE)
+            max_in_flight: Pages fetched ahead of the consumer (defaults to FETCH_MAX_WORKERS)
+            vs_currencies: Quote currencies (defaults to VS_CURRENCIES)
+        
+        Yields:
+            Transformed DataFrames in id order, one currency after another
+        
+        Raises:
+            RuntimeError: If a page cannot be fetched or decoded
+        """
+        batch_size = batch_size or Config.PIPELINE_BATCH_SIZE
+        tasks = iter(self._market_tasks(
+            self._chunk_ids(crypto_ids, min(batch_size, self.page_size)),
+            vs_currencies or Config.VS_CURRENCIES
+        ))
+        in_flight_limit = max(1, max_in_flight or self.max_workers)
+        extraction_timestamp = datetime.utcnow()
+        
+        pending = deque()
+        builders: List[MarketColumnBuilder] = []
+        buffered_rows = 0
+        
+        with ThreadPoolExecutor(max_workers=in_flight_limit) as executor:
+            for page_fn, page_args in islice(tasks, in_flight_limit):
+                pending.append(executor.submit(page_fn, *page_args))
+            
+            while pending:
+                try:
+                    builder = pending.popleft().result()
+                except Exception as e:
+                    logger.error(f"Error fetching page from CoinGecko: {str(e)}")
+                    raise RuntimeError("Market data page fetch failed - stopping stream") from e
+                
+                task = next(tasks, None)
+                if task is not None:
+                    pending.append(executor.submit(task[0], *task[1]))
+                
+                if builder.size:
+                    builders.append(builder)
+                    buffered_rows += builder.size
+                
+                if buffered_rows >= batch_size:
+                    yield MarketColumnBuilder.concat(builders, extraction_timestamp)
+                    builders = []
+                    buffered_rows = 0
+        
+        if builders:
+            yield MarketColumnBuilder.concat(builders, extraction_timestamp)
+    
+    @instrumented()
+    def fetch_market_chart_range(self, crypto_id: str, start: datetime, end: datetime) -> Dict[str, List]:
+        """
+        Fetch the historical price, market cap and volume series for one coin.
+        
+        Args:
+            crypto_id: Cryptocurrency ID
+            start: Range start (UTC)
+            end: Range end (UTC)
+        
+        Returns:
+            Dictionary with 'prices', 'market_caps' and 'total_volumes' lists of
+            [timestamp_ms, value] pairs
+        
+        Raises:
+            requests.exceptions.RequestException: If the request fails after retries
+        """
+        params = {
+            "vs_currency": DEFAULT_VS_CURRENCY,
+            "from": int(start.replace(tzinfo=timezone.utc).timestamp()),
+            "to": int(end.replace(tzinfo=timezone.utc).timestamp()),
+        }
+        return self._get_json(f"/coins/{crypto_id}/market_chart/range", params)
+    
+    def _market_tasks(self, chunks: List[List[str]], vs_currencies: List[str]) -> List[Tuple[Callable, Tuple]]:
+        """Pair every id chunk with every quote currency as (function, args) page tasks."""
+        return [
+            (self._fetch_page_columnar, (chunk, currency))
+            for currency in vs_currencies
+            for chunk in chunks
+        ]
+    
+    def _fetch_pages(self, page_fn: Callable, chunks: List, max_workers: Optional[int]) -> Optional[List]:
+        """
+        Run page_fn over every id chunk on a bounded thread pool.
+        
+        Args:
+            page_fn: Function fetching one chunk
+            chunks: Id chunks, one per request
+            max_workers: Concurrent requests (defaults to FETCH_MAX_WORKERS)
+        
+        Returns:
+            Results in chunk order, or None if any page fails
+        """
+        workers = max(1, min(max_workers or self.max_workers, len(chunks)))
+        pages: List = [None] * len(chunks)
+        failed_pages = 0
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(page_fn, chunk): index
+                for index, chunk in enumerate(chunks)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    pages[index] = future.result()
+                except Exception as e:
+                    logger.error(f"Error fetching page {index + 1}/{len(chunks)} from CoinGecko: {str(e)}")
+                    failed_pages += 1
+        
+        if failed_pages:
+            logger.error(f"{failed_pages} of {len(chunks)} pages failed - discarding partial result")
+            return None
+        
+        return pages
+    
+    def _fetch_page(self, crypto_ids: List[str]) -> List[Dict]:
+        """
+        Request a single /coins/markets page for the given ids.
+        
+        Args:
+            crypto_ids: Ids to request (at most one page worth)
+        
+        Returns:
+            Decoded JSON list of market records
+        """
+        return self._get_json("/coins/markets", self._markets_params(crypto_ids))
+        
+    def _fetch_page_columnar(self, crypto_ids: List[str], vs_currency: str = DEFAULT_VS_CURRENCY) -> MarketColumnBuilder:
+        """
+        Stream a single /coins/markets page into a column builder.
+        
+        Args:
+            crypto_ids: Ids to request (at most one page worth)
+            vs_currency: Quote currency of the page
+        
+        Returns:
+            Builder holding the decoded page
+        """
+        builder = MarketColumnBuilder(capacity=len(crypto_ids), vs_currency=vs_currency)
+        params = self._markets_params(crypto_ids, vs_currency)
+        builder.extend(iter_json_array(self._get_chunks("/coins/markets", params)))
+        return builder
+    
+    def _get_json(self, endpoint: str, params: Dict):
+        """
+        GET an API endpoint and decode its JSON body, going through the cache if enabled.
+        
+        Args:
+            endpoint: API path relative to the base URL
+            params: Query string parameters
+        
+        Returns:
+            Decoded JSON response
+        """
+        if self.cache is None:
+            return self.http.get(f"{self.base_url}{endpoint}", params=params).json()
+        return json.loads(b"".join(self._get_chunks(endpoint, params)))
+    
+    def _get_chunks(self, endpoint: str, params: Dict) -> Iterator[bytes]:
+        """
+        Stream an API response body, serving it from the cache when fresh.
+        
+        On a miss the streamed chunks are teed into the cache once the body has
+        been read completely.
+        
+        Args:
+            endpoint: API path relative to the base URL
+            params: Query string parameters
+        
+        Yields:
+            Response body chunks
+        
+        Raises:
+            OfflineCacheMiss: If the cache is offline and has no entry
+        """
+        if self.cache is not None:
+            body = self.cache.get(endpoint, params)
+            if body is not None:
+                yield body
+                return
+            if self.cache.offline:
+                raise OfflineCacheMiss(f"No cached response for {endpoint} in offline mode")
+        
+        response = self.http.get(f"{self.base_url}{endpoint}", params=params, stream=True)
+        parts: Optional[List[bytes]] = [] if self.cache is not None else None
+        
+        try:
+            for chunk in self._count_bytes(response.iter_content(chunk_size=64 * 1024)):
+                if parts is not None:
+                    parts.append(chunk)
+                yield chunk
+            
+            if parts is not None:
+                self.cache.put(endpoint, params, b"".join(parts))
+        finally:
+            response.close()
+    
+    def _markets_params(self, crypto_ids: List[str], vs_currency: str = DEFAULT_VS_CURRENCY) -> Dict:
+        """Build /coins/markets query parameters for one page of ids."""
+        return {
+            "vs_currency": vs_currency,
+            "ids": ",".join(crypto_ids),
+            "order": "market_cap_desc",
+            "per_page": self.page_size,
+            "page": 1,
+            "sparkline": False,
+            "price_change_percentage": "24h,7d"
+        }
+        
+    def _count_bytes(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Pass body chunks through while adding their size to the transport stats."""
+        for chunk in chunks:
+            self.http.stats.record_bytes(len(chunk))
+            yield chunk
+    
+    def transport_stats(self) -> Dict:
+        """
+        Get request latency, retry and byte counters for this fetcher's session.
+        
+        Returns:
+            Dictionary of transport statistics
+        """
+        stats = self.http.stats.summary()
+        if self.cache is not None:
+            stats['cache'] = self.cache.stats()
+        return stats
+    
+    def transfer_counters(self) -> Dict[str, int]:
+        """Cumulative response bytes and request retries, for run metrics."""
+        return {'bytes': self.http.stats.bytes_received, 'retries': self.http.stats.retries}
+    
+    @staticmethod
+    def _chunk_ids(crypto_ids: List[str], chunk_size: int) -> List[List[str]]:
+        """Split an id list into consecutive chunks of at most chunk_size ids."""
+        ids = [crypto_id.strip() for crypto_id in crypto_ids if crypto_id.strip()]
+        return [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+    
+    @instrumented()
     def transform_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Transform raw API data to match BigQuery schema.
         
+        The result uses the compact dtypes of columnar_decoder.compact_frame,
+        the same as the columnar fetch path.
+        
         Args:
             df: Raw DataFrame from API
             
@@ -93,6 +535,7 @@ class CryptoDataFetcher:
             'crypto_id': df['id'],
             'symbol': df['symbol'].str.upper(),
             'name': df['name'],
+            'vs_currency': df['vs_currency'] if 'vs_currency' in df.columns else DEFAULT_VS_CURRENCY,
             'current_price': df['current_price'],
             'market_cap': df['market_cap'],
             'market_cap_rank': df['market_cap_rank'],
@@ -112,6 +555,7 @@ class CryptoDataFetcher:
             'last_updated': pd.to_datetime(df['last_updated']),
             'extraction_timestamp': df['extraction_timestamp']
         })
+        compact_frame(transformed_df)
         
         logger.info(f"Transformed {len(transformed_df)} records")
         return transformed_df
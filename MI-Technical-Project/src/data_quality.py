@@ -3,22 +3,137 @@ Data Quality module for validation and quality checks.
 Ensures data integrity before loading to BigQuery.
 """
 
+import numpy as np
 import pandas as pd
 import logging
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
+from anomaly_detector import MAX_REPORTED_ANOMALIES, AnomalyDetector
+from column_sketches import ColumnSketch, SketchStore, merge_profiles, profile_frame, summarize_profile
 from config import Config
+from metrics import instrumented
+from quality_rules import CRYPTO_PRICES_RULES, REFERENCE_RULES, RuleEngine
 
 logger = logging.getLogger(__name__)
 
 
+class QualityReportAggregator:
+    """Combines per-batch quality reports into one run-level report."""
+    
+    def __init__(self, min_records: int, max_null_pct: float):
+        self.min_records = min_records
+        self.max_null_pct = max_null_pct
+        self.batch_count = 0
+        self.failed_batches = 0
+        self.record_count = 0
+        self.null_counts: Dict[str, int] = {}
+        self.failed_checks = set()
+        self.anomaly_report: Optional[Dict] = None
+    
+    def add(self, report: Dict, batch_passed: bool = True):
+        """
+        Fold one batch report into the running totals.
+        
+        Args:
+            report: Report produced by RuleEngine.evaluate for a single batch
+            batch_passed: Whether the batch cleared its quality gate
+        """
+        self.batch_count += 1
+        if not batch_passed:
+            self.failed_batches += 1
+        self.record_count += report.get('record_count', 0)
+        
+        for col, stats in report.get('null_values', {}).items():
+            self.null_counts[col] = self.null_counts.get(col, 0) + stats['null_count']
+        
+        for check in ('datatype_check', 'range_check'):
+            if report.get(check) == 'FAILED':
+                self.failed_checks.add(check)
+        
+        anomalies = report.get('anomaly_check')
+        if anomalies is not None:
+            self._add_anomalies(anomalies)
+    
+    def _add_anomalies(self, anomalies: Dict):
+        """Sum one batch's anomaly report into the run-level anomaly report."""
+        if self.anomaly_report is None:
+            self.anomaly_report = {**anomalies, 'anomalies': list(anomalies['anomalies'])}
+            return
+        
+        combined = self.anomaly_report
+        combined['scored_rows'] += anomalies['scored_rows']
+        combined['anomaly_count'] += anomalies['anomaly_count']
+        combined['anomalies'].extend(anomalies['anomalies'][:max(0, MAX_REPORTED_ANOMALIES - len(combined['anomalies']))])
+        if anomalies['status'] == 'FAILED' or combined['status'] == 'PASSED':
+            combined['status'] = anomalies['status']
+    
+    def finalize(self) -> Tuple[bool, Dict]:
+        """
+        Build the run-level report from the accumulated totals.
+        
+        Null percentages and the minimum records check are recomputed from the
+        totals, so the report matches run_all_checks on the concatenated batches.
+        
+        Returns:
+            Tuple of (validation_passed, quality_report)
+        """
+        report: Dict = {}
+        
+        if self.record_count == 0:
+            report['empty_check'] = 'FAILED'
+            report['overall_status'] = 'FAILED'
+            return False, report
+        
+        report['empty_check'] = 'PASSED'
+        report['record_count'] = self.record_count
+        report['min_records_check'] = 'PASSED' if self.record_count >= self.min_records else 'FAILED'
+        
+        null_report = {}
+        null_failed = False
+        for col, null_count in self.null_counts.items():
+            null_pct = (null_count / self.record_count) * 100
+            null_report[col] = {
+                'null_count': null_count,
+                'null_percentage': round(null_pct, 2)
+            }
+            null_failed = null_failed or null_pct > self.max_null_pct
+        
+        report['null_values'] = null_report
+        report['null_check'] = 'FAILED' if null_failed else 'PASSED'
+        report['datatype_check'] = 'FAILED' if 'datatype_check' in self.failed_checks else 'PASSED'
+        report['range_check'] = 'FAILED' if 'range_check' in self.failed_checks else 'PASSED'
+        if self.anomaly_report is not None:
+            report['anomaly_check'] = self.anomaly_report
+        
+        all_passed = all(
+            report[check] == 'PASSED'
+            for check in ('min_records_check', 'null_check', 'datatype_check', 'range_check')
+        )
+        all_passed = all_passed and report.get('anomaly_check', {}).get('status') != 'FAILED'
+        report['overall_status'] = 'PASSED' if all_passed else 'FAILED'
+        
+        return all_passed, report
+
+
 class DataQualityChecker:
     """Performs data quality checks on cryptocurrency data."""
     
-    def __init__(self):
+    def __init__(
+        self,
+        anomaly_detector: Optional[AnomalyDetector] = None,
+        sketch_store: Optional[SketchStore] = None
+    ):
         self.min_records = Config.MIN_RECORDS_THRESHOLD
         self.max_null_pct = Config.MAX_NULL_PERCENTAGE
         self.quality_report = {}
+        self.violation_masks: Dict[str, np.ndarray] = {}
+        self.rule_engine = RuleEngine(CRYPTO_PRICES_RULES, self.min_records, self.max_null_pct)
+        self.batch_aggregator = QualityReportAggregator(self.min_records, self.max_null_pct)
+        self.anomaly_detector = anomaly_detector
+        
+        # Column sketches of the rows validated since the profile was last recorded
+        self.sketch_store = sketch_store
+        self.column_profile: Dict[str, ColumnSketch] = {}
         
     def check_empty_response(self, df: pd.DataFrame) -> bool:
         """
@@ -77,7 +192,7 @@ class DataQualityChecker:
         
         for col in critical_columns:
             if col in df.columns:
-                null_count = df[col].isnull().sum()
+                null_count = int(df[col].isnull().sum())
                 null_pct = (null_count / len(df)) * 100
                 null_report[col] = {
                     'null_count': null_count,
@@ -108,11 +223,9 @@ class DataQualityChecker:
         Returns:
             True if validation passes, False otherwise
         """
-        type_checks = {
-            'current_price': ['float64', 'float32', 'int64'],
-            'market_cap': ['float64', 'float32', 'int64'],
-            'total_volume': ['float64', 'float32', 'int64'],
-        }
+        # Compact dtypes from the fetcher (category ids, Int64 counts, UTC
+        # timestamps) and their plain pandas equivalents are both accepted
+        type_checks = CRYPTO_PRICES_RULES['types']
         
         has_failures = False
         
@@ -144,16 +257,16 @@ class DataQualityChecker:
         
         # Price should be positive
         if 'current_price' in df.columns:
-            negative_prices = df[df['current_price'] < 0]
-            if len(negative_prices) > 0:
-                logger.error(f"Data Quality FAILED: Found {len(negative_prices)} records with negative prices")
+            negative_prices = int((df['current_price'] < 0).sum())
+            if negative_prices > 0:
+                logger.error(f"Data Quality FAILED: Found {negative_prices} records with negative prices")
                 has_failures = True
         
         # Market cap should be positive
         if 'market_cap' in df.columns:
-            negative_mcap = df[df['market_cap'] < 0]
-            if len(negative_mcap) > 0:
-                logger.error(f"Data Quality FAILED: Found {len(negative_mcap)} records with negative market cap")
+            negative_mcap = int((df['market_cap'] < 0).sum())
+            if negative_mcap > 0:
+                logger.error(f"Data Quality FAILED: Found {negative_mcap} records with negative market cap")
                 has_failures = True
         
         if has_failures:
@@ -164,10 +277,15 @@ class DataQualityChecker:
         self.quality_report['range_check'] = 'PASSED'
         return True
     
+    @instrumented()
     def run_all_checks(self, df: pd.DataFrame) -> Tuple[bool, Dict]:
         """
         Run all data quality checks.
         
+        The empty, minimum records, null, type and range rules are evaluated
+        together by the compiled RuleEngine in a single pass over the column
+        arrays. Per-row violation masks are kept in self.violation_masks.
+        
         Args:
             df: DataFrame to validate
             
@@ -178,17 +296,19 @@ class DataQualityChecker:
         logger.info("STARTING DATA QUALITY CHECKS")
         logger.info("=" * 60)
         
-        critical_columns = ['crypto_id', 'symbol', 'name', 'current_price']
+        all_passed, report, masks = self.rule_engine.evaluate(df)
+        
+        if self.anomaly_detector is not None and df is not None and not df.empty:
+            anomaly_passed, report['anomaly_check'], masks['anomaly'] = self.anomaly_detector.score(df)
+            all_passed = all_passed and anomaly_passed
+            report['overall_status'] = 'PASSED' if all_passed else 'FAILED'
         
-        checks = [
-            self.check_empty_response(df),
-            self.check_minimum_records(df) if df is not None and not df.empty else False,
-            self.check_null_values(df, critical_columns) if df is not None and not df.empty else False,
-            self.check_data_types(df) if df is not None and not df.empty else False,
-            self.check_value_ranges(df) if df is not None and not df.empty else False,
-        ]
+        if self.sketch_store is not None and df is not None and not df.empty:
+            self.column_profile = profile_frame(df)
+            report['column_profile'] = summarize_profile(self.column_profile)
         
-        all_passed = all(checks)
+        self.quality_report.update(report)
+        self.violation_masks = masks
         
         logger.info("=" * 60)
         if all_passed:
@@ -197,6 +317,112 @@ class DataQualityChecker:
             logger.error("DATA QUALITY: SOME CHECKS FAILED ✗")
         logger.info("=" * 60)
         
-        self.quality_report['overall_status'] = 'PASSED' if all_passed else 'FAILED'
+        return all_passed, self.quality_report
+
+    @instrumented()
+    def check_reference_data(self, frames: Dict[str, pd.DataFrame]) -> Tuple[bool, Dict]:
+        """
+        Validate the reference frames fetched alongside market data.
+        
+        Each frame is checked against its own table's rules (see
+        quality_rules.REFERENCE_RULES); anomaly scoring does not apply.
+        
+        Args:
+            frames: DataFrames keyed by fetch endpoint ('global', 'exchange_rates')
+        
+        Returns:
+            Tuple of (validation_passed, report keyed by endpoint)
+        """
+        all_passed = True
+        report = {}
+        
+        for endpoint, df in frames.items():
+            logger.info(f"Checking {endpoint} reference data")
+            passed, report[endpoint], _ = RuleEngine(REFERENCE_RULES[endpoint], 1, self.max_null_pct).evaluate(df)
+            all_passed = all_passed and passed
+        
+        return all_passed, report
+    
+    @instrumented()
+    def run_batch_checks(self, df: pd.DataFrame) -> bool:
+        """
+        Validate one streaming batch and fold it into the run-level report.
+        
+        The minimum records threshold applies to the whole run, so it is not
+        part of the per-batch gate; it is checked by aggregate_batch_reports.
+        
+        Args:
+            df: Batch DataFrame to validate
+        
+        Returns:
+            True if the batch can be loaded, False otherwise
+        """
+        _, report, masks = self.rule_engine.evaluate(df)
+        
+        anomaly_passed = True
+        if self.anomaly_detector is not None and df is not None and not df.empty:
+            anomaly_passed, report['anomaly_check'], masks['anomaly'] = self.anomaly_detector.score(df)
+        self.violation_masks = masks
+        
+        batch_passed = anomaly_passed and all(
+            report.get(check) == 'PASSED'
+            for check in ('empty_check', 'null_check', 'datatype_check', 'range_check')
+        )
+        self.batch_aggregator.add(report, batch_passed)
+        
+        if batch_passed and self.sketch_store is not None and df is not None and not df.empty:
+            self.column_profile = merge_profiles([self.column_profile, profile_frame(df)])
+        
+        return batch_passed
+    
+    @instrumented()
+    def aggregate_batch_reports(self) -> Tuple[bool, Dict]:
+        """
+        Produce the run-level report for all batches checked so far.
+        
+        Returns:
+            Tuple of (validation_passed, quality_report)
+        """
+        all_passed, report = self.batch_aggregator.finalize()
+        all_passed = all_passed and self.batch_aggregator.failed_batches == 0
         
+        self.quality_report = report
+        if not all_passed:
+            self.quality_report['overall_status'] = 'FAILED'
+        if self.column_profile:
+            self.quality_report['column_profile'] = summarize_profile(self.column_profile)
+        
+        logger.info(f"Aggregated quality results from {self.batch_aggregator.batch_count} batches")
         return all_passed, self.quality_report
+
+    def update_anomaly_baselines(self, df: pd.DataFrame):
+        """
+        Fold loaded rows into the anomaly baselines and persist them.
+        
+        Call this only after the rows were loaded, so values rejected by a
+        failing check never shift the baselines.
+        
+        Args:
+            df: Rows that were loaded
+        """
+        if self.anomaly_detector is None:
+            return
+        
+        self.anomaly_detector.update(df)
+        self.anomaly_detector.save()
+
+    def record_column_profile(self):
+        """
+        Store the column profile of the validated rows as one run in the sketch store.
+        
+        Call this only after the rows were loaded, like update_anomaly_baselines,
+        so trends only cover data that reached the warehouse.
+        """
+        if self.sketch_store is None or not self.column_profile:
+            return
+        
+        try:
+            self.sketch_store.record(self.column_profile)
+        except Exception as e:
+            logger.warning(f"Could not record column profile: {str(e)}")
+        self.column_profile = {}
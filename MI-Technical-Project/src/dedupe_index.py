@@ -0,0 +1,270 @@
+"""
+Dedupe index module for pre-load duplicate suppression.
+Keeps one Bloom filter of loaded natural keys per extraction date in local files,
+so rows already in the warehouse are dropped before they are loaded again.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Second hash seed (pandas' default hash_key is '0123456789123456')
+_SECOND_HASH_KEY = "dedupeindexseed2"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit key hashes, using double hashing for its k probes."""
+    
+    def __init__(self, num_bits: int, num_hashes: int, bits: Optional[np.ndarray] = None, count: int = 0):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else np.zeros((num_bits + 7) // 8, dtype=np.uint8)
+        self.count = count
+    
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float) -> 'BloomFilter':
+        """
+        Size a filter for a number of keys and false positive rate.
+        
+        Args:
+            capacity: Keys the filter is expected to hold
+            error_rate: False positive rate at that capacity
+        
+        Returns:
+            Empty filter
+        """
+        num_bits = int(np.ceil(-capacity * np.log(error_rate) / np.log(2) ** 2))
+        num_hashes = max(1, int(round(num_bits / capacity * np.log(2))))
+        return cls(num_bits, num_hashes)
+    
+    def _positions(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        """Bit positions probed for each key, shape (keys, num_hashes)."""
+        probes = np.arange(self.num_hashes, dtype=np.uint64)
+        return ((h1[:, None] + probes * (h2[:, None] | np.uint64(1))) % np.uint64(self.num_bits)).astype(np.int64)
+    
+    def contains(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        """Whether each key may have been added (False means it was not)."""
+        positions = self._positions(h1, h2)
+        return ((self.bits[positions >> 3] >> (positions & 7).astype(np.uint8)) & 1).all(axis=1)
+    
+    def add(self, h1: np.ndarray, h2: np.ndarray):
+        """Add keys to the filter."""
+        positions = self._positions(h1, h2).ravel()
+        np.bitwise_or.at(self.bits, positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+        self.count += len(h1)
+
+
+class DedupeIndex:
+    """
+    Persistent probabilistic index of the natural keys already loaded.
+    
+    Keys are kept in one Bloom filter per extraction date, saved as a
+    compressed .npz file per date. A batch is checked in one vectorized pass
+    against the filters of its own dates only. Rows the filters have never
+    seen are new for certain. Rows they may have seen are confirmed with a
+    query against just those dates, so false positives are loaded rather
+    than dropped. At most max_open_partitions filters are held in memory,
+    which bounds memory however many dates a backfill touches.
+    """
+    
+    def __init__(
+        self,
+        directory: Path,
+        key_columns: List[str],
+        confirm: Optional[Callable[[pd.DataFrame], Optional[pd.DataFrame]]] = None,
+        capacity_per_partition: int = 200000,
+        error_rate: float = 0.001,
+        max_open_partitions: int = 8
+    ):
+        """
+        Args:
+            directory: Directory for the per-date filter files
+            key_columns: Natural key columns (must include extraction_timestamp)
+            confirm: Called with the candidate duplicate rows; returns the key
+                columns of those rows already in the warehouse, or None if they
+                could not be checked (candidates are then loaded)
+            capacity_per_partition: Keys per extraction date each filter is sized for
+            error_rate: False positive rate of a filter at capacity
+            max_open_partitions: Filters kept in memory at once
+        
+        Raises:
+            ValueError: If key_columns does not include extraction_timestamp
+        """
+        if 'extraction_timestamp' not in key_columns:
+            raise ValueError("Dedupe key columns must include extraction_timestamp, which partitions the index")
+        
+        self.directory = Path(directory)
+        self.key_columns = key_columns
+        self.confirm = confirm
+        self.capacity_per_partition = capacity_per_partition
+        self.error_rate = error_rate
+        self.max_open_partitions = max_open_partitions
+        self._filters: "OrderedDict[str, BloomFilter]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self.directory.mkdir(parents=True, exist_ok=True)
+    
+    def filter_new(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict]:
+        """
+        Drop rows whose natural key was already loaded, and repeated keys within the batch.
+        
+        Args:
+            df: Validated DataFrame
+        
+        Returns:
+            Tuple of (rows to load, report with rows_checked, batch_duplicates,
+            candidates, duplicates_skipped and false_positives)
+        """
+        report = {'rows_checked': len(df), 'batch_duplicates': 0, 'candidates': 0, 'duplicates_skipped': 0, 'false_positives': 0}
+        if df.empty:
+            return df, report
+        
+        repeated = df.duplicated(subset=self.key_columns, keep='last').to_numpy()
+        if repeated.any():
+            df = df[~repeated]
+            report['batch_duplicates'] = int(repeated.sum())
+        
+        h1, h2 = self._hashes(df)
+        dates = self._dates(df)
+        seen = np.zeros(len(df), dtype=bool)
+        
+        with self._lock:
+            for day in np.unique(dates):
+                if not self._filter_path(day).exists() and day not in self._filters:
+                    continue
+                rows = dates == day
+                seen[rows] = self._filter(day).contains(h1[rows], h2[rows])
+        
+        report['candidates'] = int(seen.sum())
+        if seen.any():
+            duplicate = self._confirm(df[seen], h1[seen], h2[seen])
+            if duplicate is not None:
+                seen[np.flatnonzero(seen)] = duplicate
+                report['duplicates_skipped'] = int(duplicate.sum())
+                report['false_positives'] = report['candidates'] - report['duplicates_skipped']
+                df = df[~seen]
+        
+        if report['batch_duplicates'] or report['duplicates_skipped']:
+            logger.warning(
+                f"Dedupe: skipped {report['duplicates_skipped']} rows already loaded and "
+                f"{report['batch_duplicates']} repeated within the batch "
+                f"({report['false_positives']} of {report['candidates']} candidates were new)"
+            )
+        return df, report
+    
+    def commit(self, df: pd.DataFrame):
+        """
+        Add the keys of loaded rows to the filters of their dates and save them.
+        
+        Call this only after the rows were loaded, so a failed load never
+        marks rows as present.
+        
+        Args:
+            df: Rows that were loaded
+        """
+        if df is None or df.empty:
+            return
+        
+        h1, h2 = self._hashes(df)
+        dates = self._dates(df)
+        
+        with self._lock:
+            for day in np.unique(dates):
+                rows = dates == day
+                bloom = self._filter(day)
+                bloom.add(h1[rows], h2[rows])
+                if bloom.count > self.capacity_per_partition:
+                    logger.warning(
+                        f"Dedupe filter for {day} holds {bloom.count} keys, above its capacity of "
+                        f"{self.capacity_per_partition} - raise DEDUPE_KEYS_PER_PARTITION to keep false positives rare"
+                    )
+                self._save(day, bloom)
+    
+    def _confirm(self, candidates: pd.DataFrame, h1: np.ndarray, h2: np.ndarray) -> Optional[np.ndarray]:
+        """Which candidate rows are really in the warehouse, or None if they could not be checked."""
+        if self.confirm is None:
+            logger.warning(f"Dedupe: no confirmation query configured - loading {len(candidates)} candidate rows")
+            return None
+        
+        try:
+            existing = self.confirm(candidates[self.key_columns])
+        except Exception as e:
+            logger.warning(f"Dedupe: confirming {len(candidates)} candidate rows failed ({str(e)}) - loading them")
+            existing = None
+        if existing is None:
+            return None
+        if existing.empty:
+            return np.zeros(len(candidates), dtype=bool)
+        
+        return pd.MultiIndex.from_arrays([h1, h2]).isin(pd.MultiIndex.from_arrays(self._hashes(existing)))
+    
+    def _filter(self, day: str) -> BloomFilter:
+        """Filter of an extraction date, read from disk or created, evicting the least recently used."""
+        if day in self._filters:
+            self._filters.move_to_end(day)
+            return self._filters[day]
+        
+        path = self._filter_path(day)
+        bloom = None
+        if path.exists():
+            try:
+                with np.load(path, allow_pickle=False) as state:
+                    bloom = BloomFilter(int(state['num_bits']), int(state['num_hashes']), state['bits'], int(state['count']))
+            except (OSError, KeyError, ValueError) as e:
+                logger.warning(f"Could not read dedupe filter {path} ({str(e)}) - starting it empty")
+        if bloom is None:
+            bloom = BloomFilter.for_capacity(self.capacity_per_partition, self.error_rate)
+        
+        self._filters[day] = bloom
+        while len(self._filters) > self.max_open_partitions:
+            self._filters.popitem(last=False)
+        return bloom
+    
+    def _save(self, day: str, bloom: BloomFilter):
+        """Write a filter to its file atomically."""
+        path = self._filter_path(day)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, num_bits=bloom.num_bits, num_hashes=bloom.num_hashes, bits=bloom.bits, count=bloom.count)
+        os.replace(tmp_path, path)
+    
+    def _filter_path(self, day: str) -> Path:
+        """File of an extraction date's filter."""
+        return self.directory / f"{day}.npz"
+    
+    def _hashes(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Two independent 64-bit hashes of each row's natural key.
+        
+        Timestamps are normalized to UTC nanoseconds (whatever their stored
+        resolution) and missing values to '', so keys read back from BigQuery
+        hash like the rows that were loaded.
+        """
+        normalized = pd.DataFrame({
+            col: pd.to_datetime(df[col], utc=True).astype('datetime64[ns, UTC]').astype('int64').to_numpy()
+            if col == 'extraction_timestamp' or pd.api.types.is_datetime64_any_dtype(df[col])
+            else df[col].astype(object).where(df[col].notna(), "").astype(str).to_numpy(dtype=object)
+            for col in self.key_columns
+        })
+        h1 = pd.util.hash_pandas_object(normalized, index=False).to_numpy(dtype=np.uint64)
+        h2 = pd.util.hash_pandas_object(normalized, index=False, hash_key=_SECOND_HASH_KEY).to_numpy(dtype=np.uint64)
+        return h1, h2
+    
+    @staticmethod
+    def _dates(df: pd.DataFrame) -> np.ndarray:
+        """ISO extraction date of each row."""
+        codes, days = pd.factorize(pd.to_datetime(df['extraction_timestamp'], utc=True).dt.floor('D'))
+        return np.asarray(days.strftime('%Y-%m-%d'), dtype=str)[codes]
+    
+    def close(self):
+        """Drop the filters held in memory (every committed filter is already on disk)."""
+        with self._lock:
+            self._filters.clear()
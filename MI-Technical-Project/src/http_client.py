@@ -0,0 +1,238 @@
+"""
+HTTP transport module for API requests.
+Provides a pooled session with rate limiting, retries and request statistics.
+"""
+
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Requests per minute allowed by each CoinGecko plan
+TIER_REQUESTS_PER_MINUTE = {
+    "public": 10,
+    "demo": 30,
+    "analyst": 500,
+    "pro": 1000,
+}
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting request starts to a per-minute rate."""
+    
+    def __init__(self, requests_per_minute: float, capacity: int = 1):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        if self.rate <= 0:
+            return
+        
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if now >= self._blocked_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                
+                wait = max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+            
+            time.sleep(wait)
+    
+    def pause(self, seconds: float):
+        """Stop handing out tokens for the given number of seconds (e.g. after a 429)."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class TransportStats:
+    """Thread-safe counters for requests made through an HttpClient."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.bytes_received = 0
+        self.latencies: List[float] = []
+    
+    def record_request(self, latency: float, num_bytes: int):
+        """Record one completed HTTP round trip."""
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += num_bytes
+            self.latencies.append(latency)
+    
+    def record_bytes(self, num_bytes: int):
+        """Record body bytes read from a streamed response."""
+        with self._lock:
+            self.bytes_received += num_bytes
+
+    def record_retry(self):
+        """Record a retried request."""
+        with self._lock:
+            self.retries += 1
+    
+    def record_failure(self):
+        """Record a request that failed for good."""
+        with self._lock:
+            self.failures += 1
+    
+    def summary(self) -> Dict:
+        """
+        Summarize counters and latency percentiles.
+        
+        Returns:
+            Dictionary of request, retry, failure, byte and latency statistics
+        """
+        with self._lock:
+            latencies = sorted(self.latencies)
+            summary = {
+                'requests': self.requests,
+                'retries': self.retries,
+                'failures': self.failures,
+                'bytes_received': self.bytes_received,
+            }
+        
+        if latencies:
+            summary['latency_p50_ms'] = round(latencies[len(latencies) // 2] * 1000, 1)
+            summary['latency_p95_ms'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1)
+            summary['latency_max_ms'] = round(latencies[-1] * 1000, 1)
+        
+        return summary
+
+
+class HttpClient:
+    """Pooled HTTP client with token-bucket rate limiting and jittered retries."""
+    
+    def __init__(
+        self,
+        requests_per_minute: float,
+        burst: int = 1,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        pool_size: int = 10,
+        timeout: float = 30,
+        headers: Optional[Dict[str, str]] = None
+    ):
+        self.rate_limiter = TokenBucket(requests_per_minute, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.stats = TransportStats()
+        
+        # Keep-alive connection pool shared by all worker threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+    
+    def get(self, url: str, params: Optional[Dict] = None, stream: bool = False) -> requests.Response:
+        """
+        Send a GET request, retrying transient failures.
+        
+        429 and 5xx responses, connection errors and timeouts are retried up to
+        max_retries times. A Retry-After header is honoured when present,
+        otherwise the delay is jittered exponential backoff. A 429 also pauses
+        the shared rate limiter so concurrent workers back off together.
+        
+        Args:
+            url: Request URL
+            params: Query string parameters
+            stream: Defer downloading the body until it is read
+        
+        Returns:
+            Successful response
+        
+        Raises:
+            requests.exceptions.RequestException: If the request still fails after all retries
+        """
+        attempt = 0
+        
+        while True:
+            self.rate_limiter.acquire()
+            start = time.perf_counter()
+            
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.stats.record_request(time.perf_counter() - start, 0)
+                if attempt >= self.max_retries:
+                    self.stats.record_failure()
+                    raise
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"Request to {url} failed ({str(e)}), retrying in {delay:.1f}s")
+            else:
+                num_bytes = 0 if stream else len(response.content)
+                self.stats.record_request(time.perf_counter() - start, num_bytes)
+                
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    if response.status_code >= 400:
+                        self.stats.record_failure()
+                    response.raise_for_status()
+                    return response
+                
+                if attempt >= self.max_retries:
+                    self.stats.record_failure()
+                    response.raise_for_status()
+                    return response
+                
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff_delay(attempt)
+                if response.status_code == 429:
+                    self.rate_limiter.pause(delay)
+                response.close()
+                logger.warning(f"Request to {url} returned {response.status_code}, retrying in {delay:.1f}s")
+            
+            self.stats.record_retry()
+            attempt += 1
+            time.sleep(delay)
+    
+    def close(self):
+        """Close pooled connections."""
+        self.session.close()
+    
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+    
+    def _retry_after(self, response: requests.Response) -> Optional[float]:
+        """Parse a Retry-After header given either in seconds or as an HTTP date."""
+        value = response.headers.get("Retry-After") if response.headers else None
+        if not value:
+            return None
+        
+        try:
+            return min(self.backoff_max, max(0.0, float(value)))
+        except ValueError:
+            pass
+        
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return min(self.backoff_max, max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds()))
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,380 @@
+"""
+Local BigQuery stand-in backed by DuckDB.
+Implements the subset of google.cloud.bigquery.Client (and of the Storage Write
+API) used by the loaders so loads, appends, MERGEs and queries can be exercised
+without a GCP project.
+"""
+
+import logging
+import re
+import threading
+import uuid
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# BigQuery type names -> DuckDB type names
+TYPE_MAP = {
+    'FLOAT64': 'DOUBLE',
+    'INT64': 'BIGINT',
+    'STRING': 'VARCHAR',
+    'BOOL': 'BOOLEAN',
+    'BYTES': 'BLOB',
+    'NUMERIC': 'DECIMAL(38, 9)',
+    'TIMESTAMP': 'TIMESTAMPTZ',  # BigQuery TIMESTAMP is an absolute point in time
+}
+
+TABLE_REF_PATTERN = re.compile(r"`([^`]+)`")
+PARAM_PATTERN = re.compile(r"@(\w+)")
+
+
+def _strip_options(sql: str) -> str:
+    """Remove BigQuery OPTIONS(...) clauses, including nested parentheses."""
+    result = []
+    pos = 0
+    for match in re.finditer(r"\bOPTIONS\s*\(", sql, flags=re.IGNORECASE):
+        if match.start() < pos:
+            continue
+        result.append(sql[pos:match.start()])
+        depth = 1
+        i = match.end()
+        in_string = None
+        while i < len(sql) and depth:
+            char = sql[i]
+            if in_string:
+                if char == in_string:
+                    in_string = None
+            elif char in "'\"":
+                in_string = char
+            elif char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            i += 1
+        pos = i
+    result.append(sql[pos:])
+    return "".join(result)
+
+
+def translate_sql(sql: str) -> str:
+    """
+    Rewrite BigQuery Standard SQL into the DuckDB dialect.
+    
+    Handles backtick table references (`project.dataset.table` and
+    `dataset.table`), OPTIONS/PARTITION BY/CLUSTER BY clauses, BigQuery
+    type names and @named query parameters.
+    
+    Args:
+        sql: BigQuery SQL statement(s)
+    
+    Returns:
+        Equivalent DuckDB SQL
+    """
+    def table_ref(match):
+        parts = match.group(1).split(".")
+        return ".".join(f'"{part}"' for part in parts[-2:])
+    
+    sql = re.sub(r"--[^\n]*", "", sql)
+    sql = TABLE_REF_PATTERN.sub(table_ref, sql)
+    sql = _strip_options(sql)
+    sql = re.sub(r"\bPARTITION\s+BY\s+DATE\s*\([^)]*\)", "", sql, flags=re.IGNORECASE)
+    # Table partitioning on a plain column follows the column list; window PARTITION BY follows "("
+    sql = re.sub(r"(?<=\))\s*PARTITION\s+BY\s+\w+(?=\s+(?:CLUSTER|OPTIONS)\b|\s*;|\s*$)", "", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bCLUSTER\s+BY\s+[\w\s,]+?(?=;|$)", "", sql, flags=re.IGNORECASE)
+    for bq_type, duck_type in TYPE_MAP.items():
+        sql = re.sub(rf"\b{bq_type}\b", duck_type, sql)
+    sql = PARAM_PATTERN.sub(r"$\1", sql)
+    return sql
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split a SQL script on semicolons, dropping empty statements."""
+    return [statement.strip() for statement in sql.split(";") if statement.strip()]
+
+
+class LocalJob:
+    """Completed job returned by LocalBigQueryClient, mirroring LoadJob/QueryJob."""
+    
+    def __init__(
+        self,
+        job_type: str,
+        output_rows: int = 0,
+        frame: Optional[pd.DataFrame] = None,
+        destination: Optional[str] = None
+    ):
+        self.job_id = f"local_{job_type}_{uuid.uuid4().hex[:12]}"
+        self.job_type = job_type
+        self.destination = destination
+        self.output_rows = output_rows
+        self.num_dml_affected_rows = output_rows if job_type == "query" else None
+        self.state = "DONE"
+        self.error_result = None
+        self._frame = frame
+    
+    def done(self) -> bool:
+        """Local jobs complete synchronously."""
+        return True
+    
+    def result(self, timeout: Optional[float] = None) -> 'LocalJob':
+        """Return self; the job has already finished."""
+        return self
+    
+    @property
+    def total_rows(self) -> int:
+        """Rows in the query result (0 for DML and load jobs)."""
+        return len(self._frame) if self._frame is not None else 0
+    
+    def to_dataframe(self) -> pd.DataFrame:
+        """Query results as a DataFrame (empty for DML and load jobs)."""
+        return self._frame if self._frame is not None else pd.DataFrame()
+    
+    def to_arrow(self, create_bqstorage_client: bool = False):
+        """Query results as an Arrow table; create_bqstorage_client is accepted and ignored."""
+        import pyarrow as pa
+        
+        return pa.Table.from_pandas(self.to_dataframe(), preserve_index=False)
+
+
+class LocalTable:
+    """Table metadata returned by LocalBigQueryClient.get_table."""
+    
+    def __init__(self, table_ref: str, num_rows: int, columns: List[str]):
+        self.table_ref = table_ref
+        self.num_rows = num_rows
+        self.columns = columns
+
+
+class LocalBigQueryClient:
+    """In-process BigQuery client stand-in storing datasets as DuckDB schemas."""
+    
+    def __init__(self, database: str = ":memory:", project: str = "local"):
+        import duckdb
+        
+        self.project = project
+        self.connection = duckdb.connect(database)
+        self.connection.execute("SET TimeZone = 'UTC'")
+        self.queries: List[str] = []
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _split_ref(ref: str) -> List[str]:
+        """Split a dataset or table reference into its last two parts."""
+        return str(ref).strip("`").split(".")[-2:]
+    
+    def _quoted(self, table_ref: str) -> str:
+        schema, table = self._split_ref(table_ref)
+        return f'"{schema}"."{table}"'
+    
+    def _table_exists(self, table_ref: str) -> bool:
+        schema, table = self._split_ref(table_ref)
+        found = self.connection.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = ? AND table_name = ?",
+            [schema, table]
+        ).fetchone()[0]
+        return found > 0
+    
+    def get_dataset(self, dataset_ref):
+        """Return the dataset reference, raising if the schema does not exist."""
+        name = str(getattr(dataset_ref, "dataset_id", dataset_ref)).split(".")[-1]
+        with self._lock:
+            found = self.connection.execute(
+                "SELECT COUNT(*) FROM information_schema.schemata WHERE schema_name = ?", [name]
+            ).fetchone()[0]
+        if not found:
+            raise LookupError(f"Dataset {dataset_ref} not found")
+        return dataset_ref
+    
+    def create_dataset(self, dataset, timeout: Optional[float] = None, exists_ok: bool = False):
+        """Create the DuckDB schema backing a dataset."""
+        name = str(getattr(dataset, "dataset_id", dataset)).split(".")[-1]
+        with self._lock:
+            self.connection.execute(f'CREATE SCHEMA IF NOT EXISTS "{name}"')
+        return dataset
+    
+    def get_table(self, table_ref) -> LocalTable:
+        """Return row count and columns for a table, raising if it does not exist."""
+        table_ref = str(table_ref)
+        with self._lock:
+            if not self._table_exists(table_ref):
+                raise LookupError(f"Table {table_ref} not found")
+            quoted = self._quoted(table_ref)
+            num_rows = self.connection.execute(f"SELECT COUNT(*) FROM {quoted}").fetchone()[0]
+            columns = [row[0] for row in self.connection.execute(f"DESCRIBE {quoted}").fetchall()]
+        return LocalTable(table_ref, num_rows, columns)
+    
+    def delete_table(self, table_ref, not_found_ok: bool = False):
+        """Drop a table."""
+        table_ref = str(table_ref)
+        with self._lock:
+            if not self._table_exists(table_ref):
+                if not_found_ok:
+                    return
+                raise LookupError(f"Table {table_ref} not found")
+            self.connection.execute(f"DROP TABLE {self._quoted(table_ref)}")
+    
+    def load_table_from_dataframe(self, df: pd.DataFrame, table_ref, job_config=None) -> LocalJob:
+        """
+        Load a DataFrame into a table, creating the dataset and table if needed.
+        
+        Args:
+            df: DataFrame to load
+            table_ref: Destination table reference
+            job_config: Optional LoadJobConfig; only write_disposition is honoured
+        
+        Returns:
+            Completed LocalJob with output_rows set
+        """
+        return self._load(df, len(df), str(table_ref), job_config)
+    
+    def load_table_from_file(self, file_obj, table_ref, job_config=None) -> LocalJob:
+        """
+        Load a Parquet file object into a table, creating the dataset and table if needed.
+        
+        Args:
+            file_obj: Binary file object with Parquet content
+            table_ref: Destination table reference
+            job_config: Optional LoadJobConfig; only write_disposition is honoured
+        
+        Returns:
+            Completed LocalJob with output_rows set
+        """
+        import pyarrow.parquet as pq
+        
+        table = pq.read_table(file_obj)
+        return self._load(table, table.num_rows, str(table_ref), job_config)
+    
+    def _load(self, source, num_rows: int, table_ref: str, job_config) -> LocalJob:
+        """Create, replace or append to a table from a DataFrame or Arrow table."""
+        schema, _ = self._split_ref(table_ref)
+        disposition = getattr(job_config, "write_disposition", None) or "WRITE_APPEND"
+        quoted = self._quoted(table_ref)
+        
+        with self._lock:
+            self.connection.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+            self.connection.register("_load_source", source)
+            try:
+                exists = self._table_exists(table_ref)
+                if disposition == "WRITE_EMPTY" and exists:
+                    if self.connection.execute(f"SELECT COUNT(*) FROM {quoted}").fetchone()[0]:
+                        raise ValueError(f"Table {table_ref} is not empty")
+                if disposition == "WRITE_TRUNCATE" or not exists:
+                    self.connection.execute(f"CREATE OR REPLACE TABLE {quoted} AS SELECT * FROM _load_source")
+                else:
+                    self.connection.execute(f"INSERT INTO {quoted} BY NAME SELECT * FROM _load_source")
+            finally:
+                self.connection.unregister("_load_source")
+        
+        return LocalJob("load", output_rows=num_rows, destination=table_ref)
+    
+    def query(self, query: str, job_config=None) -> LocalJob:
+        """
+        Run BigQuery SQL (one statement or a script) against DuckDB.
+        
+        Args:
+            query: BigQuery Standard SQL
+            job_config: Optional QueryJobConfig; query_parameters are bound by name
+        
+        Returns:
+            Completed LocalJob; to_dataframe() returns the last statement's result
+        """
+        self.queries.append(query)
+        params: Dict = {
+            param.name: param.value
+            for param in (getattr(job_config, "query_parameters", None) or [])
+        }
+        
+        frame = None
+        affected = 0
+        with self._lock:
+            for statement in split_statements(translate_sql(query)):
+                used = {name: value for name, value in params.items() if f"${name}" in statement}
+                cursor = self.connection.execute(statement, used) if used else self.connection.execute(statement)
+                if cursor.description is None:
+                    continue
+                frame = cursor.df()
+                if list(frame.columns) == ["Count"] and len(frame) == 1:
+                    affected = int(frame.iloc[0, 0])
+        
+        return LocalJob("query", output_rows=affected, frame=frame)
+
+
+class LocalWriteClient:
+    """
+    Storage Write API stand-in appending to a LocalBigQueryClient.
+    
+    Mirrors storage_writer.BigQueryWriteClient: rows appended to a committed
+    stream are visible at once, rows of a pending stream when it is committed.
+    Offsets are enforced as BigQuery does, so an append at an offset the stream
+    already holds is ignored and one past its end is rejected.
+    """
+    
+    def __init__(self, client: LocalBigQueryClient):
+        self.client = client
+        self._streams: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+    
+    def create_stream(self, table_ref: str, stream_type: str) -> str:
+        """Open a write stream on a table, returning its name."""
+        name = f"{table_ref}/streams/{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self._streams[name] = {
+                'table_ref': table_ref, 'type': stream_type, 'rows': 0, 'buffer': [], 'finalized': False
+            }
+        return name
+    
+    def append(self, stream_name: str, table, offset: int):
+        """
+        Append rows at an offset of a stream.
+        
+        Raises:
+            ValueError: If the stream is finalized or the offset is past its end
+        """
+        with self._lock:
+            stream = self._streams[stream_name]
+            if stream['finalized']:
+                raise ValueError(f"Stream {stream_name} is finalized")
+            if offset < stream['rows']:
+                logger.info(f"Rows at offset {offset} of {stream_name} were already written")
+                return
+            if offset > stream['rows']:
+                raise ValueError(f"Offset {offset} is past the end of {stream_name} ({stream['rows']} rows)")
+            
+            if stream['type'] == "pending":
+                stream['buffer'].append(table)
+            else:
+                self.client._load(table, table.num_rows, stream['table_ref'], None)
+            stream['rows'] += table.num_rows
+    
+    def finalize(self, stream_name: str) -> int:
+        """Close a stream to appends, returning its row count."""
+        with self._lock:
+            stream = self._streams[stream_name]
+            stream['finalized'] = True
+            return stream['rows']
+    
+    def commit(self, table_ref: str, stream_names: List[str]):
+        """
+        Make the rows of finalized pending streams visible in one transaction.
+        
+        Raises:
+            ValueError: If a stream is not finalized
+        """
+        import pyarrow as pa
+        
+        with self._lock:
+            streams = [self._streams[name] for name in stream_names]
+            if not all(stream['finalized'] for stream in streams):
+                raise ValueError("Only finalized streams can be committed")
+            tables = [table for stream in streams for table in stream['buffer']]
+            if tables:
+                table = pa.concat_tables(tables)
+                self.client._load(table, table.num_rows, table_ref, None)
+            for name in stream_names:
+                del self._streams[name]
+    
+    def close(self):
+        """Drop streams that were never committed."""
+        with self._lock:
+            self._streams = {}
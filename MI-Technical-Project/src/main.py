@@ -3,106 +3,817 @@ Main ETL pipeline for Cryptocurrency MI Reporting Automation.
 Orchestrates data extraction, quality checks, and loading to BigQuery.
 """
 
+import argparse
 import logging
 import sys
 import json
-from datetime import datetime
+from functools import partial
+from datetime import date, datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
 
 from config import Config
-from data_fetcher import CryptoDataFetcher
-from data_quality import DataQualityChecker
-from bigquery_loader import BigQueryLoader
-
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, Config.LOG_LEVEL),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('etl_pipeline.log')
-    ]
-)
+from metrics import RunMetrics, set_run_metrics, stage
+
+# pandas, requests and google-cloud are imported inside the commands that need
+# them, so --help and validate-config start without paying for them
+if TYPE_CHECKING:
+    import pandas as pd
+    from anomaly_detector import AnomalyDetector, SeriesMeans
+    from bigquery_loader import BigQueryLoader
+    from column_sketches import SketchStore
+    from data_fetcher import CryptoDataFetcher
+    from data_quality import DataQualityChecker
+    from dedupe_index import DedupeIndex
+    from sinks import Sink
+    from watermark_store import WatermarkStore
 
 logger = logging.getLogger(__name__)
 
 
-def main():
-    """Main ETL pipeline execution."""
+def configure_logging():
+    """Send log output to stdout and etl_pipeline.log."""
+    logging.basicConfig(
+        level=getattr(logging, Config.LOG_LEVEL),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(sys.stdout),
+            logging.FileHandler('etl_pipeline.log')
+        ]
+    )
+
+
+def incremental_stage(
+    batches: Iterator,
+    watermarks: "WatermarkStore",
+    report: Dict,
+    pending: Optional["pd.DataFrame"] = None
+) -> Iterator:
+    """
+    Drop rows whose coin has not changed since the last successful load.
     
-    logger.info("=" * 80)
-    logger.info("CRYPTOCURRENCY MI REPORTING AUTOMATION - ETL PIPELINE")
-    logger.info(f"Execution started at: {datetime.utcnow().isoformat()}")
-    logger.info("=" * 80)
+    Args:
+        batches: Iterator of transformed DataFrames
+        watermarks: Watermark store of the last successful load
+        report: Counters updated in place (rows_fetched, rows_skipped) plus the
+            'changed' list of watermark columns to commit after the load
+        pending: Rows still waiting in the load spool, skipped like loaded ones
     
-    pipeline_success = False
+    Yields:
+        Non-empty batches of changed rows
+    """
+    from watermark_store import WATERMARK_COLUMNS
     
-    try:
-        # Validate configuration
-        logger.info("Step 1: Validating configuration...")
-        Config.validate()
-        logger.info("✓ Configuration validated successfully")
-        
-        # Initialize components
-        logger.info("\nStep 2: Initializing components...")
-        fetcher = CryptoDataFetcher()
-        quality_checker = DataQualityChecker()
-        bq_loader = BigQueryLoader()
-        logger.info("✓ Components initialized")
+    for batch in batches:
+        changed, skipped = watermarks.filter_changed(batch, pending)
+        report['rows_fetched'] += len(batch)
+        report['rows_skipped'] += skipped
         
-        # Fetch data from API
-        logger.info(f"\nStep 3: Fetching cryptocurrency data...")
-        logger.info(f"Tracking: {', '.join(Config.CRYPTO_IDS)}")
-        raw_data = fetcher.fetch_market_data(Config.CRYPTO_IDS)
-        
-        if raw_data is None or raw_data.empty:
-            logger.error("✗ Data fetch failed or returned empty results")
-            sys.exit(1)
+        if not changed.empty:
+            report['changed'].append(changed[WATERMARK_COLUMNS])
+            yield changed
+
+
+def quality_stage(
+    batches: Iterator,
+    quality_checker: "DataQualityChecker",
+    series_means: Optional["SeriesMeans"] = None
+) -> Iterator:
+    """
+    Validate streamed batches, stopping the stream at the first failing batch.
+    
+    Args:
+        batches: Iterator of transformed DataFrames
+        quality_checker: Checker accumulating the run-level report
+        series_means: If given, each passing batch is folded into these
+            per-series means so the baselines can be updated after the loads
+            succeed without keeping the run's rows
+    
+    Yields:
+        Batches that passed their quality gate
+    """
+    for batch in batches:
+        if not quality_checker.run_batch_checks(batch):
+            logger.error(f"✗ Data quality checks failed for a batch of {len(batch)} records - stopping stream")
+            return
+        if series_means is not None:
+            series_means.add(batch)
+        yield batch
+
+
+def load_stage(batches: Iterator, bq_loader: "BigQueryLoader") -> Iterator[Tuple[int, object]]:
+    """
+    Submit validated batches to BigQuery one at a time without waiting for them.
+    
+    Args:
+        batches: Iterator of validated DataFrames
+        bq_loader: Initialized BigQuery loader
+    
+    Yields:
+        Tuple of (rows in the batch, job handle to wait on)
+    """
+    for batch in batches:
+        job = bq_loader.submit_batch(batch)
+        if job is None:
+            raise RuntimeError(f"Failed to load a batch of {len(batch)} records to BigQuery")
+        yield len(batch), job
+
+
+def prepare_bigquery(bq_loader: "BigQueryLoader", first_step: int):
+    """
+    Initialize the BigQuery client and ensure the dataset exists.
+    
+    Args:
+        bq_loader: BigQuery loader to prepare
+        first_step: Step number used in the log output
+    """
+    logger.info(f"\nStep {first_step}: Initializing BigQuery connection...")
+    if not bq_loader.initialize_client():
+        logger.error("✗ Failed to initialize BigQuery client")
+        sys.exit(1)
+    
+    logger.info("✓ BigQuery client initialized")
+    
+    # Ensure dataset exists
+    logger.info(f"\nStep {first_step + 1}: Ensuring BigQuery dataset exists...")
+    if not bq_loader.ensure_dataset_exists():
+        logger.error("✗ Failed to ensure dataset exists")
+        sys.exit(1)
+    
+    logger.info("✓ Dataset verified/created")
+
+
+def run_streaming_pipeline(
+    fetcher: "CryptoDataFetcher",
+    quality_checker: "DataQualityChecker",
+    bq_loader: "BigQueryLoader",
+    batch_size: int,
+    watermarks: Optional["WatermarkStore"] = None
+) -> bool:
+    """
+    Run fetch, quality checks and load as generator stages over record batches.
+    
+    Only a bounded number of batches is alive at any time, so memory stays flat
+    regardless of how many coins are processed.
+    
+    Args:
+        fetcher: Data fetcher
+        quality_checker: Data quality checker
+        bq_loader: Initialized BigQuery loader
+        batch_size: Maximum rows per batch
+        watermarks: Watermark store; when given only changed rows are loaded
+    
+    Returns:
+        True if every batch was validated and loaded, False otherwise
+    """
+    logger.info(f"\nStep 5: Streaming fetch -> quality -> load in batches of {batch_size}...")
+    logger.info(f"Tracking {len(Config.CRYPTO_IDS)} cryptocurrencies")
+    
+    batches = fetcher.iter_transformed_batches(Config.CRYPTO_IDS, batch_size=batch_size)
+    incremental = {'rows_fetched': 0, 'rows_skipped': 0, 'changed': []}
+    if watermarks is not None:
+        batches = incremental_stage(batches, watermarks, incremental, bq_loader.pending_rows())
+    series_means = None
+    if quality_checker.anomaly_detector is not None:
+        from anomaly_detector import SeriesMeans
         
-        logger.info(f"✓ Fetched {len(raw_data)} records from API")
+        series_means = SeriesMeans()
+    submitted_rows = 0
+    jobs = []
+    
+    try:
+        with stage("pipeline.stream") as stream_counts:
+            for batch_rows, job in load_stage(quality_stage(batches, quality_checker, series_means), bq_loader):
+                submitted_rows += batch_rows
+                stream_counts['rows'] = submitted_rows
+                jobs.append(job)
+                logger.info(f"✓ Submitted batch of {batch_rows} records ({submitted_rows} total)")
+    finally:
+        logger.info(f"API transport stats: {json.dumps(fetcher.transport_stats())}")
         
-        # Transform data
-        logger.info("\nStep 4: Transforming data...")
-        transformed_data = fetcher.transform_data(raw_data)
-        logger.info(f"✓ Data transformed - Shape: {transformed_data.shape}")
+        # Load jobs run concurrently; wait for all of them together
+        with stage("pipeline.wait_for_loads") as wait_counts:
+            loads_ok, loaded_rows = bq_loader.wait_for_jobs(jobs)
+            wait_counts['rows'] = loaded_rows
+    
+    if not loads_ok:
+        logger.error(f"✗ Some load jobs failed - {loaded_rows} of {submitted_rows} records were written")
+        return False
+    
+    if watermarks is not None:
+        logger.info(f"Incremental: {incremental['rows_skipped']} of {incremental['rows_fetched']} rows unchanged and skipped")
+        if not incremental['changed']:
+            logger.info("✓ No coins changed since the last load - nothing to load")
+            return True
+    
+    quality_passed, quality_report = quality_checker.aggregate_batch_reports()
+    if watermarks is not None:
+        quality_report['incremental'] = {
+            'rows_fetched': incremental['rows_fetched'],
+            'rows_skipped': incremental['rows_skipped'],
+        }
+    
+    logger.info("\nData Quality Report:")
+    logger.info(json.dumps(quality_report, indent=2))
+    
+    if not quality_passed:
+        logger.error(f"✗ Data quality checks failed - {loaded_rows} records were loaded before the stream stopped")
+        return False
+    
+    if watermarks is not None:
+        for changed in incremental['changed']:
+            watermarks.commit(changed)
+    
+    if series_means is not None:
+        quality_checker.update_anomaly_baselines(series_means.rows())
+    quality_checker.record_column_profile()
+    
+    logger.info(f"✓ Streamed {loaded_rows} records to BigQuery")
+    return True
+
+
+def rebuild_watermarks(bq_loader: "BigQueryLoader", watermarks: "WatermarkStore") -> bool:
+    """
+    Rebuild the local watermark store from the latest loaded row per coin.
+    
+    Args:
+        bq_loader: Initialized BigQuery loader
+        watermarks: Watermark store to rebuild
+    
+    Returns:
+        True if the store was rebuilt, False otherwise
+    """
+    logger.info("\nStep 5: Rebuilding watermarks from v_latest_crypto_prices...")
+    latest = bq_loader.execute_query(
+        f"SELECT crypto_id, vs_currency, last_updated, current_price "
+        f"FROM `{bq_loader.project_id}.{bq_loader.dataset_id}.v_latest_crypto_prices`",
+        use_cache=False
+    )
+    return watermarks.rebuild(latest)
+
+
+def run_backfill(fetcher: "CryptoDataFetcher", bq_loader: "BigQueryLoader", args: argparse.Namespace) -> bool:
+    """
+    Backfill history for a date window from CoinGecko market_chart ranges.
+    
+    Args:
+        fetcher: Data fetcher
+        bq_loader: Initialized BigQuery loader
+        args: Parsed backfill arguments
+    
+    Returns:
+        True if every coin was backfilled, False otherwise
+    """
+    from backfill import BackfillEngine
+    
+    crypto_ids = args.ids.split(",") if args.ids else Config.CRYPTO_IDS
+    logger.info(f"\nStep 5: Backfilling {len(crypto_ids)} cryptocurrencies from {args.start} to {args.end}...")
+    
+    engine = BackfillEngine(
+        fetcher,
+        bq_loader,
+        checkpoint_path=args.checkpoint,
+        max_workers=args.workers,
+        slice_days=args.slice_days,
+        dedupe_index=create_dedupe_index(bq_loader)
+    )
+    success = engine.run(crypto_ids, args.start, args.end)
+    logger.info(f"API transport stats: {json.dumps(fetcher.transport_stats())}")
+    
+    return success
+
+
+def report_column_profile(sketch_store: "SketchStore", days: int) -> bool:
+    """
+    Log the merged column profile of the last N days and its drift from the N days before.
+    
+    Only the stored per-run sketches are merged, so no warehouse data is read.
+    
+    Args:
+        sketch_store: Store of per-run column sketches
+        days: Window length in days
+    
+    Returns:
+        True if any run was recorded in the current window, False otherwise
+    """
+    from column_sketches import compare_profiles, summarize_profile
+    
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=days)
+    logger.info(f"\nStep 3: Merging column profiles of the last {days} days...")
+    
+    runs = sketch_store.run_count(start, end)
+    if not runs:
+        logger.error(f"✗ No column profiles recorded since {start.isoformat()}")
+        return False
+    
+    current = sketch_store.load(start, end)
+    baseline = sketch_store.load(start - timedelta(days=days), start)
+    report = {
+        'window': {'start': start.isoformat(), 'end': end.isoformat(), 'runs': runs},
+        'profile': summarize_profile(current),
+    }
+    if baseline:
+        report['drift'] = compare_profiles(baseline, current)
+    else:
+        logger.info(f"No runs recorded in the {days} days before the window - drift not computed")
+    
+    logger.info("\nColumn Profile:")
+    logger.info(json.dumps(report, indent=2))
+    return True
+
+
+def run_batch_pipeline(
+    fetcher: "CryptoDataFetcher",
+    quality_checker: "DataQualityChecker",
+    sinks: Optional[List["Sink"]],
+    watermarks: Optional["WatermarkStore"] = None,
+    dedupe_index: Optional["DedupeIndex"] = None
+) -> bool:
+    """
+    Fetch one snapshot, validate it and write it to every sink.
+    
+    Every configured quote currency and endpoint is fetched in one pass; the
+    reference frames (global metrics, exchange rates) are validated with the
+    market data and written with it.
+    
+    The BigQuery sink stages validated frames in the load spool before
+    BigQuery is touched and then drains the whole spool, so batches left by
+    earlier failed runs are loaded in the same jobs without fetching them again.
+    
+    Args:
+        fetcher: Data fetcher
+        quality_checker: Data quality checker
+        sinks: Destinations (BigQueryLoader, LocalParquetSink), or None for a
+            dry run that stops after validation
+        watermarks: Watermark store; when given only changed rows are loaded
+        dedupe_index: Index of loaded keys; when given rows already in the
+            warehouse are dropped before the load
+    
+    Returns:
+        True if the snapshot was validated (and written to every sink), False otherwise
+    """
+    # Fetch data from API, decoding straight into the BigQuery schema
+    logger.info(f"\nStep 3: Fetching cryptocurrency data...")
+    logger.info(f"Tracking: {', '.join(Config.CRYPTO_IDS)} in {', '.join(Config.VS_CURRENCIES)}")
+    with stage("pipeline.fetch") as fetch_counts:
+        frames = fetcher.fetch_market_matrix(Config.CRYPTO_IDS) or {}
+        transformed_data = frames.get('markets')
+        reference_frames = {endpoint: df for endpoint, df in frames.items() if endpoint != 'markets'}
+        fetch_counts['rows'] = sum(len(df) for df in frames.values())
+    logger.info(f"API transport stats: {json.dumps(fetcher.transport_stats())}")
+    
+    if transformed_data is None or transformed_data.empty:
+        logger.error("✗ Data fetch failed or returned empty results")
+        return False
+    
+    logger.info(f"✓ Fetched {len(transformed_data)} records from API")
+    
+    incremental_report = None
+    if watermarks is not None:
+        fetched_rows = len(transformed_data)
+        with stage("pipeline.incremental") as incremental_counts:
+            transformed_data, skipped_rows = watermarks.filter_changed(transformed_data, queued_rows(sinks))
+            incremental_counts['rows'] = fetched_rows
+        incremental_report = {'rows_fetched': fetched_rows, 'rows_skipped': skipped_rows}
+        logger.info(f"Incremental: {skipped_rows} of {fetched_rows} rows unchanged and skipped")
         
-        # Run data quality checks
-        logger.info("\nStep 5: Running data quality checks...")
+        if transformed_data.empty:
+            logger.info("✓ No coins changed since the last load - nothing to load")
+            return True
+    
+    # Transform data
+    logger.info("\nStep 4: Transforming data...")
+    logger.info(f"✓ Data decoded into schema columns during fetch - Shape: {transformed_data.shape}")
+    
+    # Run data quality checks
+    logger.info("\nStep 5: Running data quality checks...")
+    with stage("pipeline.quality") as quality_counts:
         quality_passed, quality_report = quality_checker.run_all_checks(transformed_data)
+        quality_counts['rows'] = len(transformed_data)
+    if incremental_report is not None:
+        quality_report['incremental'] = incremental_report
+    if reference_frames:
+        reference_passed, quality_report['reference_data'] = quality_checker.check_reference_data(reference_frames)
+        quality_passed = quality_passed and reference_passed
+    
+    # Log quality report
+    logger.info("\nData Quality Report:")
+    logger.info(json.dumps(quality_report, indent=2))
+    
+    if not quality_passed:
+        logger.error("✗ Data quality checks failed - aborting pipeline")
+        return False
+    
+    logger.info("✓ All data quality checks passed")
+    
+    if sinks is None:
+        logger.info(f"✓ Dry run - {len(transformed_data)} validated records were not loaded")
+        return True
+    
+    if dedupe_index is not None:
+        with stage("pipeline.dedupe") as dedupe_counts:
+            transformed_data, dedupe_report = dedupe_index.filter_new(transformed_data)
+            dedupe_counts['rows'] = dedupe_report['rows_checked']
+        logger.info(f"Dedupe: {json.dumps(dedupe_report)}")
         
-        # Log quality report
-        logger.info("\nData Quality Report:")
-        logger.info(json.dumps(quality_report, indent=2))
-        
-        if not quality_passed:
-            logger.error("✗ Data quality checks failed - aborting pipeline")
-            sys.exit(1)
+        if transformed_data.empty:
+            logger.info("✓ Every row is already in the warehouse - nothing to load")
+            return True
+    
+    # Write data to every sink
+    logger.info(f"\nStep 6: Writing data to {', '.join(sink.name for sink in sinks)}...")
+    failed_sinks = []
+    with stage("pipeline.load") as load_counts:
+        for sink in sinks:
+            with stage(f"pipeline.load.{sink.name}") as sink_counts:
+                if sink.write(transformed_data, reference_frames):
+                    sink_counts['rows'] = len(transformed_data)
+                else:
+                    failed_sinks.append(sink.name)
+        load_counts['rows'] = len(transformed_data) if not failed_sinks else 0
+    if failed_sinks:
+        logger.error(f"✗ Failed to write data to {', '.join(failed_sinks)}")
+        return False
+    
+    logger.info(f"✓ Data successfully written to {', '.join(sink.name for sink in sinks)}")
+    
+    commit_loaded(transformed_data, watermarks, dedupe_index)
+    
+    quality_checker.update_anomaly_baselines(transformed_data)
+    quality_checker.record_column_profile()
+    
+    return True
+
+
+def queued_rows(sinks: Optional[List["Sink"]]) -> Optional["pd.DataFrame"]:
+    """Market data rows earlier runs left queued in the sinks (e.g. the load spool), or None."""
+    import pandas as pd
+    
+    frames = [rows for rows in (sink.pending_rows() for sink in sinks or []) if rows is not None and not rows.empty]
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+
+def commit_loaded(
+    df: "pd.DataFrame",
+    watermarks: Optional["WatermarkStore"] = None,
+    dedupe_index: Optional["DedupeIndex"] = None
+):
+    """
+    Record loaded rows in the watermark store and the dedupe index.
+    
+    Used after a run's own load and as BigQueryLoader.on_spool_loaded, so rows
+    of a failed run advance both once replay_spool loads them.
+    
+    Args:
+        df: Rows that were loaded
+        watermarks: Watermark store to advance, if incremental
+        dedupe_index: Index of loaded keys, if enabled
+    """
+    if watermarks is not None:
+        watermarks.commit(df)
+    if dedupe_index is not None:
+        dedupe_index.commit(df)
+
+
+def writes_bigquery_only(args: argparse.Namespace) -> bool:
+    """Whether a command loads or reads BigQuery directly instead of writing through SINKS."""
+    if args.command == "run":
+        return args.stream
+    return args.command not in ("dry-run", "validate-config", "profile")
+
+
+def validate_config() -> bool:
+    """
+    Validate configuration and print the effective settings.
+    
+    Returns:
+        True if the configuration is valid, False otherwise
+    """
+    try:
+        Config.validate()
+    except ValueError as e:
+        logger.error(f"✗ Configuration error: {str(e)}")
+        return False
+    
+    logger.info("✓ Configuration validated successfully")
+    logger.info(f"BigQuery table: {Config.GCP_PROJECT_ID}.{Config.BQ_DATASET}.{Config.BQ_TABLE} ({Config.BQ_LOAD_MODE} mode, query cache {Config.QUERY_CACHE_MODE})")
+    logger.info(f"CoinGecko: {Config.COINGECKO_API_URL} ({Config.COINGECKO_API_TIER} tier, cache {Config.CACHE_MODE})")
+    logger.info(f"Tracking {len(Config.CRYPTO_IDS)} cryptocurrencies; state in {Config.STATE_DIR}")
+    logger.info(f"Sinks: {', '.join(Config.SINKS)}" + (f" (local warehouse {Config.LOCAL_WAREHOUSE_DIR})" if "local" in Config.SINKS else ""))
+    return True
+
+
+def create_watermarks() -> "WatermarkStore":
+    """Open the incremental watermark store."""
+    from watermark_store import WatermarkStore
+    
+    return WatermarkStore(
+        Config.STATE_DIR / "watermarks.sqlite",
+        price_tolerance_pct=Config.INCREMENTAL_PRICE_TOLERANCE_PCT
+    )
+
+
+def create_anomaly_detector() -> Optional["AnomalyDetector"]:
+    """Open the anomaly baselines, or return None when ANOMALY_ACTION is off."""
+    if Config.ANOMALY_ACTION == "off":
+        return None
+    
+    from anomaly_detector import AnomalyDetector
+    
+    return AnomalyDetector(
+        Config.STATE_DIR / "anomaly_state.npz",
+        action=Config.ANOMALY_ACTION,
+        method=Config.ANOMALY_METHOD,
+        threshold=Config.ANOMALY_THRESHOLD,
+        alpha=Config.ANOMALY_ALPHA,
+        min_observations=Config.ANOMALY_MIN_OBSERVATIONS,
+        min_scale=Config.ANOMALY_MIN_SCALE
+    )
+
+
+def create_sketch_store() -> Optional["SketchStore"]:
+    """Open the per-run column sketch store, or return None when COLUMN_PROFILES is off."""
+    if Config.COLUMN_PROFILES == "off":
+        return None
+    
+    from column_sketches import SketchStore
+    
+    return SketchStore(Config.STATE_DIR / "column_sketches.sqlite")
+
+
+def create_dedupe_index(bq_loader: "BigQueryLoader") -> Optional["DedupeIndex"]:
+    """Open the index of loaded keys, or return None when DEDUPE_INDEX is off."""
+    if Config.DEDUPE_INDEX == "off":
+        return None
+    
+    from dedupe_index import DedupeIndex
+    
+    return DedupeIndex(
+        Config.STATE_DIR / "dedupe_index",
+        key_columns=Config.BQ_MERGE_KEYS,
+        confirm=bq_loader.existing_keys,
+        capacity_per_partition=Config.DEDUPE_KEYS_PER_PARTITION,
+        error_rate=Config.DEDUPE_ERROR_RATE,
+        max_open_partitions=Config.DEDUPE_MAX_OPEN_PARTITIONS
+    )
+
+
+def create_sinks(bq_loader: "BigQueryLoader") -> List["Sink"]:
+    """Build the sinks listed in SINKS, with bq_loader as the BigQuery sink."""
+    from sinks import LocalParquetSink
+    
+    return [bq_loader if name == "bigquery" else LocalParquetSink() for name in Config.SINKS]
+
+
+def parse_date(value: str) -> date:
+    """Parse a YYYY-MM-DD command-line date."""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+def run_option_parser(defaults: bool = True) -> argparse.ArgumentParser:
+    """
+    Build the parent parser holding the run command's flags.
+    
+    Args:
+        defaults: Whether flags set their defaults; the subcommand copy suppresses
+                  them so a flag given before the command is not reset by it
+    
+    Returns:
+        Parent parser for argparse.ArgumentParser(parents=...)
+    """
+    def default(value):
+        return value if defaults else argparse.SUPPRESS
+    
+    run_options = argparse.ArgumentParser(add_help=False)
+    run_options.add_argument(
+        "--stream", action="store_true", default=default(False),
+        help="Process coins as bounded batches instead of one in-memory frame"
+    )
+    run_options.add_argument(
+        "--incremental", action="store_true", default=default(False),
+        help="Only load coins whose last_updated advanced since the last successful load"
+    )
+    run_options.add_argument(
+        "--batch-size", type=int, default=default(Config.PIPELINE_BATCH_SIZE),
+        help="Rows per batch in --stream mode (default: PIPELINE_BATCH_SIZE)"
+    )
+    return run_options
+    
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Cryptocurrency MI reporting ETL pipeline",
+        parents=[run_option_parser()]
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    
+    subparsers.add_parser("run", parents=[run_option_parser(defaults=False)], help="Run the daily snapshot pipeline (default)")
+    subparsers.add_parser("validate-config", help="Validate configuration and exit")
+    
+    dry_run = subparsers.add_parser("dry-run", help="Fetch and validate a snapshot without loading it")
+    dry_run.add_argument(
+        "--incremental", action="store_true", default=argparse.SUPPRESS,
+        help="Apply the watermark filter (watermarks are not advanced)"
+    )
+    
+    backfill = subparsers.add_parser("backfill", help="Backfill history from market_chart ranges")
+    backfill.add_argument("--start", type=parse_date, required=True, help="First day to backfill (YYYY-MM-DD)")
+    backfill.add_argument("--end", type=parse_date, required=True, help="Last day to backfill, inclusive (YYYY-MM-DD)")
+    backfill.add_argument("--ids", help="Comma-separated coin IDs (default: CRYPTO_IDS)")
+    backfill.add_argument("--workers", type=int, help="Coins backfilled concurrently (default: BACKFILL_MAX_WORKERS)")
+    backfill.add_argument("--slice-days", type=int, help="Days per API request (default: BACKFILL_SLICE_DAYS)")
+    backfill.add_argument("--checkpoint", help="Checkpoint file (default: STATE_DIR/backfill_checkpoint.json)")
+    
+    daemon = subparsers.add_parser("daemon", help="Poll continuously, batching several polls per load")
+    daemon.add_argument("--interval", type=float, help="Seconds between polls (default: DAEMON_INTERVAL_SECONDS)")
+    daemon.add_argument("--polls-per-load", type=int, help="Polls buffered per load (default: DAEMON_POLLS_PER_LOAD)")
+    daemon.add_argument(
+        "--incremental", action="store_true", default=argparse.SUPPRESS,
+        help="Only load coins whose last_updated advanced since the last successful load"
+    )
+    
+    subparsers.add_parser("replay", help="Load Parquet files left in the load spool by failed loads")
+    
+    profile = subparsers.add_parser("profile", help="Report column profiles and drift from stored run sketches")
+    profile.add_argument("--days", type=int, default=7, help="Window length, compared with the window before it (default: 7)")
+    subparsers.add_parser("rebuild-watermarks", help="Rebuild the incremental watermark store from BigQuery")
+    subparsers.add_parser("rebuild-rollups", help="Recompute the daily summary and latest price tables from full history")
+    
+    args = parser.parse_args(argv)
+    args.command = args.command or "run"
+    
+    if args.command == "backfill" and args.start > args.end:
+        parser.error("--start must not be after --end")
+    
+    return args
+
+
+def run_command(args: argparse.Namespace) -> bool:
+    """
+    Build the components a command needs and run it.
+    
+    Heavy modules are imported here, per command: dry-run never loads the
+    BigQuery client library, and replay never loads the HTTP fetcher.
+    
+    Args:
+        args: Parsed command-line arguments
+    
+    Returns:
+        True if the command succeeded, False otherwise
+    """
+    logger.info("\nStep 2: Initializing components...")
+    
+    if args.command == "dry-run":
+        from data_fetcher import CryptoDataFetcher
+        from data_quality import DataQualityChecker
         
-        logger.info("✓ All data quality checks passed")
+        watermarks = create_watermarks() if args.incremental else None
+        logger.info("✓ Components initialized")
+        quality_checker = DataQualityChecker(anomaly_detector=create_anomaly_detector(), sketch_store=create_sketch_store())
+        return run_batch_pipeline(CryptoDataFetcher(), quality_checker, None, watermarks)
+    
+    if args.command == "profile":
+        sketch_store = create_sketch_store()
+        if sketch_store is None:
+            logger.error("✗ COLUMN_PROFILES is off - no column profiles are recorded")
+            return False
+        logger.info("✓ Components initialized")
+        return report_column_profile(sketch_store, args.days)
+    
+    from bigquery_loader import BigQueryLoader
+    
+    bq_loader = BigQueryLoader()
+    
+    if args.command == "rebuild-watermarks":
+        watermarks = create_watermarks()
+        logger.info("✓ Components initialized")
+        prepare_bigquery(bq_loader, first_step=3)
+        return rebuild_watermarks(bq_loader, watermarks)
+    
+    if args.command == "rebuild-rollups":
+        logger.info("✓ Components initialized")
+        prepare_bigquery(bq_loader, first_step=3)
         
-        # Initialize BigQuery client
-        logger.info("\nStep 6: Initializing BigQuery connection...")
-        if not bq_loader.initialize_client():
-            logger.error("✗ Failed to initialize BigQuery client")
-            sys.exit(1)
+        logger.info("\nStep 5: Rebuilding rollup tables...")
+        return bq_loader.refresh_rollups(rebuild=True)
+    
+    if args.command == "replay":
+        watermarks = create_watermarks() if args.incremental else None
+        bq_loader.on_spool_loaded = partial(
+            commit_loaded, watermarks=watermarks, dedupe_index=create_dedupe_index(bq_loader)
+        )
+        logger.info("✓ Components initialized")
+        prepare_bigquery(bq_loader, first_step=3)
         
-        logger.info("✓ BigQuery client initialized")
+        logger.info("\nStep 5: Replaying staged loads...")
+        if not bq_loader.replay_spool():
+            logger.error("✗ Some staged files could not be loaded - they remain in the spool")
+            return False
+        return True
+    
+    from data_fetcher import CryptoDataFetcher
+    
+    fetcher = CryptoDataFetcher()
+    watermarks = create_watermarks() if args.incremental else None
+    
+    if args.command == "daemon":
+        from daemon import PollingDaemon
         
-        # Ensure dataset exists
-        logger.info("\nStep 7: Ensuring BigQuery dataset exists...")
-        if not bq_loader.ensure_dataset_exists():
-            logger.error("✗ Failed to ensure dataset exists")
-            sys.exit(1)
+        logger.info("✓ Components initialized")
+        prepare_bigquery(bq_loader, first_step=3)
         
-        logger.info("✓ Dataset verified/created")
+        logger.info("\nStep 5: Starting polling daemon...")
+        daemon = PollingDaemon(
+            fetcher,
+            bq_loader,
+            interval=args.interval,
+            polls_per_load=args.polls_per_load,
+            watermarks=watermarks,
+            anomaly_detector=create_anomaly_detector(),
+            sketch_store=create_sketch_store(),
+            dedupe_index=create_dedupe_index(bq_loader)
+        )
+        return daemon.run()
+    
+    if args.command == "backfill":
+        logger.info("✓ Components initialized")
+        prepare_bigquery(bq_loader, first_step=3)
+        return run_backfill(fetcher, bq_loader, args)
+    
+    from data_quality import DataQualityChecker
+    
+    quality_checker = DataQualityChecker(anomaly_detector=create_anomaly_detector(), sketch_store=create_sketch_store())
+    logger.info("✓ Components initialized")
+    
+    if args.stream:
+        prepare_bigquery(bq_loader, first_step=3)
+        return run_streaming_pipeline(fetcher, quality_checker, bq_loader, args.batch_size, watermarks)
+    
+    dedupe_index = create_dedupe_index(bq_loader)
+    bq_loader.on_spool_loaded = partial(commit_loaded, watermarks=watermarks, dedupe_index=dedupe_index)
+    return run_batch_pipeline(fetcher, quality_checker, create_sinks(bq_loader), watermarks, dedupe_index)
+
+
+def write_run_metrics(metrics: RunMetrics, success: bool):
+    """
+    Finish a run's metrics, log the per-stage summary and write the metric files.
+    
+    Args:
+        metrics: Metrics collected during the run
+        success: Whether the run succeeded
+    """
+    set_run_metrics(None)
+    metrics.finish(success)
+    summary = metrics.summary()
+    
+    logger.info(f"\nRun metrics: {summary['wall_seconds']:.2f}s wall, {summary['cpu_seconds']:.2f}s CPU")
+    for name, totals in summary['stages'].items():
+        if name.startswith("pipeline."):
+            logger.info(
+                f"  {name}: {totals['wall_seconds']:.3f}s wall, {totals['cpu_seconds']:.3f}s CPU, "
+                f"{totals['rows']} rows, +{totals['peak_rss_delta_bytes'] // 1024} KiB peak RSS"
+            )
+    
+    try:
+        written = metrics.write(Config.METRICS_DIR)
+        logger.info(f"Run metrics written to {written['jsonl']} and {written['prom']}")
+    except OSError as e:
+        logger.error(f"Could not write run metrics: {str(e)}")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Main ETL pipeline execution."""
+    args = parse_args(argv)
+    configure_logging()
+    
+    if args.command == "validate-config":
+        sys.exit(0 if validate_config() else 1)
+    
+    logger.info("=" * 80)
+    logger.info("CRYPTOCURRENCY MI REPORTING AUTOMATION - ETL PIPELINE")
+    logger.info(f"Execution started at: {datetime.utcnow().isoformat()}")
+    logger.info("=" * 80)
+    
+    pipeline_success = False
+    metrics = RunMetrics(command=args.command, profile_threshold=Config.PROFILE_SLOW_RUN_SECONDS)
+    set_run_metrics(metrics)
+    
+    try:
+        # Validate configuration
+        logger.info("Step 1: Validating configuration...")
+        bigquery_only = writes_bigquery_only(args)
+        Config.validate(bigquery_only=bigquery_only)
+        logger.info("✓ Configuration validated successfully")
+        if bigquery_only and "local" in Config.SINKS:
+            logger.warning(f"SINKS includes 'local', but '{args.command}' writes to BigQuery only")
         
-        # Load data to BigQuery
-        logger.info("\nStep 8: Loading data to BigQuery...")
-        if not bq_loader.load_data(transformed_data, write_disposition="WRITE_APPEND"):
-            logger.error("✗ Failed to load data to BigQuery")
+        if not run_command(args):
             sys.exit(1)
         
-        logger.info("✓ Data successfully loaded to BigQuery")
-        
         pipeline_success = True
         
     except ValueError as e:
@@ -112,6 +823,8 @@ def main():
         logger.error(f"Unexpected error in pipeline: {str(e)}", exc_info=True)
         sys.exit(1)
     finally:
+        write_run_metrics(metrics, pipeline_success)
+        
         logger.info("\n" + "=" * 80)
         if pipeline_success:
             logger.info("ETL PIPELINE COMPLETED SUCCESSFULLY ✓")
@@ -0,0 +1,372 @@
+"""
+Run metrics module for pipeline instrumentation.
+Records wall time, CPU time, peak RSS growth, rows, bytes and retries per stage.
+"""
+
+import functools
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "mi_etl"
+
+# Stage field -> (Prometheus metric suffix, help text)
+STAGE_METRICS = {
+    'calls': ('stage_calls', 'Times a pipeline stage ran.'),
+    'errors': ('stage_errors', 'Times a pipeline stage raised an exception.'),
+    'wall_seconds': ('stage_wall_seconds', 'Wall-clock time spent in a pipeline stage.'),
+    'cpu_seconds': ('stage_cpu_seconds', 'Process CPU time spent in a pipeline stage.'),
+    'peak_rss_delta_bytes': ('stage_peak_rss_delta_bytes', 'Largest growth of peak resident memory during one call of a stage.'),
+    'rows': ('stage_rows', 'Rows processed by a pipeline stage.'),
+    'bytes': ('stage_bytes', 'Bytes transferred by a pipeline stage.'),
+    'retries': ('stage_retries', 'Request retries during a pipeline stage.'),
+}
+
+_active: Optional["RunMetrics"] = None
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process in bytes (0 where unsupported)."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def get_run_metrics() -> Optional["RunMetrics"]:
+    """Get the metrics collector of the current run, if one is active."""
+    return _active
+
+
+def set_run_metrics(metrics: Optional["RunMetrics"]):
+    """Make a metrics collector the target of stage() and @instrumented."""
+    global _active
+    _active = metrics
+
+
+@contextmanager
+def stage(name: str) -> Iterator[Dict]:
+    """
+    Time a block of code as a stage of the active run.
+    
+    The yielded dictionary accepts 'rows', 'bytes' and 'retries' counts for
+    the block. Without an active run the block runs untimed.
+    
+    Args:
+        name: Stage name (e.g. 'pipeline.fetch')
+    
+    Yields:
+        Dictionary of counts to record with the timings
+    """
+    metrics = _active
+    if metrics is None:
+        yield {}
+        return
+    
+    with metrics.stage(name) as counts:
+        yield counts
+
+
+def instrumented(name: Optional[str] = None) -> Callable:
+    """
+    Decorator recording each call of a method as a stage of the active run.
+    
+    Rows are taken from a DataFrame result, or from a DataFrame first argument.
+    If the instance has a transfer_counters() method returning cumulative
+    'bytes' and 'retries', the increase during the call is recorded too.
+    Generator methods are timed only while producing items, with one call
+    per item; the step that finds the generator exhausted adds its time but
+    no call.
+    
+    Args:
+        name: Stage name (defaults to the method's qualified name)
+    
+    Returns:
+        Decorator for instance methods
+    """
+    def decorator(func: Callable) -> Callable:
+        stage_name = name or func.__qualname__
+        
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(self, *args, **kwargs):
+                items = func(self, *args, **kwargs)
+                if _active is None:
+                    yield from items
+                    return
+                
+                while True:
+                    with _measure(self, stage_name) as counts:
+                        try:
+                            item = next(items)
+                        except StopIteration:
+                            counts['calls'] = 0
+                            return
+                        counts['rows'] = _row_count(item)
+                    yield item
+            
+            return generator_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if _active is None:
+                return func(self, *args, **kwargs)
+            
+            with _measure(self, stage_name) as counts:
+                result = func(self, *args, **kwargs)
+                counts['rows'] = _row_count(result) or (_row_count(args[0]) if args else 0)
+            return result
+        
+        return wrapper
+    
+    return decorator
+
+
+@contextmanager
+def _measure(instance, stage_name: str) -> Iterator[Dict]:
+    """Time one method call, adding the instance's transfer counter deltas."""
+    counters = getattr(instance, "transfer_counters", None)
+    before = counters() if counters is not None else None
+    
+    with stage(stage_name) as counts:
+        try:
+            yield counts
+        finally:
+            if before is not None:
+                after = counters()
+                for field in ('bytes', 'retries'):
+                    counts[field] = counts.get(field, 0) + after.get(field, 0) - before.get(field, 0)
+
+
+def _row_count(value) -> int:
+    """Number of rows in a DataFrame, 0 for anything else."""
+    if hasattr(value, "columns") and hasattr(value, "__len__"):
+        return len(value)
+    return 0
+
+
+class RunMetrics:
+    """Per-stage timings and counters for one pipeline run."""
+    
+    def __init__(self, command: str = "run", profile_threshold: float = 0.0):
+        self.command = command
+        self.run_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.started_at = datetime.utcnow()
+        self.profile_threshold = profile_threshold
+        self.stages: Dict[str, Dict] = {}
+        self.success: Optional[bool] = None
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self._lock = threading.Lock()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._profiler = None
+        
+        if profile_threshold > 0:
+            import cProfile
+            
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+    
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Dict]:
+        """
+        Time a block of code and add it to the named stage's totals.
+        
+        Args:
+            name: Stage name
+        
+        Yields:
+            Dictionary of 'rows', 'bytes' and 'retries' counts for the block
+            ('calls' may be set to 0 to add the time without counting a call)
+        """
+        counts: Dict = {}
+        rss_before = peak_rss_bytes()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        failed = False
+        
+        try:
+            yield counts
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.record(
+                name,
+                wall_seconds=time.perf_counter() - wall_start,
+                cpu_seconds=time.process_time() - cpu_start,
+                peak_rss_delta_bytes=peak_rss_bytes() - rss_before,
+                rows=counts.get('rows', 0),
+                num_bytes=counts.get('bytes', 0),
+                retries=counts.get('retries', 0),
+                failed=failed,
+                calls=counts.get('calls', 1)
+            )
+    
+    def record(
+        self,
+        name: str,
+        wall_seconds: float,
+        cpu_seconds: float = 0.0,
+        peak_rss_delta_bytes: int = 0,
+        rows: int = 0,
+        num_bytes: int = 0,
+        retries: int = 0,
+        failed: bool = False,
+        calls: int = 1
+    ):
+        """
+        Add one measured call to a stage's totals.
+        
+        Args:
+            name: Stage name
+            wall_seconds: Wall-clock duration of the call
+            cpu_seconds: Process CPU time used during the call
+            peak_rss_delta_bytes: Growth of the process's peak RSS during the call
+            rows: Rows processed
+            num_bytes: Bytes transferred
+            retries: Request retries
+            failed: Whether the call raised
+            calls: Calls the measurement covers (0 adds time to the previous one)
+        """
+        with self._lock:
+            totals = self.stages.setdefault(name, {field: 0 for field in STAGE_METRICS})
+            totals['calls'] += calls
+            totals['errors'] += int(failed)
+            totals['wall_seconds'] += wall_seconds
+            totals['cpu_seconds'] += cpu_seconds
+            totals['peak_rss_delta_bytes'] = max(totals['peak_rss_delta_bytes'], peak_rss_delta_bytes)
+            totals['rows'] += rows
+            totals['bytes'] += num_bytes
+            totals['retries'] += retries
+    
+    def finish(self, success: bool):
+        """
+        Stop the run clock and the profiler.
+        
+        Args:
+            success: Whether the run succeeded
+        """
+        self.success = success
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        self.cpu_seconds = time.process_time() - self._cpu_start
+        
+        if self._profiler is not None:
+            self._profiler.disable()
+    
+    def summary(self) -> Dict:
+        """
+        Build the machine-readable run summary.
+        
+        Returns:
+            Dictionary with run totals and per-stage metrics
+        """
+        with self._lock:
+            stages = {
+                name: {field: round(value, 6) if isinstance(value, float) else value for field, value in totals.items()}
+                for name, totals in self.stages.items()
+            }
+        
+        return {
+            'run_id': self.run_id,
+            'command': self.command,
+            'started_at': self.started_at.isoformat(),
+            'success': self.success,
+            'wall_seconds': round(self.wall_seconds, 6),
+            'cpu_seconds': round(self.cpu_seconds, 6),
+            'peak_rss_bytes': peak_rss_bytes(),
+            'stages': stages,
+        }
+    
+    def to_prometheus(self) -> str:
+        """
+        Render the run summary in the Prometheus text exposition format.
+        
+        Returns:
+            Metrics text suitable for the node_exporter textfile collector
+        """
+        summary = self.summary()
+        command = _escape_label(self.command)
+        lines = []
+        
+        run_metrics = [
+            ('run_success', 'Whether the last run succeeded.', int(bool(summary['success']))),
+            ('run_wall_seconds', 'Wall-clock duration of the last run.', summary['wall_seconds']),
+            ('run_cpu_seconds', 'Process CPU time of the last run.', summary['cpu_seconds']),
+            ('run_peak_rss_bytes', 'Peak resident memory of the last run.', summary['peak_rss_bytes']),
+            ('run_timestamp_seconds', 'Start time of the last run.', self.started_at.timestamp()),
+        ]
+        for suffix, help_text, value in run_metrics:
+            metric = f"{METRIC_PREFIX}_{suffix}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f'{metric}{{command="{command}"}} {value}')
+        
+        for field, (suffix, help_text) in STAGE_METRICS.items():
+            metric = f"{METRIC_PREFIX}_{suffix}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            for name, totals in sorted(summary['stages'].items()):
+                lines.append(f'{metric}{{command="{command}",stage="{_escape_label(name)}"}} {totals[field]}')
+        
+        return "\n".join(lines) + "\n"
+    
+    def write(self, metrics_dir: Path) -> Dict[str, Path]:
+        """
+        Write the run summary and, for slow runs, the profile.
+        
+        The summary is appended to metrics.jsonl (one line per run) and the
+        Prometheus text replaces metrics.prom. A cProfile dump is written when
+        profiling was enabled and the run took longer than the threshold.
+        
+        Args:
+            metrics_dir: Directory for metric files
+        
+        Returns:
+            Mapping of output kind ('jsonl', 'prom', 'profile') to written path
+        """
+        metrics_dir = Path(metrics_dir)
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        written = {}
+        
+        jsonl_path = metrics_dir / "metrics.jsonl"
+        with open(jsonl_path, "a") as f:
+            f.write(json.dumps(self.summary()) + "\n")
+        written['jsonl'] = jsonl_path
+        
+        prom_path = metrics_dir / "metrics.prom"
+        tmp_path = prom_path.with_suffix(".prom.tmp")
+        tmp_path.write_text(self.to_prometheus())
+        os.replace(tmp_path, prom_path)
+        written['prom'] = prom_path
+        
+        if self._profiler is not None and self.wall_seconds >= self.profile_threshold:
+            profile_path = metrics_dir / f"profile-{self.run_id}.prof"
+            self._profiler.dump_stats(str(profile_path))
+            written['profile'] = profile_path
+            logger.info(f"Run took {self.wall_seconds:.1f}s - profile written to {profile_path}")
+        
+        return written
+
+
+def _escape_label(value: str) -> str:
+    """Escape a Prometheus label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,296 @@
+"""
+Parquet staging module for BigQuery loads.
+Writes batches as compressed, fsync'ed Parquet files with a fixed schema to a
+local spool, and tracks each file's load state in a SQLite manifest.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from config import Config
+from table_schema import load_table_schema, to_arrow_schema, to_arrow_table
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.sqlite"
+
+# Manifest states: staged and not yet loaded, load attempted and failed, loaded
+# (file removed), merged into a larger file by compact (file removed)
+SPOOL_STATES = ('pending', 'failed', 'loaded', 'compacted')
+
+
+def fsync_directory(directory: Path):
+    """Flush a directory entry (e.g. after a rename) to disk where the platform allows it."""
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class SpoolManifest:
+    """SQLite record of every staged file and its load state, shared by the stagers of one spool."""
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " file TEXT PRIMARY KEY,"
+            " table_name TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " num_rows INTEGER NOT NULL,"
+            " extraction_dates TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " last_error TEXT,"
+            " compacted_into TEXT,"
+            " staged_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_state ON files (state)")
+        self._db.commit()
+    
+    def add(self, file_name: str, table_name: str, num_rows: int, extraction_dates: List[str]):
+        """Record a newly staged file as pending."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (file, table_name, state, num_rows, extraction_dates, staged_at, updated_at)"
+                " VALUES (?, ?, 'pending', ?, ?, ?, ?)",
+                (file_name, table_name, num_rows, json.dumps(extraction_dates), now, now)
+            )
+            self._db.commit()
+    
+    def set_state(self, file_names: List[str], state: str, error: Optional[str] = None, compacted_into: Optional[str] = None):
+        """
+        Move files to a new state.
+        
+        Args:
+            file_names: Staged file names
+            state: One of SPOOL_STATES
+            error: Failure message, counted as one more load attempt
+            compacted_into: File the rows were merged into (state 'compacted')
+        """
+        attempt = 1 if state == 'failed' else 0
+        with self._lock:
+            self._db.executemany(
+                "UPDATE files SET state = ?, attempts = attempts + ?, last_error = COALESCE(?, last_error),"
+                " compacted_into = COALESCE(?, compacted_into), updated_at = ? WHERE file = ?",
+                [(state, attempt, error, compacted_into, time.time(), name) for name in file_names]
+            )
+            self._db.commit()
+    
+    def entries(self, states: Optional[List[str]] = None) -> List[Dict]:
+        """
+        List manifest entries, oldest first.
+        
+        Args:
+            states: Only entries in these states (default: all)
+        
+        Returns:
+            One dictionary per file
+        """
+        query = "SELECT file, table_name, state, num_rows, extraction_dates, attempts, last_error, staged_at FROM files"
+        params: List = []
+        if states:
+            query += f" WHERE state IN ({', '.join('?' for _ in states)})"
+            params = list(states)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY staged_at, file", params).fetchall()
+        return [
+            {
+                'file': row[0],
+                'table_name': row[1],
+                'state': row[2],
+                'num_rows': row[3],
+                'extraction_dates': json.loads(row[4]),
+                'attempts': row[5],
+                'last_error': row[6],
+                'staged_at': row[7],
+            }
+            for row in rows
+        ]
+    
+    def counts(self) -> Dict[str, int]:
+        """Number of files per state."""
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*) FROM files GROUP BY state").fetchall()
+        return {state: dict(rows).get(state, 0) for state in SPOOL_STATES}
+    
+    def close(self):
+        """Close the SQLite connection."""
+        with self._lock:
+            self._db.close()
+
+
+class ParquetStager:
+    """
+    Stages DataFrames as Parquet files in a spool directory, one file per batch.
+    
+    Files are fsync'ed before they are renamed into place, so a staged batch
+    survives a crash or a failed load and can be replayed without calling the
+    API again, keeping its original extraction_timestamp.
+    """
+    
+    def __init__(
+        self,
+        table_name: Optional[str] = None,
+        spool_dir: Optional[Path] = None,
+        compression: Optional[str] = None,
+        schema_table: str = "crypto_prices"
+    ):
+        self.table_name = table_name or Config.BQ_TABLE
+        self.spool_dir = Path(spool_dir or Config.STATE_DIR / "load_spool")
+        self.compression = compression or Config.STAGING_COMPRESSION
+        self.columns = load_table_schema(schema_table)
+        self.arrow_schema = to_arrow_schema(self.columns)
+        self._manifest: Optional[SpoolManifest] = None
+    
+    @property
+    def manifest(self) -> SpoolManifest:
+        """Manifest of the spool directory, created on first use."""
+        if self._manifest is None:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            self._manifest = SpoolManifest(self.spool_dir / MANIFEST_NAME)
+        return self._manifest
+    
+    def to_arrow(self, df: pd.DataFrame) -> pa.Table:
+        """
+        Convert a DataFrame to an Arrow table with the table's schema.
+        
+        Args:
+            df: DataFrame to convert
+        
+        Returns:
+            Arrow table matching sql/schema.sql
+        """
+        return to_arrow_table(df, self.arrow_schema)
+    
+    def stage(self, df: pd.DataFrame) -> Path:
+        """
+        Write a DataFrame to a new Parquet file in the spool.
+        
+        The file is written under a temporary name, fsync'ed and renamed once
+        complete, so the spool never contains partial files, and it is
+        recorded as pending in the manifest.
+        
+        Args:
+            df: DataFrame to stage
+        
+        Returns:
+            Path of the staged file
+        """
+        return self._write(self.to_arrow(df))
+    
+    def compact(self, paths: List[Path], key_columns: Optional[List[str]] = None) -> Path:
+        """
+        Merge several staged files into one, so they load with a single job.
+        
+        The merged file is made durable before the originals are removed and
+        marked compacted. A single file is returned as it is.
+        
+        Args:
+            paths: Staged files of this stager's table, oldest first
+            key_columns: If given, rows repeating a key keep only the newest copy
+        
+        Returns:
+            Path of the file to load
+        """
+        if len(paths) == 1:
+            return paths[0]
+        
+        table = pa.concat_tables([pq.read_table(path, schema=self.arrow_schema) for path in paths])
+        if key_columns:
+            df = table.to_pandas()
+            duplicated = df.duplicated(subset=key_columns, keep='last').to_numpy()
+            if duplicated.any():
+                table = table.filter(pa.array(~duplicated))
+        
+        path = self._write(table)
+        names = [Path(p).name for p in paths]
+        self.manifest.set_state(names, 'compacted', compacted_into=path.name)
+        for old_path in paths:
+            Path(old_path).unlink(missing_ok=True)
+        
+        logger.info(f"Compacted {len(paths)} staged files into {path.name} ({table.num_rows} records)")
+        return path
+    
+    def _write(self, table: pa.Table) -> Path:
+        """Durably write an Arrow table to a new spool file and record it as pending."""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        path = self.spool_dir / f"{self.table_name}-{stamp}-{uuid.uuid4().hex[:8]}.parquet"
+        tmp_path = path.with_suffix(".parquet.tmp")
+        
+        with open(tmp_path, "wb") as f:
+            pq.write_table(table, f, compression=self.compression)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        fsync_directory(self.spool_dir)
+        
+        self.manifest.add(path.name, self.table_name, table.num_rows, self._extraction_dates(table))
+        logger.info(f"Staged {table.num_rows} records to {path.name} ({path.stat().st_size} bytes)")
+        return path
+    
+    def pending(self) -> List[Path]:
+        """
+        List staged files that have not been loaded yet, oldest first.
+        
+        Returns:
+            Paths of staged Parquet files
+        """
+        if not self.spool_dir.exists():
+            return []
+        return sorted(self.spool_dir.glob(f"{self.table_name}-*.parquet"))
+    
+    def discard(self, path: Path):
+        """
+        Remove a staged file after it has been loaded.
+        
+        Args:
+            path: Staged file to remove
+        """
+        self.manifest.set_state([Path(path).name], 'loaded')
+        try:
+            Path(path).unlink()
+        except FileNotFoundError:
+            pass
+
+    def mark_failed(self, path: Path, error: str):
+        """
+        Record a failed load attempt of a staged file, which stays in the spool.
+        
+        Args:
+            path: Staged file
+            error: Failure message
+        """
+        self.manifest.set_state([Path(path).name], 'failed', error=error)
+    
+    @staticmethod
+    def _extraction_dates(table: pa.Table) -> List[str]:
+        """ISO dates of the extraction_timestamp values in a staged table."""
+        if 'extraction_timestamp' not in table.column_names:
+            return []
+        dates = pc.unique(table.column('extraction_timestamp').cast(pa.timestamp('us', tz='UTC')).cast(pa.date32()))
+        return sorted(day.isoformat() for day in dates.to_pylist() if day is not None)
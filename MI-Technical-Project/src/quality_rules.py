@@ -0,0 +1,227 @@
+"""
+Declarative data quality rules for the crypto_prices and reference table schemas.
+Compiles null, type and range rules into a single vectorized pass.
+"""
+
+import logging
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Rules for the crypto_prices table (see sql/schema.sql)
+CRYPTO_PRICES_RULES = {
+    'not_null': ['crypto_id', 'symbol', 'name', 'current_price'],
+    'types': {
+        'crypto_id': ['category', 'string', 'object'],
+        'symbol': ['category', 'string', 'object'],
+        'name': ['category', 'string', 'object'],
+        'vs_currency': ['category', 'string', 'object'],
+        'current_price': ['float64', 'float32', 'int64'],
+        'market_cap': ['float64', 'float32', 'int64'],
+        'market_cap_rank': ['Int64', 'int64', 'float64'],
+        'total_volume': ['float64', 'float32', 'int64'],
+        'last_updated': ['datetime64[ns, UTC]', 'datetime64[ns]'],
+        'extraction_timestamp': ['datetime64[ns, UTC]', 'datetime64[ns]'],
+    },
+    'ranges': {
+        'current_price': {'min': 0},
+        'market_cap': {'min': 0},
+    },
+}
+
+# Rules for the crypto_global_metrics table
+GLOBAL_METRICS_RULES = {
+    'not_null': ['vs_currency', 'total_market_cap', 'total_volume'],
+    'types': {
+        'vs_currency': ['category', 'string', 'object'],
+        'total_market_cap': ['float64'],
+        'total_volume': ['float64'],
+        'extraction_timestamp': ['datetime64[ns, UTC]', 'datetime64[ns]'],
+    },
+    'ranges': {
+        'total_market_cap': {'min': 0},
+        'total_volume': {'min': 0},
+        'market_cap_percentage_btc': {'min': 0, 'max': 100},
+        'market_cap_percentage_eth': {'min': 0, 'max': 100},
+    },
+}
+
+# Rules for the crypto_exchange_rates table
+EXCHANGE_RATES_RULES = {
+    'not_null': ['currency', 'btc_rate'],
+    'types': {
+        'currency': ['category', 'string', 'object'],
+        'btc_rate': ['float64'],
+        'extraction_timestamp': ['datetime64[ns, UTC]', 'datetime64[ns]'],
+    },
+    'ranges': {
+        'btc_rate': {'min': 0},
+    },
+}
+
+# Rules per reference endpoint fetched alongside /coins/markets
+REFERENCE_RULES = {
+    'global': GLOBAL_METRICS_RULES,
+    'exchange_rates': EXCHANGE_RATES_RULES,
+}
+
+
+class RuleEngine:
+    """Evaluates compiled quality rules over column arrays in one pass."""
+    
+    def __init__(self, rules: Optional[Dict] = None, min_records: int = 1, max_null_pct: float = 10.0):
+        self.rules = rules or CRYPTO_PRICES_RULES
+        self.min_records = min_records
+        self.max_null_pct = max_null_pct
+        self.plan = self._compile(self.rules)
+    
+    @staticmethod
+    def _compile(rules: Dict) -> Dict[str, Dict]:
+        """
+        Group rules by column so each column array is visited once.
+        
+        Args:
+            rules: Declarative rule specification
+        
+        Returns:
+            Mapping of column name to the checks that apply to it
+        """
+        plan: Dict[str, Dict] = {}
+        
+        for col in rules.get('not_null', []):
+            plan.setdefault(col, {})['not_null'] = True
+        
+        for col, valid_types in rules.get('types', {}).items():
+            plan.setdefault(col, {})['types'] = list(valid_types)
+        
+        for col, bounds in rules.get('ranges', {}).items():
+            plan.setdefault(col, {})['range'] = (bounds.get('min'), bounds.get('max'))
+        
+        return plan
+    
+    def evaluate(self, df: pd.DataFrame) -> Tuple[bool, Dict, Dict[str, np.ndarray]]:
+        """
+        Run every compiled rule against a DataFrame.
+        
+        Args:
+            df: DataFrame to validate
+        
+        Returns:
+            Tuple of (validation_passed, quality_report, violation_masks). The
+            report has the same keys as DataQualityChecker.run_all_checks;
+            violation_masks maps 'null:<col>' and 'range:<col>' rules, plus
+            'any', to boolean row masks.
+        """
+        report: Dict = {}
+        masks: Dict[str, np.ndarray] = {}
+        
+        if df is None or df.empty:
+            logger.error("Data Quality FAILED: Empty DataFrame received")
+            report['empty_check'] = 'FAILED'
+            report['overall_status'] = 'FAILED'
+            return False, report, masks
+        
+        num_rows = len(df)
+        logger.info(f"Data Quality PASSED: Empty check - {num_rows} records found")
+        report['empty_check'] = 'PASSED'
+        report['record_count'] = num_rows
+        
+        min_records_ok = num_rows >= self.min_records
+        if min_records_ok:
+            logger.info(f"Data Quality PASSED: Minimum records check - {num_rows} records")
+        else:
+            logger.error(f"Data Quality FAILED: Only {num_rows} records, minimum required: {self.min_records}")
+        report['min_records_check'] = 'PASSED' if min_records_ok else 'FAILED'
+        
+        null_report = {}
+        null_failed = False
+        type_failed = False
+        range_failed = False
+        any_violation = np.zeros(num_rows, dtype=bool)
+        
+        for col, checks in self.plan.items():
+            if col not in df.columns:
+                continue
+            
+            series = df[col]
+            values = self._numeric_values(series)
+            
+            if 'types' in checks and series.dtype.name not in checks['types']:
+                logger.error(f"Data Quality FAILED: Column '{col}' has invalid type '{series.dtype}'")
+                type_failed = True
+            
+            null_mask = None
+            if checks.get('not_null') or 'range' in checks:
+                if values is None:
+                    null_mask = series.isna().to_numpy()
+                elif values.dtype.kind == 'f':
+                    null_mask = np.isnan(values)
+                else:
+                    null_mask = np.zeros(num_rows, dtype=bool)
+            
+            if checks.get('not_null'):
+                null_count = int(np.count_nonzero(null_mask))
+                null_pct = (null_count / num_rows) * 100
+                null_report[col] = {
+                    'null_count': null_count,
+                    'null_percentage': round(null_pct, 2)
+                }
+                masks[f'null:{col}'] = null_mask
+                any_violation |= null_mask
+                
+                if null_pct > self.max_null_pct:
+                    logger.error(f"Data Quality FAILED: Column '{col}' has {null_pct:.2f}% null values (threshold: {self.max_null_pct}%)")
+                    null_failed = True
+            
+            if 'range' in checks and values is not None:
+                low, high = checks['range']
+                range_mask = np.zeros(num_rows, dtype=bool)
+                if low is not None:
+                    range_mask |= values < low
+                if high is not None:
+                    range_mask |= values > high
+                range_mask &= ~null_mask
+                
+                violations = int(np.count_nonzero(range_mask))
+                masks[f'range:{col}'] = range_mask
+                any_violation |= range_mask
+                
+                if violations:
+                    logger.error(f"Data Quality FAILED: Found {violations} records with '{col}' outside range [{low}, {high}]")
+                    range_failed = True
+        
+        report['null_values'] = null_report
+        report['null_check'] = 'FAILED' if null_failed else 'PASSED'
+        report['datatype_check'] = 'FAILED' if type_failed else 'PASSED'
+        report['range_check'] = 'FAILED' if range_failed else 'PASSED'
+        masks['any'] = any_violation
+        
+        for check in ('null_check', 'datatype_check', 'range_check'):
+            if report[check] == 'PASSED':
+                logger.info(f"Data Quality PASSED: {self._check_label(check)} check")
+        
+        all_passed = min_records_ok and not (null_failed or type_failed or range_failed)
+        report['overall_status'] = 'PASSED' if all_passed else 'FAILED'
+        
+        return all_passed, report, masks
+    
+    @staticmethod
+    def _numeric_values(series: pd.Series) -> Optional[np.ndarray]:
+        """Return a NumPy view of a numeric column (float64 for nullable dtypes), or None."""
+        if isinstance(series.dtype, np.dtype):
+            return series.to_numpy(copy=False) if series.dtype.kind in 'fiub' else None
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            return series.to_numpy(dtype='float64', na_value=np.nan)
+        return None
+    
+    @staticmethod
+    def _check_label(check: str) -> str:
+        """Human-readable name for a report key."""
+        return {
+            'null_check': 'Null values',
+            'datatype_check': 'Data types',
+            'range_check': 'Value ranges',
+        }[check]
@@ -0,0 +1,339 @@
+"""
+Query cache module for BigQuery query results.
+Stores result sets as local Parquet files indexed in SQLite, with LRU eviction
+and invalidation when the loader writes to a table partition a result depends on.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+TABLE_REF_PATTERN = re.compile(r"`([^`]+)`")
+COMMENT_PATTERN = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Normalize a query for use in a cache key.
+    
+    Comments are removed and whitespace runs outside string literals are
+    collapsed, so reformatting a query does not change its key.
+    
+    Args:
+        query: SQL query
+    
+    Returns:
+        Normalized SQL text
+    """
+    parts = re.split(r"('(?:[^'\\]|\\.)*')", COMMENT_PATTERN.sub(" ", query))
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s+", " ", parts[i])
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def table_key(ref: str) -> str:
+    """Reduce a table reference to lower-case 'dataset.table', ignoring the project."""
+    return ".".join(str(ref).strip("`").split(".")[-2:]).lower()
+
+
+def referenced_tables(query: str) -> Set[str]:
+    """Tables and views a query reads, from its backtick-quoted references."""
+    return {table_key(ref) for ref in TABLE_REF_PATTERN.findall(COMMENT_PATTERN.sub(" ", query)) if "." in ref}
+
+
+class QueryCache:
+    """Thread-safe local cache of query result sets stored as Parquet files."""
+    
+    def __init__(
+        self,
+        directory: Path,
+        max_bytes: int = 512 * 1024 * 1024,
+        ttl_seconds: int = 3600,
+        dependencies: Optional[Dict[str, Iterable[str]]] = None
+    ):
+        """
+        Args:
+            directory: Directory for result files and the SQLite index
+            max_bytes: Total result file size above which least recently used entries are evicted
+            ttl_seconds: Maximum entry age, covering writes made outside this
+                machine's loader (0 keeps entries until invalidated or evicted)
+            dependencies: Tables each view reads, keyed by 'dataset.view', so a
+                write to a base table invalidates results read through its views
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.dependencies = {
+            table_key(view): {table_key(table) for table in tables}
+            for view, tables in (dependencies or {}).items()
+        }
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.directory / "index.sqlite"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " file TEXT NOT NULL,"
+            " tables TEXT NOT NULL,"
+            " partitions TEXT,"
+            " size INTEGER NOT NULL,"
+            " num_rows INTEGER NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS writes (table_name TEXT PRIMARY KEY, written_at REAL NOT NULL)")
+        self._db.commit()
+    
+    @staticmethod
+    def make_key(query: str, params: Optional[Dict] = None) -> str:
+        """
+        Build a cache key from normalized SQL and query parameters.
+        
+        Args:
+            query: SQL query
+            params: Named query parameters
+        
+        Returns:
+            Hex digest identifying the query
+        """
+        normalized_params = sorted((name, str(value)) for name, value in (params or {}).items())
+        payload = json.dumps([normalize_sql(query), normalized_params], separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def base_tables(self, query: str) -> Set[str]:
+        """
+        Tables a query depends on, with views expanded to the tables they read.
+        
+        Args:
+            query: SQL query
+        
+        Returns:
+            Set of 'dataset.table' names (empty if the query names no tables)
+        """
+        tables = set()
+        pending = list(referenced_tables(query))
+        while pending:
+            name = pending.pop()
+            if name in tables:
+                continue
+            tables.add(name)
+            pending.extend(self.dependencies.get(name, ()))
+        return tables
+    
+    def get(self, query: str, params: Optional[Dict] = None) -> Optional[pa.Table]:
+        """
+        Look up a cached result set.
+        
+        Args:
+            query: SQL query
+            params: Named query parameters
+        
+        Returns:
+            Arrow table, or None on a miss or expired entry
+        """
+        key = self.make_key(query, params)
+        now = time.time()
+        
+        with self._lock:
+            row = self._db.execute("SELECT file, stored_at FROM results WHERE key = ?", (key,)).fetchone()
+            
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                self.misses += 1
+                return None
+            
+            try:
+                table = pq.read_table(self.directory / row[0])
+            except (OSError, pa.ArrowInvalid) as e:
+                logger.warning(f"Dropping unreadable query cache entry {row[0]}: {str(e)}")
+                self._delete([(key, row[0])])
+                self._db.commit()
+                self.misses += 1
+                return None
+            
+            self._db.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+        
+        return table
+    
+    def put(
+        self,
+        query: str,
+        params: Optional[Dict],
+        table: pa.Table,
+        partitions: Optional[Iterable[str]] = None,
+        started_at: Optional[float] = None
+    ) -> bool:
+        """
+        Store a result set, evicting least recently used entries over the size bound.
+        
+        Queries that name no tables are not cached, since no write could
+        invalidate them. Neither are results of queries that started before
+        the latest recorded write to one of their tables, which may predate it.
+        
+        Args:
+            query: SQL query
+            params: Named query parameters
+            table: Result set
+            partitions: ISO dates of the partitions the result reads (None means
+                any write to its tables invalidates it)
+            started_at: time.time() when the query was submitted
+        
+        Returns:
+            True if the result was stored, False otherwise
+        """
+        tables = self.base_tables(query)
+        if not tables:
+            logger.debug("Query names no tables - result not cached")
+            return False
+        
+        if started_at is not None and self._last_write(tables) >= started_at:
+            logger.info("Tables were written while the query ran - result not cached")
+            return False
+        
+        key = self.make_key(query, params)
+        file_name = f"{key[:32]}-{uuid.uuid4().hex[:8]}.parquet"
+        path = self.directory / file_name
+        tmp_path = path.with_name(path.name + ".tmp")
+        
+        try:
+            pq.write_table(table, tmp_path, compression="zstd")
+            os.replace(tmp_path, path)
+        except (OSError, pa.ArrowException) as e:
+            logger.warning(f"Could not cache query result: {str(e)}")
+            tmp_path.unlink(missing_ok=True)
+            return False
+        
+        now = time.time()
+        partitions_json = json.dumps(sorted(partitions)) if partitions is not None else None
+        
+        with self._lock:
+            previous = self._db.execute("SELECT key, file FROM results WHERE key = ?", (key,)).fetchall()
+            self._delete(previous)
+            self._db.execute(
+                "INSERT INTO results (key, file, tables, partitions, size, num_rows, stored_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, file_name, json.dumps(sorted(tables)), partitions_json,
+                 path.stat().st_size, table.num_rows, now, now)
+            )
+            self.stores += 1
+            self._evict()
+            self._db.commit()
+        return True
+    
+    def record_write(self, table_ref: str, partitions: Optional[Iterable[str]] = None) -> int:
+        """
+        Invalidate cached results that read a table the loader has written to.
+        
+        A result is kept if it declared the partitions it reads and none of
+        them were written.
+        
+        Args:
+            table_ref: Table written to
+            partitions: ISO dates of the partitions written (None means any partition)
+        
+        Returns:
+            Number of entries invalidated
+        """
+        name = table_key(table_ref)
+        written = set(partitions) if partitions is not None else None
+        
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO writes (table_name, written_at) VALUES (?, ?)", (name, time.time())
+            )
+            stale = []
+            for key, file_name, tables, read in self._db.execute("SELECT key, file, tables, partitions FROM results"):
+                if name not in json.loads(tables):
+                    continue
+                if written is not None and read is not None and not written.intersection(json.loads(read)):
+                    continue
+                stale.append((key, file_name))
+            
+            self._delete(stale)
+            self._db.commit()
+            self.invalidations += len(stale)
+        
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached query results after a write to {name}")
+        return len(stale)
+    
+    def _last_write(self, tables: Set[str]) -> float:
+        """Time of the latest recorded write to any of the tables (0 if none)."""
+        placeholders = ", ".join("?" for _ in tables)
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT COALESCE(MAX(written_at), 0) FROM writes WHERE table_name IN ({placeholders})",
+                sorted(tables)
+            ).fetchone()
+        return row[0]
+    
+    def clear(self):
+        """Remove every cached result."""
+        with self._lock:
+            self._delete(self._db.execute("SELECT key, file FROM results").fetchall())
+            self._db.commit()
+    
+    def _delete(self, entries: List):
+        """Delete index rows and result files for (key, file) pairs."""
+        for key, file_name in entries:
+            self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            (self.directory / file_name).unlink(missing_ok=True)
+    
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        rows = self._db.execute("SELECT key, file, size FROM results ORDER BY accessed_at").fetchall()
+        for key, file_name, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._delete([(key, file_name)])
+            total -= size
+            self.evictions += 1
+    
+    def stats(self) -> Dict:
+        """
+        Get hit, miss, store, eviction and invalidation counters.
+        
+        Returns:
+            Dictionary of cache statistics
+        """
+        with self._lock:
+            size = self._db.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM results").fetchone()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': size[1],
+                'bytes': size[0],
+            }
+    
+    def close(self):
+        """Close the SQLite connection."""
+        with self._lock:
+            self._db.close()
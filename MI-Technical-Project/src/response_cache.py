@@ -0,0 +1,201 @@
+"""
+Response cache module for CoinGecko API calls.
+Stores compressed response bodies in SQLite with per-endpoint TTLs and LRU eviction.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class OfflineCacheMiss(RuntimeError):
+    """Raised in offline mode when a request is not in the cache."""
+
+
+def parse_endpoint_ttls(value: str) -> Dict[str, int]:
+    """
+    Parse a 'path=seconds,path=seconds' TTL specification.
+    
+    Args:
+        value: Comma-separated endpoint=seconds pairs
+    
+    Returns:
+        Mapping of endpoint path fragment to TTL in seconds
+    """
+    ttls = {}
+    for item in value.split(","):
+        if "=" in item:
+            endpoint, seconds = item.split("=", 1)
+            ttls[endpoint.strip()] = int(seconds)
+    return ttls
+
+
+class ResponseCache:
+    """Thread-safe SQLite cache of API response bodies."""
+    
+    def __init__(
+        self,
+        path: Path,
+        default_ttl: int = 300,
+        endpoint_ttls: Optional[Dict[str, int]] = None,
+        max_bytes: int = 256 * 1024 * 1024,
+        offline: bool = False
+    ):
+        self.path = Path(path)
+        self.default_ttl = default_ttl
+        self.endpoint_ttls = endpoint_ttls or {}
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " endpoint TEXT NOT NULL,"
+            " body BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._db.commit()
+    
+    @staticmethod
+    def make_key(endpoint: str, params: Optional[Dict]) -> str:
+        """
+        Build a cache key from an endpoint and normalized query parameters.
+        
+        Parameter order, value types and the order of comma-separated ids do
+        not change the key.
+        
+        Args:
+            endpoint: API path (e.g. '/coins/markets')
+            params: Query string parameters
+        
+        Returns:
+            Hex digest identifying the request
+        """
+        normalized = {}
+        for name, value in (params or {}).items():
+            if isinstance(value, bool):
+                value = str(value).lower()
+            value = str(value)
+            if name == "ids":
+                value = ",".join(sorted(part.strip() for part in value.split(",")))
+            normalized[name] = value
+        
+        payload = json.dumps([endpoint, sorted(normalized.items())], separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def ttl_for(self, endpoint: str) -> int:
+        """TTL in seconds for an endpoint, using the longest matching configured fragment."""
+        matches = [fragment for fragment in self.endpoint_ttls if fragment in endpoint]
+        if not matches:
+            return self.default_ttl
+        return self.endpoint_ttls[max(matches, key=len)]
+    
+    def get(self, endpoint: str, params: Optional[Dict] = None) -> Optional[bytes]:
+        """
+        Look up a cached response body.
+        
+        In offline mode entries never expire, so previously fetched data can be
+        replayed without network access.
+        
+        Args:
+            endpoint: API path
+            params: Query string parameters
+        
+        Returns:
+            Response body, or None on a miss or expired entry
+        """
+        key = self.make_key(endpoint, params)
+        now = time.time()
+        
+        with self._lock:
+            row = self._db.execute("SELECT body, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            
+            if row is None or (not self.offline and now - row[1] > self.ttl_for(endpoint)):
+                self.misses += 1
+                return None
+            
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+        
+        return zlib.decompress(row[0])
+    
+    def put(self, endpoint: str, params: Optional[Dict], body: bytes):
+        """
+        Store a response body, evicting least recently used entries over the size bound.
+        
+        Args:
+            endpoint: API path
+            params: Query string parameters
+            body: Raw response body
+        """
+        if self.offline:
+            return
+        
+        key = self.make_key(endpoint, params)
+        compressed = zlib.compress(body, 6)
+        now = time.time()
+        
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, body, size, stored_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, compressed, len(compressed), now, now)
+            )
+            self.stores += 1
+            self._evict()
+            self._db.commit()
+    
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+    
+    def stats(self) -> Dict:
+        """
+        Get hit, miss, store and eviction counters.
+        
+        Returns:
+            Dictionary of cache statistics
+        """
+        with self._lock:
+            size = self._db.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM responses").fetchone()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'entries': size[1],
+                'bytes': size[0],
+            }
+    
+    def close(self):
+        """Close the SQLite connection."""
+        with self._lock:
+            self._db.close()
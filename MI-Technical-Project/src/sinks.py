@@ -0,0 +1,378 @@
+"""
+Sink module for the destinations a run writes validated batches to.
+Defines the Sink interface (BigQueryLoader is one implementation) and a local
+Hive-partitioned Parquet warehouse queried in-process with DuckDB.
+"""
+
+import logging
+import re
+from abc import ABC, abstractmethod
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from config import Config
+from columnar_decoder import DEFAULT_VS_CURRENCY
+from table_schema import (
+    REFERENCE_TABLES, load_create_table, load_table_schema, load_view_definitions, to_arrow_schema, to_arrow_table
+)
+
+logger = logging.getLogger(__name__)
+
+SINK_NAMES = ('bigquery', 'local')
+
+# Hive partition column holding DATE(extraction_timestamp)
+PARTITION_DATE_COLUMN = "extraction_date"
+
+DATABASE_NAME = "warehouse.duckdb"
+
+# Rollup queries over a crypto_prices source, matching BigQueryLoader.build_rollup_query
+LOCAL_ROLLUPS = {
+    'crypto_daily_summary': """
+SELECT
+  CAST(extraction_timestamp AS DATE) AS date,
+  crypto_id,
+  COALESCE(vs_currency, '{currency}') AS vs_currency,
+  symbol,
+  name,
+  AVG(current_price) AS avg_price,
+  MIN(low_24h) AS daily_low,
+  MAX(high_24h) AS daily_high,
+  AVG(market_cap) AS avg_market_cap,
+  AVG(total_volume) AS avg_volume,
+  AVG(price_change_percentage_24h) AS avg_24h_change_pct,
+  COUNT(*) AS data_points,
+  CURRENT_TIMESTAMP AS refreshed_at
+FROM {source}
+GROUP BY 1, 2, 3, 4, 5""",
+    'crypto_latest_prices': """
+SELECT {latest_columns}
+FROM {source}
+QUALIFY ROW_NUMBER() OVER (PARTITION BY crypto_id, COALESCE(vs_currency, '{currency}') ORDER BY extraction_timestamp DESC) = 1""",
+}
+
+class Sink(ABC):
+    """Destination for validated market data and reference frames."""
+    
+    name = "sink"
+    
+    @abstractmethod
+    def write(self, df: pd.DataFrame, reference_frames: Optional[Dict[str, pd.DataFrame]] = None) -> bool:
+        """
+        Write one validated batch.
+        
+        Args:
+            df: Validated market data
+            reference_frames: Validated reference frames keyed by fetch
+                endpoint ('global', 'exchange_rates')
+        
+        Returns:
+            True if the batch was written, False otherwise
+        """
+    
+    def pending_rows(self) -> Optional[pd.DataFrame]:
+        """
+        Rows accepted by an earlier write but not yet in the destination.
+        
+        Returns:
+            DataFrame of the queued market data rows, or None if the sink does not queue writes
+        """
+        return None
+    
+    def close(self):
+        """Release connections held by the sink."""
+
+
+class LocalParquetSink(Sink):
+    """
+    Writes batches to a local Parquet dataset and answers queries over it with DuckDB.
+    
+    crypto_prices is partitioned by extraction_date and crypto_id in the Hive
+    layout (extraction_date=2024-01-01/crypto_id=bitcoin/part-*.parquet), and
+    the reference tables by extraction_date. Like the BigQuery MERGE, a
+    crypto_prices row replaces a stored row with the same BQ_MERGE_KEYS, so
+    rewriting a batch does not duplicate it. The rollup tables are kept in a
+    DuckDB file next to the dataset and refreshed for the dates each write
+    touches, so the sql/schema.sql views read a few small tables instead of
+    every Parquet file. Queries use the dataset and table names of sql/schema.sql.
+    """
+    
+    name = "local"
+    
+    def __init__(self, root: Optional[Path] = None, dataset: Optional[str] = None):
+        """
+        Args:
+            root: Warehouse directory (defaults to LOCAL_WAREHOUSE_DIR)
+            dataset: Schema name queries refer to (defaults to BQ_DATASET)
+        """
+        self.root = Path(root or Config.LOCAL_WAREHOUSE_DIR)
+        self.dataset = dataset or Config.BQ_DATASET
+        self.table_name = Config.BQ_TABLE
+        self.key_columns = Config.BQ_MERGE_KEYS
+        self.compression = Config.STAGING_COMPRESSION
+        self.schemas = {
+            self.table_name: to_arrow_schema(load_table_schema("crypto_prices")),
+            **{table: to_arrow_schema(load_table_schema(table)) for table in REFERENCE_TABLES.values()},
+        }
+        self._connection = None
+        self._view_tables = None
+        self._lock = threading.Lock()
+    
+    def write(self, df: pd.DataFrame, reference_frames: Optional[Dict[str, pd.DataFrame]] = None) -> bool:
+        """
+        Upsert a validated batch into the local dataset and refresh the rollups of its dates.
+        
+        Args:
+            df: Validated market data
+            reference_frames: Validated reference frames keyed by fetch endpoint
+        
+        Returns:
+            True if every frame was written, False otherwise
+        """
+        frames = {self.table_name: df}
+        frames.update({REFERENCE_TABLES[endpoint]: frame for endpoint, frame in (reference_frames or {}).items()})
+        
+        try:
+            dates = []
+            for table_name, frame in frames.items():
+                is_target = table_name == self.table_name
+                partitions = [PARTITION_DATE_COLUMN, 'crypto_id'] if is_target else [PARTITION_DATE_COLUMN]
+                written = self._write_table(
+                    table_name, to_arrow_table(frame, self.schemas[table_name]), partitions,
+                    self.key_columns if is_target else None
+                )
+                if table_name == self.table_name:
+                    dates = written
+            
+            with self._lock:
+                self._refresh_rollups(self._connect(), dates)
+        except Exception as e:
+            logger.error(f"Error writing data to local warehouse {self.root}: {str(e)}")
+            return False
+        
+        logger.info(f"Wrote {len(df)} records to local warehouse {self.root}")
+        return True
+    
+    def _write_table(
+        self,
+        table_name: str,
+        table: pa.Table,
+        partitions: List[str],
+        key_columns: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Write an Arrow table under its table directory in the Hive layout.
+        
+        With key columns, the partitions the table touches are rewritten:
+        stored rows whose key the table repeats are dropped and the rest are
+        written back with the new rows, replacing the old files.
+        
+        Args:
+            table_name: Table directory under the warehouse root
+            table: Rows to write, in the table's schema
+            partitions: Hive partition columns, extraction_date first
+            key_columns: Columns identifying a row (None appends)
+        
+        Returns:
+            ISO extraction dates written
+        """
+        dates = table.column('extraction_timestamp').cast(pa.timestamp('us', tz='UTC')).cast(pa.date32())
+        table = table.append_column(PARTITION_DATE_COLUMN, dates)
+        partitioning = ds.partitioning(pa.schema([table.schema.field(col) for col in partitions]), flavor="hive")
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        
+        replaced = []
+        if key_columns:
+            table, replaced = self._merge_stored_rows(table_name, table, partitions, partitioning, key_columns)
+        
+        ds.write_dataset(
+            table,
+            self.root / table_name,
+            format="parquet",
+            partitioning=partitioning,
+            basename_template=f"part-{stamp}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            file_options=ds.ParquetFileFormat().make_write_options(compression=self.compression)
+        )
+        for path in replaced:
+            path.unlink()
+        return sorted({day.isoformat() for day in dates.unique().to_pylist() if day is not None})
+    
+    def _merge_stored_rows(
+        self,
+        table_name: str,
+        table: pa.Table,
+        partitions: List[str],
+        partitioning: ds.Partitioning,
+        key_columns: List[str]
+    ) -> Tuple[pa.Table, List[Path]]:
+        """Add the stored rows of the table's partitions that it does not replace, returning the files they came from."""
+        table_dir = self.root / table_name
+        directories = {
+            table_dir.joinpath(*(f"{col}={value}" for col, value in zip(partitions, values)))
+            for values in zip(*(table.column(col).to_pylist() for col in partitions))
+        }
+        files = sorted(path for directory in directories for path in directory.glob("*.parquet"))
+        
+        new_keys = self._keys(table, key_columns)
+        repeated = new_keys.duplicated(keep='last')
+        if repeated.any():
+            table = table.filter(pa.array(~repeated))
+            new_keys = new_keys[~repeated]
+        if not files:
+            return table, []
+        
+        stored = ds.dataset(
+            [str(path) for path in files], format="parquet", partitioning=partitioning, partition_base_dir=str(table_dir)
+        ).to_table().select(table.schema.names).cast(table.schema)
+        kept = stored.filter(pa.array(~self._keys(stored, key_columns).isin(new_keys)))
+        logger.debug(f"Rewriting {len(files)} files of {table_name}: {stored.num_rows - kept.num_rows} rows replaced")
+        return pa.concat_tables([kept, table]), files
+    
+    @staticmethod
+    def _keys(table: pa.Table, key_columns: List[str]) -> pd.MultiIndex:
+        """Row keys of a table, with rows from before vs_currency existed keyed as USD."""
+        keys = table.select(key_columns).to_pandas()
+        if 'vs_currency' in keys:
+            keys['vs_currency'] = keys['vs_currency'].astype(object).fillna(DEFAULT_VS_CURRENCY)
+        return pd.MultiIndex.from_frame(keys)
+    
+    def query(self, query: str, params: Optional[Dict] = None) -> pd.DataFrame:
+        """
+        Run a query against the local dataset.
+        
+        BigQuery Standard SQL is accepted for the subset the DuckDB stand-in
+        translates, so `project.dataset.v_latest_crypto_prices` and
+        @named parameters work unchanged.
+        
+        Args:
+            query: SQL query
+            params: Named query parameters
+        
+        Returns:
+            Query results as a DataFrame
+        """
+        from local_bigquery import translate_sql
+        
+        with self._lock:
+            connection = self._connect()
+            return connection.execute(translate_sql(query), params or {}).fetchdf()
+    
+    def rebuild_rollups(self):
+        """Recompute the rollup tables from every Parquet file of the dataset."""
+        with self._lock:
+            self._refresh_rollups(self._connect(), None)
+    
+    def _connect(self):
+        """Open the DuckDB database on first use, creating the rollup tables and views."""
+        if self._connection is None:
+            import duckdb
+            from local_bigquery import translate_sql
+            
+            self.root.mkdir(parents=True, exist_ok=True)
+            database_path = self.root / DATABASE_NAME
+            is_new = not database_path.exists()
+            
+            self._connection = duckdb.connect(str(database_path))
+            self._connection.execute("SET TimeZone = 'UTC'")
+            self._connection.execute(f'CREATE SCHEMA IF NOT EXISTS "{self.dataset}"')
+            for rollup in LOCAL_ROLLUPS:
+                ddl = re.sub(r"`[^`]+`", f"`{self.dataset}.{rollup}`", load_create_table(rollup), count=1)
+                self._connection.execute(translate_sql(ddl))
+            for view, sql in load_view_definitions().items():
+                sql = re.sub(r"`(?:[\w-]+\.)*(\w+)`", lambda match: f'"{self.dataset}"."{match.group(1)}"', sql)
+                self._connection.execute(f'CREATE OR REPLACE VIEW "{self.dataset}"."{view}" AS {sql}')
+            
+            self._view_tables = None
+            self._create_table_views(self._connection)
+            if is_new and self.table_name in self._view_tables:
+                # Database removed or written by an older version: rebuild from the dataset
+                self._refresh_rollups(self._connection, None)
+        
+        self._create_table_views(self._connection)
+        return self._connection
+    
+    def _create_table_views(self, connection):
+        """Expose each table written so far as a view over its Parquet files."""
+        tables = [table_name for table_name in self.schemas if (self.root / table_name).is_dir()]
+        if tables == self._view_tables:
+            return
+        
+        for table_name in tables:
+            connection.execute(
+                f'CREATE OR REPLACE VIEW "{self.dataset}"."{table_name}" AS '
+                f"SELECT * FROM {self._parquet_source(table_name)}"
+            )
+        self._view_tables = tables
+    
+    def _parquet_source(self, table_name: str, dates: Optional[List[str]] = None) -> str:
+        """read_parquet() call over a table's files, or only those of some extraction dates."""
+        table_dir = (self.root / table_name).as_posix()
+        if dates is None:
+            files = f"'{table_dir}/**/*.parquet'"
+        else:
+            files = "[" + ", ".join(f"'{table_dir}/{PARTITION_DATE_COLUMN}={day}/**/*.parquet'" for day in dates) + "]"
+        
+        hive_types = f"{{'{PARTITION_DATE_COLUMN}': DATE" + (", 'crypto_id': VARCHAR}" if table_name == self.table_name else "}")
+        return f"read_parquet({files}, hive_partitioning = true, hive_types = {hive_types})"
+    
+    def _refresh_rollups(self, connection, dates: Optional[List[str]]):
+        """
+        Recompute the daily summary of some dates and fold their newest rows into the latest prices.
+        
+        Args:
+            connection: DuckDB connection
+            dates: ISO extraction dates to refresh (None rebuilds both tables)
+        """
+        if dates is not None and not dates:
+            return
+        
+        source = self._parquet_source(self.table_name, dates)
+        latest_columns = ", ".join(
+            f"COALESCE(vs_currency, '{DEFAULT_VS_CURRENCY}') AS vs_currency" if col['name'] == 'vs_currency' else col['name']
+            for col in load_table_schema('crypto_latest_prices')
+        )
+        summary = f'"{self.dataset}"."crypto_daily_summary"'
+        latest = f'"{self.dataset}"."crypto_latest_prices"'
+        summary_filter = "TRUE" if dates is None else "date IN (" + ", ".join(f"DATE '{day}'" for day in dates) + ")"
+        
+        connection.execute("BEGIN TRANSACTION")
+        try:
+            connection.execute(f"DELETE FROM {summary} WHERE {summary_filter}")
+            connection.execute(f"INSERT INTO {summary} " + LOCAL_ROLLUPS['crypto_daily_summary'].format(
+                source=source, currency=DEFAULT_VS_CURRENCY
+            ))
+            
+            if dates is None:
+                connection.execute(f"DELETE FROM {latest}")
+            connection.execute(f"CREATE OR REPLACE TEMP TABLE _latest_source AS " + LOCAL_ROLLUPS['crypto_latest_prices'].format(
+                source=source, currency=DEFAULT_VS_CURRENCY, latest_columns=latest_columns
+            ))
+            # Older extractions (e.g. backfilled dates) never replace newer ones
+            connection.execute(
+                f"DELETE FROM _latest_source S USING {latest} T "
+                f"WHERE S.crypto_id = T.crypto_id AND S.vs_currency = T.vs_currency AND S.extraction_timestamp < T.extraction_timestamp"
+            )
+            connection.execute(
+                f"DELETE FROM {latest} T USING _latest_source S "
+                f"WHERE T.crypto_id = S.crypto_id AND T.vs_currency = S.vs_currency"
+            )
+            connection.execute(f"INSERT INTO {latest} SELECT * FROM _latest_source")
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+    
+    def close(self):
+        """Close the DuckDB connection."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+                self._view_tables = None
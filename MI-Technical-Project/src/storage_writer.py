@@ -0,0 +1,361 @@
+"""
+Storage Write API module for low-latency appends to BigQuery tables.
+Buffers Arrow rows per table and appends them to write streams, flushing on size or age.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, List, Optional
+
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+WRITE_STREAM_TYPES = ('committed', 'pending')
+
+# AppendRows requests are limited to 10 MB; leave room for the request envelope
+MAX_REQUEST_BYTES = 8 * 1024 * 1024
+
+
+class AppendResult:
+    """
+    Job-like handle for rows submitted to a StorageWriter.
+    
+    Mirrors the parts of a load job the loader reads (done, result,
+    output_rows, destination), so appends are waited on with wait_for_jobs.
+    The handle finishes when the flush carrying its rows does.
+    """
+    
+    def __init__(self, destination: str, num_rows: int):
+        self.job_id = f"append_{uuid.uuid4().hex[:12]}"
+        self.job_type = "storage_write"
+        self.destination = destination
+        self.output_rows = num_rows
+        self.num_dml_affected_rows = None
+        self.error_result = None
+        self._error: Optional[Exception] = None
+        self._finished = threading.Event()
+    
+    def done(self) -> bool:
+        """Whether the rows were flushed (or the flush failed)."""
+        return self._finished.is_set()
+    
+    def result(self, timeout: Optional[float] = None) -> 'AppendResult':
+        """
+        Wait for the flush carrying these rows.
+        
+        Raises:
+            TimeoutError: If the rows were not flushed within the timeout
+            Exception: The error of a failed flush
+        """
+        if not self._finished.wait(timeout):
+            raise TimeoutError(f"Rows of {self.job_id} were not flushed within {timeout}s")
+        if self._error is not None:
+            raise self._error
+        return self
+    
+    def _finish(self, error: Optional[Exception] = None):
+        """Mark the handle finished, with the flush error if it failed."""
+        self._error = error
+        self.error_result = {'message': str(error)} if error is not None else None
+        self._finished.set()
+
+
+class BigQueryWriteClient:
+    """Storage Write API calls through google-cloud-bigquery-storage, with rows serialized as Arrow."""
+    
+    def __init__(self, credentials=None):
+        """
+        Args:
+            credentials: Google credentials (None uses application default credentials)
+        """
+        from google.cloud import bigquery_storage_v1
+        
+        self._client = bigquery_storage_v1.BigQueryWriteClient(credentials=credentials)
+        self._connections = {}
+    
+    def _table_path(self, table_ref: str) -> str:
+        """projects/.../datasets/.../tables/... path of a project.dataset.table reference."""
+        project, dataset, table = table_ref.split(".")
+        return self._client.table_path(project, dataset, table)
+    
+    def create_stream(self, table_ref: str, stream_type: str) -> str:
+        """
+        Create a write stream on a table.
+        
+        Args:
+            table_ref: Destination table (project.dataset.table)
+            stream_type: 'committed' (rows visible on append) or 'pending'
+                (rows visible when the stream is committed)
+        
+        Returns:
+            Stream name
+        """
+        from google.cloud.bigquery_storage_v1 import types
+        
+        write_stream = types.WriteStream(
+            type_=types.WriteStream.Type.PENDING if stream_type == "pending" else types.WriteStream.Type.COMMITTED
+        )
+        return self._client.create_write_stream(parent=self._table_path(table_ref), write_stream=write_stream).name
+    
+    def append(self, stream_name: str, table: pa.Table, offset: int):
+        """
+        Append rows at an offset of a stream.
+        
+        An append the server already has (ALREADY_EXISTS, e.g. a retry after a
+        lost response) is treated as written, so retried offsets are exactly-once.
+        
+        Args:
+            stream_name: Stream from create_stream
+            table: Rows to append (at most MAX_REQUEST_BYTES)
+            offset: Row offset of the first row in the stream
+        """
+        if table.num_rows == 0:
+            return
+        
+        from google.api_core.exceptions import AlreadyExists
+        from google.cloud.bigquery_storage_v1 import types, writer
+        
+        connection = self._connections.get(stream_name)
+        if connection is None:
+            # The writer schema travels once, in the first request of the connection
+            template = types.AppendRowsRequest(write_stream=stream_name)
+            template.arrow_rows = types.AppendRowsRequest.ArrowData(
+                writer_schema=types.ArrowSchema(serialized_schema=table.schema.serialize().to_pybytes())
+            )
+            connection = writer.AppendRowsStream(self._client, template)
+            self._connections[stream_name] = connection
+        
+        request = types.AppendRowsRequest(offset=offset)
+        request.arrow_rows = types.AppendRowsRequest.ArrowData(
+            rows=types.ArrowRecordBatch(
+                serialized_record_batch=table.combine_chunks().to_batches()[0].serialize().to_pybytes(),
+                row_count=table.num_rows
+            )
+        )
+        try:
+            connection.send(request).result()
+        except AlreadyExists:
+            logger.info(f"Rows at offset {offset} of {stream_name} were already written")
+    
+    def finalize(self, stream_name: str) -> int:
+        """
+        Finalize a stream so it accepts no more rows.
+        
+        Returns:
+            Rows in the stream
+        """
+        connection = self._connections.pop(stream_name, None)
+        if connection is not None:
+            connection.close()
+        return self._client.finalize_write_stream(name=stream_name).row_count
+    
+    def commit(self, table_ref: str, stream_names: List[str]):
+        """
+        Atomically make the rows of finalized pending streams visible.
+        
+        Raises:
+            RuntimeError: If BigQuery rejected the commit
+        """
+        from google.cloud.bigquery_storage_v1 import types
+        
+        response = self._client.batch_commit_write_streams(
+            types.BatchCommitWriteStreamsRequest(parent=self._table_path(table_ref), write_streams=stream_names)
+        )
+        if response.stream_errors:
+            raise RuntimeError(f"Commit of {', '.join(stream_names)} failed: {response.stream_errors[0].error_message}")
+    
+    def close(self):
+        """Close open AppendRows connections."""
+        for connection in self._connections.values():
+            connection.close()
+        self._connections = {}
+
+
+class StorageWriter:
+    """
+    Appends Arrow rows to one table through a Storage Write API client.
+    
+    Submitted rows are buffered and flushed when the buffer reaches
+    flush_bytes or its oldest rows are flush_seconds old (checked on submit),
+    or when flush() is called. In 'committed' mode a flush that fits in one
+    AppendRows request is appended to one long-lived stream and its rows are
+    queryable at once; each append carries its offset, so a retried append is
+    written exactly once. A larger flush is split into several requests, and
+    a failure after some were acknowledged would leave those rows visible
+    while the staged file is replayed, so it is written through a pending
+    stream instead. In 'pending' mode every flush writes a new stream that is
+    finalized and committed as a unit, so a batch becomes visible entirely or
+    not at all.
+    """
+    
+    def __init__(
+        self,
+        write_client,
+        table_ref: str,
+        arrow_schema: pa.Schema,
+        stream_type: str = "committed",
+        flush_bytes: int = 4 * 1024 * 1024,
+        flush_seconds: float = 2.0,
+        max_retries: int = 3,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            write_client: BigQueryWriteClient or local_bigquery.LocalWriteClient
+            table_ref: Destination table (project.dataset.table)
+            arrow_schema: Schema rows are cast to before they are sent
+            stream_type: 'committed' or 'pending'
+            flush_bytes: Buffered Arrow bytes that trigger a flush
+            flush_seconds: Age of the oldest buffered rows that triggers a flush
+            max_retries: Retries of a failed append at the same offset
+            clock: Monotonic time source
+        
+        Raises:
+            ValueError: If stream_type is not recognized
+        """
+        if stream_type not in WRITE_STREAM_TYPES:
+            raise ValueError(f"Invalid write stream type '{stream_type}', expected one of {', '.join(WRITE_STREAM_TYPES)}")
+        
+        self.write_client = write_client
+        self.table_ref = table_ref
+        self.arrow_schema = arrow_schema
+        self.stream_type = stream_type
+        self.flush_bytes = flush_bytes
+        self.flush_seconds = flush_seconds
+        self.max_retries = max_retries
+        self.clock = clock
+        self.flushes = 0
+        self.rows_written = 0
+        self._buffer: List[pa.Table] = []
+        self._handles: List[AppendResult] = []
+        self._buffered_bytes = 0
+        self._buffered_since: Optional[float] = None
+        self._stream: Optional[str] = None
+        self._offset = 0
+        self._lock = threading.Lock()
+    
+    def submit(self, table: pa.Table) -> AppendResult:
+        """
+        Buffer rows for the next flush, flushing now if the buffer is due.
+        
+        Args:
+            table: Rows with the writer's schema
+        
+        Returns:
+            Handle finishing when the rows are flushed
+        """
+        handle = AppendResult(self.table_ref, table.num_rows)
+        with self._lock:
+            self._buffer.append(table.cast(self.arrow_schema))
+            self._handles.append(handle)
+            self._buffered_bytes += table.nbytes
+            if self._buffered_since is None:
+                self._buffered_since = self.clock()
+            due = (
+                self._buffered_bytes >= self.flush_bytes
+                or self.clock() - self._buffered_since >= self.flush_seconds
+            )
+        
+        if due:
+            self.flush()
+        return handle
+    
+    def flush(self) -> bool:
+        """
+        Write every buffered row.
+        
+        Returns:
+            True if the buffer was written (or empty), False otherwise
+        """
+        with self._lock:
+            if not self._buffer:
+                return True
+            
+            table = pa.concat_tables(self._buffer)
+            handles = self._handles
+            self._buffer, self._handles = [], []
+            self._buffered_bytes, self._buffered_since = 0, None
+            
+            try:
+                # Empty submits finish without a request; BigQuery rejects empty appends
+                if table.num_rows and self.stream_type == "committed" and len(self._chunks(table)) == 1:
+                    self._append_committed(table)
+                elif table.num_rows:
+                    self._append_pending(table)
+            except Exception as e:
+                logger.error(f"Storage Write API flush of {table.num_rows} rows to {self.table_ref} failed: {str(e)}")
+                for handle in handles:
+                    handle._finish(e)
+                return False
+            
+            self.flushes += 1
+            self.rows_written += table.num_rows
+        
+        for handle in handles:
+            handle._finish()
+        logger.info(f"Appended {table.num_rows} rows to {self.table_ref} ({self.stream_type} stream)")
+        return True
+    
+    def _append_committed(self, table: pa.Table):
+        """Append one request's worth of rows to the long-lived committed stream, opening it on first use."""
+        if self._stream is None:
+            self._stream = self.write_client.create_stream(self.table_ref, "committed")
+            self._offset = 0
+        
+        try:
+            self._append_with_retry(self._stream, table, self._offset)
+            self._offset += table.num_rows
+        except Exception:
+            # Rows after the last acknowledged offset are unknown; start over on a new stream
+            self._stream = None
+            raise
+    
+    def _append_pending(self, table: pa.Table):
+        """Write a batch to a new pending stream and commit it atomically."""
+        stream = self.write_client.create_stream(self.table_ref, "pending")
+        offset = 0
+        for chunk in self._chunks(table):
+            self._append_with_retry(stream, chunk, offset)
+            offset += chunk.num_rows
+        self.write_client.finalize(stream)
+        self.write_client.commit(self.table_ref, [stream])
+    
+    def _append_with_retry(self, stream: str, chunk: pa.Table, offset: int):
+        """Append a chunk, retrying at the same offset so a retry never duplicates rows."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.write_client.append(stream, chunk, offset)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"Append at offset {offset} of {stream} failed ({str(e)}) - retrying")
+                time.sleep(min(2 ** attempt * 0.1, 2.0))
+    
+    @staticmethod
+    def _chunks(table: pa.Table) -> List[pa.Table]:
+        """Split a table into slices small enough for one AppendRows request."""
+        if table.nbytes <= MAX_REQUEST_BYTES or table.num_rows <= 1:
+            return [table]
+        rows_per_chunk = max(1, int(table.num_rows * MAX_REQUEST_BYTES / table.nbytes))
+        return [table.slice(start, rows_per_chunk) for start in range(0, table.num_rows, rows_per_chunk)]
+    
+    def close(self) -> bool:
+        """
+        Flush buffered rows and finalize the committed stream.
+        
+        Returns:
+            True if the final flush succeeded, False otherwise
+        """
+        flushed = self.flush()
+        with self._lock:
+            if self._stream is not None:
+                try:
+                    self.write_client.finalize(self._stream)
+                except Exception as e:
+                    logger.warning(f"Could not finalize write stream {self._stream}: {str(e)}")
+                self._stream = None
+        return flushed
@@ -0,0 +1,198 @@
+"""
+Table schema module for the BigQuery tables defined in sql/schema.sql.
+Parses CREATE TABLE statements into column definitions and Arrow schemas, and
+CREATE VIEW statements into the tables each view reads.
+"""
+
+import logging
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_SQL_PATH = Path(__file__).resolve().parent.parent / "sql" / "schema.sql"
+
+# BigQuery column type -> Arrow type used when staging loads
+ARROW_TYPES = {
+    'STRING': pa.string(),
+    'FLOAT64': pa.float64(),
+    'INT64': pa.int64(),
+    'BOOL': pa.bool_(),
+    'DATE': pa.date32(),
+    'TIMESTAMP': pa.timestamp('us', tz='UTC'),
+}
+
+# Reference tables appended to alongside crypto_prices, keyed by fetch endpoint
+REFERENCE_TABLES = {
+    'global': "crypto_global_metrics",
+    'exchange_rates': "crypto_exchange_rates",
+}
+
+COLUMN_PATTERN = re.compile(r"^\s*(\w+)\s+(STRING|FLOAT64|INT64|BOOL|DATE|TIMESTAMP)\b(\s+NOT\s+NULL)?", re.IGNORECASE)
+VIEW_PATTERN = re.compile(
+    r"CREATE\s+(?:OR\s+REPLACE\s+)?VIEW\s+(?:IF\s+NOT\s+EXISTS\s+)?`([^`]+)`\s+AS\b(.*?)(?:;|\Z)",
+    re.IGNORECASE | re.DOTALL
+)
+
+
+def load_table_schema(table_name: str, schema_path: Optional[Path] = None) -> List[Dict[str, str]]:
+    """
+    Read the column definitions of a table from its CREATE TABLE statement.
+    
+    Args:
+        table_name: Table name without dataset (e.g. 'crypto_prices')
+        schema_path: SQL file to read (defaults to sql/schema.sql)
+    
+    Returns:
+        List of {'name', 'type', 'mode'} dictionaries in declaration order
+    
+    Raises:
+        ValueError: If the table is not defined in the file
+    """
+    sql = Path(schema_path or SCHEMA_SQL_PATH).read_text()
+    header = re.search(
+        rf"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`(?:[\w-]+\.)*{re.escape(table_name)}`\s*\(",
+        sql,
+        re.IGNORECASE
+    )
+    if not header:
+        raise ValueError(f"Table '{table_name}' is not defined in {schema_path or SCHEMA_SQL_PATH}")
+    
+    columns = []
+    for line in sql[header.end():].splitlines():
+        if line.strip().startswith(")"):
+            break
+        match = COLUMN_PATTERN.match(line)
+        if match:
+            columns.append({
+                'name': match.group(1),
+                'type': match.group(2).upper(),
+                'mode': 'REQUIRED' if match.group(3) else 'NULLABLE',
+            })
+    
+    return columns
+
+
+def load_create_table(table_name: str, schema_path: Optional[Path] = None) -> str:
+    """
+    Read the CREATE TABLE statement of a table, without its trailing semicolon.
+    
+    Args:
+        table_name: Table name without dataset (e.g. 'crypto_daily_summary')
+        schema_path: SQL file to read (defaults to sql/schema.sql)
+    
+    Returns:
+        DDL statement as written in the file
+    
+    Raises:
+        ValueError: If the table is not defined in the file
+    """
+    sql = re.sub(r"--[^\n]*", "", Path(schema_path or SCHEMA_SQL_PATH).read_text())
+    match = re.search(
+        # Stops at the first semicolon outside a string literal (descriptions may contain one)
+        rf"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`(?:[\w-]+\.)*{re.escape(table_name)}`"
+        r"""(?:"[^"]*"|'[^']*'|[^;"'])*""",
+        sql,
+        re.IGNORECASE | re.DOTALL
+    )
+    if not match:
+        raise ValueError(f"Table '{table_name}' is not defined in {schema_path or SCHEMA_SQL_PATH}")
+    return match.group(0).strip()
+
+
+def load_view_dependencies(schema_path: Optional[Path] = None) -> Dict[str, List[str]]:
+    """
+    Read which tables each view reads from its CREATE VIEW statement.
+    
+    Args:
+        schema_path: SQL file to read (defaults to sql/schema.sql)
+    
+    Returns:
+        Mapping of 'dataset.view' to the 'dataset.table' references in its query
+    """
+    sql = re.sub(r"--[^\n]*", "", Path(schema_path or SCHEMA_SQL_PATH).read_text())
+    
+    dependencies = {}
+    for match in VIEW_PATTERN.finditer(sql):
+        view = ".".join(match.group(1).split(".")[-2:])
+        tables = re.findall(r"`([^`]+)`", match.group(2))
+        dependencies[view] = sorted({".".join(table.split(".")[-2:]) for table in tables})
+    
+    return dependencies
+
+
+def load_view_definitions(schema_path: Optional[Path] = None) -> Dict[str, str]:
+    """
+    Read the query of each CREATE VIEW statement.
+    
+    Args:
+        schema_path: SQL file to read (defaults to sql/schema.sql)
+    
+    Returns:
+        Mapping of view name (without dataset) to its SELECT statement
+    """
+    sql = re.sub(r"--[^\n]*", "", Path(schema_path or SCHEMA_SQL_PATH).read_text())
+    return {match.group(1).split(".")[-1]: match.group(2).strip() for match in VIEW_PATTERN.finditer(sql)}
+
+
+def to_arrow_schema(columns: List[Dict[str, str]]) -> pa.Schema:
+    """
+    Build the Arrow schema matching a table's columns.
+    
+    Args:
+        columns: Column definitions from load_table_schema
+    
+    Returns:
+        Arrow schema with one field per column
+    """
+    return pa.schema([
+        pa.field(col['name'], ARROW_TYPES[col['type']], nullable=col['mode'] != 'REQUIRED')
+        for col in columns
+    ])
+
+
+def to_arrow_table(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """
+    Convert a transformed DataFrame to an Arrow table with a fixed schema.
+    
+    Columns are reordered to the schema, missing nullable columns are filled
+    with nulls, and values are cast to the declared types so type drift fails
+    here instead of silently widening the BigQuery table. The cast is safe:
+    only timestamps are truncated, floored from nanoseconds to BigQuery's
+    microseconds first.
+    
+    Args:
+        df: DataFrame to convert
+        schema: Target Arrow schema
+    
+    Returns:
+        Arrow table with exactly the schema's columns
+    
+    Raises:
+        ValueError: If the frame has columns the schema does not declare, a
+            required column is missing, or a value does not fit its declared type
+    """
+    extra = [col for col in df.columns if col not in schema.names]
+    if extra:
+        raise ValueError(f"Columns not in table schema: {', '.join(extra)}")
+    
+    arrays = []
+    for field in schema:
+        if field.name in df.columns:
+            values = df[field.name]
+            if pd.api.types.is_datetime64_any_dtype(values):
+                values = values.dt.floor('us')
+            try:
+                arrays.append(pa.Array.from_pandas(values, type=field.type))
+            except (pa.ArrowInvalid, OverflowError) as e:
+                raise ValueError(f"Column '{field.name}' does not fit {field.type}: {e}") from e
+        elif field.nullable:
+            arrays.append(pa.nulls(len(df), type=field.type))
+        else:
+            raise ValueError(f"Required column '{field.name}' is missing")
+    
+    return pa.Table.from_arrays(arrays, schema=schema)
@@ -0,0 +1,176 @@
+"""
+Watermark store module for incremental loads.
+Tracks the last loaded last_updated and price per coin and quote currency in a local SQLite file.
+"""
+
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from columnar_decoder import series_ids
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_COLUMNS = ['crypto_id', 'vs_currency', 'last_updated', 'current_price']
+
+
+def _keyed(df: pd.DataFrame) -> pd.DataFrame:
+    """Watermark columns of a frame, with crypto_id replaced by the row's series id."""
+    return df[['last_updated', 'current_price']].assign(crypto_id=series_ids(df))
+
+
+class WatermarkStore:
+    """
+    Per-series high-water marks of the last successful load.
+    
+    A series is a coin in one quote currency; USD series are keyed by the
+    bare crypto_id (see columnar_decoder.series_ids).
+    """
+    
+    def __init__(self, path: Path, price_tolerance_pct: float = 0.0):
+        self.path = Path(path)
+        self.price_tolerance_pct = price_tolerance_pct
+        self._lock = threading.Lock()
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks ("
+            " crypto_id TEXT PRIMARY KEY,"
+            " last_updated_ns INTEGER,"
+            " current_price REAL)"
+        )
+        self._db.commit()
+    
+    def load(self) -> pd.DataFrame:
+        """
+        Read every watermark.
+        
+        Returns:
+            DataFrame with crypto_id, last_updated (UTC) and current_price columns
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT crypto_id, last_updated_ns, current_price FROM watermarks").fetchall()
+        
+        ids = [row[0] for row in rows]
+        last_updated = np.array([row[1] if row[1] is not None else np.iinfo(np.int64).min for row in rows], dtype=np.int64)
+        prices = np.array([row[2] if row[2] is not None else np.nan for row in rows], dtype=np.float64)
+        
+        return pd.DataFrame({
+            'crypto_id': pd.Series(ids, dtype=object),
+            'last_updated': pd.DatetimeIndex(last_updated.view('datetime64[ns]'), tz='UTC'),
+            'current_price': prices,
+        })
+    
+    def filter_changed(self, df: pd.DataFrame, pending: Optional[pd.DataFrame] = None) -> Tuple[pd.DataFrame, int]:
+        """
+        Keep only rows that changed since the last successful load.
+        
+        A row is kept when its coin has no watermark, or when its last_updated
+        is newer than the watermark and, if a price tolerance is configured,
+        its price moved by more than that percentage since the watermark.
+        
+        Args:
+            df: Transformed DataFrame
+            pending: Rows waiting to be loaded (e.g. in the load spool); where
+                newer than the stored watermark they act as the watermark, so
+                a version that is already queued is not loaded twice
+        
+        Returns:
+            Tuple of (changed rows, number of rows skipped)
+        """
+        if df is None or df.empty:
+            return df, 0
+        
+        watermarks = self.load()
+        if pending is not None and not pending.empty:
+            queued = _keyed(pending).assign(last_updated=lambda frame: pd.to_datetime(frame['last_updated'], utc=True))
+            watermarks = (
+                pd.concat([watermarks, queued[watermarks.columns]], ignore_index=True)
+                .sort_values('last_updated', na_position='first', kind='stable')
+                .drop_duplicates('crypto_id', keep='last')
+            )
+        watermarks = watermarks.rename(columns={
+            'last_updated': '_wm_last_updated',
+            'current_price': '_wm_price',
+        })
+        joined = _keyed(df).merge(watermarks, on='crypto_id', how='left')
+        
+        new_coin = joined['_wm_last_updated'].isna().to_numpy()
+        last_updated = pd.to_datetime(joined['last_updated'], utc=True)
+        advanced = (last_updated > joined['_wm_last_updated']).to_numpy()
+        # Rows without a last_updated cannot be compared, so they are kept
+        advanced |= last_updated.isna().to_numpy()
+        
+        if self.price_tolerance_pct > 0:
+            previous = joined['_wm_price'].to_numpy(dtype=np.float64)
+            current = joined['current_price'].to_numpy(dtype=np.float64)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                moved_pct = np.abs(current - previous) / np.abs(previous) * 100
+            moved = ~(moved_pct <= self.price_tolerance_pct)
+            advanced &= moved
+        
+        keep = new_coin | advanced
+        changed = df if keep.all() else df[keep]
+        return changed, int(len(df) - len(changed))
+    
+    def commit(self, df: pd.DataFrame):
+        """
+        Advance the watermarks to the rows of a successful load.
+        
+        Args:
+            df: Rows that were loaded
+        """
+        if df is None or df.empty:
+            return
+        
+        latest = _keyed(df).sort_values('last_updated').drop_duplicates('crypto_id', keep='last')
+        nanos = pd.to_datetime(latest['last_updated'], utc=True).astype('datetime64[ns, UTC]').array.asi8
+        nat = np.iinfo(np.int64).min
+        
+        rows = [
+            (crypto_id, None if ns == nat else int(ns), None if pd.isna(price) else float(price))
+            for crypto_id, ns, price in zip(latest['crypto_id'], nanos, latest['current_price'])
+        ]
+        
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO watermarks (crypto_id, last_updated_ns, current_price) VALUES (?, ?, ?)",
+                rows
+            )
+            self._db.commit()
+        
+        logger.info(f"Advanced watermarks for {len(rows)} series")
+    
+    def rebuild(self, latest: Optional[pd.DataFrame]) -> bool:
+        """
+        Replace every watermark with the latest loaded row per coin.
+        
+        Args:
+            latest: Rows from v_latest_crypto_prices (crypto_id, vs_currency,
+                last_updated, current_price)
+        
+        Returns:
+            True if the store was rebuilt, False otherwise
+        """
+        if latest is None:
+            logger.error("Cannot rebuild watermarks: no rows returned from the warehouse")
+            return False
+        
+        with self._lock:
+            self._db.execute("DELETE FROM watermarks")
+            self._db.commit()
+        
+        self.commit(latest)
+        logger.info(f"Rebuilt watermark store with {len(latest)} coins")
+        return True
+    
+    def close(self):
+        """Close the SQLite connection."""
+        with self._lock:
+            self._db.close()
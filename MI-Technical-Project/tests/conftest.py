@@ -0,0 +1,24 @@
+"""
+Shared test helpers.
+"""
+
+import pandas as pd
+from datetime import datetime
+
+
+def make_batch(prices, extraction_timestamp=datetime(2024, 1, 1, 12), vs_currency='usd'):
+    """Build a crypto_prices batch with the columns the loaders, sinks and rollups read."""
+    return pd.DataFrame({
+        'crypto_id': list(prices),
+        'symbol': [crypto_id[:3].upper() for crypto_id in prices],
+        'name': [crypto_id.title() for crypto_id in prices],
+        'vs_currency': [vs_currency] * len(prices),
+        'current_price': list(prices.values()),
+        'low_24h': [price * 0.95 for price in prices.values()],
+        'high_24h': [price * 1.05 for price in prices.values()],
+        'market_cap': [price * 1e7 for price in prices.values()],
+        'market_cap_rank': list(range(1, len(prices) + 1)),
+        'total_volume': [price * 1e5 for price in prices.values()],
+        'price_change_percentage_24h': [1.5] * len(prices),
+        'extraction_timestamp': [extraction_timestamp] * len(prices),
+    })
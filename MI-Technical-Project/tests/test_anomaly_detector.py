@@ -0,0 +1,171 @@
+"""
+Unit tests for the anomaly detection module.
+"""
+
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+from pathlib import Path
+from src.anomaly_detector import AnomalyDetector, SeriesMeans
+from src.data_quality import DataQualityChecker
+
+
+def make_snapshot(prices, volume=1e9):
+    """Build a transformed snapshot with one row per coin."""
+    return pd.DataFrame({
+        'crypto_id': list(prices),
+        'symbol': [crypto_id[:3].upper() for crypto_id in prices],
+        'name': [crypto_id.title() for crypto_id in prices],
+        'current_price': list(prices.values()),
+        'market_cap': [price * 1e7 for price in prices.values()],
+        'total_volume': [volume] * len(prices),
+    })
+
+
+class TestAnomalyDetector:
+    """Test cases for AnomalyDetector class."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.path = Path(tempfile.mkdtemp()) / "anomaly_state.npz"
+        self.detector = AnomalyDetector(self.path, min_observations=3)
+        rng = np.random.default_rng(7)
+        for step in range(10):
+            noise = 1 + rng.normal(0, 0.005)
+            self.detector.update(make_snapshot({'bitcoin': 50000.0 * noise, 'ethereum': 3000.0 * noise}))
+    
+    def test_normal_batch_passes(self):
+        """Test that values near the baseline are not flagged."""
+        passed, report, mask = self.detector.score(make_snapshot({'bitcoin': 50200.0, 'ethereum': 2990.0}))
+        
+        assert passed is True
+        assert report['status'] == 'PASSED'
+        assert report['scored_rows'] == 2
+        assert not mask.any()
+    
+    def test_hundredfold_price_is_flagged(self):
+        """Test that a bad decimal shows up as an anomaly for that coin only."""
+        passed, report, mask = self.detector.score(make_snapshot({'bitcoin': 500.0, 'ethereum': 3000.0}))
+        
+        assert passed is True
+        assert report['status'] == 'WARN'
+        assert mask.tolist() == [True, False]
+        flagged = {(anomaly['crypto_id'], anomaly['metric']) for anomaly in report['anomalies']}
+        assert ('bitcoin', 'current_price') in flagged
+    
+    def test_fail_action_fails_the_gate(self):
+        """Test that the fail action rejects anomalous batches."""
+        self.detector.action = 'fail'
+        
+        passed, report, _ = self.detector.score(make_snapshot({'bitcoin': 5000000.0, 'ethereum': 3000.0}))
+        
+        assert passed is False
+        assert report['status'] == 'FAILED'
+    
+    def test_new_coins_are_not_scored(self):
+        """Test that coins without enough history are skipped."""
+        passed, report, mask = self.detector.score(make_snapshot({'solana': 1.0}))
+        
+        assert passed is True
+        assert report['scored_rows'] == 0
+        assert not mask.any()
+    
+    def test_state_round_trip(self):
+        """Test that baselines survive a save and reload."""
+        self.detector.save()
+        
+        reloaded = AnomalyDetector(self.path, min_observations=3)
+        
+        assert list(reloaded.index) == ['bitcoin', 'ethereum']
+        assert reloaded.count.tolist() == [10, 10]
+        np.testing.assert_allclose(reloaded.mean, self.detector.mean)
+    
+    def test_update_is_per_coin(self):
+        """Test that a batch with many rows per coin takes one EWMA step per coin."""
+        before = self.detector.count.copy()
+        batch = pd.concat([make_snapshot({'bitcoin': 50000.0})] * 50, ignore_index=True)
+        
+        self.detector.update(batch)
+        
+        assert (self.detector.count - before).tolist() == [1, 0]
+    
+    def test_streamed_series_means_match_whole_run(self):
+        """Test that folding batches into SeriesMeans steps the baselines exactly as the run's rows would."""
+        rng = np.random.default_rng(11)
+        run = pd.concat(
+            [make_snapshot({'bitcoin': 50000.0 * (1 + rng.normal(0, 0.01)), 'ethereum': 3000.0}) for _ in range(12)],
+            ignore_index=True
+        )
+        whole, streamed = [AnomalyDetector(Path(tempfile.mkdtemp()) / "anomaly_state.npz") for _ in range(2)]
+        for detector in (whole, streamed):
+            detector.update(make_snapshot({'bitcoin': 50000.0, 'ethereum': 3000.0}))
+        
+        series_means = SeriesMeans()
+        for start in range(0, len(run), 5):
+            series_means.add(run.iloc[start:start + 5])
+        streamed.update(series_means.rows())
+        whole.update(run)
+        
+        assert len(series_means.rows()) == 2
+        np.testing.assert_allclose(streamed.mean, whole.mean)
+        np.testing.assert_allclose(streamed.var, whole.var)
+    
+    def test_mad_method(self):
+        """Test that the MAD scale flags the same gross error."""
+        self.detector.method = 'mad'
+        
+        _, report, mask = self.detector.score(make_snapshot({'bitcoin': 500.0, 'ethereum': 3000.0}))
+        
+        assert report['method'] == 'mad'
+        assert mask.tolist() == [True, False]
+    
+    def test_invalid_action_raises(self):
+        """Test that an unknown action is rejected."""
+        with pytest.raises(ValueError):
+            AnomalyDetector(self.path, action='ignore')
+
+
+class TestAnomalyQualityGate:
+    """Test cases for the anomaly check inside DataQualityChecker."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.detector = AnomalyDetector(
+            Path(tempfile.mkdtemp()) / "anomaly_state.npz", action='fail', min_observations=1
+        )
+        self.checker = DataQualityChecker(anomaly_detector=self.detector)
+        self.checker.update_anomaly_baselines(make_snapshot({'bitcoin': 50000.0}))
+    
+    def test_report_contains_anomaly_check(self):
+        """Test that run_all_checks records the anomaly result and fails on it."""
+        passed, report = self.checker.run_all_checks(make_snapshot({'bitcoin': 5.0}))
+        
+        assert passed is False
+        assert report['anomaly_check']['status'] == 'FAILED'
+        assert report['overall_status'] == 'FAILED'
+        assert self.checker.violation_masks['anomaly'].tolist() == [True]
+    
+    def test_missing_frame_fails_without_scoring(self):
+        """Test that a None frame returns the FAILED report instead of reaching the detector."""
+        passed, report = self.checker.run_all_checks(None)
+        
+        assert passed is False
+        assert report['overall_status'] == 'FAILED'
+        assert 'anomaly_check' not in report
+        assert self.checker.run_batch_checks(None) is False
+    
+    def test_batch_reports_aggregate_anomalies(self):
+        """Test that streaming batches roll their anomaly counts into the run report."""
+        assert self.checker.run_batch_checks(make_snapshot({'bitcoin': 50100.0})) is True
+        assert self.checker.run_batch_checks(make_snapshot({'bitcoin': 5.0})) is False
+        
+        passed, report = self.checker.aggregate_batch_reports()
+        
+        assert passed is False
+        assert report['anomaly_check']['anomaly_count'] == 1
+        assert report['anomaly_check']['scored_rows'] == 2
+    
+    def test_baselines_are_saved(self):
+        """Test that updating baselines persists the state file."""
+        assert self.detector.path.exists()
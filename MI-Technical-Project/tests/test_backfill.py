@@ -0,0 +1,123 @@
+"""
+Unit tests for the historical backfill module.
+"""
+
+import pytest
+import pandas as pd
+from datetime import date, datetime, timedelta
+from unittest.mock import Mock
+from src.backfill import BackfillCheckpoint, BackfillEngine, market_chart_to_frame
+
+
+def make_payload(start, end, step_hours=6):
+    """Build a market_chart/range payload with points every step_hours."""
+    points = []
+    ts = start
+    while ts <= end:
+        points.append(int(ts.timestamp() * 1000))
+        ts += timedelta(hours=step_hours)
+    return {
+        'prices': [[ms, 100.0] for ms in points],
+        'market_caps': [[ms, 1e9] for ms in points],
+        'total_volumes': [[ms, 5e6] for ms in points],
+    }
+
+
+class TestMarketChartToFrame:
+    """Test cases for market_chart_to_frame."""
+    
+    def test_rows_follow_crypto_prices_schema(self):
+        """Test that series points become schema-shaped rows inside the window."""
+        start = datetime(2024, 1, 1)
+        end = datetime(2024, 1, 2)
+        payload = make_payload(start, end)
+        
+        df = market_chart_to_frame('bitcoin', 'btc', 'Bitcoin', payload, end)
+        
+        assert len(df) == 4
+        assert df['symbol'].unique().tolist() == ['BTC']
+        assert df['current_price'].tolist() == [100.0] * 4
+        assert df['extraction_timestamp'].dt.date.unique().tolist() == [date(2024, 1, 1)]
+        assert df['high_24h'].isna().all()
+        assert 'market_cap_rank' in df.columns
+
+
+class TestBackfillEngine:
+    """Test cases for BackfillEngine class."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.fetcher = Mock()
+        self.fetcher.fetch_transformed_market_data.return_value = pd.DataFrame({
+            'crypto_id': ['bitcoin', 'ethereum'],
+            'symbol': ['BTC', 'ETH'],
+            'name': ['Bitcoin', 'Ethereum'],
+        })
+        self.fetcher.fetch_market_chart_range.side_effect = lambda crypto_id, start, end: make_payload(start, end)
+        self.loader = Mock()
+        self.loader.write_batch.return_value = True
+    
+    def test_backfills_every_coin_in_slices(self, tmp_path):
+        """Test that each coin is fetched slice by slice and checkpointed."""
+        engine = BackfillEngine(self.fetcher, self.loader, checkpoint_path=tmp_path / 'cp.json', slice_days=2)
+        
+        assert engine.run(['bitcoin', 'ethereum'], date(2024, 1, 1), date(2024, 1, 4)) is True
+        
+        assert self.fetcher.fetch_market_chart_range.call_count == 4
+        checkpoint = BackfillCheckpoint(tmp_path / 'cp.json', date(2024, 1, 1), date(2024, 1, 4))
+        assert checkpoint.loaded_through('bitcoin') == date(2024, 1, 5)
+        assert checkpoint.loaded_through('ethereum') == date(2024, 1, 5)
+    
+    def test_resumes_from_checkpoint(self, tmp_path):
+        """Test that an interrupted backfill resumes instead of starting over."""
+        checkpoint_path = tmp_path / 'cp.json'
+        self.loader.write_batch.side_effect = [True, False]
+        engine = BackfillEngine(
+            self.fetcher, self.loader, checkpoint_path=checkpoint_path, max_workers=1, slice_days=2, flush_rows=1
+        )
+        
+        assert engine.run(['bitcoin'], date(2024, 1, 1), date(2024, 1, 4)) is False
+        
+        self.loader.write_batch.side_effect = None
+        self.fetcher.fetch_market_chart_range.reset_mock()
+        assert engine.run(['bitcoin'], date(2024, 1, 1), date(2024, 1, 4)) is True
+        
+        resumed_start = self.fetcher.fetch_market_chart_range.call_args_list[0].args[1]
+        assert resumed_start == datetime(2024, 1, 3)
+        assert self.fetcher.fetch_market_chart_range.call_count == 1
+    
+    def test_skips_completed_coins(self, tmp_path):
+        """Test that a finished window makes no further requests."""
+        engine = BackfillEngine(self.fetcher, self.loader, checkpoint_path=tmp_path / 'cp.json')
+        engine.run(['bitcoin'], date(2024, 1, 1), date(2024, 1, 2))
+        self.fetcher.reset_mock()
+        
+        assert engine.run(['bitcoin'], date(2024, 1, 1), date(2024, 1, 2)) is True
+        assert self.fetcher.fetch_market_chart_range.call_count == 0
+
+    def test_slices_of_many_coins_share_loads(self, tmp_path):
+        """Test that slices are buffered across coins into few loads with one rollup refresh."""
+        engine = BackfillEngine(
+            self.fetcher, self.loader, checkpoint_path=tmp_path / 'cp.json', max_workers=1, slice_days=1, flush_rows=10
+        )
+        
+        assert engine.run(['bitcoin', 'ethereum'], date(2024, 1, 1), date(2024, 1, 4)) is True
+        
+        batches = [call.args[0] for call in self.loader.write_batch.call_args_list]
+        assert [len(batch) for batch in batches] == [12, 12, 8]
+        assert batches[1]['crypto_id'].unique().tolist() == ['bitcoin', 'ethereum']
+        self.loader.refresh_rollups.assert_called_once_with()
+        assert self.loader.defer_rollups is False
+    
+    def test_failed_load_stops_coins_in_it(self, tmp_path):
+        """Test that coins in a failed load stop and keep their checkpoint before the failed slices."""
+        self.loader.write_batch.side_effect = [True, False]
+        engine = BackfillEngine(
+            self.fetcher, self.loader, checkpoint_path=tmp_path / 'cp.json', max_workers=1, slice_days=1, flush_rows=8
+        )
+        
+        assert engine.run(['bitcoin'], date(2024, 1, 1), date(2024, 1, 4)) is False
+        
+        checkpoint = BackfillCheckpoint(tmp_path / 'cp.json', date(2024, 1, 1), date(2024, 1, 4))
+        assert checkpoint.loaded_through('bitcoin') == date(2024, 1, 3)
+        assert self.loader.write_batch.call_count == 2
@@ -0,0 +1,75 @@
+"""
+Unit tests for the benchmark harness (fake CoinGecko server and scenario runner).
+"""
+
+import json
+import pytest
+import requests
+from benchmarks.fake_coingecko import FakeCoinGeckoServer, synthetic_coin_ids
+from benchmarks.run_benchmarks import compare_results
+
+
+class TestFakeCoinGeckoServer:
+    """Test cases for FakeCoinGeckoServer."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.server = FakeCoinGeckoServer(num_coins=30).start()
+    
+    def teardown_method(self):
+        """Stop the server."""
+        self.server.stop()
+    
+    def test_pagination(self):
+        """Test that per_page and page select consecutive coins."""
+        url = f"{self.server.base_url}/coins/markets"
+        
+        first = requests.get(url, params={'per_page': 10, 'page': 1}).json()
+        last = requests.get(url, params={'per_page': 10, 'page': 3}).json()
+        
+        assert [coin['id'] for coin in first] == synthetic_coin_ids(10)
+        assert last[-1]['id'] == "coin-000029"
+    
+    def test_ids_filter_returns_market_cap_order(self):
+        """Test that requested ids come back ordered by rank and unknown ids are ignored."""
+        response = requests.get(
+            f"{self.server.base_url}/coins/markets",
+            params={'ids': "coin-000005,coin-000001,unknown", 'per_page': 250}
+        )
+        
+        assert [coin['id'] for coin in response.json()] == ["coin-000001", "coin-000005"]
+    
+    def test_throttling(self):
+        """Test that every Nth request is answered with 429 and Retry-After."""
+        self.server.throttle_every = 2
+        url = f"{self.server.base_url}/coins/markets"
+        
+        statuses = [requests.get(url).status_code for _ in range(4)]
+        
+        assert statuses == [200, 429, 200, 429]
+        assert self.server.throttled == 2
+
+
+class TestBenchmarkScenarios:
+    """Test cases for the scenario runner."""
+    
+    def test_small_scenario_loads_every_row(self):
+        """Test fetch -> validate -> load end to end, including 429 retries."""
+        pytest.importorskip("duckdb")
+        from benchmarks.run_benchmarks import run_scenario
+        
+        result = run_scenario(600, throttle_every=2, workers=2)
+        
+        assert result['success'] is True
+        assert result['rows_loaded'] == 600
+        assert result['retries'] > 0
+        assert result['stages']['pipeline.fetch']['rows'] == 600
+        json.dumps(result)
+    
+    def test_compare_flags_throughput_regressions(self):
+        """Test that a throughput drop beyond the threshold is reported."""
+        baseline = {'scenarios': [{'rows': 1000, 'records_per_second': 1000.0, 'peak_rss_bytes': 100}]}
+        current = {'scenarios': [{'rows': 1000, 'records_per_second': 700.0, 'peak_rss_bytes': 100}]}
+        
+        assert compare_results(baseline, current, max_regression_pct=20) != []
+        assert compare_results(baseline, current, max_regression_pct=40) == []
@@ -0,0 +1,368 @@
+"""
+Unit tests for BigQuery loader module.
+"""
+
+import tempfile
+import time
+import pytest
+import pandas as pd
+import pyarrow.parquet as pq
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from unittest.mock import Mock
+from conftest import make_batch
+from src.bigquery_loader import BigQueryLoader
+from src.columnar_decoder import exchange_rates_frame
+from src.main import commit_loaded, run_batch_pipeline
+from src.parquet_staging import ParquetStager
+from src.watermark_store import WatermarkStore
+
+duckdb = pytest.importorskip("duckdb")
+from src.local_bigquery import LocalBigQueryClient, translate_sql
+
+
+class TestBigQueryLoader:
+    """Test cases for BigQueryLoader class."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.client = LocalBigQueryClient()
+        self.stager = ParquetStager(spool_dir=tempfile.mkdtemp())
+        self.loader = BigQueryLoader(client=self.client, stager=self.stager)
+        self.loader.project_id = "local"
+        self.loader.initialize_client()
+        self.loader.ensure_dataset_exists()
+    
+    def table_rows(self):
+        """Return the target table ordered by key."""
+        return self.client.query(
+            f"SELECT * FROM `{self.loader.table_ref}` ORDER BY crypto_id, extraction_timestamp"
+        ).to_dataframe()
+    
+    def test_upsert_is_idempotent(self):
+        """Test that rerunning the same batch does not duplicate rows."""
+        batch = make_batch({'bitcoin': 50000.0, 'ethereum': 3000.0})
+        
+        assert self.loader.upsert_data(batch) is True
+        assert self.loader.upsert_data(batch) is True
+        
+        assert len(self.table_rows()) == 2
+    
+    def test_upsert_updates_matching_keys(self):
+        """Test that matching keys are updated and new keys inserted."""
+        self.loader.upsert_data(make_batch({'bitcoin': 50000.0}))
+        self.loader.upsert_data(make_batch({'bitcoin': 51000.0, 'ethereum': 3000.0}))
+        
+        rows = self.table_rows()
+        assert rows['crypto_id'].tolist() == ['bitcoin', 'ethereum']
+        assert rows['current_price'].tolist() == [51000.0, 3000.0]
+    
+    def test_upsert_keeps_other_timestamps(self):
+        """Test that rows with a different extraction timestamp are separate keys."""
+        self.loader.upsert_data(make_batch({'bitcoin': 50000.0}))
+        self.loader.upsert_data(make_batch({'bitcoin': 52000.0}, datetime(2024, 1, 2, 12, 0)))
+        
+        assert self.table_rows()['current_price'].tolist() == [50000.0, 52000.0]
+    
+    def test_upsert_drops_staging_table(self):
+        """Test that the staging table is removed after the MERGE."""
+        self.loader.upsert_data(make_batch({'bitcoin': 50000.0}))
+        self.loader.upsert_data(make_batch({'bitcoin': 50000.0}))
+        
+        tables = self.client.connection.execute("SELECT table_name FROM information_schema.tables").fetchall()
+        assert sorted(tables) == [('crypto_daily_summary',), ('crypto_latest_prices',), (self.loader.table_id,)]
+    
+    def test_merge_is_pruned_to_touched_partitions(self):
+        """Test that the MERGE condition lists only the batch's extraction dates."""
+        self.loader.upsert_data(make_batch({'bitcoin': 50000.0}))
+        batch = pd.concat([
+            make_batch({'bitcoin': 50000.0}),
+            make_batch({'bitcoin': 52000.0}, datetime(2024, 1, 3, 9, 30)),
+        ])
+        self.loader.upsert_data(batch)
+        
+        merge = [query for query in self.client.queries if query.startswith("MERGE")][-1]
+        assert "DATE(T.extraction_timestamp) IN (DATE '2024-01-01', DATE '2024-01-03')" in merge
+    
+    def test_first_upsert_is_waited_on_once(self):
+        """Test that the plain load creating the table is left to the caller's wait and counted there."""
+        self.loader.wait_for_jobs = Mock(wraps=self.loader.wait_for_jobs)
+        job = self.loader.submit_batch(make_batch({'bitcoin': 50000.0, 'ethereum': 3000.0}))
+        
+        success, rows = self.loader.wait_for_jobs([job])
+        
+        assert success is True
+        assert rows == 2
+        assert self.loader.wait_for_jobs.call_count == 1
+        assert self.stager.pending() == []
+        assert len(self.table_rows()) == 2
+    
+    def test_upsert_missing_key_column(self):
+        """Test that a batch without the key columns is rejected."""
+        batch = make_batch({'bitcoin': 50000.0}).drop(columns=['extraction_timestamp'])
+        
+        assert self.loader.upsert_data(batch) is False
+    
+    def test_write_batch_append_mode(self):
+        """Test that append mode keeps the WRITE_APPEND behaviour."""
+        self.loader.load_mode = "append"
+        batch = make_batch({'bitcoin': 50000.0})
+        
+        self.loader.write_batch(batch)
+        self.loader.write_batch(batch)
+        
+        assert len(self.table_rows()) == 2
+
+
+class FakeJob:
+    """Load job that finishes a fixed time after it is created."""
+    
+    def __init__(self, duration, output_rows=0, error=None):
+        self.finishes_at = time.monotonic() + duration
+        self.output_rows = output_rows
+        self.error = error
+        self.result_calls = 0
+    
+    def done(self):
+        return time.monotonic() >= self.finishes_at
+    
+    def result(self):
+        self.result_calls += 1
+        if self.error:
+            raise self.error
+        return self
+
+
+class TestAsyncLoads:
+    """Test cases for job submission, polling and metadata caching."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.client = Mock()
+        self.loader = BigQueryLoader(client=self.client, stager=ParquetStager(spool_dir=tempfile.mkdtemp()))
+        self.loader.project_id = "test-project"
+    
+    def test_wait_is_bounded_by_slowest_job(self):
+        """Test that concurrent jobs are waited on together, not one after another."""
+        jobs = [FakeJob(0.2, output_rows=10) for _ in range(4)]
+        
+        start = time.monotonic()
+        success, rows = self.loader.wait_for_jobs(jobs, poll_interval=0.01)
+        elapsed = time.monotonic() - start
+        
+        assert success is True
+        assert rows == 40
+        assert elapsed < 0.6
+    
+    def test_failed_job_is_reported(self):
+        """Test that one failing job fails the wait but the others are still counted."""
+        jobs = [FakeJob(0, output_rows=5), FakeJob(0, error=RuntimeError("quota exceeded"))]
+        
+        success, rows = self.loader.wait_for_jobs(jobs, poll_interval=0.01)
+        
+        assert success is False
+        assert rows == 5
+    
+    def test_load_data_uses_job_statistics(self):
+        """Test that load_data does not fetch table metadata after the load."""
+        self.client.load_table_from_file.return_value = FakeJob(0, output_rows=2)
+        
+        assert self.loader.load_data(make_batch({'bitcoin': 1.0, 'ethereum': 2.0})) is True
+        self.client.get_table.assert_not_called()
+    
+    def test_dataset_existence_is_cached(self):
+        """Test that the dataset lookup happens once per client."""
+        other_loader = BigQueryLoader(client=self.client, stager=self.loader.stager)
+        other_loader.project_id = "test-project"
+        
+        assert self.loader.ensure_dataset_exists() is True
+        assert other_loader.ensure_dataset_exists() is True
+        
+        assert self.client.get_dataset.call_count == 1
+    
+    def test_submit_batch_does_not_wait(self):
+        """Test that append-mode submission returns before the job finishes."""
+        self.loader.load_mode = "append"
+        job = FakeJob(60)
+        self.client.load_table_from_file.return_value = job
+        
+        assert self.loader.submit_batch(make_batch({'bitcoin': 1.0})) is job
+        assert job.result_calls == 0
+
+
+class TestParquetStaging:
+    """Test cases for Parquet staging and spool replay."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.client = LocalBigQueryClient()
+        self.stager = ParquetStager(spool_dir=tempfile.mkdtemp())
+        self.loader = BigQueryLoader(client=self.client, stager=self.stager)
+        self.loader.project_id = "local"
+        self.loader.load_mode = "append"
+    
+    def test_stage_uses_schema_from_sql(self):
+        """Test that staged files carry the crypto_prices schema, not inferred types."""
+        path = self.stager.stage(make_batch({'bitcoin': 50000.0}))
+        
+        table = pq.read_table(path)
+        assert table.schema.names[:3] == ['crypto_id', 'symbol', 'name']
+        assert len(table.schema) == 22
+        assert str(table.schema.field('extraction_timestamp').type) == 'timestamp[us, tz=UTC]'
+        assert str(table.schema.field('market_cap_rank').type) == 'int64'
+    
+    def test_stage_rejects_unknown_columns(self):
+        """Test that type or column drift fails instead of widening the table."""
+        batch = make_batch({'bitcoin': 50000.0})
+        batch['unexpected'] = 1
+        
+        with pytest.raises(ValueError):
+            self.stager.stage(batch)
+    
+    def test_stage_rejects_values_that_do_not_fit(self):
+        """Test that a fractional or out-of-range INT64 value fails instead of being truncated or wrapped."""
+        for rank in ([1.7], pd.Series([2**70], dtype=object)):
+            batch = make_batch({'bitcoin': 50000.0})
+            batch['market_cap_rank'] = rank
+            
+            with pytest.raises(ValueError):
+                self.stager.stage(batch)
+    
+    def test_stage_floors_timestamps_to_microseconds(self):
+        """Test that nanosecond timestamps are the one value truncated to fit BigQuery."""
+        batch = make_batch({'bitcoin': 50000.0}, pd.Timestamp('2024-01-01 12:00:00.123456789'))
+        
+        table = pq.read_table(self.stager.stage(batch))
+        
+        assert table.column('extraction_timestamp')[0].as_py().microsecond == 123456
+    
+    def test_reference_frames_load_to_their_tables(self):
+        """Test that reference frames are appended to their own tables in one wait."""
+        self.loader.ensure_dataset_exists()
+        rates = exchange_rates_frame(
+            {'rates': {'usd': {'name': 'US Dollar', 'unit': '$', 'value': 65000.0, 'type': 'fiat'}}},
+            datetime(2024, 1, 1, 12)
+        )
+        
+        assert len(self.loader.stage_batch(make_batch({'bitcoin': 50000.0}), {'exchange_rates': rates})) == 2
+        
+        assert self.loader.replay_spool() is True
+        stored = self.client.query("SELECT currency, btc_rate FROM `local.crypto_analytics.crypto_exchange_rates`").to_dataframe()
+        assert stored.values.tolist() == [['usd', 65000.0]]
+        assert self.stager.pending() == []
+        assert list(self.stager.spool_dir.glob("*.parquet")) == []
+    
+    def test_loaded_files_are_removed(self):
+        """Test that the spool is empty after a successful load."""
+        assert self.loader.write_batch(make_batch({'bitcoin': 50000.0})) is True
+        
+        assert self.stager.pending() == []
+        assert self.client.get_table(self.loader.table_ref).num_rows == 1
+    
+    def test_failed_load_is_replayed(self):
+        """Test that a file whose load failed stays in the spool and is replayed."""
+        failing_client = Mock()
+        failing_client.load_table_from_file.side_effect = RuntimeError("backend error")
+        failing_loader = BigQueryLoader(client=failing_client, stager=self.stager)
+        failing_loader.load_mode = "append"
+        
+        assert failing_loader.write_batch(make_batch({'bitcoin': 50000.0})) is False
+        assert len(self.stager.pending()) == 1
+        
+        assert self.loader.replay_spool() is True
+        assert self.stager.pending() == []
+        assert self.client.get_table(self.loader.table_ref).num_rows == 1
+
+    def test_manifest_tracks_spool_states(self):
+        """Test that staged, failed and loaded files are recorded in the manifest."""
+        failing_client = Mock()
+        failing_client.load_table_from_file.side_effect = RuntimeError("backend error")
+        failing_loader = BigQueryLoader(client=failing_client, stager=self.stager)
+        failing_loader.load_mode = "append"
+        
+        assert failing_loader.write_batch(make_batch({'bitcoin': 50000.0})) is False
+        entry = self.stager.manifest.entries()[0]
+        assert entry['state'] == 'failed'
+        assert entry['attempts'] == 1
+        assert entry['extraction_dates'] == ['2024-01-01']
+        assert 'backend error' in entry['last_error']
+        
+        assert self.loader.replay_spool() is True
+        assert self.stager.manifest.counts() == {'pending': 0, 'failed': 0, 'loaded': 1, 'compacted': 0}
+    
+    def test_failed_batches_replay_in_one_load(self):
+        """Test that several spooled batches load with one job and keep their extraction time."""
+        self.loader.ensure_dataset_exists()
+        first = datetime(2024, 1, 1, 12, 0)
+        second = datetime(2024, 1, 2, 12, 0)
+        self.stager.stage(make_batch({'bitcoin': 50000.0}, first))
+        self.stager.stage(make_batch({'bitcoin': 51000.0, 'ethereum': 3000.0}, second))
+        
+        self.client.load_table_from_file = Mock(wraps=self.client.load_table_from_file)
+        
+        assert self.loader.replay_spool() is True
+        assert self.client.load_table_from_file.call_count == 1
+        
+        rows = self.client.query(
+            f"SELECT crypto_id, extraction_timestamp FROM `{self.loader.table_ref}` ORDER BY extraction_timestamp, crypto_id"
+        ).to_dataframe()
+        assert rows['crypto_id'].tolist() == ['bitcoin', 'bitcoin', 'ethereum']
+        assert [ts.replace(tzinfo=None) for ts in rows['extraction_timestamp']] == [first, second, second]
+        assert self.stager.pending() == []
+        assert self.stager.manifest.counts() == {'pending': 0, 'failed': 0, 'loaded': 1, 'compacted': 2}
+    
+    def test_run_loads_earlier_spooled_batch_with_new_one(self):
+        """Test that a run drains batches left by failed runs without refetching them."""
+        self.loader.initialize_client()
+        self.stager.stage(make_batch({'bitcoin': 50000.0}, datetime(2024, 1, 1, 12, 0)))
+        fetcher = Mock()
+        fetcher.fetch_market_matrix.return_value = {'markets': make_batch({'bitcoin': 51000.0}, datetime(2024, 1, 2, 12, 0))}
+        fetcher.transport_stats.return_value = {}
+        checker = Mock()
+        checker.run_all_checks.return_value = (True, {})
+        self.client.load_table_from_file = Mock(wraps=self.client.load_table_from_file)
+        
+        assert run_batch_pipeline(fetcher, checker, [self.loader]) is True
+        
+        fetcher.fetch_market_matrix.assert_called_once()
+        assert self.client.load_table_from_file.call_count == 1
+        assert self.client.get_table(self.loader.table_ref).num_rows == 2
+        assert self.stager.pending() == []
+
+    def test_incremental_run_does_not_reload_spooled_versions(self):
+        """Test that a version waiting in the spool is skipped and advances the watermarks once replayed."""
+        self.loader.initialize_client()
+        watermarks = WatermarkStore(Path(tempfile.mkdtemp()) / "watermarks.sqlite")
+        self.loader.on_spool_loaded = partial(commit_loaded, watermarks=watermarks)
+        spooled = make_batch({'bitcoin': 50000.0, 'ethereum': 3000.0}, datetime(2024, 1, 1, 12, 0))
+        spooled['last_updated'] = pd.Timestamp('2024-01-01 11:59', tz='UTC')
+        self.stager.stage(spooled)
+        fresh = make_batch({'bitcoin': 50000.0, 'ethereum': 3100.0}, datetime(2024, 1, 1, 12, 5))
+        fresh['last_updated'] = [pd.Timestamp('2024-01-01 11:59', tz='UTC'), pd.Timestamp('2024-01-01 12:04', tz='UTC')]
+        fetcher = Mock()
+        fetcher.fetch_market_matrix.return_value = {'markets': fresh}
+        fetcher.transport_stats.return_value = {}
+        checker = Mock()
+        checker.run_all_checks.return_value = (True, {})
+        
+        assert run_batch_pipeline(fetcher, checker, [self.loader], watermarks) is True
+        
+        rows = self.client.query(f"SELECT crypto_id FROM `{self.loader.table_ref}` ORDER BY crypto_id").to_dataframe()
+        assert rows['crypto_id'].tolist() == ['bitcoin', 'ethereum', 'ethereum']
+        assert watermarks.load()['crypto_id'].tolist() == ['bitcoin', 'ethereum']
+        assert watermarks.filter_changed(fresh)[0].empty
+        watermarks.close()
+
+
+class TestTranslateSql:
+    """Test cases for the BigQuery to DuckDB SQL translation."""
+    
+    def test_strips_bigquery_only_clauses(self):
+        """Test that DDL options, partitioning and clustering are removed."""
+        sql = translate_sql(
+            "CREATE TABLE `p.ds.t` (a STRING NOT NULL OPTIONS(description=\"x (y)\"), b FLOAT64) "
+            "PARTITION BY DATE(ts) CLUSTER BY a OPTIONS(labels=[(\"k\", \"v\")]);"
+        )
+        
+        assert sql.split() == ['CREATE', 'TABLE', '"ds"."t"', '(a', 'VARCHAR', 'NOT', 'NULL', ',', 'b', 'DOUBLE)', ';']
@@ -0,0 +1,141 @@
+"""
+Unit tests for the command-line entry point and its start-up cost.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import pandas as pd
+import pytest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import Mock, patch
+from src.config import Config
+from src.main import parse_args, run_batch_pipeline, writes_bigquery_only
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+# Generous enough for a slow CI runner, far below the ~0.7s pandas/BigQuery import cost
+IMPORT_BUDGET_SECONDS = 0.5
+
+HEAVY_MODULES = ['pandas', 'numpy', 'requests', 'pyarrow', 'google.cloud.bigquery']
+
+
+def run_cli_probe(argv):
+    """Parse argv in a fresh interpreter and report elapsed time and loaded heavy modules."""
+    script = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import main\n"
+        f"args = main.parse_args({argv!r})\n"
+        "if args.command == 'validate-config':\n"
+        "    main.validate_config()\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]\n"
+        "print(json.dumps({'elapsed': elapsed, 'heavy': heavy}))\n"
+    )
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR), GCP_PROJECT_ID="test-project")
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True, text=True, env=env, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def make_snapshot():
+    """Build a one-coin transformed snapshot."""
+    return pd.DataFrame({
+        'crypto_id': ['bitcoin'],
+        'current_price': [50000.0],
+        'extraction_timestamp': [datetime.utcnow()],
+    })
+
+
+class TestStartup:
+    """Test cases for lazy imports at CLI start-up."""
+    
+    def test_validate_config_skips_heavy_imports(self):
+        """Test that validate-config loads no data or cloud libraries."""
+        probe = run_cli_probe(["validate-config"])
+        
+        assert probe['heavy'] == []
+    
+    def test_commands_parse_without_heavy_imports(self):
+        """Test that parsing any command defers component imports."""
+        for argv in (["run", "--incremental"], ["dry-run"], ["backfill", "--start", "2024-01-01", "--end", "2024-01-02"]):
+            probe = run_cli_probe(argv)
+            assert probe['heavy'] == [], argv
+    
+    def test_import_time_budget(self):
+        """Test that importing the CLI and parsing arguments stays within budget."""
+        probe = run_cli_probe(["validate-config"])
+        
+        assert probe['elapsed'] < IMPORT_BUDGET_SECONDS
+
+
+class TestCommands:
+    """Test cases for command parsing and the dry-run pipeline."""
+    
+    def test_default_command_is_run(self):
+        """Test that no subcommand runs the daily pipeline."""
+        args = parse_args([])
+        
+        assert args.command == "run"
+        assert args.stream is False
+    
+    def test_flags_before_command_are_kept(self):
+        """Test that run flags given before the subcommand are not reset by its defaults."""
+        before = parse_args(["--stream", "--batch-size", "10", "run"])
+        after = parse_args(["run", "--stream", "--batch-size", "10"])
+        daemon = parse_args(["--incremental", "daemon"])
+        
+        assert before.stream is True and before.batch_size == 10
+        assert after.stream is True and after.batch_size == 10
+        assert parse_args(["run"]).incremental is False
+        assert daemon.incremental is True
+    
+    def test_bigquery_only_commands_require_bigquery_sink(self):
+        """Test that commands bypassing SINKS refuse a configuration without the BigQuery sink."""
+        assert writes_bigquery_only(parse_args(["--stream", "run"])) is True
+        assert writes_bigquery_only(parse_args(["daemon"])) is True
+        assert writes_bigquery_only(parse_args(["run"])) is False
+        
+        with patch.object(Config, 'SINKS', ['local']):
+            with pytest.raises(ValueError, match="SINKS must include 'bigquery'"):
+                Config.validate(bigquery_only=True)
+    
+    def test_dry_run_validates_without_loading(self):
+        """Test that a dry run fetches and checks data but loads nothing."""
+        fetcher = Mock()
+        fetcher.fetch_market_matrix.return_value = {'markets': make_snapshot()}
+        fetcher.transport_stats.return_value = {}
+        checker = Mock()
+        checker.run_all_checks.return_value = (True, {'overall_passed': True})
+        
+        assert run_batch_pipeline(fetcher, checker, None) is True
+        checker.run_all_checks.assert_called_once()
+    
+    def test_dry_run_does_not_advance_watermarks(self):
+        """Test that a dry run with --incremental leaves watermarks untouched."""
+        snapshot = make_snapshot()
+        fetcher = Mock()
+        fetcher.fetch_market_matrix.return_value = {'markets': snapshot}
+        fetcher.transport_stats.return_value = {}
+        checker = Mock()
+        checker.run_all_checks.return_value = (True, {})
+        watermarks = Mock()
+        watermarks.filter_changed.return_value = (snapshot, 0)
+        
+        assert run_batch_pipeline(fetcher, checker, None, watermarks) is True
+        watermarks.commit.assert_not_called()
+    
+    def test_failed_quality_checks_fail_dry_run(self):
+        """Test that a dry run reports failing quality checks."""
+        fetcher = Mock()
+        fetcher.fetch_market_matrix.return_value = {'markets': make_snapshot()}
+        fetcher.transport_stats.return_value = {}
+        checker = Mock()
+        checker.run_all_checks.return_value = (False, {'overall_passed': False})
+        
+        assert run_batch_pipeline(fetcher, checker, None) is False
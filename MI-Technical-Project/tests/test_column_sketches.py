@@ -0,0 +1,112 @@
+"""
+Unit tests for column sketches and the per-run sketch store.
+"""
+
+import tempfile
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from pathlib import Path
+from src.column_sketches import (
+    ColumnSketch, DDSketch, HyperLogLog, SketchStore, compare_profiles, merge_profiles, profile_frame
+)
+from src.data_quality import DataQualityChecker
+
+
+def make_batch(prices, volumes=None):
+    """Build a batch with numeric and identifier columns."""
+    return pd.DataFrame({
+        'crypto_id': [f"coin-{i}" for i in range(len(prices))],
+        'vs_currency': ['usd'] * len(prices),
+        'current_price': prices,
+        'total_volume': volumes if volumes is not None else [price * 1000 for price in prices],
+    })
+
+
+class TestSketches:
+    """Test cases for HyperLogLog, DDSketch and ColumnSketch."""
+    
+    def test_distinct_count_within_error(self):
+        """Test that HyperLogLog estimates distinct values within a few percent, ignoring repeats."""
+        sketch = HyperLogLog()
+        sketch.add(pd.Series([f"coin-{i % 20000}" for i in range(60000)]))
+        
+        assert abs(sketch.estimate() - 20000) / 20000 < 0.05
+    
+    def test_quantiles_within_relative_accuracy(self):
+        """Test that DDSketch quantiles of a skewed distribution stay within its relative accuracy."""
+        values = np.random.default_rng(7).lognormal(mean=3, sigma=2, size=50000)
+        sketch = DDSketch(relative_accuracy=0.01)
+        sketch.add(values)
+        
+        for q in (0.1, 0.5, 0.9, 0.99):
+            exact = np.quantile(values, q, method='lower')
+            assert abs(sketch.quantile(q) - exact) / exact < 0.02
+    
+    def test_merged_runs_match_single_pass(self):
+        """Test that merging per-run sketches gives the same profile as sketching all rows at once."""
+        prices = np.random.default_rng(1).lognormal(size=3000)
+        runs = [profile_frame(make_batch(chunk)) for chunk in np.array_split(prices, 3)]
+        
+        merged = merge_profiles(runs)['current_price'].summary()
+        single = profile_frame(make_batch(prices))['current_price'].summary()
+        
+        assert merged == single
+    
+    def test_serialization_round_trip(self):
+        """Test that a sketch read back from bytes summarizes identically."""
+        batch = make_batch([1.0, 2.0, np.nan, -3.0, 0.0])
+        for sketch in profile_frame(batch).values():
+            assert ColumnSketch.from_bytes(sketch.to_bytes()).summary() == sketch.summary()
+    
+    def test_drift_reports_quantile_shift(self):
+        """Test that a doubled volume distribution shows as a 100% quantile shift."""
+        prices = list(np.linspace(1, 100, 500))
+        before = profile_frame(make_batch(prices))
+        after = profile_frame(make_batch(prices, [price * 2000 for price in prices]))
+        
+        drift = compare_profiles(before, after)
+        
+        assert abs(drift['total_volume']['quantile_change_pct']['p50'] - 100) < 5
+        assert drift['current_price']['max_shift_pct'] == 0
+        assert drift['crypto_id']['distinct_change_pct'] == 0
+
+
+class TestSketchStore:
+    """Test cases for SketchStore."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.store = SketchStore(Path(tempfile.mkdtemp()) / "column_sketches.sqlite")
+    
+    def teardown_method(self):
+        """Close the store."""
+        self.store.close()
+    
+    def test_load_merges_runs_in_window(self):
+        """Test that load merges only the runs recorded inside the window."""
+        now = datetime(2024, 3, 1, 12)
+        self.store.record(profile_frame(make_batch([1.0, 2.0])), now - timedelta(days=40))
+        self.store.record(profile_frame(make_batch([10.0, 20.0])), now - timedelta(days=2))
+        self.store.record(profile_frame(make_batch([30.0])), now - timedelta(days=1))
+        
+        month = self.store.load(now - timedelta(days=30), now)
+        
+        assert self.store.run_count(now - timedelta(days=30), now) == 2
+        assert month['current_price'].summary()['count'] == 3
+        assert month['current_price'].summary()['min'] == 10.0
+        assert month['current_price'].summary()['max'] == 30.0
+    
+    def test_checker_records_profile_after_load(self):
+        """Test that the quality checker adds the profile to its report and records it once."""
+        checker = DataQualityChecker(sketch_store=self.store)
+        batch = make_batch([1.0, 2.0, 3.0]).assign(
+            symbol=['A', 'B', 'C'], name=['A', 'B', 'C'], extraction_timestamp=datetime(2024, 1, 1)
+        )
+        
+        _, report = checker.run_all_checks(batch)
+        checker.record_column_profile()
+        checker.record_column_profile()
+        
+        assert report['column_profile']['crypto_id']['distinct'] == 3
+        assert self.store.run_count() == 1
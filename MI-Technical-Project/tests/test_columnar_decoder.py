@@ -0,0 +1,131 @@
+"""
+Unit tests for the columnar decoder module.
+"""
+
+import json
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from src.columnar_decoder import MarketColumnBuilder, compact_frame, iter_json_array, series_ids
+from src.data_fetcher import CryptoDataFetcher
+
+
+SAMPLE_RECORDS = [
+    {
+        'id': 'bitcoin', 'symbol': 'btc', 'name': 'Bitcoin Ünicode',
+        'current_price': 50000, 'market_cap': 1000000000.0, 'market_cap_rank': 1,
+        'total_volume': 2500000.5, 'high_24h': 51000.0, 'low_24h': 49000.0,
+        'price_change_24h': -120.5, 'price_change_percentage_24h': -0.24,
+        'price_change_percentage_7d_in_currency': 3.1, 'circulating_supply': 19500000.0,
+        'total_supply': 21000000.0, 'max_supply': 21000000.0, 'ath': 69045.0,
+        'ath_date': '2021-11-10T14:24:11.849Z', 'atl': 67.81, 'atl_date': '2013-07-06T00:00:00.000Z',
+        'last_updated': '2024-03-14T07:10:36.635Z', 'sparkline_in_7d': None, 'roi': None,
+    },
+    {
+        'id': 'ethereum', 'symbol': 'eth', 'name': 'Ethereum',
+        'current_price': 3000.0, 'market_cap': 360000000.0, 'market_cap_rank': None,
+        'total_volume': 1200000.0, 'high_24h': None, 'low_24h': 2900.0,
+        'price_change_24h': 12.0, 'price_change_percentage_24h': 0.4,
+        'price_change_percentage_7d_in_currency': None, 'circulating_supply': 120000000.0,
+        'total_supply': 120000000.0, 'max_supply': None, 'ath': 4878.26,
+        'ath_date': '2021-11-10T14:24:19.604Z', 'atl': 0.43, 'atl_date': None,
+        'last_updated': '2024-03-14T07:10:40.000Z',
+    },
+]
+
+
+def split_bytes(payload, size):
+    """Split a byte payload into fixed-size chunks."""
+    return [payload[i:i + size] for i in range(0, len(payload), size)]
+
+
+class TestIterJsonArray:
+    """Test cases for the incremental JSON array decoder."""
+    
+    def test_decodes_elements_split_across_chunks(self):
+        """Test decoding when records and multi-byte characters straddle chunks."""
+        payload = json.dumps(SAMPLE_RECORDS, ensure_ascii=False).encode('utf-8')
+        
+        for size in (1, 7, 64, len(payload)):
+            assert list(iter_json_array(split_bytes(payload, size))) == SAMPLE_RECORDS
+    
+    def test_empty_array(self):
+        """Test decoding an empty array."""
+        assert list(iter_json_array([b' [ ] '])) == []
+    
+    def test_truncated_body_raises(self):
+        """Test that a truncated body is reported instead of silently dropped."""
+        payload = json.dumps(SAMPLE_RECORDS).encode('utf-8')[:-20]
+        
+        with pytest.raises(ValueError):
+            list(iter_json_array(split_bytes(payload, 16)))
+    
+    def test_non_array_body_raises(self):
+        """Test that an error object is rejected."""
+        with pytest.raises(ValueError):
+            list(iter_json_array([b'{"status": {"error_code": 429}}']))
+
+
+class TestMarketColumnBuilder:
+    """Test cases for MarketColumnBuilder class."""
+    
+    def test_matches_transform_data_output(self):
+        """Test that the columnar frame matches the dict -> DataFrame -> transform_data route."""
+        extraction_timestamp = datetime(2024, 3, 14, 7, 15)
+        raw = pd.DataFrame(SAMPLE_RECORDS)
+        raw['extraction_timestamp'] = extraction_timestamp
+        expected = CryptoDataFetcher().transform_data(raw)
+        
+        builder = MarketColumnBuilder(capacity=1)
+        builder.extend(SAMPLE_RECORDS)
+        result = builder.to_frame(extraction_timestamp)
+        
+        assert list(result.columns) == list(expected.columns)
+        assert result['current_price'].dtype == np.float64
+        assert result['market_cap_rank'].dtype.name == 'Int64'
+        assert result['market_cap_rank'].isna().tolist() == [False, True]
+        for col in expected.columns:
+            if col == 'market_cap_rank':
+                continue
+            pd.testing.assert_series_equal(result[col], expected[col], check_dtype=False, check_names=False)
+
+    def test_compact_dtypes(self):
+        """Test that identifiers are dictionary-encoded and timestamps are UTC."""
+        builder = MarketColumnBuilder()
+        builder.extend(SAMPLE_RECORDS * 50)
+        result = builder.to_frame(datetime(2024, 3, 14, 7, 15))
+        
+        assert isinstance(result['crypto_id'].dtype, pd.CategoricalDtype)
+        assert result['crypto_id'].cat.categories.dtype == 'string'
+        assert result['symbol'].tolist()[:2] == ['BTC', 'ETH']
+        for col in ('ath_date', 'last_updated', 'extraction_timestamp'):
+            assert str(result[col].dtype) == 'datetime64[ns, UTC]'
+        
+        plain = result.astype({col: object for col in ('crypto_id', 'symbol', 'name')})
+        assert result.memory_usage(deep=True).sum() * 2 < plain.memory_usage(deep=True).sum()
+    
+    def test_compact_frame_is_idempotent(self):
+        """Test that compacting an already compact frame copies no column data."""
+        builder = MarketColumnBuilder()
+        builder.extend(SAMPLE_RECORDS)
+        df = builder.to_frame(datetime(2024, 3, 14, 7, 15))
+        codes = df['crypto_id'].cat.codes.to_numpy()
+        prices = df['current_price'].to_numpy()
+        
+        compact_frame(df)
+        
+        assert np.shares_memory(df['crypto_id'].cat.codes.to_numpy(), codes)
+        assert np.shares_memory(df['current_price'].to_numpy(), prices)
+
+    def test_series_ids_qualify_other_currencies(self):
+        """Test that non-USD rows get their own series while USD keeps the bare id."""
+        usd = MarketColumnBuilder()
+        usd.extend(SAMPLE_RECORDS)
+        eur = MarketColumnBuilder(vs_currency='eur')
+        eur.extend(SAMPLE_RECORDS)
+        df = MarketColumnBuilder.concat([usd, eur], datetime(2024, 3, 14, 7, 15))
+        
+        assert df['vs_currency'].tolist() == ['usd', 'usd', 'eur', 'eur']
+        assert list(series_ids(df)) == ['bitcoin', 'ethereum', 'bitcoin:eur', 'ethereum:eur']
+        assert list(series_ids(df.drop(columns='vs_currency'))) == ['bitcoin', 'ethereum'] * 2
@@ -0,0 +1,125 @@
+"""
+Unit tests for the polling daemon module.
+"""
+
+import signal
+import tempfile
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import Mock
+from src.daemon import PollingDaemon
+from src.watermark_store import WatermarkStore
+
+
+def make_snapshot(price):
+    """Build a one-coin transformed snapshot."""
+    return pd.DataFrame({
+        'crypto_id': ['bitcoin'],
+        'symbol': ['BTC'],
+        'name': ['Bitcoin'],
+        'current_price': [price],
+        'market_cap': [1e12],
+        'total_volume': [1e10],
+        'extraction_timestamp': [datetime.utcnow()],
+    })
+
+
+def make_versioned_snapshot():
+    """Build a two-coin snapshot whose rows carry a fixed last_updated."""
+    return pd.DataFrame({
+        'crypto_id': ['bitcoin', 'ethereum'],
+        'symbol': ['BTC', 'ETH'],
+        'name': ['Bitcoin', 'Ethereum'],
+        'current_price': [50000.0, 3000.0],
+        'market_cap': [1e12, 4e11],
+        'total_volume': [1e10, 5e9],
+        'last_updated': [datetime(2024, 1, 1, 12)] * 2,
+        'extraction_timestamp': [datetime.utcnow()] * 2,
+    })
+
+
+class TestPollingDaemon:
+    """Test cases for PollingDaemon class."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.fetcher = Mock()
+        self.fetcher.fetch_transformed_market_data.side_effect = [make_snapshot(50000.0 + i) for i in range(10)]
+        self.fetcher.transport_stats.return_value = {}
+        self.loader = Mock()
+        self.loader.stager.pending.return_value = []
+        self.loader.write_batch.return_value = True
+        self.daemon = PollingDaemon(self.fetcher, self.loader, interval=0.01, polls_per_load=2, align_offset=0)
+    
+    def test_polls_are_batched_into_loads(self):
+        """Test that several polls share one load."""
+        assert self.daemon.run(max_polls=4) is True
+        
+        assert self.loader.write_batch.call_count == 2
+        assert [len(call.args[0]) for call in self.loader.write_batch.call_args_list] == [2, 2]
+    
+    def test_buffered_rows_are_flushed_on_stop(self):
+        """Test that rows polled since the last load are written on shutdown."""
+        self.daemon.run(max_polls=3)
+        
+        assert self.daemon.rows_loaded == 3
+        assert len(self.loader.write_batch.call_args_list[-1].args[0]) == 1
+    
+    def test_sigterm_stops_and_flushes(self):
+        """Test that SIGTERM ends the loop after flushing the buffer."""
+        def poll_then_signal(crypto_ids):
+            self.daemon._handle_signal(signal.SIGTERM, None)
+            return make_snapshot(50000.0)
+        self.fetcher.fetch_transformed_market_data.side_effect = poll_then_signal
+        
+        assert self.daemon.run() is True
+        
+        assert self.daemon.polls == 1
+        assert self.loader.write_batch.call_count == 1
+    
+    def test_failed_poll_is_skipped(self):
+        """Test that a failed fetch does not stop the daemon."""
+        self.fetcher.fetch_transformed_market_data.side_effect = [None, make_snapshot(1.0), make_snapshot(2.0)]
+        
+        self.daemon.run(max_polls=3)
+        
+        assert self.daemon.rows_loaded == 2
+    
+    def test_polls_align_to_interval(self):
+        """Test that the next poll lands on the next interval boundary plus offset."""
+        daemon = PollingDaemon(self.fetcher, self.loader, interval=300, align_offset=15, clock=lambda: 1000.0)
+        
+        assert daemon.seconds_until_next_poll() == 215.0
+    
+    def test_unchanged_rows_are_buffered_once_per_flush(self):
+        """Test that with watermarks, an unchanged snapshot polled several times is loaded once."""
+        snapshot = make_versioned_snapshot()
+        self.fetcher.fetch_transformed_market_data.side_effect = [snapshot.copy() for _ in range(6)]
+        watermarks = WatermarkStore(Path(tempfile.mkdtemp()) / "watermarks.sqlite")
+        daemon = PollingDaemon(self.fetcher, self.loader, interval=0.01, polls_per_load=3, align_offset=0, watermarks=watermarks)
+        
+        daemon.run(max_polls=6)
+        
+        assert [len(call.args[0]) for call in self.loader.write_batch.call_args_list] == [2]
+        watermarks.close()
+
+    def test_spooled_rows_are_not_loaded_again(self):
+        """Test that rows of a failed flush are skipped while spooled and advance the watermarks once replayed."""
+        snapshot = make_versioned_snapshot()
+        self.fetcher.fetch_transformed_market_data.side_effect = [snapshot.copy() for _ in range(2)]
+        self.loader.write_batch.return_value = False
+        watermarks = WatermarkStore(Path(tempfile.mkdtemp()) / "watermarks.sqlite")
+        daemon = PollingDaemon(self.fetcher, self.loader, interval=0.01, polls_per_load=1, align_offset=0, watermarks=watermarks)
+        
+        daemon.poll()
+        assert daemon.flush() is False
+        self.loader.stager.pending.return_value = [Path("crypto_prices-1.parquet")]
+        self.loader.pending_rows.return_value = snapshot
+        self.loader.replay_spool.side_effect = lambda: self.loader.on_spool_loaded(snapshot) or True
+        
+        assert daemon.poll() is False
+        assert daemon.flush() is True
+        assert self.loader.write_batch.call_count == 1
+        assert len(watermarks.load()) == 2
+        watermarks.close()
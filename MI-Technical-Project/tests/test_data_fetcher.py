@@ -2,8 +2,10 @@
 Unit tests for the data fetcher module.
 """
 
+import json
 import pytest
 import pandas as pd
+import requests
 from unittest.mock import Mock, patch
 from src.data_fetcher import CryptoDataFetcher
 
@@ -20,7 +22,7 @@ class TestCryptoDataFetcher:
         assert self.fetcher.base_url is not None
         assert isinstance(self.fetcher.api_key, str)
     
-    @patch('src.data_fetcher.requests.get')
+    @patch('requests.Session.get')
     def test_fetch_market_data_success(self, mock_get):
         """Test successful data fetch."""
         # Mock API response
@@ -35,6 +37,7 @@ class TestCryptoDataFetcher:
             }
         ]
         mock_response.status_code = 200
+        mock_response.content = b'[]'
         mock_get.return_value = mock_response
         
         # Execute
@@ -45,12 +48,13 @@ class TestCryptoDataFetcher:
         assert isinstance(result, pd.DataFrame)
         assert len(result) > 0
     
-    @patch('src.data_fetcher.requests.get')
+    @patch('requests.Session.get')
     def test_fetch_market_data_empty_response(self, mock_get):
         """Test handling of empty API response."""
         mock_response = Mock()
         mock_response.json.return_value = []
         mock_response.status_code = 200
+        mock_response.content = b'[]'
         mock_get.return_value = mock_response
         
         result = self.fetcher.fetch_market_data(['bitcoin'])
@@ -73,3 +77,145 @@ class TestCryptoDataFetcher:
         
         # Assert
         # assert isinstance(result, pd.DataFrame)
+    
+    @patch('requests.Session.get')
+    def test_fetch_market_data_paginated_merges_chunks(self, mock_get):
+        """Test that long id lists are split into pages and merged in order."""
+        def respond(endpoint, params, timeout, stream):
+            mock_response = Mock(status_code=200, content=b'[]')
+            mock_response.json.return_value = [
+                {'id': crypto_id, 'symbol': crypto_id[:3], 'name': crypto_id, 'current_price': 1.0}
+                for crypto_id in params['ids'].split(',')
+            ]
+            return mock_response
+        
+        mock_get.side_effect = respond
+        self.fetcher.http.rate_limiter.rate = 0
+        crypto_ids = [f"coin-{i}" for i in range(600)]
+        
+        result = self.fetcher.fetch_market_data(crypto_ids)
+        
+        assert mock_get.call_count == 3
+        assert len(result) == 600
+        assert list(result['id']) == crypto_ids
+        assert result['extraction_timestamp'].nunique() == 1
+    
+    @patch('requests.Session.get')
+    def test_fetch_market_data_paginated_fails_on_any_page_error(self, mock_get):
+        """Test that a failed page does not silently drop coins."""
+        ok_response = Mock(status_code=200, content=b'[]')
+        ok_response.json.return_value = [{'id': 'bitcoin'}]
+        mock_get.side_effect = [ok_response, requests.exceptions.HTTPError("404 Not Found")]
+        self.fetcher.http.rate_limiter.rate = 0
+        
+        result = self.fetcher.fetch_market_data_paginated(['bitcoin', 'ethereum'], chunk_size=1, max_workers=1)
+        
+        assert result is None
+    
+    @patch('requests.Session.get')
+    def test_fetch_market_data_paginated_caps_chunks_at_page_size(self, mock_get):
+        """Test that a chunk_size above the API page size does not drop coins past per_page."""
+        def respond(endpoint, params, timeout, stream):
+            ids = params['ids'].split(',')[:params['per_page']]
+            mock_response = Mock(status_code=200, content=b'[]')
+            mock_response.json.return_value = [{'id': crypto_id} for crypto_id in ids]
+            return mock_response
+        
+        mock_get.side_effect = respond
+        self.fetcher.http.rate_limiter.rate = 0
+        self.fetcher.page_size = 2
+        crypto_ids = ['bitcoin', 'ethereum', 'solana', 'cardano', 'ripple']
+        
+        result = self.fetcher.fetch_market_data_paginated(crypto_ids, chunk_size=5, max_workers=1)
+        
+        assert mock_get.call_count == 3
+        assert list(result['id']) == crypto_ids
+    
+    @patch('requests.Session.get')
+    def test_fetch_transformed_market_data_streams_pages(self, mock_get):
+        """Test the columnar ingest path returns schema-shaped rows for every page."""
+        def respond(endpoint, params, timeout, stream):
+            records = [
+                {'id': crypto_id, 'symbol': crypto_id[:3], 'name': crypto_id, 'current_price': 1.5,
+                 'market_cap_rank': 1, 'last_updated': '2024-03-14T07:10:36.635Z'}
+                for crypto_id in params['ids'].split(',')
+            ]
+            payload = json.dumps(records).encode('utf-8')
+            mock_response = Mock(status_code=200)
+            mock_response.iter_content.return_value = [payload[i:i + 100] for i in range(0, len(payload), 100)]
+            return mock_response
+        
+        mock_get.side_effect = respond
+        self.fetcher.http.rate_limiter.rate = 0
+        crypto_ids = [f"coin-{i}" for i in range(300)]
+        
+        result = self.fetcher.fetch_transformed_market_data(crypto_ids)
+        
+        assert mock_get.call_count == 2
+        assert mock_get.call_args.kwargs['stream'] is True
+        assert len(result) == 300
+        assert list(result['crypto_id']) == crypto_ids
+        assert result['symbol'].iloc[0] == 'COI'
+        assert result['current_price'].dtype == 'float64'
+        assert self.fetcher.transport_stats()['bytes_received'] > 0
+
+    @patch('requests.Session.get')
+    def test_iter_transformed_batches_bounds_batch_size(self, mock_get):
+        """Test that the streaming fetch yields bounded batches covering every coin."""
+        def respond(endpoint, params, timeout, stream):
+            records = [{'id': crypto_id, 'symbol': 'x', 'name': crypto_id, 'current_price': 1.0}
+                       for crypto_id in params['ids'].split(',')]
+            mock_response = Mock(status_code=200)
+            mock_response.iter_content.return_value = [json.dumps(records).encode('utf-8')]
+            return mock_response
+        
+        mock_get.side_effect = respond
+        self.fetcher.http.rate_limiter.rate = 0
+        crypto_ids = [f"coin-{i}" for i in range(250)]
+        
+        batches = list(self.fetcher.iter_transformed_batches(crypto_ids, batch_size=100, max_in_flight=2))
+        
+        assert [len(batch) for batch in batches] == [100, 100, 50]
+        assert [crypto_id for batch in batches for crypto_id in batch['crypto_id']] == crypto_ids
+        assert len({batch['extraction_timestamp'].iloc[0] for batch in batches}) == 1
+
+    @patch('requests.Session.get')
+    def test_fetch_market_matrix_fans_out_currencies_and_endpoints(self, mock_get):
+        """Test that every currency and endpoint is fetched in one pass into typed frames."""
+        def respond(url, params, timeout, stream):
+            mock_response = Mock(status_code=200, content=b'{}')
+            if url.endswith('/global'):
+                mock_response.json.return_value = {'data': {
+                    'total_market_cap': {'usd': 2.5e12, 'eur': 2.3e12},
+                    'total_volume': {'usd': 9e10, 'eur': 8e10},
+                    'market_cap_percentage': {'btc': 52.1, 'eth': 16.8},
+                    'active_cryptocurrencies': 13000, 'markets': 1100, 'updated_at': 1710400000,
+                }}
+            elif url.endswith('/exchange_rates'):
+                mock_response.json.return_value = {'rates': {
+                    'usd': {'name': 'US Dollar', 'unit': '$', 'value': 65000.0, 'type': 'fiat'},
+                    'eth': {'name': 'Ether', 'unit': 'ETH', 'value': 18.5, 'type': 'crypto'},
+                }}
+            else:
+                price = 2.0 if params['vs_currency'] == 'eur' else 1.0
+                records = [{'id': crypto_id, 'symbol': 'x', 'name': crypto_id, 'current_price': price}
+                           for crypto_id in params['ids'].split(',')]
+                mock_response.iter_content.return_value = [json.dumps(records).encode('utf-8')]
+            return mock_response
+        
+        mock_get.side_effect = respond
+        self.fetcher.http.rate_limiter.rate = 0
+        
+        frames = self.fetcher.fetch_market_matrix(
+            ['bitcoin', 'ethereum'], vs_currencies=['usd', 'eur'],
+            endpoints=['markets', 'global', 'exchange_rates'], chunk_size=1
+        )
+        
+        assert mock_get.call_count == 6
+        markets = frames['markets']
+        assert len(markets) == 4
+        assert markets.groupby('vs_currency', observed=True)['current_price'].first().to_dict() == {'eur': 2.0, 'usd': 1.0}
+        assert frames['global']['vs_currency'].tolist() == ['usd', 'eur']
+        assert frames['global']['total_market_cap'].tolist() == [2.5e12, 2.3e12]
+        assert frames['exchange_rates']['btc_rate'].tolist() == [65000.0, 18.5]
+        assert frames['global']['extraction_timestamp'].iloc[0] == markets['extraction_timestamp'].iloc[0]
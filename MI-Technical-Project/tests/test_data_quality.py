@@ -74,3 +74,72 @@ class TestDataQualityChecker:
         })
         result = self.checker.check_value_ranges(df)
         assert result is False
+
+    def test_run_all_checks_report_structure(self):
+        """Test that the single-pass engine produces the per-check report keys."""
+        df = pd.DataFrame({
+            'crypto_id': ['bitcoin', 'ethereum'],
+            'symbol': ['BTC', 'ETH'],
+            'name': ['Bitcoin', 'Ethereum'],
+            'current_price': [50000.0, 3000.0],
+            'market_cap': [1000000000.0, 500000000.0],
+            'total_volume': [50000000.0, 20000000.0]
+        })
+        passed, report = self.checker.run_all_checks(df)
+        
+        assert passed is True
+        assert report['overall_status'] == 'PASSED'
+        assert report['record_count'] == 2
+        for check in ('empty_check', 'min_records_check', 'null_check', 'datatype_check', 'range_check'):
+            assert report[check] == 'PASSED'
+        assert report['null_values']['current_price'] == {'null_count': 0, 'null_percentage': 0.0}
+    
+    def test_run_all_checks_violation_masks(self):
+        """Test that failing rows are flagged per rule."""
+        df = pd.DataFrame({
+            'crypto_id': ['bitcoin', 'ethereum', 'cardano'],
+            'symbol': ['BTC', 'ETH', 'ADA'],
+            'name': ['Bitcoin', 'Ethereum', 'Cardano'],
+            'current_price': [50000.0, -1.0, None],
+            'market_cap': [1000000000.0, 500000000.0, -5.0],
+            'total_volume': [1.0, 2.0, 3.0]
+        })
+        passed, report = self.checker.run_all_checks(df)
+        masks = self.checker.violation_masks
+        
+        assert passed is False
+        assert report['range_check'] == 'FAILED'
+        assert report['null_check'] == 'FAILED'
+        assert masks['range:current_price'].tolist() == [False, True, False]
+        assert masks['null:current_price'].tolist() == [False, False, True]
+        assert masks['range:market_cap'].tolist() == [False, False, True]
+        assert masks['any'].tolist() == [False, True, True]
+    
+    def test_run_all_checks_empty_dataframe(self):
+        """Test that an empty frame fails without running column rules."""
+        passed, report = self.checker.run_all_checks(pd.DataFrame())
+        
+        assert passed is False
+        assert report['empty_check'] == 'FAILED'
+        assert report['overall_status'] == 'FAILED'
+
+    def test_aggregated_batch_report_matches_run_all_checks(self):
+        """Test that per-batch results aggregate to the whole-frame report."""
+        df = pd.DataFrame({
+            'crypto_id': ['bitcoin', 'ethereum', 'cardano', 'solana', 'polkadot'],
+            'symbol': ['BTC', 'ETH', 'ADA', 'SOL', None],
+            'name': ['Bitcoin', 'Ethereum', 'Cardano', 'Solana', 'Polkadot'],
+            'current_price': [50000.0, 3000.0, 0.5, 100.0, 7.0],
+            'market_cap': [1.0, 2.0, 3.0, 4.0, 5.0],
+            'total_volume': [1.0, 2.0, 3.0, 4.0, 5.0]
+        })
+        
+        for start in range(0, len(df), 2):
+            self.checker.run_batch_checks(df.iloc[start:start + 2])
+        batch_passed, batch_report = self.checker.aggregate_batch_reports()
+        
+        full_passed, full_report = DataQualityChecker().run_all_checks(df)
+        
+        assert batch_passed is False
+        assert batch_passed == full_passed
+        assert batch_report == full_report
@@ -0,0 +1,174 @@
+"""
+Unit tests for the dedupe index (per-date Bloom filters of loaded keys).
+"""
+
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import Mock
+from conftest import make_batch
+from src.daemon import PollingDaemon
+from src.dedupe_index import BloomFilter, DedupeIndex
+
+KEYS = ['crypto_id', 'vs_currency', 'extraction_timestamp']
+
+
+class TestBloomFilter:
+    """Test cases for BloomFilter."""
+    
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        """Test that every added key is found and unseen keys rarely are."""
+        rng = np.random.default_rng(3)
+        added = rng.integers(0, 2**63, size=(2, 20000), dtype=np.int64).astype(np.uint64)
+        unseen = rng.integers(0, 2**63, size=(2, 100000), dtype=np.int64).astype(np.uint64)
+        bloom = BloomFilter.for_capacity(20000, 0.01)
+        
+        bloom.add(added[0], added[1])
+        
+        assert bloom.contains(added[0], added[1]).all()
+        assert bloom.contains(unseen[0], unseen[1]).mean() < 0.02
+
+
+class TestDedupeIndex:
+    """Test cases for DedupeIndex."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.directory = Path(tempfile.mkdtemp())
+        self.loaded = make_batch({})[KEYS]
+        self.index = DedupeIndex(self.directory, KEYS, confirm=self.confirm)
+    
+    def confirm(self, candidates):
+        """Stand-in for BigQueryLoader.existing_keys over the rows committed so far."""
+        return self.loaded
+    
+    def commit(self, df):
+        """Record a batch as loaded in the stand-in warehouse and the index."""
+        self.loaded = pd.concat([self.loaded, df[KEYS]], ignore_index=True) if len(self.loaded) else df[KEYS]
+        self.index.commit(df)
+    
+    def test_reloaded_rows_are_skipped(self):
+        """Test that rows already loaded are dropped and new rows kept."""
+        self.commit(make_batch({'bitcoin': 100.0, 'ethereum': 101.0}))
+        
+        batch = pd.concat([make_batch({'bitcoin': 100.0, 'ethereum': 101.0}), make_batch({'bitcoin': 100.0}, datetime(2024, 1, 1, 12, 5))])
+        new_rows, report = self.index.filter_new(batch)
+        
+        assert len(new_rows) == 1
+        assert new_rows['extraction_timestamp'].iloc[0] == datetime(2024, 1, 1, 12, 5)
+        assert report['duplicates_skipped'] == 2
+    
+    def test_repeats_within_batch_are_dropped(self):
+        """Test that a key repeated in one batch is loaded once."""
+        batch = pd.concat([make_batch({'bitcoin': 100.0}), make_batch({'bitcoin': 100.0})], ignore_index=True)
+        
+        new_rows, report = self.index.filter_new(batch)
+        
+        assert len(new_rows) == 1
+        assert report['batch_duplicates'] == 1
+    
+    def test_false_positives_are_loaded(self):
+        """Test that candidates the warehouse does not hold are kept."""
+        self.index.commit(make_batch({'bitcoin': 100.0}))
+        
+        new_rows, report = self.index.filter_new(make_batch({'bitcoin': 100.0}))
+        
+        assert len(new_rows) == 1
+        assert report['candidates'] == 1
+        assert report['false_positives'] == 1
+    
+    def test_candidates_loaded_when_confirmation_fails(self):
+        """Test that a failed confirmation query loads the candidates rather than dropping them."""
+        self.index.confirm = Mock(side_effect=RuntimeError("query failed"))
+        self.index.commit(make_batch({'bitcoin': 100.0}))
+        
+        new_rows, report = self.index.filter_new(make_batch({'bitcoin': 100.0}))
+        
+        assert len(new_rows) == 1
+        assert report['duplicates_skipped'] == 0
+    
+    def test_only_batch_dates_are_read(self):
+        """Test that filters are kept per date and the confirmation sees only candidates."""
+        self.commit(make_batch({'bitcoin': 100.0}, datetime(2024, 1, 1, 12)))
+        self.commit(make_batch({'bitcoin': 100.0}, datetime(2024, 1, 2, 12)))
+        self.index.confirm = Mock(return_value=self.loaded)
+        
+        new_rows, _ = self.index.filter_new(make_batch({'bitcoin': 100.0, 'ethereum': 101.0}, datetime(2024, 1, 3, 12)))
+        
+        assert sorted(path.name for path in self.directory.iterdir()) == ['2024-01-01.npz', '2024-01-02.npz']
+        assert len(new_rows) == 2
+        self.index.confirm.assert_not_called()
+    
+    def test_state_persists_and_open_filters_are_bounded(self):
+        """Test that a reopened index still knows loaded keys while holding at most max_open_partitions filters."""
+        start = datetime(2024, 1, 1, 12)
+        for day in range(5):
+            self.commit(make_batch({'bitcoin': 100.0}, start + timedelta(days=day)))
+        
+        reopened = DedupeIndex(self.directory, KEYS, confirm=self.confirm, max_open_partitions=2)
+        batch = pd.concat([make_batch({'bitcoin': 100.0}, start + timedelta(days=day)) for day in range(5)])
+        new_rows, report = reopened.filter_new(batch)
+        
+        assert new_rows.empty
+        assert report['duplicates_skipped'] == 5
+        assert len(reopened._filters) == 2
+    
+    def test_key_columns_must_include_timestamp(self):
+        """Test that the index refuses keys it cannot partition by date."""
+        with pytest.raises(ValueError):
+            DedupeIndex(self.directory, ['crypto_id'])
+    
+    def test_daemon_skips_rows_already_loaded(self):
+        """Test that the daemon filters a flush through the index and commits what it loaded."""
+        fetcher = Mock()
+        fetcher.fetch_transformed_market_data.side_effect = [make_batch({'bitcoin': 100.0}), make_batch({'bitcoin': 100.0})]
+        loader = Mock()
+        loader.stager.pending.return_value = []
+        loader.write_batch.return_value = True
+        daemon = PollingDaemon(fetcher, loader, interval=0.01, polls_per_load=1, align_offset=0, dedupe_index=self.index)
+        
+        daemon.poll()
+        daemon.flush()
+        self.loaded = make_batch({'bitcoin': 100.0})[KEYS]
+        daemon.poll()
+        daemon.flush()
+        
+        assert loader.write_batch.call_count == 1
+        assert self.directory.joinpath('2024-01-01.npz').exists()
+
+
+class TestExistingKeys:
+    """Test cases for BigQueryLoader.existing_keys (uses the DuckDB stand-in)."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        pytest.importorskip("duckdb")
+        from src.bigquery_loader import BigQueryLoader
+        from src.local_bigquery import LocalBigQueryClient
+        from src.parquet_staging import ParquetStager
+        
+        self.client = LocalBigQueryClient()
+        self.loader = BigQueryLoader(client=self.client, stager=ParquetStager(spool_dir=tempfile.mkdtemp()))
+        self.loader.project_id = "local"
+        self.loader.load_mode = "append"
+        self.loader.initialize_client()
+        self.loader.ensure_dataset_exists()
+    
+    def test_confirms_loaded_keys(self):
+        """Test that the lookup returns the loaded keys of the candidates' time range only."""
+        assert self.loader.existing_keys(make_batch({'bitcoin': 100.0})).empty
+        
+        self.loader.write(make_batch({'bitcoin': 100.0, 'ethereum': 101.0}))
+        self.loader.write(make_batch({'bitcoin': 100.0}, datetime(2024, 1, 2, 12)))
+        index = DedupeIndex(Path(tempfile.mkdtemp()), KEYS, confirm=self.loader.existing_keys)
+        index.commit(make_batch({'bitcoin': 100.0, 'ethereum': 101.0}))
+        
+        existing = self.loader.existing_keys(make_batch({'bitcoin': 100.0}))
+        new_rows, report = index.filter_new(make_batch({'bitcoin': 100.0, 'ethereum': 101.0, 'solana': 102.0}))
+        
+        assert len(existing) == 2
+        assert list(new_rows['crypto_id']) == ['solana']
+        assert report['duplicates_skipped'] == 2
@@ -0,0 +1,92 @@
+"""
+Unit tests for the HTTP transport module.
+"""
+
+import pytest
+import requests
+from unittest.mock import Mock, patch
+from src.http_client import HttpClient, TokenBucket
+
+
+def make_response(status_code, headers=None, content=b'[]'):
+    """Build a mock requests.Response."""
+    response = Mock(status_code=status_code, headers=headers or {}, content=content)
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError(f"{status_code} Error")
+    return response
+
+
+class TestHttpClient:
+    """Test cases for HttpClient class."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.client = HttpClient(requests_per_minute=0, max_retries=3, backoff_base=0)
+    
+    @patch('time.sleep')
+    def test_retries_429_honouring_retry_after(self, mock_sleep):
+        """Test that a 429 is retried after the Retry-After delay."""
+        self.client.session.get = Mock(side_effect=[
+            make_response(429, headers={'Retry-After': '2'}),
+            make_response(200),
+        ])
+        
+        response = self.client.get("https://example.com/coins/markets")
+        
+        assert response.status_code == 200
+        mock_sleep.assert_called_once_with(2.0)
+        stats = self.client.stats.summary()
+        assert stats['requests'] == 2
+        assert stats['retries'] == 1
+        assert stats['failures'] == 0
+    
+    @patch('time.sleep')
+    def test_retries_connection_errors_then_succeeds(self, mock_sleep):
+        """Test that transient connection errors are retried."""
+        self.client.session.get = Mock(side_effect=[
+            requests.exceptions.ConnectionError("reset"),
+            make_response(502),
+            make_response(200),
+        ])
+        
+        response = self.client.get("https://example.com/coins/markets")
+        
+        assert response.status_code == 200
+        assert self.client.stats.summary()['retries'] == 2
+    
+    @patch('time.sleep')
+    def test_gives_up_after_max_retries(self, mock_sleep):
+        """Test that persistent 503s raise once retries are exhausted."""
+        self.client.session.get = Mock(return_value=make_response(503))
+        
+        with pytest.raises(requests.exceptions.HTTPError):
+            self.client.get("https://example.com/coins/markets")
+        
+        assert self.client.session.get.call_count == 4
+        assert self.client.stats.summary()['failures'] == 1
+    
+    def test_client_errors_are_not_retried(self):
+        """Test that a 404 fails immediately."""
+        self.client.session.get = Mock(return_value=make_response(404))
+        
+        with pytest.raises(requests.exceptions.HTTPError):
+            self.client.get("https://example.com/coins/unknown")
+        
+        assert self.client.session.get.call_count == 1
+
+
+class TestTokenBucket:
+    """Test cases for TokenBucket class."""
+    
+    @patch('time.sleep')
+    def test_waits_once_burst_is_spent(self, mock_sleep):
+        """Test that requests beyond the burst capacity block."""
+        bucket = TokenBucket(requests_per_minute=6000, capacity=2)
+        
+        bucket.acquire()
+        bucket.acquire()
+        assert mock_sleep.call_count == 0
+        
+        mock_sleep.side_effect = lambda seconds: setattr(bucket, '_tokens', 1.0)
+        bucket.acquire()
+        assert mock_sleep.call_count == 1
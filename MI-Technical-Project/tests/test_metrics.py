@@ -0,0 +1,132 @@
+"""
+Unit tests for the run metrics module.
+"""
+
+import json
+import tempfile
+import pandas as pd
+import pytest
+from pathlib import Path
+from src.metrics import RunMetrics, get_run_metrics, instrumented, set_run_metrics, stage
+
+
+class FakeFetcher:
+    """Instrumented stand-in with cumulative transfer counters."""
+    
+    def __init__(self):
+        self.bytes_received = 0
+        self.retries = 0
+    
+    def transfer_counters(self):
+        return {'bytes': self.bytes_received, 'retries': self.retries}
+    
+    @instrumented()
+    def fetch(self, rows):
+        self.bytes_received += 100 * rows
+        self.retries += 1
+        return pd.DataFrame({'crypto_id': ['coin'] * rows})
+    
+    @instrumented("fetcher.batches")
+    def batches(self, sizes):
+        for size in sizes:
+            yield pd.DataFrame({'crypto_id': ['coin'] * size})
+    
+    @instrumented()
+    def fail(self):
+        raise RuntimeError("boom")
+
+
+class TestRunMetrics:
+    """Test cases for RunMetrics and the stage helpers."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.metrics = RunMetrics(command="run")
+        set_run_metrics(self.metrics)
+        self.fetcher = FakeFetcher()
+    
+    def teardown_method(self):
+        """Clear the active run."""
+        set_run_metrics(None)
+    
+    def test_stage_aggregates_calls(self):
+        """Test that repeated stages add up rows and calls."""
+        for rows in (3, 4):
+            with stage("pipeline.quality") as counts:
+                counts['rows'] = rows
+        
+        totals = self.metrics.summary()['stages']['pipeline.quality']
+        assert totals['calls'] == 2
+        assert totals['rows'] == 7
+        assert totals['wall_seconds'] >= 0
+    
+    def test_stage_without_active_run_is_untimed(self):
+        """Test that stages are no-ops when no run is active."""
+        set_run_metrics(None)
+        
+        with stage("pipeline.fetch") as counts:
+            counts['rows'] = 5
+        
+        assert get_run_metrics() is None
+        assert self.metrics.stages == {}
+    
+    def test_instrumented_records_rows_bytes_and_retries(self):
+        """Test that method stages take rows from the result and deltas from transfer counters."""
+        self.fetcher.fetch(5)
+        
+        totals = self.metrics.summary()['stages']['FakeFetcher.fetch']
+        assert totals['rows'] == 5
+        assert totals['bytes'] == 500
+        assert totals['retries'] == 1
+    
+    def test_instrumented_generator_counts_yielded_rows(self):
+        """Test that generator methods are timed per item and sum their rows."""
+        batches = list(self.fetcher.batches([2, 3]))
+        
+        totals = self.metrics.summary()['stages']['fetcher.batches']
+        assert len(batches) == 2
+        assert totals['rows'] == 5
+        assert totals['calls'] == 2
+    
+    def test_instrumented_counts_errors(self):
+        """Test that a raising method is recorded as an error."""
+        with pytest.raises(RuntimeError):
+            self.fetcher.fail()
+        
+        totals = self.metrics.summary()['stages']['FakeFetcher.fail']
+        assert totals['calls'] == 1
+        assert totals['errors'] == 1
+    
+    def test_prometheus_text(self):
+        """Test the Prometheus text exposition output."""
+        self.fetcher.fetch(2)
+        self.metrics.finish(True)
+        
+        text = self.metrics.to_prometheus()
+        
+        assert '# TYPE mi_etl_stage_wall_seconds gauge' in text
+        assert 'mi_etl_run_success{command="run"} 1' in text
+        assert 'mi_etl_stage_rows{command="run",stage="FakeFetcher.fetch"} 2' in text
+    
+    def test_write_appends_history_and_replaces_prom(self):
+        """Test that each run appends a JSON line and rewrites the .prom file."""
+        metrics_dir = Path(tempfile.mkdtemp())
+        
+        for _ in range(2):
+            self.metrics.finish(True)
+            written = self.metrics.write(metrics_dir)
+        
+        lines = written['jsonl'].read_text().splitlines()
+        assert len(lines) == 2
+        assert json.loads(lines[0])['command'] == "run"
+        assert written['prom'].read_text().startswith("# HELP")
+        assert 'profile' not in written
+    
+    def test_slow_run_writes_profile(self):
+        """Test that a run over the profiling threshold dumps cProfile stats."""
+        metrics = RunMetrics(command="run", profile_threshold=1e-9)
+        metrics.finish(False)
+        
+        written = metrics.write(Path(tempfile.mkdtemp()))
+        
+        assert written['profile'].exists()
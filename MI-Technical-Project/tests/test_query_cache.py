@@ -0,0 +1,162 @@
+"""
+Unit tests for the query result cache.
+"""
+
+import tempfile
+import time
+import pytest
+import pandas as pd
+import pyarrow as pa
+from datetime import datetime
+from conftest import make_batch
+from src.query_cache import QueryCache, normalize_sql, referenced_tables
+from src.table_schema import load_view_dependencies
+
+LATEST_QUERY = "SELECT crypto_id, current_price FROM `local.crypto_analytics.v_latest_crypto_prices`"
+
+
+def make_result(num_rows=3):
+    """Build a small result set."""
+    return pa.table({'crypto_id': [f"coin-{i}" for i in range(num_rows)], 'current_price': [float(i) for i in range(num_rows)]})
+
+
+class TestQueryCache:
+    """Test cases for QueryCache class."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.cache = QueryCache(
+            tempfile.mkdtemp(),
+            dependencies={'crypto_analytics.v_latest_crypto_prices': ['crypto_analytics.crypto_prices']}
+        )
+    
+    def test_key_ignores_formatting_but_not_literals(self):
+        """Test that whitespace and comments do not change the key, string literals do."""
+        formatted = "SELECT crypto_id,\n  current_price -- latest\nFROM   `local.crypto_analytics.v_latest_crypto_prices`;"
+        
+        assert QueryCache.make_key(formatted) == QueryCache.make_key(LATEST_QUERY)
+        assert normalize_sql("SELECT 'a  b'") == "SELECT 'a  b'"
+        assert QueryCache.make_key(LATEST_QUERY, {'day': '2024-01-01'}) != QueryCache.make_key(LATEST_QUERY, {'day': '2024-01-02'})
+    
+    def test_round_trip(self):
+        """Test that a stored result is returned on the next lookup."""
+        assert self.cache.get(LATEST_QUERY) is None
+        assert self.cache.put(LATEST_QUERY, None, make_result()) is True
+        
+        table = self.cache.get(LATEST_QUERY)
+        
+        assert table.equals(make_result())
+        assert self.cache.stats()['hits'] == 1
+    
+    def test_views_expand_to_base_tables(self):
+        """Test that a write to the base table invalidates results read through a view."""
+        self.cache.put(LATEST_QUERY, None, make_result())
+        
+        assert self.cache.record_write("local.crypto_analytics.crypto_prices", ["2024-01-01"]) == 1
+        assert self.cache.get(LATEST_QUERY) is None
+    
+    def test_writes_to_other_partitions_keep_results(self):
+        """Test that results declaring their partitions survive writes elsewhere."""
+        query = "SELECT * FROM `crypto_analytics.crypto_prices` WHERE DATE(extraction_timestamp) = '2024-01-01'"
+        self.cache.put(query, None, make_result(), partitions=["2024-01-01"])
+        
+        assert self.cache.record_write("crypto_analytics.crypto_prices", ["2024-01-02"]) == 0
+        assert self.cache.get(query) is not None
+        assert self.cache.record_write("crypto_analytics.crypto_prices", ["2024-01-01"]) == 1
+    
+    def test_result_of_query_overlapping_a_write_is_not_stored(self):
+        """Test that a query started before a write does not cache its possibly stale result."""
+        started_at = time.time()
+        self.cache.record_write("crypto_analytics.crypto_prices")
+        
+        assert self.cache.put(LATEST_QUERY, None, make_result(), started_at=started_at) is False
+    
+    def test_queries_without_tables_are_not_cached(self):
+        """Test that results no write could invalidate are not stored."""
+        assert referenced_tables("SELECT 1") == set()
+        assert self.cache.put("SELECT 1", None, make_result()) is False
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used result is evicted over the size bound."""
+        first = "SELECT * FROM `crypto_analytics.crypto_prices` LIMIT 1"
+        second = "SELECT * FROM `crypto_analytics.crypto_prices` LIMIT 2"
+        self.cache.put(first, None, make_result(1000))
+        self.cache.max_bytes = self.cache.stats()['bytes'] + 100
+        
+        self.cache.put(second, None, make_result(1000))
+        
+        assert self.cache.get(first) is None
+        assert self.cache.get(second) is not None
+        assert self.cache.stats()['evictions'] == 1
+    
+    def test_ttl_expiry(self):
+        """Test that entries older than the TTL are misses."""
+        self.cache.ttl_seconds = 1
+        self.cache.put(LATEST_QUERY, None, make_result())
+        self.cache._db.execute("UPDATE results SET stored_at = stored_at - 10")
+        
+        assert self.cache.get(LATEST_QUERY) is None
+    
+    def test_schema_view_dependencies(self):
+        """Test that view dependencies are read from sql/schema.sql."""
+        dependencies = load_view_dependencies()
+        
+        assert dependencies['crypto_analytics.v_latest_crypto_prices'] == ['crypto_analytics.crypto_latest_prices']
+        assert dependencies['crypto_analytics.v_daily_price_summary'] == ['crypto_analytics.crypto_daily_summary']
+
+
+class TestLoaderQueryCache:
+    """Test cases for BigQueryLoader.execute_query with the query cache."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        pytest.importorskip("duckdb")
+        from src.bigquery_loader import BigQueryLoader
+        from src.local_bigquery import LocalBigQueryClient
+        from src.parquet_staging import ParquetStager
+        
+        self.client = LocalBigQueryClient()
+        self.loader = BigQueryLoader(
+            client=self.client,
+            stager=ParquetStager(spool_dir=tempfile.mkdtemp()),
+            query_cache=QueryCache(tempfile.mkdtemp())
+        )
+        self.loader.project_id = "local"
+        self.loader.ensure_dataset_exists()
+        self.query = f"SELECT crypto_id, current_price FROM `{self.loader.table_ref}` ORDER BY crypto_id"
+        self.loader.upsert_data(make_batch({'bitcoin': 50000.0}))
+    
+    def test_repeated_query_is_served_locally(self):
+        """Test that the second identical query does not reach the client."""
+        first = self.loader.execute_query(self.query)
+        queries_before = len(self.client.queries)
+        
+        second = self.loader.execute_query(self.query)
+        
+        assert len(self.client.queries) == queries_before
+        pd.testing.assert_frame_equal(first, second)
+    
+    def test_merge_invalidates_cached_result(self):
+        """Test that upserting into a partition refreshes results that read it."""
+        self.loader.execute_query(self.query)
+        
+        self.loader.upsert_data(make_batch({'bitcoin': 51000.0, 'ethereum': 3000.0}))
+        result = self.loader.execute_query(self.query)
+        
+        assert result['current_price'].tolist() == [51000.0, 3000.0]
+    
+    def test_append_load_invalidates_cached_result(self):
+        """Test that plain loads record their partitions with the cache."""
+        self.loader.execute_query(self.query)
+        
+        self.loader.load_data(make_batch({'solana': 100.0}, datetime(2024, 1, 2, 12, 0)))
+        result = self.loader.execute_query(self.query)
+        
+        assert result['crypto_id'].tolist() == ['bitcoin', 'solana']
+    
+    def test_query_parameters(self):
+        """Test that named parameters are bound and part of the cache key."""
+        query = f"SELECT crypto_id FROM `{self.loader.table_ref}` WHERE current_price > @min_price"
+        
+        assert len(self.loader.execute_query(query, params={'min_price': 1000.0})) == 1
+        assert len(self.loader.execute_query(query, params={'min_price': 100000.0})) == 0
@@ -0,0 +1,129 @@
+"""
+Unit tests for the response cache module.
+"""
+
+import json
+import os
+import tempfile
+import pytest
+from pathlib import Path
+from unittest.mock import Mock, patch
+from src.data_fetcher import CryptoDataFetcher, OfflineCacheMiss
+from src.response_cache import ResponseCache, parse_endpoint_ttls
+
+
+class TestResponseCache:
+    """Test cases for ResponseCache class."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.path = Path(tempfile.mkdtemp()) / "cache.sqlite"
+        self.cache = ResponseCache(self.path, default_ttl=300)
+    
+    def test_hit_and_miss_counters(self):
+        """Test that stored responses are returned and counted."""
+        assert self.cache.get("/coins/markets", {'ids': 'bitcoin'}) is None
+        self.cache.put("/coins/markets", {'ids': 'bitcoin'}, b'[{"id": "bitcoin"}]')
+        
+        assert self.cache.get("/coins/markets", {'ids': 'bitcoin'}) == b'[{"id": "bitcoin"}]'
+        stats = self.cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['entries'] == 1
+    
+    def test_key_normalizes_params(self):
+        """Test that parameter and id order do not change the cache key."""
+        first = ResponseCache.make_key("/coins/markets", {'ids': 'bitcoin,ethereum', 'sparkline': False})
+        second = ResponseCache.make_key("/coins/markets", {'sparkline': 'false', 'ids': 'ethereum, bitcoin'})
+        
+        assert first == second
+        assert first != ResponseCache.make_key("/coins/markets", {'ids': 'bitcoin'})
+    
+    def test_expired_entries_miss(self):
+        """Test that entries older than their endpoint TTL are not served."""
+        cache = ResponseCache(self.path, default_ttl=300, endpoint_ttls={'/coins/markets': -1})
+        cache.put("/coins/markets", {}, b'[]')
+        cache.put("/coins/bitcoin/market_chart/range", {}, b'{}')
+        
+        assert cache.get("/coins/markets", {}) is None
+        assert cache.get("/coins/bitcoin/market_chart/range", {}) == b'{}'
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted over the size bound."""
+        body = os.urandom(1024)
+        cache = ResponseCache(self.path, max_bytes=len(body) * 2 + 100)
+        cache.put("/a", {}, body)
+        cache.put("/b", {}, body)
+        cache.get("/a", {})
+        cache.put("/c", {}, body)
+        
+        assert cache.get("/b", {}) is None
+        assert cache.get("/a", {}) == body
+        assert cache.stats()['evictions'] == 1
+    
+    def test_offline_mode_never_expires(self):
+        """Test that offline mode replays stale entries and does not write."""
+        self.cache.put("/coins/markets", {}, b'[]')
+        offline = ResponseCache(self.path, default_ttl=-1, offline=True)
+        
+        assert offline.get("/coins/markets", {}) == b'[]'
+        offline.put("/other", {}, b'[]')
+        assert offline.stats()['entries'] == 1
+    
+    def test_parse_endpoint_ttls(self):
+        """Test parsing of the CACHE_ENDPOINT_TTLS setting."""
+        assert parse_endpoint_ttls("/coins/markets=300, /market_chart/range=86400") == {
+            '/coins/markets': 300,
+            '/market_chart/range': 86400,
+        }
+
+
+class TestCachedFetcher:
+    """Test cases for CryptoDataFetcher with a response cache."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.cache = ResponseCache(Path(tempfile.mkdtemp()) / "cache.sqlite")
+        self.fetcher = CryptoDataFetcher(cache=self.cache)
+        self.fetcher.http.rate_limiter.rate = 0
+        self.records = [
+            {'id': 'bitcoin', 'symbol': 'btc', 'name': 'Bitcoin', 'current_price': 50000.0},
+            {'id': 'ethereum', 'symbol': 'eth', 'name': 'Ethereum', 'current_price': 3000.0},
+        ]
+    
+    def mock_response(self):
+        response = Mock()
+        response.status_code = 200
+        response.iter_content.return_value = [json.dumps(self.records).encode('utf-8')]
+        return response
+    
+    @patch('requests.Session.get')
+    def test_repeat_run_makes_no_network_calls(self, mock_get):
+        """Test that a second fetch within the TTL is served from the cache."""
+        mock_get.return_value = self.mock_response()
+        
+        first = self.fetcher.fetch_transformed_market_data(['bitcoin', 'ethereum'])
+        second = self.fetcher.fetch_transformed_market_data(['ethereum', 'bitcoin'])
+        
+        assert mock_get.call_count == 1
+        assert second['crypto_id'].tolist() == first['crypto_id'].tolist()
+        assert self.fetcher.transport_stats()['cache']['hits'] == 1
+    
+    @patch('requests.Session.get')
+    def test_json_endpoints_are_cached(self, mock_get):
+        """Test that decoded-JSON calls also go through the cache."""
+        mock_get.return_value = self.mock_response()
+        
+        assert self.fetcher.fetch_market_data(['bitcoin', 'ethereum']) is not None
+        assert self.fetcher.fetch_market_data(['bitcoin', 'ethereum']) is not None
+        
+        assert mock_get.call_count == 1
+    
+    @patch('requests.Session.get')
+    def test_offline_miss_raises(self, mock_get):
+        """Test that offline mode never goes to the network."""
+        self.cache.offline = True
+        
+        with pytest.raises(OfflineCacheMiss):
+            self.fetcher._fetch_page(['bitcoin'])
+        mock_get.assert_not_called()
@@ -0,0 +1,145 @@
+"""
+Unit tests for the incrementally maintained rollup tables.
+"""
+
+import tempfile
+import pytest
+import pandas as pd
+from datetime import datetime
+from conftest import make_batch
+from src.bigquery_loader import BigQueryLoader
+from src.parquet_staging import ParquetStager
+from src.table_schema import SCHEMA_SQL_PATH
+
+duckdb = pytest.importorskip("duckdb")
+from src.local_bigquery import LocalBigQueryClient
+
+# The view definitions before the rollup tables, used as the reference result
+FULL_SCAN_SUMMARY = """
+SELECT DATE(extraction_timestamp) AS date, crypto_id, symbol, name,
+  AVG(current_price) AS avg_price, MIN(low_24h) AS daily_low, MAX(high_24h) AS daily_high,
+  AVG(market_cap) AS avg_market_cap, AVG(total_volume) AS avg_volume,
+  AVG(price_change_percentage_24h) AS avg_24h_change_pct, COUNT(*) AS data_points
+FROM `local.crypto_analytics.crypto_prices`
+GROUP BY date, crypto_id, symbol, name
+ORDER BY date, crypto_id
+"""
+
+
+class TestRollups:
+    """Test cases for the daily summary and latest price rollups."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.client = LocalBigQueryClient()
+        self.loader = BigQueryLoader(client=self.client, stager=ParquetStager(spool_dir=tempfile.mkdtemp()))
+        self.loader.project_id = "local"
+        self.loader.rollups_enabled = True
+        self.loader.ensure_dataset_exists()
+    
+    def query(self, sql):
+        """Run a query against the local client."""
+        return self.client.query(sql).to_dataframe()
+    
+    def summary(self):
+        """Daily summary rollup in the reference column order."""
+        return self.query(
+            "SELECT date, crypto_id, symbol, name, avg_price, daily_low, daily_high, avg_market_cap, "
+            "avg_volume, avg_24h_change_pct, data_points "
+            f"FROM `{self.loader.daily_summary_ref}` ORDER BY date, crypto_id"
+        )
+    
+    def test_summary_matches_full_scan(self):
+        """Test that incremental refreshes give the same result as re-aggregating everything."""
+        self.loader.upsert_data(make_batch({'bitcoin': 50000.0, 'ethereum': 3000.0}, datetime(2024, 1, 1, 9)))
+        self.loader.upsert_data(make_batch({'bitcoin': 52000.0, 'ethereum': 3100.0}, datetime(2024, 1, 1, 15)))
+        self.loader.upsert_data(make_batch({'bitcoin': 51000.0}, datetime(2024, 1, 2, 9)))
+        
+        pd.testing.assert_frame_equal(self.summary(), self.query(FULL_SCAN_SUMMARY), check_dtype=False)
+        assert self.summary()['data_points'].tolist() == [2, 2, 1]
+    
+    def test_only_touched_dates_are_recomputed(self):
+        """Test that the refresh is limited to the dates the load wrote."""
+        self.loader.upsert_data(make_batch({'bitcoin': 50000.0}, datetime(2024, 1, 1, 9)))
+        self.loader.upsert_data(make_batch({'bitcoin': 51000.0}, datetime(2024, 1, 2, 9)))
+        
+        refresh = [query for query in self.client.queries if query.startswith("BEGIN TRANSACTION")][-1]
+        
+        assert "DATE(extraction_timestamp) IN (DATE '2024-01-02')" in refresh
+        assert "2024-01-01" not in refresh
+    
+    def test_latest_prices_never_move_backwards(self):
+        """Test that backfilling an older date keeps the newest price per coin."""
+        self.loader.upsert_data(make_batch({'bitcoin': 51000.0}, datetime(2024, 1, 2, 9)))
+        self.loader.upsert_data(make_batch({'bitcoin': 40000.0, 'ethereum': 2000.0}, datetime(2023, 12, 1, 9)))
+        
+        latest = self.query(f"SELECT crypto_id, current_price FROM `{self.loader.latest_prices_ref}` ORDER BY crypto_id")
+        
+        assert latest['current_price'].tolist() == [51000.0, 2000.0]
+    
+    def test_rollups_are_kept_per_currency(self):
+        """Test that each quote currency of a coin gets its own summary and latest row."""
+        self.loader.upsert_data(make_batch({'bitcoin': 50000.0}, datetime(2024, 1, 1, 9)))
+        self.loader.upsert_data(make_batch({'bitcoin': 46000.0}, datetime(2024, 1, 1, 9), vs_currency='eur'))
+        
+        latest = self.query(
+            f"SELECT vs_currency, current_price FROM `{self.loader.latest_prices_ref}` ORDER BY vs_currency"
+        )
+        daily = self.query(f"SELECT vs_currency, avg_price FROM `{self.loader.daily_summary_ref}` ORDER BY vs_currency")
+        
+        assert latest.values.tolist() == [['eur', 46000.0], ['usd', 50000.0]]
+        assert daily.values.tolist() == [['eur', 46000.0], ['usd', 50000.0]]
+    
+    def test_legacy_rows_without_currency_match_usd_keys(self):
+        """Test that rerunning a pre-migration date updates its NULL-currency rows instead of duplicating them."""
+        legacy = make_batch({'bitcoin': 50000.0}, datetime(2024, 1, 1, 9), vs_currency=None)
+        self.loader.upsert_data(legacy)
+        
+        self.loader.upsert_data(make_batch({'bitcoin': 50500.0}, datetime(2024, 1, 1, 9)))
+        
+        rows = self.query(f"SELECT current_price FROM `{self.loader.table_ref}`")
+        existing = self.loader.existing_keys(make_batch({'bitcoin': 50500.0}, datetime(2024, 1, 1, 9)))
+        assert rows['current_price'].tolist() == [50500.0]
+        assert self.summary()['data_points'].tolist() == [1]
+        assert existing['vs_currency'].tolist() == ['usd']
+    
+    def test_append_loads_refresh_rollups(self):
+        """Test that plain loads refresh the rollups too."""
+        self.loader.load_mode = "append"
+        
+        self.loader.write_batch(make_batch({'bitcoin': 50000.0}, datetime(2024, 1, 1, 9)))
+        self.loader.write_batch(make_batch({'bitcoin': 52000.0}, datetime(2024, 1, 1, 15)))
+        
+        assert self.summary()['avg_price'].tolist() == [51000.0]
+    
+    def test_failed_refresh_is_retried(self):
+        """Test that dates whose refresh failed are refreshed after the next load."""
+        build_rollup_query = self.loader.build_rollup_query
+        self.loader.build_rollup_query = lambda dates: "SELECT * FROM missing_table"
+        self.loader.upsert_data(make_batch({'bitcoin': 50000.0}, datetime(2024, 1, 1, 9)))
+        
+        self.loader.build_rollup_query = build_rollup_query
+        self.loader.upsert_data(make_batch({'bitcoin': 51000.0}, datetime(2024, 1, 2, 9)))
+        
+        dates = pd.to_datetime(self.summary()['date']).dt.strftime('%Y-%m-%d').tolist()
+        assert dates == ['2024-01-01', '2024-01-02']
+    
+    def test_rebuild_from_history(self):
+        """Test that a rebuild fills the rollups from rows loaded before they existed."""
+        self.loader.rollups_enabled = False
+        self.loader.upsert_data(make_batch({'bitcoin': 50000.0, 'ethereum': 3000.0}, datetime(2024, 1, 1, 9)))
+        
+        assert self.loader.refresh_rollups(rebuild=True) is True
+        
+        pd.testing.assert_frame_equal(self.summary(), self.query(FULL_SCAN_SUMMARY), check_dtype=False)
+    
+    def test_views_read_the_rollups(self):
+        """Test that the views in sql/schema.sql are thin selects over the rollup tables."""
+        self.client.query(SCHEMA_SQL_PATH.read_text())
+        self.loader.upsert_data(make_batch({'bitcoin': 50000.0, 'ethereum': 3000.0}, datetime(2024, 1, 1, 9)))
+        
+        latest = self.query("SELECT crypto_id FROM `crypto_analytics.v_latest_crypto_prices`")
+        daily = self.query("SELECT date, crypto_id, data_points FROM `crypto_analytics.v_daily_price_summary`")
+        
+        assert latest['crypto_id'].tolist() == ['bitcoin', 'ethereum']
+        assert daily['data_points'].tolist() == [1, 1]
@@ -0,0 +1,151 @@
+"""
+Unit tests for the sink layer and the local Parquet warehouse.
+"""
+
+import tempfile
+import pytest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import Mock
+from conftest import make_batch
+from src.columnar_decoder import exchange_rates_frame
+from src.main import run_batch_pipeline
+from src.sinks import LocalParquetSink, Sink
+
+duckdb = pytest.importorskip("duckdb")
+
+
+class TestLocalParquetSink:
+    """Test cases for LocalParquetSink."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.root = Path(tempfile.mkdtemp())
+        self.sink = LocalParquetSink(root=self.root, dataset="crypto_analytics")
+    
+    def teardown_method(self):
+        """Close the DuckDB connection."""
+        self.sink.close()
+    
+    def test_writes_hive_partitions(self):
+        """Test that rows land under extraction_date and crypto_id partitions."""
+        assert self.sink.write(make_batch({'bitcoin': 50000.0, 'ethereum': 3000.0}, datetime(2024, 1, 1, 12))) is True
+        
+        partitions = sorted(path.parent.relative_to(self.root).as_posix() for path in self.root.rglob("*.parquet"))
+        assert partitions == [
+            'crypto_prices/extraction_date=2024-01-01/crypto_id=bitcoin',
+            'crypto_prices/extraction_date=2024-01-01/crypto_id=ethereum',
+        ]
+    
+    def test_rewriting_a_batch_does_not_duplicate_rows(self):
+        """Test that rows repeating a stored key replace it, so the rollups match the BigQuery MERGE."""
+        batch = make_batch({'bitcoin': 50000.0, 'ethereum': 3000.0}, datetime(2024, 1, 1, 12))
+        self.sink.write(batch)
+        self.sink.write(batch)
+        self.sink.write(make_batch({'bitcoin': 51000.0}, datetime(2024, 1, 1, 12)))
+        
+        rows = self.sink.query("SELECT crypto_id, current_price FROM `crypto_analytics.crypto_prices` ORDER BY crypto_id")
+        summary = self.sink.query("SELECT data_points FROM `crypto_analytics.crypto_daily_summary`")
+        assert rows.values.tolist() == [['bitcoin', 51000.0], ['ethereum', 3000.0]]
+        assert summary['data_points'].tolist() == [1, 1]
+        assert len(list(self.root.rglob("*.parquet"))) == 2
+    
+    def test_latest_prices_view_keeps_newest_row(self):
+        """Test that v_latest_crypto_prices returns the newest row per coin and currency."""
+        self.sink.write(make_batch({'bitcoin': 50000.0, 'ethereum': 3000.0}, datetime(2024, 1, 1, 12)))
+        self.sink.write(make_batch({'bitcoin': 51000.0}, datetime(2024, 1, 2, 12)))
+        self.sink.write(make_batch({'bitcoin': 47000.0}, datetime(2024, 1, 2, 12), vs_currency='eur'))
+        
+        latest = self.sink.query(
+            "SELECT crypto_id, vs_currency, current_price FROM `my-project.crypto_analytics.v_latest_crypto_prices` "
+            "ORDER BY crypto_id, vs_currency"
+        )
+        assert latest.values.tolist() == [['bitcoin', 'eur', 47000.0], ['bitcoin', 'usd', 51000.0], ['ethereum', 'usd', 3000.0]]
+    
+    def test_daily_summary_view_aggregates_per_day(self):
+        """Test that v_daily_price_summary averages each day's extractions."""
+        self.sink.write(make_batch({'bitcoin': 50000.0}, datetime(2024, 1, 1, 9)))
+        self.sink.write(make_batch({'bitcoin': 52000.0}, datetime(2024, 1, 1, 15)))
+        self.sink.write(make_batch({'bitcoin': 60000.0}, datetime(2024, 1, 2, 9)))
+        
+        summary = self.sink.query(
+            "SELECT CAST(date AS VARCHAR) AS day, avg_price, data_points FROM `crypto_analytics.v_daily_price_summary` "
+            "WHERE crypto_id = @coin ORDER BY date",
+            {'coin': 'bitcoin'}
+        )
+        assert summary.values.tolist() == [['2024-01-01', 51000.0, 2], ['2024-01-02', 60000.0, 1]]
+    
+    def test_backfilled_day_does_not_replace_latest_price(self):
+        """Test that writing an older extraction date keeps the newer latest price."""
+        self.sink.write(make_batch({'bitcoin': 51000.0}, datetime(2024, 1, 2, 12)))
+        self.sink.write(make_batch({'bitcoin': 40000.0}, datetime(2023, 12, 1, 12)))
+        
+        latest = self.sink.query("SELECT current_price FROM `crypto_analytics.crypto_latest_prices`")
+        assert latest['current_price'].tolist() == [51000.0]
+    
+    def test_rollups_rebuilt_when_database_is_missing(self):
+        """Test that the rollup tables are rebuilt from the Parquet files if the database is removed."""
+        self.sink.write(make_batch({'bitcoin': 50000.0}, datetime(2024, 1, 1, 12)))
+        self.sink.close()
+        (self.root / "warehouse.duckdb").unlink()
+        
+        rebuilt = LocalParquetSink(root=self.root, dataset="crypto_analytics")
+        try:
+            summary = rebuilt.query("SELECT crypto_id, avg_price FROM `crypto_analytics.v_daily_price_summary`")
+        finally:
+            rebuilt.close()
+        assert summary.values.tolist() == [['bitcoin', 50000.0]]
+    
+    def test_reference_frames_are_queryable(self):
+        """Test that reference frames are written to their own tables."""
+        rates = exchange_rates_frame(
+            {'rates': {'usd': {'name': 'US Dollar', 'unit': '$', 'value': 65000.0, 'type': 'fiat'}}},
+            datetime(2024, 1, 1, 12)
+        )
+        self.sink.write(make_batch({'bitcoin': 50000.0}, datetime(2024, 1, 1, 12)), {'exchange_rates': rates})
+        
+        stored = self.sink.query("SELECT currency, btc_rate FROM `crypto_analytics.crypto_exchange_rates`")
+        assert stored.values.tolist() == [['usd', 65000.0]]
+    
+    def test_run_writes_to_every_sink(self):
+        """Test that one run writes the validated batch to several sinks."""
+        batch = make_batch({'bitcoin': 50000.0}, datetime(2024, 1, 1, 12))
+        fetcher = Mock()
+        fetcher.fetch_market_matrix.return_value = {'markets': batch}
+        fetcher.transport_stats.return_value = {}
+        checker = Mock()
+        checker.run_all_checks.return_value = (True, {})
+        other_sink = Mock()
+        other_sink.name = "other"
+        other_sink.write.return_value = True
+        
+        assert run_batch_pipeline(fetcher, checker, [self.sink, other_sink]) is True
+        
+        other_sink.write.assert_called_once()
+        assert len(self.sink.query("SELECT * FROM `crypto_analytics.crypto_prices`")) == 1
+    
+    def test_failed_sink_fails_run(self):
+        """Test that a run fails, and baselines are not advanced, if any sink fails."""
+        fetcher = Mock()
+        fetcher.fetch_market_matrix.return_value = {'markets': make_batch({'bitcoin': 50000.0}, datetime(2024, 1, 1, 12))}
+        fetcher.transport_stats.return_value = {}
+        checker = Mock()
+        checker.run_all_checks.return_value = (True, {})
+        failing_sink = Mock()
+        failing_sink.name = "other"
+        failing_sink.write.return_value = False
+        
+        assert run_batch_pipeline(fetcher, checker, [self.sink, failing_sink]) is False
+        checker.update_anomaly_baselines.assert_not_called()
+
+
+class TestSink:
+    """Test cases for the Sink interface."""
+    
+    def test_sink_without_write_cannot_be_built(self):
+        """Test that an incomplete sink fails at construction rather than mid-run."""
+        class IncompleteSink(Sink):
+            name = "incomplete"
+        
+        with pytest.raises(TypeError):
+            IncompleteSink()
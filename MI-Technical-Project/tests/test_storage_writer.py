@@ -0,0 +1,197 @@
+"""
+Unit tests for Storage Write API appends (uses the DuckDB stand-in).
+"""
+
+import tempfile
+import pytest
+import pandas as pd
+import pyarrow as pa
+from datetime import datetime
+from unittest.mock import Mock, patch
+from src.bigquery_loader import BigQueryLoader
+from src.parquet_staging import ParquetStager
+from src.storage_writer import StorageWriter
+
+duckdb = pytest.importorskip("duckdb")
+from src.local_bigquery import LocalBigQueryClient, LocalWriteClient
+
+TABLE_REF = "local.crypto_analytics.events"
+SCHEMA = pa.schema([('crypto_id', pa.string()), ('current_price', pa.float64())])
+
+
+def make_rows(prices):
+    """Build an Arrow table of crypto_id/current_price rows."""
+    return pa.table({'crypto_id': list(prices), 'current_price': list(prices.values())}, schema=SCHEMA)
+
+
+class FakeClock:
+    """Monotonic clock advanced by hand."""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestStorageWriter:
+    """Test cases for StorageWriter with LocalWriteClient."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.client = LocalBigQueryClient()
+        self.write_client = LocalWriteClient(self.client)
+        self.clock = FakeClock()
+    
+    def make_writer(self, **kwargs):
+        """StorageWriter on the test table with flushes triggered only by hand unless overridden."""
+        options = {'flush_bytes': 1 << 30, 'flush_seconds': 60.0, 'clock': self.clock}
+        options.update(kwargs)
+        return StorageWriter(self.write_client, TABLE_REF, SCHEMA, **options)
+    
+    def row_count(self):
+        """Rows visible in the test table."""
+        return self.client.get_table(TABLE_REF).num_rows
+    
+    def test_committed_rows_visible_after_flush(self):
+        """Test that committed-stream appends reuse one stream and are queryable after each flush."""
+        writer = self.make_writer()
+        
+        handle = writer.submit(make_rows({'bitcoin': 50000.0, 'ethereum': 3000.0}))
+        assert handle.done() is False
+        assert writer.flush() is True
+        assert handle.result().output_rows == 2
+        assert self.row_count() == 2
+        
+        writer.submit(make_rows({'solana': 100.0}))
+        writer.flush()
+        assert self.row_count() == 3
+        assert writer._offset == 3
+        assert len(self.write_client._streams) == 1
+    
+    def test_pending_rows_visible_only_after_commit(self):
+        """Test that pending-stream batches become visible atomically on commit."""
+        writer = self.make_writer(stream_type="pending")
+        commits = []
+        original_commit = self.write_client.commit
+        
+        def commit(table_ref, streams):
+            commits.append(streams)
+            with pytest.raises(LookupError):
+                self.client.get_table(TABLE_REF)
+            original_commit(table_ref, streams)
+        
+        self.write_client.commit = commit
+        writer.submit(make_rows({'bitcoin': 50000.0}))
+        writer.submit(make_rows({'ethereum': 3000.0}))
+        
+        assert writer.flush() is True
+        assert len(commits) == 1
+        assert self.row_count() == 2
+    
+    def test_retried_offset_is_written_once(self):
+        """Test that an append replayed at an acknowledged offset does not duplicate rows."""
+        stream = self.write_client.create_stream(TABLE_REF, "committed")
+        rows = make_rows({'bitcoin': 50000.0})
+        
+        self.write_client.append(stream, rows, 0)
+        self.write_client.append(stream, rows, 0)
+        
+        assert self.row_count() == 1
+        with pytest.raises(ValueError):
+            self.write_client.append(stream, rows, 5)
+    
+    def test_flushes_on_size_and_age(self):
+        """Test that submit flushes once the buffer reaches flush_bytes or flush_seconds."""
+        rows = make_rows({'bitcoin': 50000.0})
+        by_size = self.make_writer(flush_bytes=rows.nbytes * 2)
+        by_size.submit(rows)
+        assert by_size.flushes == 0
+        by_size.submit(rows)
+        assert by_size.flushes == 1
+        
+        by_age = self.make_writer(flush_seconds=2.0)
+        by_age.submit(rows)
+        self.clock.now = 2.5
+        by_age.submit(rows)
+        assert by_age.flushes == 1
+        assert self.row_count() == 4
+    
+    def test_failed_flush_fails_handles(self):
+        """Test that handles of a failed flush raise the flush error."""
+        writer = self.make_writer(max_retries=0)
+        self.write_client.append = lambda stream, table, offset: (_ for _ in ()).throw(RuntimeError("stream broken"))
+        
+        handle = writer.submit(make_rows({'bitcoin': 50000.0}))
+        assert writer.flush() is False
+        with pytest.raises(RuntimeError, match="stream broken"):
+            handle.result()
+
+    def test_multi_request_flush_commits_atomically(self):
+        """Test that a committed-mode flush needing several requests goes through one pending stream."""
+        writer = self.make_writer()
+        rows = make_rows({f"coin-{i}": float(i) for i in range(100)})
+        appends = []
+        original_append = self.write_client.append
+        
+        def append(stream, table, offset):
+            appends.append(stream)
+            if len(appends) == 2:
+                raise RuntimeError("connection reset")
+            original_append(stream, table, offset)
+        
+        self.write_client.append = append
+        writer.max_retries = 0
+        with patch("src.storage_writer.MAX_REQUEST_BYTES", rows.nbytes // 4):
+            writer.submit(rows)
+            assert writer.flush() is False
+        
+        with pytest.raises(LookupError):
+            self.client.get_table(TABLE_REF)
+        assert self.write_client._streams[appends[0]]['type'] == "pending"
+    
+    def test_empty_submit_sends_nothing(self):
+        """Test that flushing only empty tables finishes their handles without an append."""
+        writer = self.make_writer()
+        self.write_client.append = Mock(side_effect=AssertionError("empty append sent"))
+        
+        handle = writer.submit(make_rows({}))
+        
+        assert writer.flush() is True
+        assert handle.result().output_rows == 0
+
+class TestLoaderStorageWrite:
+    """Test cases for BigQueryLoader in storage_write mode."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.client = LocalBigQueryClient()
+        self.stager = ParquetStager(spool_dir=tempfile.mkdtemp())
+        self.write_client = LocalWriteClient(self.client)
+        self.loader = BigQueryLoader(client=self.client, stager=self.stager, write_client=self.write_client)
+        self.loader.project_id = "local"
+        self.loader.load_mode = "append"
+        self.loader.write_mode = "storage_write"
+        self.loader.initialize_client()
+        self.loader.ensure_dataset_exists()
+    
+    def test_write_appends_without_load_jobs(self):
+        """Test that a sink write appends through the write client and empties the spool."""
+        batch = pd.DataFrame({
+            'crypto_id': ['bitcoin', 'ethereum'],
+            'symbol': ['BTC', 'ETH'],
+            'name': ['Bitcoin', 'Ethereum'],
+            'vs_currency': ['usd', 'usd'],
+            'current_price': [50000.0, 3000.0],
+            'extraction_timestamp': [datetime(2024, 1, 1, 12)] * 2,
+        })
+        
+        self.client.load_table_from_file = Mock(wraps=self.client.load_table_from_file)
+        
+        assert self.loader.write(batch) is True
+        
+        assert self.client.get_table(self.loader.table_ref).num_rows == 2
+        assert self.stager.pending() == []
+        self.client.load_table_from_file.assert_not_called()
+        self.loader.close()
+
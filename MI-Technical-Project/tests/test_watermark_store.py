@@ -0,0 +1,100 @@
+"""
+Unit tests for the watermark store module.
+"""
+
+import tempfile
+import pandas as pd
+from pathlib import Path
+from src.watermark_store import WatermarkStore
+
+
+def make_snapshot(last_updated, prices):
+    """Build a transformed snapshot with one row per coin."""
+    return pd.DataFrame({
+        'crypto_id': list(prices),
+        'symbol': [crypto_id[:3].upper() for crypto_id in prices],
+        'last_updated': pd.to_datetime(last_updated, utc=True),
+        'current_price': list(prices.values()),
+    })
+
+
+class TestWatermarkStore:
+    """Test cases for WatermarkStore class."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.path = Path(tempfile.mkdtemp()) / "watermarks.sqlite"
+        self.store = WatermarkStore(self.path)
+        self.first = make_snapshot(
+            ['2024-01-01T00:00:00Z', '2024-01-01T00:00:00Z'],
+            {'bitcoin': 50000.0, 'ethereum': 3000.0}
+        )
+    
+    def test_new_coins_are_kept(self):
+        """Test that every row is loaded when there are no watermarks."""
+        changed, skipped = self.store.filter_changed(self.first)
+        
+        assert len(changed) == 2
+        assert skipped == 0
+    
+    def test_unchanged_rows_are_skipped(self):
+        """Test that only coins whose last_updated advanced are kept."""
+        self.store.commit(self.first)
+        second = make_snapshot(
+            ['2024-01-01T00:05:00Z', '2024-01-01T00:00:00Z'],
+            {'bitcoin': 50100.0, 'ethereum': 3000.0}
+        )
+        
+        changed, skipped = self.store.filter_changed(second)
+        
+        assert changed['crypto_id'].tolist() == ['bitcoin']
+        assert skipped == 1
+    
+    def test_price_tolerance(self):
+        """Test that small price moves are skipped when a tolerance is set."""
+        store = WatermarkStore(self.path, price_tolerance_pct=0.5)
+        store.commit(self.first)
+        second = make_snapshot(
+            ['2024-01-01T00:05:00Z', '2024-01-01T00:05:00Z'],
+            {'bitcoin': 50100.0, 'ethereum': 3100.0}
+        )
+        
+        changed, skipped = store.filter_changed(second)
+        
+        assert changed['crypto_id'].tolist() == ['ethereum']
+        assert skipped == 1
+    
+    def test_watermarks_persist(self):
+        """Test that committed watermarks survive reopening the store."""
+        self.store.commit(self.first)
+        self.store.close()
+        
+        reopened = WatermarkStore(self.path)
+        changed, skipped = reopened.filter_changed(self.first)
+        
+        assert changed.empty
+        assert skipped == 2
+    
+    def test_rebuild_replaces_watermarks(self):
+        """Test that rebuilding from the latest-prices view replaces the store."""
+        self.store.commit(self.first)
+        latest = make_snapshot(['2024-01-02T00:00:00Z'], {'bitcoin': 52000.0})
+        
+        assert self.store.rebuild(latest) is True
+        
+        watermarks = self.store.load()
+        assert watermarks['crypto_id'].tolist() == ['bitcoin']
+        assert watermarks['last_updated'].iloc[0] == pd.Timestamp('2024-01-02', tz='UTC')
+        assert self.store.rebuild(None) is False
+
+    def test_currencies_have_separate_watermarks(self):
+        """Test that a coin's quote currencies advance independently."""
+        self.store.commit(self.first.assign(vs_currency='usd'))
+        eur = self.first.assign(vs_currency='eur')
+        
+        changed, skipped = self.store.filter_changed(eur)
+        self.store.commit(eur)
+        
+        assert len(changed) == 2
+        assert skipped == 0
+        assert sorted(self.store.load()['crypto_id']) == ['bitcoin', 'bitcoin:eur', 'ethereum', 'ethereum:eur']